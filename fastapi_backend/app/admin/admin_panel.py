@@ -2,11 +2,14 @@
 import asyncio
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from pydantic import BaseModel
 from app.users.auth import get_current_user, get_db
+from app.users.identity_cache import identity_cache, invalidate_identity
 from app.users.permissions import require_role
+from app.ledger.running_balance import ledger_balances
+from app.market.tick_latency import tick_latency
 from app.storage.models import UserAccount, Notification, MockOrder, MockTrade, ExecutionEvent, MockPosition, LedgerEntry, PnlSnapshot
 from app.users.passwords import verify_password
 from app.notifications.notifier import notify
@@ -33,13 +36,13 @@ class DhanConnectionToggleIn(BaseModel):
     reason: str | None = None
 
 
-async def _load_master_background():
+async def _load_master_background(force: bool = False):
     _load_master_state["running"] = True
     _load_master_state["last_error"] = None
     try:
         from app.market.instrument_master.loader import MASTER
 
-        await asyncio.to_thread(MASTER.load)
+        await asyncio.to_thread(MASTER.load, force)
         _load_master_state["last_records"] = len(getattr(MASTER, "rows", []) or [])
         _load_master_state["last_loaded_at"] = datetime.now(timezone.utc).isoformat()
     except Exception as exc:
@@ -80,7 +83,7 @@ async def load_instrument_master(force: bool = False, user=Depends(get_current_u
                 "last_loaded_at": _load_master_state.get("last_loaded_at"),
             }
 
-        _load_master_task = asyncio.create_task(_load_master_background())
+        _load_master_task = asyncio.create_task(_load_master_background(force))
         return {
             "status": "started",
             "message": "Instrument master load started in background",
@@ -112,16 +115,8 @@ def user_auth_check(payload: UserAuthCheckIn, user=Depends(get_current_user), db
     if not identifier:
         raise HTTPException(status_code=400, detail="identifier is required")
 
-    target = (
-        db.query(UserAccount)
-        .filter(
-            (func.lower(UserAccount.mobile) == identifier.lower())
-            | (func.lower(UserAccount.user_id) == identifier.lower())
-            | (func.lower(UserAccount.username) == identifier.lower())
-            | (func.lower(UserAccount.email) == identifier.lower())
-        )
-        .first()
-    )
+    target_id = identity_cache.resolve_id(db, identifier)
+    target = db.get(UserAccount, target_id) if target_id is not None else None
 
     if not target:
         return {
@@ -167,6 +162,175 @@ def dhan_connection_status(user=Depends(get_current_user)):
     return {"status": "ok", "data": get_status()}
 
 
+@router.get("/metrics")
+def tick_latency_metrics(format: str = "prometheus", user=Depends(get_current_user)):
+    """Tick-to-client latency histograms (Prometheus text, or ``?format=json``)."""
+    require_role(user, ["ADMIN", "SUPER_ADMIN"])
+    if format == "json":
+        return {"status": "ok", "data": tick_latency.snapshot()}
+    return PlainTextResponse(tick_latency.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/margin/reconciliation")
+def margin_reconciliation_status(user=Depends(get_current_user)):
+    """Local-vs-Dhan margin reconciliation counters and recent discrepancies."""
+    require_role(user, ["ADMIN", "SUPER_ADMIN"])
+    from app.rms.margin_engine import MARGIN_RECONCILER
+
+    return {"status": "ok", "data": MARGIN_RECONCILER.get_status()}
+
+
+@router.get("/archive")
+def order_archive_status(user=Depends(get_current_user)):
+    """Partitions, files and size of the purged-order archive."""
+    require_role(user, ["ADMIN", "SUPER_ADMIN"])
+    from app.storage.order_archive import ORDER_ARCHIVE
+
+    return {"status": "ok", "data": ORDER_ARCHIVE.get_status()}
+
+
+@router.get("/archive/{table}")
+def order_archive_query(
+    table: str,
+    user_id: int | None = None,
+    symbol: str | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    columns: str | None = None,
+    limit: int = 1000,
+    user=Depends(get_current_user),
+):
+    """
+    Query archived orders / trades / execution_events.
+
+    Filters (user_id, symbol, start_date..end_date inclusive, YYYY-MM-DD) are
+    applied to partitions and file statistics before any column is read;
+    ``columns`` is a comma-separated projection.
+    """
+    require_role(user, ["ADMIN", "SUPER_ADMIN"])
+    from app.storage.order_archive import ORDER_ARCHIVE, TABLES
+
+    if table not in TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown archive table '{table}'")
+    projection = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    try:
+        rows = ORDER_ARCHIVE.query(
+            table,
+            user_id=user_id,
+            symbol=symbol,
+            start_date=start_date,
+            end_date=end_date,
+            columns=projection,
+            limit=max(1, min(int(limit), 50000)),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, datetime):
+                row[key] = value.isoformat()
+    return {"status": "ok", "count": len(rows), "data": rows}
+
+
+@router.get("/execution-analytics")
+def execution_analytics(
+    start_date: str | None = None,
+    end_date: str | None = None,
+    group_by: str = "symbol",
+    symbol: str | None = None,
+    user_id: int | None = None,
+    user=Depends(get_current_user),
+):
+    """
+    Slippage, fill ratio, time-to-fill, latency and rejection reasons from execution events.
+
+    ``group_by`` is a comma-separated subset of symbol, exchange, segment,
+    user, order_type, product_type, side. Dates are IST trading days
+    (YYYY-MM-DD, default today); purged days are read from the order archive.
+    """
+    require_role(user, ["ADMIN", "SUPER_ADMIN"])
+    from datetime import date
+    from app.execution_simulator.execution_analytics import DIMENSIONS, EXECUTION_ANALYTICS
+
+    dims = [d.strip() for d in (group_by or "").split(",") if d.strip()]
+    unknown = [d for d in dims if d not in DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by {unknown}; use {list(DIMENSIONS)}")
+    try:
+        start = date.fromisoformat(start_date) if start_date else None
+        end = date.fromisoformat(end_date) if end_date else None
+        report = EXECUTION_ANALYTICS.report(start, end, dims, symbol=symbol, user_id=user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"status": "ok", "data": report}
+
+
+@router.get("/execution-models")
+def execution_models(user=Depends(get_current_user)):
+    """Active latency/slippage models and the calibration table they sample from."""
+    require_role(user, ["ADMIN", "SUPER_ADMIN"])
+    from app.execution_simulator.calibration import CALIBRATION_STORE
+    from app.execution_simulator.execution_engine import get_execution_engine
+
+    engine = get_execution_engine()
+    data = {
+        "latency_model": engine.config.latency_model,
+        "slippage_model": engine.config.slippage_model,
+        "available_versions": CALIBRATION_STORE.versions(),
+    }
+    for name in ("latency_model", "slippage_model"):
+        table = getattr(getattr(engine, name), "table", None)
+        if table is not None:
+            data[f"{name}_table"] = table.summary()
+    return {"status": "ok", "data": data}
+
+
+@router.post("/execution-models/reload")
+def execution_models_reload(version: int | None = None, user=Depends(get_current_user)):
+    """Switch the empirical models to a calibration version (latest/pinned when omitted)."""
+    require_role(user, ["ADMIN", "SUPER_ADMIN"])
+    from app.execution_simulator.execution_engine import get_execution_engine
+
+    engine = get_execution_engine()
+    loaded = {}
+    for name in ("latency_model", "slippage_model"):
+        model = getattr(engine, name)
+        if hasattr(model, "reload"):
+            loaded[name] = model.reload(version)
+    if version is not None and any(v != version for v in loaded.values()):
+        raise HTTPException(status_code=404, detail=f"Calibration version {version} not available")
+    return {"status": "ok", "data": loaded}
+
+
+@router.get("/squareoff")
+def squareoff_status(user=Depends(get_current_user)):
+    """MIS square-off cutoffs, progress of the running pass and the last result per exchange."""
+    require_role(user, ["ADMIN", "SUPER_ADMIN"])
+    from app.rms.squareoff_engine import SQUAREOFF_ENGINE
+
+    return {"status": "ok", "data": SQUAREOFF_ENGINE.get_status()}
+
+
+@router.post("/squareoff/run")
+def squareoff_run(
+    exchange: str | None = None,
+    user_id: int | None = None,
+    dry_run: bool = False,
+    user=Depends(get_current_user),
+):
+    """Square off open MIS positions now (one exchange, or every configured one)."""
+    require_role(user, ["SUPER_ADMIN"])
+    from app.rms.squareoff_engine import SQUAREOFF_ENGINE
+
+    exchanges = [exchange.upper()] if exchange else None
+    if exchanges and exchanges[0] not in SQUAREOFF_ENGINE.cutoffs:
+        raise HTTPException(status_code=400, detail=f"Unknown exchange {exchange}; use {sorted(SQUAREOFF_ENGINE.cutoffs)}")
+    result = SQUAREOFF_ENGINE.run(exchanges, reason="ADMIN_SQUAREOFF", user_id=user_id, dry_run=dry_run)
+    if result.get("status") == "already_running":
+        raise HTTPException(status_code=409, detail="A square-off pass is already running")
+    return {"status": "ok", "data": result}
+
+
 @router.post("/dhan-connection")
 def dhan_connection_toggle(payload: DhanConnectionToggleIn, user=Depends(get_current_user)):
     require_role(user, ["ADMIN", "SUPER_ADMIN"])
@@ -214,6 +378,7 @@ def suspend_user(username: str, user=Depends(get_current_user), db: Session = De
     target = db.query(UserAccount).filter(UserAccount.username == username).first()
     target.status = "BLOCKED"
     db.commit()
+    invalidate_identity(target.id)
     notify(db, f"User {username} suspended by {user.username}")
     return {"status": "suspended"}
 
@@ -444,6 +609,7 @@ def clear_admin_executed_orders(
         
         if include_ledger:
             db.query(LedgerEntry).filter(LedgerEntry.user_id == admin_user.id).delete()
+            ledger_balances.rebuild(db, admin_user.id)
         
         if include_pnl:
             db.query(PnlSnapshot).filter(PnlSnapshot.user_id == admin_user.id).delete()
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.users.auth import get_current_user, get_db
 from app.users.permissions import require_role
+from app.ledger.running_balance import ledger_balances
 from app.storage.models import UserAccount, MockOrder, MockTrade, ExecutionEvent, MockPosition, LedgerEntry, PnlSnapshot
 from typing import Dict, Any
 
@@ -80,6 +81,7 @@ def clear_admin_executed_orders(
         
         if include_ledger:
             db.query(LedgerEntry).filter(LedgerEntry.user_id == admin_user.id).delete()
+            ledger_balances.rebuild(db, admin_user.id)
         
         if include_pnl:
             db.query(PnlSnapshot).filter(PnlSnapshot.user_id == admin_user.id).delete()
@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import asyncio
-import time
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -15,17 +14,13 @@ from app.commodity_engine.commodity_futures_service import commodity_futures_ser
 from app.commodity_engine.commodity_utils import fetch_dhan_credentials
 from app.ems.exchange_clock import is_market_open
 from app.market.market_state import state as market_state
+from app.market.tick_latency import tick_latency
 from app.market_cache.options import get_option_chain
 from app.market_cache.futures import list_futures
-from app.services.dhan_sdk_bridge import sdk_quote_data_async
+from app.services.dhan_quote_batcher import dhan_quote_batcher
 
 router = APIRouter(prefix="/commodities")
 
-_QUOTE_LOCK = asyncio.Lock()
-_QUOTE_LAST_CALL = 0.0
-_QUOTE_MIN_INTERVAL_SECONDS = 0.75
-_QUOTE_CACHE_TTL_SECONDS = 3.0
-_QUOTE_CACHE: Dict[str, Dict[str, object]] = {}
 
 
 @router.get("/expiries")
@@ -113,31 +108,18 @@ def _extract_depth(payload: object) -> Dict[str, List[Dict[str, float]]]:
     return {"bids": [], "asks": []}
 
 
-async def _rate_limit_quote_api() -> None:
-    global _QUOTE_LAST_CALL
-    async with _QUOTE_LOCK:
-        now = time.monotonic()
-        wait = _QUOTE_MIN_INTERVAL_SECONDS - (now - _QUOTE_LAST_CALL)
-        if wait > 0:
-            await asyncio.sleep(wait)
-        _QUOTE_LAST_CALL = time.monotonic()
-
-
 async def _fetch_mcx_quotes(tokens: List[str]) -> Dict[str, Dict[str, object]]:
     normalized_tokens = [token for token in {_as_token(token) for token in tokens} if token]
     if not normalized_tokens:
         return {}
 
-    now = time.monotonic()
     response_map: Dict[str, Dict[str, object]] = {}
     missing: List[str] = []
     for token in normalized_tokens:
-        cached = _QUOTE_CACHE.get(token)
-        if cached and (now - float(cached.get("ts") or 0.0)) <= _QUOTE_CACHE_TTL_SECONDS:
-            payload = cached.get("payload")
-            if isinstance(payload, dict):
-                response_map[token] = payload
-                continue
+        cached = dhan_quote_batcher.get_cached("MCX_COMM", token)
+        if cached is not None:
+            response_map[token] = cached
+            continue
         missing.append(token)
 
     if not missing:
@@ -147,25 +129,8 @@ async def _fetch_mcx_quotes(tokens: List[str]) -> Dict[str, Dict[str, object]]:
     if not creds:
         return response_map
 
-    await _rate_limit_quote_api()
     try:
-        payload = {"MCX_COMM": [int(token) for token in missing]}
-        sdk_result = await sdk_quote_data_async(creds=creds, securities=payload)
-        if not sdk_result.get("ok"):
-            return response_map
-
-        body = sdk_result.get("data") or {}
-        segment = (body.get("data") or {}).get("MCX_COMM") or {}
-        ts = time.monotonic()
-        for token_key, quote_payload in segment.items():
-            token = _as_token(token_key)
-            if not token:
-                continue
-            if isinstance(quote_payload, list) and quote_payload:
-                quote_payload = quote_payload[0]
-            if isinstance(quote_payload, dict):
-                response_map[token] = quote_payload
-                _QUOTE_CACHE[token] = {"payload": quote_payload, "ts": ts}
+        response_map.update(await dhan_quote_batcher.get_many_async("MCX_COMM", missing, creds))
     except Exception:
         return response_map
 
@@ -364,7 +329,9 @@ async def commodities_ws(ws: WebSocket):
             # Send snapshot every second (REST fallback still available)
             options = commodity_option_chain_service.option_chain_cache
             futures = commodity_futures_service.futures_cache
+            pending_tick = tick_latency.broadcast_enqueued("commodities")
             await ws.send_json({"options": options, "futures": futures})
+            tick_latency.broadcast_sent(pending_tick)
             await asyncio.sleep(1)
     except WebSocketDisconnect:
         return
@@ -12,7 +12,9 @@ from typing import Dict, List, Optional, Tuple
 from app.commodity_engine.commodity_utils import fetch_dhan_credentials
 from app.commodity_engine.commodity_option_chain_service import commodity_option_chain_service
 from app.commodity_engine.commodity_futures_service import commodity_futures_service
+from app.dhan.protocols import point_feed_class
 from app.market.security_ids import EXCHANGE_CODE_MCX
+from app.market.tick_latency import tick_latency
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +36,7 @@ def _resolve_dhan_feed_class():
 
 def _create_dhan_feed(client_id: str, token: str, instruments):
     feed_cls = _resolve_dhan_feed_class()
+    point_feed_class(feed_cls)
     try:
         source = inspect.getsource(feed_cls)
     except Exception:
@@ -182,8 +185,10 @@ class CommodityWebSocketManager:
             conn.start()
 
     def on_message(self, message: Dict[str, object]):
+        tick_start = tick_latency.now() if tick_latency.enabled else None
         sec_id = message.get("security_id")
         if not sec_id:
+            tick_latency.drop("no_security_id")
             return
         sec_id_str = str(sec_id)
         self.last_tick_time = time.time()
@@ -191,6 +196,7 @@ class CommodityWebSocketManager:
 
         meta = self.token_index.get(sec_id_str)
         if not meta:
+            tick_latency.drop("unmapped")
             return
 
         def _extract(payload: Dict[str, object], keys: List[str]) -> Optional[float]:
@@ -265,6 +271,7 @@ class CommodityWebSocketManager:
         if (ask is None or ask <= 0) and depth and depth.get("asks"):
             first_ask = depth["asks"][0]
             ask = float(first_ask.get("price")) if first_ask.get("price") is not None else ask
+        tick_latency.stage("decode", tick_start)
 
         try:
             from app.market.market_state import state
@@ -298,6 +305,8 @@ class CommodityWebSocketManager:
                 oi=oi,
                 volume=volume,
             )
+        tick_latency.stage("cache_update", tick_start)
+        tick_latency.tick_published(tick_start, ("commodities",))
 
     def get_ltp(self, security_id: str) -> Optional[float]:
         quote = self.last_quotes.get(str(security_id))
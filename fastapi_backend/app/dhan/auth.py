@@ -1,9 +1,11 @@
 
 from sqlalchemy.orm import Session
 from app.storage.models import DhanCredential
+from app.dhan.credential_provider import notify_credentials_changed
 
 def save_credentials(db: Session, data: dict):
     db.query(DhanCredential).delete()
     cred = DhanCredential(**data)
     db.add(cred)
     db.commit()
+    notify_credentials_changed("credentials saved")
@@ -0,0 +1,156 @@
+"""In-memory provider for the active Dhan credential.
+
+Outbound Dhan REST calls (margin checks, quote fallbacks, option chain and
+expiry refreshes, the live feed) used to open a session and query
+``DhanCredential`` every time. The provider keeps a detached snapshot of the
+active row and reloads it only after a writer calls
+``notify_credentials_changed`` (or after a long safety TTL, for writes made
+by another process).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SAFETY_TTL_SECONDS = float(os.getenv("DHAN_CREDENTIAL_CACHE_TTL_SECONDS", "300"))
+
+
+@dataclass(frozen=True)
+class CredentialSnapshot:
+    """Detached copy of a ``DhanCredential`` row (same attribute names)."""
+
+    id: Optional[int]
+    client_id: str
+    api_key: str
+    api_secret: str
+    auth_token: str
+    daily_token: str
+    auth_mode: str
+    is_default: bool
+    last_updated: Optional[datetime]
+
+    @property
+    def access_token(self) -> str:
+        return (self.daily_token or self.auth_token or "").strip()
+
+    def as_sdk_creds(self) -> Optional[Dict[str, str]]:
+        client_id = (self.client_id or "").strip()
+        access_token = self.access_token
+        if not client_id or not access_token:
+            return None
+        return {"client_id": client_id, "access_token": access_token}
+
+
+class DhanCredentialProvider:
+    def __init__(self, ttl_seconds: float = _SAFETY_TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CredentialSnapshot] = None
+        self._loaded_at = 0.0
+        self._loaded = False
+        self._version = 0
+        self._listeners: List[Callable[[str], None]] = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _load(self) -> Optional[CredentialSnapshot]:
+        from app.storage.db import SessionLocal
+        from app.storage.models import DhanCredential
+
+        db = SessionLocal()
+        try:
+            row = db.query(DhanCredential).filter(DhanCredential.is_default == True).first()
+            if not row:
+                row = db.query(DhanCredential).first()
+            if not row:
+                return None
+            return CredentialSnapshot(
+                id=row.id,
+                client_id=(row.client_id or "").strip(),
+                api_key=row.api_key or "",
+                api_secret=row.api_secret or "",
+                auth_token=(row.auth_token or "").strip(),
+                daily_token=(row.daily_token or "").strip(),
+                auth_mode=row.auth_mode or "DAILY_TOKEN",
+                is_default=bool(row.is_default),
+                last_updated=row.last_updated,
+            )
+        finally:
+            db.close()
+
+    def get(self) -> Optional[CredentialSnapshot]:
+        """Return the active credential, hitting the database only on a miss."""
+        now = time.monotonic()
+        if self._loaded and (now - self._loaded_at) < self.ttl_seconds:
+            return self._snapshot
+
+        with self._lock:
+            if self._loaded and (time.monotonic() - self._loaded_at) < self.ttl_seconds:
+                return self._snapshot
+            try:
+                snapshot = self._load()
+            except Exception as exc:
+                logger.error("Failed to load Dhan credentials: %s", exc)
+                return self._snapshot
+
+            changed = self._loaded and snapshot != self._snapshot
+            self._snapshot = snapshot
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+
+        if changed:
+            # Another process rewrote the row; treat it like a local change.
+            self._version += 1
+            self._notify("reloaded")
+        return snapshot
+
+    def get_sdk_creds(self) -> Optional[Dict[str, str]]:
+        snapshot = self.get()
+        return snapshot.as_sdk_creds() if snapshot else None
+
+    def invalidate(self, reason: str = "") -> None:
+        with self._lock:
+            self._snapshot = None
+            self._loaded = False
+            self._loaded_at = 0.0
+            self._version += 1
+        logger.info("Dhan credential cache invalidated (%s)", reason or "unspecified")
+        self._notify(reason)
+
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        """Register a callback run after every credential change."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def _notify(self, reason: str) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(reason)
+            except Exception as exc:
+                logger.warning("Credential change listener failed: %s", exc)
+
+
+credential_provider = DhanCredentialProvider()
+
+
+def get_active_credential() -> Optional[CredentialSnapshot]:
+    return credential_provider.get()
+
+
+def get_sdk_credentials() -> Optional[Dict[str, str]]:
+    return credential_provider.get_sdk_creds()
+
+
+def notify_credentials_changed(reason: str = "") -> None:
+    """Call after committing any write to ``dhan_credentials``."""
+    credential_provider.invalidate(reason)
@@ -3,6 +3,7 @@ from pathlib import Path
 
 from app.storage.db import SessionLocal
 from app.storage.models import DhanCredential
+from app.dhan.credential_provider import notify_credentials_changed
 
 DEFAULT_CRED_PATH = Path(__file__).resolve().parents[2] / "API_cred.txt"
 
@@ -46,6 +47,7 @@ def ensure_db_credentials_from_file(path: Path | None = None) -> bool:
         )
         db.add(row)
         db.commit()
+        notify_credentials_changed("loaded from file")
         return True
     finally:
         db.close()
\ No newline at end of file
@@ -0,0 +1,292 @@
+"""
+Local stand-in for the Dhan live market feed websocket.
+
+Speaks the v2 protocol ``dhanhq.marketfeed`` uses: clients connect with
+``?version=2&token=..&clientId=..``, send JSON subscribe/unsubscribe/
+disconnect requests, and receive one binary packet per frame (ticker, quote,
+full with 5-level depth, OI and previous close; see ``app.dhan.protocols``).
+
+Prices follow a seeded geometric random walk per instrument, rounded to the
+tick size, with a synthetic five-level book around the LTP. Each connection
+is served at a target packets/sec spread round-robin over its subscriptions,
+so the ingest path (``live_feed``, ``commodity_ws_manager``, the orchestrator
+and the execution engine behind them) can be load tested without Dhan
+credentials. Point the app at it with ``DHAN_FEED_URL=ws://127.0.0.1:8765``.
+
+Run with ``python scripts/run_feed_simulator.py --rate 5000``.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from app.dhan import protocols
+
+logger = logging.getLogger("trading_nexus.dhan.feed_simulator")
+
+InstrumentKey = Tuple[int, int]  # (segment code, security id)
+
+_FNO_SEGMENTS = {protocols.SEGMENT_CODES["NSE_FNO"], protocols.SEGMENT_CODES["BSE_FNO"], protocols.SEGMENT_CODES["MCX_COMM"]}
+
+
+@dataclass
+class SimulatorConfig:
+    host: str = "127.0.0.1"
+    port: int = 8765
+    # Target packets/sec per connection, spread over its subscriptions.
+    rate: float = 1000.0
+    # Send cadence; each batch carries rate * interval packets.
+    batch_interval: float = 0.01
+    seed: int = 7
+    # Per-packet log-return standard deviation.
+    volatility: float = 0.0005
+    drift: float = 0.0
+    tick_size: float = 0.05
+    spread_ticks: int = 1
+    # Every Nth full packet is followed by an OI packet (F&O/MCX only).
+    oi_every: int = 20
+    base_prices: Dict[int, float] = field(default_factory=dict)
+    require_token: bool = False
+    max_instruments_per_connection: int = 5000
+
+
+@dataclass
+class _Instrument:
+    segment: int
+    security_id: int
+    price: float
+    prev_close: float
+    day_open: float
+    day_high: float
+    day_low: float
+    volume: int = 0
+    turnover: float = 0.0
+    oi: int = 0
+    oi_high: int = 0
+    oi_low: int = 0
+    emitted: int = 0
+
+
+class DhanFeedSimulator:
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self._rng = random.Random(self.config.seed)
+        self._instruments: Dict[InstrumentKey, _Instrument] = {}
+        self._server = None
+        self._connections = 0
+        self._packets_sent = 0
+        self._started_at: Optional[float] = None
+
+    # ---- synthetic market ---------------------------------------------------
+
+    def _round(self, price: float) -> float:
+        tick = self.config.tick_size
+        return max(tick, round(round(price / tick) * tick, 2))
+
+    def _base_price(self, security_id: int) -> float:
+        configured = self.config.base_prices.get(security_id)
+        if configured:
+            return float(configured)
+        # Stable per-id default in a plausible range (50 .. 25000).
+        return self._round(50.0 * math.exp((zlib.crc32(str(security_id).encode()) % 10_000) / 10_000 * math.log(500)))
+
+    def _instrument(self, key: InstrumentKey) -> _Instrument:
+        inst = self._instruments.get(key)
+        if inst is None:
+            price = self._base_price(key[1])
+            oi = self._rng.randint(10_000, 2_000_000) if key[0] in _FNO_SEGMENTS else 0
+            inst = _Instrument(
+                segment=key[0],
+                security_id=key[1],
+                price=price,
+                prev_close=price,
+                day_open=price,
+                day_high=price,
+                day_low=price,
+                oi=oi,
+                oi_high=oi,
+                oi_low=oi,
+            )
+            self._instruments[key] = inst
+        return inst
+
+    def _step(self, inst: _Instrument) -> int:
+        cfg = self.config
+        shock = self._rng.gauss(cfg.drift, cfg.volatility)
+        inst.price = self._round(inst.price * math.exp(shock))
+        inst.day_high = max(inst.day_high, inst.price)
+        inst.day_low = min(inst.day_low, inst.price)
+        qty = self._rng.randint(1, 50) * (75 if inst.segment in _FNO_SEGMENTS else 1)
+        inst.volume += qty
+        inst.turnover += qty * inst.price
+        if inst.oi:
+            inst.oi = max(0, inst.oi + self._rng.randint(-500, 500))
+            inst.oi_high = max(inst.oi_high, inst.oi)
+            inst.oi_low = min(inst.oi_low, inst.oi)
+        inst.emitted += 1
+        return qty
+
+    def _depth(self, inst: _Instrument):
+        tick = self.config.tick_size
+        half_spread = max(1, self.config.spread_ticks) * tick
+        levels = []
+        for level in range(protocols.DEPTH_LEVELS):
+            offset = half_spread + level * tick
+            levels.append((
+                self._rng.randint(1, 40) * 25,
+                self._rng.randint(1, 40) * 25,
+                self._rng.randint(1, 12),
+                self._rng.randint(1, 12),
+                self._round(inst.price - offset),
+                self._round(inst.price + offset),
+            ))
+        return levels
+
+    def _packets(self, inst: _Instrument, mode: int):
+        ltq = self._step(inst)
+        ltt = int(time.time())
+        avg = inst.turnover / inst.volume if inst.volume else inst.price
+        if mode == protocols.REQUEST_TICKER:
+            yield protocols.pack_ticker(inst.segment, inst.security_id, inst.price, ltt)
+            return
+        if mode == protocols.REQUEST_QUOTE:
+            yield protocols.pack_quote(
+                inst.segment, inst.security_id, inst.price, ltq, ltt, avg, inst.volume,
+                inst.volume // 2, inst.volume // 2, inst.day_open, inst.prev_close, inst.day_high, inst.day_low,
+            )
+            return
+        yield protocols.pack_full(
+            inst.segment, inst.security_id, inst.price, ltq, ltt, avg, inst.volume,
+            inst.volume // 2, inst.volume // 2, inst.oi, inst.oi_high, inst.oi_low,
+            inst.day_open, inst.prev_close, inst.day_high, inst.day_low, self._depth(inst),
+        )
+        if inst.oi and self.config.oi_every > 0 and inst.emitted % self.config.oi_every == 0:
+            yield protocols.pack_oi(inst.segment, inst.security_id, inst.oi)
+
+    # ---- connections ----------------------------------------------------------
+
+    async def _reader(self, ws, subscriptions: Dict[InstrumentKey, int], closed: asyncio.Event) -> None:
+        try:
+            async for raw in ws:
+                if isinstance(raw, (bytes, bytearray)):
+                    # v1/binary disconnect header: request code is the first byte.
+                    if raw[:1] == bytes([protocols.REQUEST_DISCONNECT]):
+                        break
+                    continue
+                try:
+                    request = json.loads(raw)
+                    code = int(request.get("RequestCode"))
+                except Exception:
+                    continue
+                if code == protocols.REQUEST_DISCONNECT:
+                    break
+                mode = protocols.request_mode(code)
+                if mode is None:
+                    continue
+                for key in protocols.parse_instrument_list(request.get("InstrumentList")):
+                    if code in protocols.UNSUBSCRIBE_CODES:
+                        subscriptions.pop(key, None)
+                        continue
+                    if key not in subscriptions and len(subscriptions) >= self.config.max_instruments_per_connection:
+                        continue
+                    is_new = key not in subscriptions
+                    subscriptions[key] = mode
+                    if is_new:
+                        inst = self._instrument(key)
+                        await ws.send(protocols.pack_prev_close(inst.segment, inst.security_id, inst.prev_close, inst.oi))
+        except Exception as exc:
+            logger.debug("Simulator reader ended: %s", exc)
+        finally:
+            closed.set()
+
+    async def _writer(self, ws, subscriptions: Dict[InstrumentKey, int], closed: asyncio.Event) -> None:
+        interval = max(0.001, self.config.batch_interval)
+        budget = 0.0
+        cursor = 0
+        next_at = time.perf_counter()
+        while not closed.is_set():
+            next_at += interval
+            budget += self.config.rate * interval
+            keys = list(subscriptions.keys())
+            if keys:
+                count = int(budget)
+                budget -= count
+                for _ in range(count):
+                    key = keys[cursor % len(keys)]
+                    cursor += 1
+                    mode = subscriptions.get(key)
+                    if mode is None:
+                        continue
+                    for packet in self._packets(self._instrument(key), mode):
+                        await ws.send(packet)
+                        self._packets_sent += 1
+            else:
+                budget = 0.0
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(closed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                # Falling behind: don't accumulate an unbounded backlog.
+                next_at = time.perf_counter()
+                await asyncio.sleep(0)
+
+    async def _handle(self, ws) -> None:
+        request = getattr(ws, "request", None)
+        path = getattr(request, "path", None) or getattr(ws, "path", "") or ""
+        query = parse_qs(urlparse(path).query)
+        if self.config.require_token and not (query.get("token") and query.get("clientId")):
+            await ws.send(protocols.pack_disconnect(809))
+            await ws.close()
+            return
+
+        self._connections += 1
+        subscriptions: Dict[InstrumentKey, int] = {}
+        closed = asyncio.Event()
+        reader = asyncio.create_task(self._reader(ws, subscriptions, closed))
+        try:
+            await self._writer(ws, subscriptions, closed)
+        except Exception as exc:
+            logger.debug("Simulator connection closed: %s", exc)
+        finally:
+            closed.set()
+            reader.cancel()
+            self._connections -= 1
+
+    # ---- lifecycle -------------------------------------------------------------
+
+    async def start(self):
+        import websockets
+
+        self._server = await websockets.serve(self._handle, self.config.host, self.config.port, max_size=None)
+        self._started_at = time.monotonic()
+        logger.info("Dhan feed simulator listening on ws://%s:%s", self.config.host, self.config.port)
+        return self._server
+
+    async def serve_forever(self) -> None:
+        server = await self.start()
+        await server.wait_closed()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def get_status(self) -> Dict[str, object]:
+        uptime = (time.monotonic() - self._started_at) if self._started_at else 0.0
+        return {
+            "connections": self._connections,
+            "instruments": len(self._instruments),
+            "packets_sent": self._packets_sent,
+            "packets_per_second": (self._packets_sent / uptime) if uptime > 0 else 0.0,
+        }
@@ -19,9 +19,9 @@ import inspect
 import socket
 import os
 import logging
+from concurrent.futures import Future
 from datetime import datetime, timedelta, date
 from typing import Dict, Optional
-from dhanhq import dhanhq as DhanHQClient
 
 try:
     from dhanhq.marketfeed import DhanFeed as _DhanFeed
@@ -29,8 +29,14 @@ except Exception:
     _DhanFeed = None
 
 from app.market.live_prices import update_price, get_price
+from app.market.shared_market_data import shared_market_data
+from app.market.tick_journal import tick_journal
+from app.market.tick_latency import tick_latency
 from app.market.subscription_manager import SUBSCRIPTION_MGR, _resolve_security_metadata
+from app.dhan.credential_provider import get_active_credential
+from app.dhan.protocols import feed_url, point_feed_class
 from app.market_orchestrator import get_orchestrator
+from app.services.dhan_quote_batcher import dhan_quote_batcher
 from app.market.security_ids import (
     EXCHANGE_CODE_BSE,
     EXCHANGE_CODE_IDX,
@@ -41,7 +47,7 @@ from app.market.security_ids import (
     mcx_watch_symbols,
 )
 from app.storage.db import SessionLocal
-from app.storage.models import DhanCredential, Watchlist
+from app.storage.models import Watchlist
 
 _started_lock = threading.Lock()
 _started = False
@@ -55,8 +61,6 @@ _MCX_WATCH = mcx_watch_symbols()
 _EXPIRY_FORMATS = ("%d%b%Y", "%d%B%Y", "%d%b%y", "%Y-%m-%d")
 FEED_MODE_TICKER = 15
 FEED_MODE_QUOTE = 17
-_REST_CLIENT_LOCK = threading.Lock()
-_REST_CLIENT: Optional[DhanHQClient] = None
 _LAST_CLOSE_CACHE: Dict[str, Dict[str, object]] = {}
 _LAST_TICK_CACHE: Dict[str, str] = {}
 _LAST_DEPTH_CACHE: Dict[str, str] = {}
@@ -177,26 +181,7 @@ def _apply_feed_target_limit(
     )
 
     return trimmed_targets
-def _ensure_rest_client(creds) -> Optional[DhanHQClient]:
-    """Create/reuse a DhanHQ REST client for quote/close lookups."""
-    global _REST_CLIENT
-    if _REST_CLIENT:
-        return _REST_CLIENT
-    token = getattr(creds, "auth_token", None) or getattr(creds, "daily_token", None)
-    if not creds or not creds.client_id or not token:
-        return None
-    with _REST_CLIENT_LOCK:
-        if _REST_CLIENT:
-            return _REST_CLIENT
-        # Handle dhanhq client signature differences across versions
-        try:
-            _REST_CLIENT = DhanHQClient(creds.client_id, token)
-        except TypeError:
-            try:
-                _REST_CLIENT = DhanHQClient(creds.client_id)
-            except TypeError:
-                _REST_CLIENT = DhanHQClient(token)
-        return _REST_CLIENT
+
 
 _LAST_CLOSE_CACHE_LOCK = threading.Lock()
 _LAST_CLOSE_TTL = timedelta(hours=6)
@@ -225,6 +210,7 @@ def _resolve_dhan_feed_class():
 
 def _create_dhan_feed(client_id: str, token: str, instruments):
     feed_cls = _resolve_dhan_feed_class()
+    point_feed_class(feed_cls)
     try:
         source = inspect.getsource(feed_cls)
     except Exception:
@@ -307,6 +293,9 @@ def get_live_feed_status() -> Dict[str, object]:
         "cooldown_active": bool(
             _last_cooldown_start and (datetime.now() - _last_cooldown_start).total_seconds() < _cooldown_period
         ),
+        "shared_market_data": shared_market_data.get_status(),
+        "tick_journal": tick_journal.get_status(),
+        "feed_url": feed_url(),
     }
 
 
@@ -465,14 +454,8 @@ def _record_connection_attempt(success=False):
 
 
 def _load_credentials():
-    db = SessionLocal()
-    try:
-        row = db.query(DhanCredential).filter(DhanCredential.is_default == True).first()
-        if row:
-            return row
-        return db.query(DhanCredential).first()
-    finally:
-        db.close()
+    """Active credential snapshot (cached in memory; reloaded only on change)."""
+    return get_active_credential()
 
 
 def _exchange_segment_from_code(exchange_code: int) -> Optional[str]:
@@ -488,25 +471,8 @@ def _exchange_segment_from_code(exchange_code: int) -> Optional[str]:
     return None
 
 
-def _parse_last_close(response: Dict[str, object], exchange_segment: str, security_id: str) -> Optional[float]:
-    """Parse last close from DhanHQ /marketfeed/quote response."""
-    if not isinstance(response, dict):
-        return None
-    if response.get("status") != "success":
-        return None
-
-    data = response.get("data") or {}
-    segment_data = None
-
-    if isinstance(data, dict):
-        segment_data = data.get(exchange_segment)
-        if segment_data is None and "data" in data and isinstance(data.get("data"), dict):
-            segment_data = data["data"].get(exchange_segment)
-
-    if not isinstance(segment_data, dict):
-        return None
-
-    sec_payload = segment_data.get(str(security_id)) or segment_data.get(int(security_id))
+def _last_close_from_payload(sec_payload: object) -> Optional[float]:
+    """Parse last close from a single security's quote payload."""
     if isinstance(sec_payload, list) and sec_payload:
         sec_payload = sec_payload[0]
 
@@ -537,47 +503,103 @@ def _parse_last_close(response: Dict[str, object], exchange_segment: str, securi
     return None
 
 
-def _get_last_close_price(security_id: str, exchange_code: Optional[int]) -> Optional[float]:
-    """Fetch and cache last closing price using DhanHQ quote API."""
-    if exchange_code is None:
-        return None
-
-    cache_key = f"{exchange_code}:{security_id}"
-    now = datetime.now()
-
+def _cached_last_close(cache_key: str) -> Optional[float]:
     with _LAST_CLOSE_CACHE_LOCK:
         cached = _LAST_CLOSE_CACHE.get(cache_key)
         if cached:
             fetched_at = cached.get("fetched_at")
-            if isinstance(fetched_at, datetime) and now - fetched_at < _LAST_CLOSE_TTL:
+            if isinstance(fetched_at, datetime) and datetime.now() - fetched_at < _LAST_CLOSE_TTL:
                 return cached.get("price")
+    return None
 
-    exchange_segment = _exchange_segment_from_code(exchange_code)
+
+def _submit_last_close_lookup(security_id: str, exchange_code: Optional[int]) -> Optional[Future]:
+    """Queue a quote lookup on the shared batcher; coalesced with other pending lookups."""
+    exchange_segment = _exchange_segment_from_code(exchange_code) if exchange_code is not None else None
     if not exchange_segment:
         return None
 
     creds = _load_credentials()
-    client = _ensure_rest_client(creds)
-    if not client:
+    token = (getattr(creds, "auth_token", None) or getattr(creds, "daily_token", None)) if creds else None
+    if not creds or not creds.client_id or not token:
         return None
 
-    try:
-        response = client.quote_data({exchange_segment: [int(security_id)]})
-        last_close = _parse_last_close(response, exchange_segment, security_id)
+    return dhan_quote_batcher.submit(
+        exchange_segment,
+        security_id,
+        {"client_id": creds.client_id, "access_token": token},
+    )
+
+
+def _store_last_close(cache_key: str, result: Dict[str, object]) -> Optional[float]:
+    last_close = _last_close_from_payload(result.get("data")) if result.get("ok") else None
+    if last_close is None:
+        return None
+    with _LAST_CLOSE_CACHE_LOCK:
+        _LAST_CLOSE_CACHE[cache_key] = {
+            "price": last_close,
+            "fetched_at": datetime.now(),
+        }
+    return last_close
+
+
+def _get_last_close_price(security_id: str, exchange_code: Optional[int]) -> Optional[float]:
+    """Fetch and cache last closing price using DhanHQ quote API."""
+    if exchange_code is None:
+        return None
+
+    cache_key = f"{exchange_code}:{security_id}"
+    cached = _cached_last_close(cache_key)
+    if cached is not None:
+        return cached
 
-        if last_close is None:
+    try:
+        future = _submit_last_close_lookup(security_id, exchange_code)
+        if future is None:
             return None
-        with _LAST_CLOSE_CACHE_LOCK:
-            _LAST_CLOSE_CACHE[cache_key] = {
-                "price": last_close,
-                "fetched_at": now,
-            }
-        return last_close
+        return _store_last_close(cache_key, future.result(timeout=15))
     except Exception as exc:
         print(f"[WARN] Failed to fetch last close for {security_id}: {exc}")
         return None
 
 
+def _schedule_last_close_update(symbol: str, security_id: str, exchange_code: Optional[int]) -> None:
+    """Non-blocking last-close fallback for the tick callback.
+
+    The feed thread must not wait on REST; the price is applied when the
+    batched quote request completes.
+    """
+    if exchange_code is None:
+        return
+
+    cache_key = f"{exchange_code}:{security_id}"
+    cached = _cached_last_close(cache_key)
+    if cached is not None:
+        update_price(symbol, cached)
+        logger.debug("[PRICE] %s = %s (last close)", symbol, cached)
+        return
+
+    try:
+        future = _submit_last_close_lookup(security_id, exchange_code)
+    except Exception as exc:
+        print(f"[WARN] Failed to queue last close lookup for {security_id}: {exc}")
+        return
+    if future is None:
+        return
+
+    def _apply(done: Future) -> None:
+        try:
+            last_close = _store_last_close(cache_key, done.result())
+        except Exception:
+            return
+        existing_price = get_price(symbol)
+        if last_close is not None and not (existing_price and existing_price > 0):
+            update_price(symbol, last_close)
+            logger.debug("[PRICE] %s = %s (last close)", symbol, last_close)
+
+    future.add_done_callback(_apply)
+
+
 def _normalize_expiry_value(expiry: Optional[object]) -> Optional[datetime]:
     if not expiry:
         return None
@@ -667,11 +689,23 @@ def _refresh_symbol_map(targets: Dict[str, Dict[str, object]]):
     _security_id_symbol_map = {
         str(sec_id): data.get("symbol", "") for sec_id, data in targets.items() if data.get("symbol")
     }
+    tick_journal.note_instruments(_security_id_symbol_map, _security_id_subscription_map)
 
 
 def _refresh_subscription_map(subscriptions: Dict[str, Dict[str, object]]):
     global _security_id_subscription_map
     _security_id_subscription_map = subscriptions
+    tick_journal.note_instruments(_security_id_symbol_map, _security_id_subscription_map)
+
+
+def install_instrument_maps(symbol_map: Dict[str, str], subscription_map: Dict[str, Dict[str, object]]) -> None:
+    """Merge recorded id -> symbol/option maps (tick journal replay, feed simulator)."""
+    global _security_id_symbol_map, _security_id_subscription_map
+    _security_id_symbol_map = {**_security_id_symbol_map, **{str(k): v for k, v in symbol_map.items()}}
+    _security_id_subscription_map = {
+        **_security_id_subscription_map,
+        **{str(k): v for k, v in subscription_map.items()},
+    }
 
 
 # Cache for expensive operations to avoid repeated calls
@@ -973,6 +1007,9 @@ def on_message_callback(feed, message):
     """Callback when market data is received"""
     if not message:
         return
+    tick_start = tick_latency.now() if tick_latency.enabled else None
+    if tick_journal.enabled:
+        tick_journal.record(message)
 
     def _extract_security_id(payload: object) -> Optional[str]:
         if isinstance(payload, dict):
@@ -1123,6 +1160,7 @@ def on_message_callback(feed, message):
         # Extract security_id from message
         sec_id = _extract_security_id(message)
         if not sec_id:
+            tick_latency.drop("no_security_id")
             return
         
         # Convert to string for mapping
@@ -1130,6 +1168,7 @@ def on_message_callback(feed, message):
         
         symbol = _security_id_symbol_map.get(sec_id_str)
         if not symbol:
+            tick_latency.drop("unmapped")
             return
 
         # If this security_id is an option instrument, update option LTP in cache
@@ -1146,11 +1185,13 @@ def on_message_callback(feed, message):
                     ltp = ask
 
             if ltp is None or ltp == 0:
+                tick_latency.drop("no_price")
                 return
 
             _LAST_TICK_CACHE[symbol] = datetime.utcnow().isoformat()
 
             depth = _extract_depth(message)
+            tick_latency.stage("decode", tick_start)
             
             # ✨ CRITICAL: Update market state with depth data for square-off functionality
             try:
@@ -1175,6 +1216,7 @@ def on_message_callback(feed, message):
                 )
             except Exception as cache_e:
                 print(f"[WARN] Failed to update option cache for {sec_id_str}: {cache_e}")
+            tick_latency.stage("cache_update", tick_start)
 
             try:
                 orchestrator = get_orchestrator()
@@ -1195,6 +1237,8 @@ def on_message_callback(feed, message):
                 })
             except Exception:
                 pass
+            tick_latency.stage("orchestrator", tick_start)
+            tick_latency.tick_published(tick_start, ("option_chain",))
             return
         
         # Extract LTP (Last Traded Price) for underlying
@@ -1209,6 +1253,7 @@ def on_message_callback(feed, message):
                 ltp = ask
 
         if ltp is None or ltp <= 0:
+            tick_latency.drop("no_price")
             existing_price = get_price(symbol)
             if existing_price and existing_price > 0:
                 return
@@ -1222,12 +1267,10 @@ def on_message_callback(feed, message):
             except Exception:
                 pass
             exchange_code = _subscribed_securities.get(sec_id_str, {}).get("exchange")
-            last_close = _get_last_close_price(sec_id_str, exchange_code)
-            if last_close is not None:
-                update_price(symbol, last_close)
-                logger.debug("[PRICE] %s = %s (last close)", symbol, last_close)
+            _schedule_last_close_update(symbol, sec_id_str, exchange_code)
             return
 
+        tick_latency.stage("decode", tick_start)
         update_price(symbol, ltp)
         _LAST_TICK_CACHE[symbol] = datetime.utcnow().isoformat()
         logger.debug("[PRICE] %s = %s", symbol, ltp)
@@ -1241,6 +1284,7 @@ def on_message_callback(feed, message):
                 _LAST_DEPTH_CACHE[symbol] = datetime.utcnow().isoformat()
         except Exception as state_e:
             print(f"[WARN] Failed to update market state depth for {symbol}: {state_e}")
+        tick_latency.stage("cache_update", tick_start)
 
         try:
             orchestrator = get_orchestrator()
@@ -1260,6 +1304,7 @@ def on_message_callback(feed, message):
             })
         except Exception:
             pass
+        tick_latency.stage("orchestrator", tick_start)
         
         # ✨ NEW: Update the option chain cache with new underlying price
         # This ensures option strikes are re-estimated when underlying price changes
@@ -1275,8 +1320,10 @@ def on_message_callback(feed, message):
         except Exception as cache_e:
             # Don't fail price update if cache update fails
             print(f"[WARN] Failed to update option cache for {symbol}: {cache_e}")
+        tick_latency.tick_published(tick_start, ("prices", "option_chain"))
         
     except Exception as e:
+        tick_latency.drop("error")
         print(f"[ERROR] Price update failed: {e}")
 
 
@@ -1302,54 +1349,67 @@ def sync_subscriptions_with_watchlist():
             if not to_subscribe and not to_unsubscribe:
                 return  # No changes - skip expensive operations
             
-            # Subscribe to new securities only when feed is available
+            # Subscribe to new securities only when feed is available.
+            # One subscribe_symbols call per sync: the feed packs the whole
+            # list into as few subscription messages as it allows.
             if to_subscribe and _market_feed:
+                batch = []
                 for sec_id in to_subscribe:
                     meta = desired_targets.get(sec_id)
                     exchange = meta.get("exchange") if meta else None
                     if exchange is None:
                         continue
+                    batch.append((exchange, sec_id, _resolve_feed_mode(meta)))
+                try:
+                    if batch:
+                        _market_feed.subscribe_symbols(batch)
+                except Exception as e:
+                    print(f"[WARN] Failed to subscribe {len(batch)} securities: {e}")
+                    batch = []
+                orchestrator = get_orchestrator()
+                for exchange, sec_id, mode in batch:
+                    meta = desired_targets.get(sec_id)
+                    _subscribed_securities[sec_id] = {"exchange": exchange, "mode": mode}
                     try:
-                        mode = _resolve_feed_mode(meta)
-                        _market_feed.subscribe_symbols([(exchange, sec_id, mode)])
-                        _subscribed_securities[sec_id] = {"exchange": exchange, "mode": mode}
-                        try:
-                            orchestrator = get_orchestrator()
-                            exchange_name = _exchange_name_from_code(exchange, meta.get("segment") if meta else None)
-                            segment_name = (meta.get("segment") or exchange_name).upper() if meta else exchange_name
-                            orchestrator.subscribe(
-                                token=str(sec_id),
-                                exchange=exchange_name,
-                                segment=segment_name,
-                                symbol=meta.get("symbol") if meta else str(sec_id),
-                                expiry=meta.get("expiry") if meta else None,
-                                meta=meta or {},
-                            )
-                        except Exception:
-                            pass
-                        print(f"[SUBSCRIBE] Security {sec_id} subscribed")
-                    except Exception as e:
-                        print(f"[WARN] Failed to subscribe {sec_id}: {e}")
+                        exchange_name = _exchange_name_from_code(exchange, meta.get("segment") if meta else None)
+                        segment_name = (meta.get("segment") or exchange_name).upper() if meta else exchange_name
+                        orchestrator.subscribe(
+                            token=str(sec_id),
+                            exchange=exchange_name,
+                            segment=segment_name,
+                            symbol=meta.get("symbol") if meta else str(sec_id),
+                            expiry=meta.get("expiry") if meta else None,
+                            meta=meta or {},
+                        )
+                    except Exception:
+                        pass
+                if batch:
+                    print(f"[SUBSCRIBE] {len(batch)} securities subscribed")
             
             # Unsubscribe anything that's no longer desired
             if to_unsubscribe and _market_feed:
+                batch = []
                 for sec_id in to_unsubscribe:
                     sub_meta = _subscribed_securities.get(sec_id) or {}
                     exchange = sub_meta.get("exchange")
-                    mode = sub_meta.get("mode") or FEED_MODE_TICKER
                     if exchange is None:
                         continue
+                    batch.append((exchange, sec_id, sub_meta.get("mode") or FEED_MODE_TICKER))
+                try:
+                    if batch:
+                        _market_feed.unsubscribe_symbols(batch)
+                except Exception as e:
+                    print(f"[WARN] Failed to unsubscribe {len(batch)} securities: {e}")
+                    batch = []
+                orchestrator = get_orchestrator()
+                for _exchange, sec_id, _mode in batch:
+                    _subscribed_securities.pop(sec_id, None)
                     try:
-                        _market_feed.unsubscribe_symbols([(exchange, sec_id, mode)])
-                        _subscribed_securities.pop(sec_id, None)
-                        try:
-                            orchestrator = get_orchestrator()
-                            orchestrator.unsubscribe(str(sec_id))
-                        except Exception:
-                            pass
-                        print(f"[UNSUBSCRIBE] Security {sec_id} unsubscribed")
-                    except Exception as e:
-                        print(f"[WARN] Failed to unsubscribe {sec_id}: {e}")
+                        orchestrator.unsubscribe(str(sec_id))
+                    except Exception:
+                        pass
+                if batch:
+                    print(f"[UNSUBSCRIBE] {len(batch)} securities unsubscribed")
         
         except Exception as e:
             print(f"[ERROR] Sync subscriptions failed: {e}")
@@ -1384,6 +1444,8 @@ def start_live_feed():
         if not _acquire_feed_lock():
             return
         _started = True
+        # This worker owns the feed: publish ticks for the other workers.
+        shared_market_data.start_writer()
     
     def run_feed():
         global _market_feed
@@ -1,2 +1,171 @@
+"""
+Dhan live market feed (v2) wire formats.
 
-# Dhan WS message formats (reference only)
+Server -> client packets are little-endian binary with an 8-byte response
+header ``<BHBI``: response code, message length, exchange segment code,
+security id. The layouts below are the ones ``dhanhq.marketfeed`` unpacks.
+Client -> server requests are JSON (``RequestCode``, ``InstrumentCount``,
+``InstrumentList``). The encoders are used by the local feed simulator.
+
+``DHAN_FEED_URL`` overrides the websocket endpoint the feed classes connect to
+(e.g. ``ws://127.0.0.1:8765`` for the simulator).
+"""
+
+import os
+import struct
+from typing import Iterable, Optional, Sequence, Tuple
+
+DEFAULT_FEED_URL = "wss://api-feed.dhan.co"
+
+# Response codes (first byte of every binary packet).
+RESPONSE_TICKER = 2
+RESPONSE_MARKET_DEPTH = 3
+RESPONSE_QUOTE = 4
+RESPONSE_OI = 5
+RESPONSE_PREV_CLOSE = 6
+RESPONSE_MARKET_STATUS = 7
+RESPONSE_FULL = 8
+RESPONSE_DISCONNECT = 50
+
+# Request codes (JSON ``RequestCode``); unsubscribe is subscribe + 1.
+REQUEST_DISCONNECT = 12
+REQUEST_TICKER = 15
+REQUEST_QUOTE = 17
+REQUEST_FULL = 21
+SUBSCRIBE_CODES = (REQUEST_TICKER, REQUEST_QUOTE, REQUEST_FULL)
+UNSUBSCRIBE_CODES = tuple(code + 1 for code in SUBSCRIBE_CODES)
+
+SEGMENT_CODES = {
+    "IDX_I": 0,
+    "NSE_EQ": 1,
+    "NSE_FNO": 2,
+    "NSE_CURRENCY": 3,
+    "BSE_EQ": 4,
+    "MCX_COMM": 5,
+    "BSE_CURRENCY": 7,
+    "BSE_FNO": 8,
+}
+
+DEPTH_LEVELS = 5
+
+_TICKER = struct.Struct("<BHBIfI")
+_PREV_CLOSE = struct.Struct("<BHBIfI")
+_OI = struct.Struct("<BHBII")
+_STATUS = struct.Struct("<BHBI")
+_QUOTE = struct.Struct("<BHBIfHIfIIIffff")
+_FULL_HEAD = struct.Struct("<BHBIfHIfIIIIIIffff")
+_DEPTH_LEVEL = struct.Struct("<IIHHff")
+_DISCONNECT = struct.Struct("<BHBIH")
+
+# (bid_qty, ask_qty, bid_orders, ask_orders, bid_price, ask_price)
+DepthLevel = Tuple[int, int, int, int, float, float]
+
+
+def feed_url() -> str:
+    return (os.getenv("DHAN_FEED_URL") or "").strip() or DEFAULT_FEED_URL
+
+
+def point_feed_class(feed_cls) -> str:
+    """Aim a dhanhq feed class at ``DHAN_FEED_URL``; returns the URL in use.
+
+    ``MarketFeed.connect`` reads the class attribute, so it is set on the class.
+    """
+    url = feed_url()
+    if hasattr(feed_cls, "market_feed_wss") and getattr(feed_cls, "market_feed_wss") != url:
+        feed_cls.market_feed_wss = url
+    return url
+
+
+def pack_ticker(segment: int, security_id: int, ltp: float, ltt: int) -> bytes:
+    return _TICKER.pack(RESPONSE_TICKER, _TICKER.size, segment, security_id, ltp, ltt)
+
+
+def pack_prev_close(segment: int, security_id: int, prev_close: float, prev_oi: int = 0) -> bytes:
+    return _PREV_CLOSE.pack(RESPONSE_PREV_CLOSE, _PREV_CLOSE.size, segment, security_id, prev_close, prev_oi)
+
+
+def pack_oi(segment: int, security_id: int, oi: int) -> bytes:
+    return _OI.pack(RESPONSE_OI, _OI.size, segment, security_id, oi)
+
+
+def pack_market_status(segment: int = 0, security_id: int = 0) -> bytes:
+    return _STATUS.pack(RESPONSE_MARKET_STATUS, _STATUS.size, segment, security_id)
+
+
+def pack_quote(
+    segment: int,
+    security_id: int,
+    ltp: float,
+    ltq: int,
+    ltt: int,
+    avg_price: float,
+    volume: int,
+    total_sell_qty: int,
+    total_buy_qty: int,
+    day_open: float,
+    day_close: float,
+    day_high: float,
+    day_low: float,
+) -> bytes:
+    return _QUOTE.pack(
+        RESPONSE_QUOTE, _QUOTE.size, segment, security_id, ltp, ltq, ltt, avg_price,
+        volume, total_sell_qty, total_buy_qty, day_open, day_close, day_high, day_low,
+    )
+
+
+def pack_full(
+    segment: int,
+    security_id: int,
+    ltp: float,
+    ltq: int,
+    ltt: int,
+    avg_price: float,
+    volume: int,
+    total_sell_qty: int,
+    total_buy_qty: int,
+    oi: int,
+    oi_high: int,
+    oi_low: int,
+    day_open: float,
+    day_close: float,
+    day_high: float,
+    day_low: float,
+    depth: Sequence[DepthLevel],
+) -> bytes:
+    size = _FULL_HEAD.size + DEPTH_LEVELS * _DEPTH_LEVEL.size
+    levels = list(depth[:DEPTH_LEVELS]) + [(0, 0, 0, 0, 0.0, 0.0)] * (DEPTH_LEVELS - len(depth))
+    return _FULL_HEAD.pack(
+        RESPONSE_FULL, size, segment, security_id, ltp, ltq, ltt, avg_price,
+        volume, total_sell_qty, total_buy_qty, oi, oi_high, oi_low,
+        day_open, day_close, day_high, day_low,
+    ) + b"".join(_DEPTH_LEVEL.pack(*level) for level in levels)
+
+
+def pack_disconnect(code: int) -> bytes:
+    """805 too many connections, 806 no data plan, 807 token expired, 808 bad client id, 809 auth failed."""
+    return _DISCONNECT.pack(RESPONSE_DISCONNECT, _DISCONNECT.size, 0, 0, code)
+
+
+def parse_instrument_list(instruments: Iterable[dict]) -> Iterable[Tuple[int, int]]:
+    """``(segment code, security id)`` pairs from a JSON ``InstrumentList``."""
+    for item in instruments or ():
+        if not isinstance(item, dict):
+            continue
+        segment = item.get("ExchangeSegment")
+        if not isinstance(segment, int):
+            segment = SEGMENT_CODES.get(str(segment or "").upper())
+        try:
+            security_id = int(str(item.get("SecurityId")).strip())
+        except (TypeError, ValueError):
+            continue
+        if segment is not None:
+            yield segment, security_id
+
+
+def request_mode(request_code: int) -> Optional[int]:
+    """Subscribe code for a subscribe/unsubscribe request, ``None`` otherwise."""
+    if request_code in SUBSCRIBE_CODES:
+        return request_code
+    if request_code in UNSUBSCRIBE_CODES:
+        return request_code - 1
+    return None
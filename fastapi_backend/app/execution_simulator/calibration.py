@@ -0,0 +1,314 @@
+"""Offline calibration of empirical latency / slippage distributions.
+
+``calibrate`` reads execution events for a window of trading days through
+``EXECUTION_ANALYTICS`` (live table and order archive alike), buckets symbols
+by fill activity and stores each distribution as a fixed grid of quantiles
+(the inverse CDF) in a ``CalibrationTable``. Tables are written as numbered
+versions under ``EXECUTION_CALIBRATION_DIR``; the simulator loads the latest
+one, or the version pinned by ``EXECUTION_CALIBRATION_VERSION``.
+
+Sampling never touches the history again: a draw is an interpolation into
+the quantile array, and draws are produced in batches into a buffer so a fill
+only pops a precomputed value.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import random
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TABLE_FORMAT = 1
+QUANTILES = 100
+BUCKETS = ("HIGH", "MEDIUM", "LOW")
+_FILE_PREFIX = "calibration-v"
+
+
+def _default_dir() -> Path:
+    from app.storage.db import DB_DIR
+
+    return Path(os.getenv("EXECUTION_CALIBRATION_DIR", "") or Path(DB_DIR) / "execution_calibration")
+
+
+class EmpiricalDistribution:
+    """Inverse CDF on an evenly spaced probability grid, sampled by interpolation."""
+
+    __slots__ = ("quantiles", "count", "_buffer", "_lock")
+
+    BATCH = 256
+
+    def __init__(self, quantiles: array, count: int) -> None:
+        self.quantiles = quantiles
+        self.count = count
+        self._buffer: List[float] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], points: int = QUANTILES) -> "EmpiricalDistribution":
+        ordered = sorted(values)
+        last = len(ordered) - 1
+        grid = array("d", (ordered[round(i * last / points)] for i in range(points + 1)))
+        return cls(grid, len(ordered))
+
+    def sample_many(self, n: int, rng: Optional[random.Random] = None) -> List[float]:
+        """``n`` draws; one uniform each, interpolated between grid points."""
+        q = self.quantiles
+        points = len(q) - 1
+        draw = (rng or random).random
+        out = []
+        for _ in range(n):
+            pos = draw() * points
+            idx = int(pos)
+            low = q[idx]
+            out.append(low + (q[idx + 1] - low) * (pos - idx) if idx < points else low)
+        return out
+
+    def sample(self) -> float:
+        """One draw from the pre-sampled buffer, refilled ``BATCH`` at a time."""
+        try:
+            return self._buffer.pop()
+        except IndexError:
+            with self._lock:
+                if not self._buffer:
+                    self._buffer = self.sample_many(self.BATCH)
+                return self._buffer.pop()
+
+    def percentile(self, pct: float) -> float:
+        return self.quantiles[min(len(self.quantiles) - 1, int(round(pct * (len(self.quantiles) - 1))))]
+
+    def __getstate__(self):
+        return {"quantiles": self.quantiles, "count": self.count}
+
+    def __setstate__(self, state) -> None:
+        self.quantiles = state["quantiles"]
+        self.count = state["count"]
+        self._buffer = []
+        self._lock = threading.Lock()
+
+
+class CalibrationTable:
+    """Latency (ms) and slippage (fraction of price) distributions by key.
+
+    Keys are ``SYM:<symbol>``, ``BKT:<exchange>:<bucket>`` and ``EXC:<exchange>``;
+    ``lookup`` resolves them in that order, most specific first.
+    """
+
+    def __init__(
+        self,
+        version: int = 0,
+        latency: Optional[Dict[str, EmpiricalDistribution]] = None,
+        slippage: Optional[Dict[str, EmpiricalDistribution]] = None,
+        buckets: Optional[Dict[str, str]] = None,
+        meta: Optional[Dict[str, object]] = None,
+    ) -> None:
+        self.version = version
+        self.latency = latency or {}
+        self.slippage = slippage or {}
+        self.buckets = buckets or {}
+        self.meta = meta or {}
+        self._resolved: Dict[tuple, Optional[EmpiricalDistribution]] = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("_resolved", None)
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._resolved = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.latency or self.slippage)
+
+    def lookup(self, kind: str, exchange: str, symbol: Optional[str] = None) -> Optional[EmpiricalDistribution]:
+        key = (kind, exchange, symbol)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        dist = self._resolve(kind, exchange, symbol)
+        if len(self._resolved) >= 65536:
+            self._resolved.clear()
+        self._resolved[key] = dist
+        return dist
+
+    def _resolve(self, kind: str, exchange: str, symbol: Optional[str]) -> Optional[EmpiricalDistribution]:
+        table = self.latency if kind == "latency" else self.slippage
+        if not table:
+            return None
+        exchange = (exchange or "").upper()
+        if symbol:
+            symbol = symbol.upper()
+            dist = table.get(f"SYM:{symbol}")
+            if dist is not None:
+                return dist
+            bucket = self.buckets.get(symbol)
+            if bucket:
+                dist = table.get(f"BKT:{exchange}:{bucket}")
+                if dist is not None:
+                    return dist
+        return table.get(f"EXC:{exchange}")
+
+    def summary(self) -> Dict[str, object]:
+        def _describe(table: Dict[str, EmpiricalDistribution]) -> Dict[str, object]:
+            return {
+                key: {"count": dist.count, "p50": round(dist.percentile(0.5), 6), "p95": round(dist.percentile(0.95), 6)}
+                for key, dist in sorted(table.items())
+                if not key.startswith("SYM:")
+            }
+
+        return {
+            "version": self.version,
+            **self.meta,
+            "symbols": len(self.buckets),
+            "symbol_latency_keys": sum(1 for key in self.latency if key.startswith("SYM:")),
+            "symbol_slippage_keys": sum(1 for key in self.slippage if key.startswith("SYM:")),
+            "latency": _describe(self.latency),
+            "slippage": _describe(self.slippage),
+        }
+
+
+def _liquidity_buckets(fill_counts: Dict[str, int]) -> Dict[str, str]:
+    """Split symbols into activity terciles by fill count."""
+    ranked = sorted(fill_counts, key=fill_counts.get, reverse=True)
+    if not ranked:
+        return {}
+    size = max(1, -(-len(ranked) // len(BUCKETS)))
+    return {symbol: BUCKETS[min(idx // size, len(BUCKETS) - 1)] for idx, symbol in enumerate(ranked)}
+
+
+def calibrate(
+    start_date: date,
+    end_date: date,
+    min_samples: int = 50,
+    points: int = QUANTILES,
+) -> CalibrationTable:
+    """Build a table from every execution event between the two dates (inclusive)."""
+    from app.execution_simulator.execution_analytics import EXECUTION_ANALYTICS, FILL_EVENTS
+
+    latency: Dict[str, List[float]] = {}
+    slippage: Dict[str, List[float]] = {}
+    symbol_exchange: Dict[str, str] = {}
+    fill_counts: Dict[str, int] = {}
+    events = 0
+
+    day = start_date
+    while day <= end_date:
+        cols = EXECUTION_ANALYTICS.frame(day).columns
+        events += len(cols["event_id"])
+        for symbol, exchange, event_type, latency_ms, slip, decision, fill_price in zip(
+            cols["symbol"], cols["exchange"], cols["event_type"], cols["latency_ms"],
+            cols["slippage"], cols["decision_price"], cols["fill_price"],
+        ):
+            if not symbol or not exchange:
+                continue
+            symbol = symbol.upper()
+            symbol_exchange[symbol] = exchange
+            if event_type == "ORDER_ACCEPTED" and latency_ms is not None:
+                latency.setdefault(symbol, []).append(float(latency_ms))
+            elif event_type in FILL_EVENTS:
+                fill_counts[symbol] = fill_counts.get(symbol, 0) + 1
+                reference = decision or fill_price
+                if slip is not None and reference:
+                    slippage.setdefault(symbol, []).append(float(slip) / float(reference))
+        day += timedelta(days=1)
+
+    buckets = _liquidity_buckets(fill_counts)
+
+    def _fit(by_symbol: Dict[str, List[float]]) -> Dict[str, EmpiricalDistribution]:
+        pooled: Dict[str, List[float]] = {}
+        for symbol, values in by_symbol.items():
+            exchange = symbol_exchange[symbol]
+            pooled.setdefault(f"EXC:{exchange}", []).extend(values)
+            pooled.setdefault(f"BKT:{exchange}:{buckets.get(symbol, 'LOW')}", []).extend(values)
+            pooled[f"SYM:{symbol}"] = values
+        return {
+            key: EmpiricalDistribution.from_values(values, points)
+            for key, values in pooled.items()
+            if len(values) >= min_samples
+        }
+
+    return CalibrationTable(
+        latency=_fit(latency),
+        slippage=_fit(slippage),
+        buckets=buckets,
+        meta={
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "events": events,
+            "min_samples": min_samples,
+            "created_at": time.time(),
+        },
+    )
+
+
+class CalibrationStore:
+    """Versioned calibration tables on disk (``calibration-v<N>.pkl``)."""
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        self.root = Path(root) if root else _default_dir()
+
+    def versions(self) -> List[int]:
+        if not self.root.exists():
+            return []
+        found = []
+        for path in self.root.glob(f"{_FILE_PREFIX}*.pkl"):
+            try:
+                found.append(int(path.stem[len(_FILE_PREFIX):]))
+            except ValueError:
+                continue
+        return sorted(found)
+
+    def _path(self, version: int) -> Path:
+        return self.root / f"{_FILE_PREFIX}{version:04d}.pkl"
+
+    def save(self, table: CalibrationTable) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        versions = self.versions()
+        table.version = (versions[-1] + 1) if versions else 1
+        path = self._path(table.version)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as handle:
+            pickle.dump({"format": TABLE_FORMAT, "table": table}, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return path
+
+    def load(self, version: Optional[int] = None) -> Optional[CalibrationTable]:
+        """The requested (or pinned, or latest) version; None when nothing is usable."""
+        if version is None:
+            pinned = os.getenv("EXECUTION_CALIBRATION_VERSION", "").strip()
+            if pinned:
+                try:
+                    version = int(pinned)
+                except ValueError:
+                    logger.warning("Ignoring invalid EXECUTION_CALIBRATION_VERSION=%r", pinned)
+        if version is None:
+            versions = self.versions()
+            if not versions:
+                return None
+            version = versions[-1]
+        path = self._path(version)
+        try:
+            with open(path, "rb") as handle:
+                payload = pickle.load(handle)
+        except FileNotFoundError:
+            logger.warning("Calibration table %s not found", path)
+            return None
+        except Exception as exc:
+            logger.warning("Unreadable calibration table %s: %s", path, exc)
+            return None
+        if not isinstance(payload, dict) or payload.get("format") != TABLE_FORMAT:
+            logger.warning("Calibration table %s has an unsupported format", path)
+            return None
+        return payload["table"]
+
+
+CALIBRATION_STORE = CalibrationStore()
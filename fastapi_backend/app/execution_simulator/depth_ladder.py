@@ -0,0 +1,167 @@
+"""Market-depth ladder used to sweep MARKET and marketable LIMIT orders."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional
+
+from app.execution_simulator.fill_engine import FillResult
+
+
+class DepthLadder:
+    """One side of the book as price / cumulative-quantity arrays.
+
+    ``prices`` is ordered from the touch outwards (asks ascending, bids
+    descending) and ``cum`` holds the running displayed quantity, so a sweep
+    is a ``bisect`` on ``cum`` and a limit cap is a ``bisect`` on ``keys``
+    (prices, negated for bids so both sides sort ascending).
+
+    Two optional models adjust what a sweep can take:
+
+    * queue position – at the level priced exactly at the order's limit, where
+      an unfilled remainder would rest, ``queue_ahead_pct`` of the displayed
+      size is left to participants already queued there. Levels the order
+      crosses through, and every level of a MARKET order, are taken in full;
+    * replenishment – once a sweep has consumed every level it may trade at,
+      each consumed level refills by ``replenish_pct`` of its displayed size,
+      for up to ``replenish_rounds`` rounds, and the refills are swept again
+      from the touch (``refill_cum`` is their running sum).
+    """
+
+    __slots__ = ("side", "prices", "keys", "cum", "refill_cum", "queue_ahead_pct", "replenish_rounds")
+
+    def __init__(
+        self,
+        side: str,
+        prices: array,
+        cum: array,
+        queue_ahead_pct: float = 0.0,
+        refill_cum: Optional[array] = None,
+        replenish_rounds: int = 0,
+    ) -> None:
+        self.side = side
+        self.prices = prices
+        self.cum = cum
+        self.keys = prices if side == "ASK" else array("d", (-p for p in prices))
+        self.queue_ahead_pct = min(1.0, max(0.0, float(queue_ahead_pct or 0.0)))
+        self.refill_cum = refill_cum if refill_cum is not None else array("d", bytes(8 * len(prices)))
+        self.replenish_rounds = max(0, int(replenish_rounds or 0)) if self.refill_cum[-1] > 0 else 0
+
+    @classmethod
+    def from_levels(
+        cls,
+        levels: Optional[Iterable[dict]],
+        side: str,
+        queue_ahead_pct: float = 0.0,
+        replenish_pct: float = 0.0,
+        replenish_rounds: int = 0,
+    ) -> Optional["DepthLadder"]:
+        """Build a ladder from ``[{"price": .., "qty": ..}, ...]``; None when empty."""
+        pairs = []
+        for level in levels or ():
+            try:
+                price = float(level.get("price"))
+                qty = float(level.get("qty") or 0.0)
+            except (AttributeError, TypeError, ValueError):
+                continue
+            if price > 0 and qty >= 1:
+                pairs.append((price, int(qty)))
+        if not pairs:
+            return None
+        pairs.sort(key=lambda item: item[0], reverse=(side == "BID"))
+        refill_pct = max(0.0, float(replenish_pct or 0.0))
+        prices = array("d", (price for price, _ in pairs))
+        cum = array("d")
+        refill_cum = array("d")
+        total = refill = 0
+        for _, qty in pairs:
+            total += qty
+            refill += int(qty * refill_pct)
+            cum.append(total)
+            refill_cum.append(refill)
+        return cls(side, prices, cum, queue_ahead_pct, refill_cum, replenish_rounds)
+
+    @property
+    def top_price(self) -> float:
+        return self.prices[0]
+
+    @property
+    def total_qty(self) -> int:
+        return int(self.cum[-1])
+
+    def levels_within(self, limit_price: Optional[float]) -> int:
+        """Number of levels at or better than ``limit_price`` (all levels if None)."""
+        if limit_price is None:
+            return len(self.prices)
+        key = float(limit_price) if self.side == "ASK" else -float(limit_price)
+        return bisect_right(self.keys, key)
+
+    def _queued_ahead(self, limit_price: Optional[float], depth: int) -> int:
+        """Quantity held back at the level the order would rest on."""
+        if limit_price is None or depth == 0 or not self.queue_ahead_pct:
+            return 0
+        key = float(limit_price) if self.side == "ASK" else -float(limit_price)
+        if self.keys[depth - 1] != key:
+            return 0
+        shown = self.cum[depth - 1] - (self.cum[depth - 2] if depth > 1 else 0.0)
+        return int(shown * self.queue_ahead_pct)
+
+    def available(self, limit_price: Optional[float] = None) -> int:
+        """Most a sweep capped at ``limit_price`` can take, refills included."""
+        depth = self.levels_within(limit_price)
+        if not depth:
+            return 0
+        first = int(self.cum[depth - 1]) - self._queued_ahead(limit_price, depth)
+        return first + int(self.refill_cum[depth - 1]) * self.replenish_rounds
+
+    def sweep(
+        self,
+        order_qty: int,
+        limit_price: Optional[float] = None,
+        lot_step: int = 1,
+    ) -> List[FillResult]:
+        """Fills for ``order_qty`` walking the ladder, capped at ``limit_price``.
+
+        The filled total is rounded down to ``lot_step``; fills are aggregated
+        per level and their slippage is the distance from the touch.
+        """
+        depth = self.levels_within(limit_price)
+        if depth == 0 or order_qty <= 0:
+            return []
+        step = max(1, int(lot_step or 1))
+        take = min(int(order_qty), self.available(limit_price))
+        take = (take // step) * step
+        if take <= 0:
+            return []
+
+        taken = [0] * depth
+        first = min(take, int(self.cum[depth - 1]) - self._queued_ahead(limit_price, depth))
+        self._take(self.cum, first, depth, taken)
+
+        remaining = take - first
+        per_round = int(self.refill_cum[depth - 1])
+        if remaining > 0:
+            # Only reached once every level within the limit is exhausted.
+            full_rounds = remaining // per_round
+            for idx in range(depth):
+                taken[idx] += full_rounds * int(self.refill_cum[idx] - (self.refill_cum[idx - 1] if idx else 0.0))
+            self._take(self.refill_cum, remaining - full_rounds * per_round, depth, taken)
+
+        top = self.prices[0]
+        return [
+            FillResult(fill_price=self.prices[idx], fill_quantity=qty, slippage=abs(self.prices[idx] - top))
+            for idx, qty in enumerate(taken)
+            if qty > 0
+        ]
+
+    @staticmethod
+    def _take(cum: array, qty: int, depth: int, taken: List[int]) -> None:
+        """Add ``qty`` taken from the touch outwards along ``cum`` into ``taken``."""
+        if qty <= 0:
+            return
+        last = bisect_left(cum, qty, 0, depth)
+        previous = 0
+        for idx in range(last + 1):
+            upto = min(int(cum[idx]), qty)
+            taken[idx] += upto - previous
+            previous = upto
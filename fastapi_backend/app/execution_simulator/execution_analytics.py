@@ -0,0 +1,344 @@
+"""Execution-quality analytics over ExecutionEvent (live table + order archive).
+
+Events for one IST trading day are loaded once into a columnar ``DayFrame``
+(plain per-column lists joined with the order's segment/type/side/quantity),
+from ``execution_events`` for days still in the live table and from
+``ORDER_ARCHIVE`` for purged days. Group-bys then run as single passes over
+those columns: no ORM objects are built. A frame built after its day ended is
+final and cached for good; one built while the day was running is rebuilt at
+most every ``EXECUTION_ANALYTICS_TODAY_TTL`` seconds, and at once after the
+day ends so late events are never missed.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+IST_OFFSET = timedelta(hours=5, minutes=30)
+
+FILL_EVENTS = ("PARTIAL_FILL", "FULL_FILL")
+DIMENSIONS = ("symbol", "exchange", "segment", "user", "order_type", "product_type", "side")
+
+_FRAME_COLUMNS = (
+    "event_id", "order_id", "user", "symbol", "event_type", "decision_price", "fill_price",
+    "fill_qty", "reason", "latency_ms", "slippage", "event_at",
+    "segment", "exchange", "order_type", "product_type", "side", "order_qty", "order_at",
+)
+
+
+def _ist_today() -> date:
+    return (datetime.utcnow() + IST_OFFSET).date()
+
+
+def _ist_day_end(day: date) -> float:
+    """Epoch seconds of the IST midnight that ends ``day``."""
+    midnight_utc = datetime.combine(day + timedelta(days=1), datetime.min.time()) - IST_OFFSET
+    return (midnight_utc - datetime(1970, 1, 1)).total_seconds()
+
+
+def _percentile(ordered: Sequence[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+def _summary(values: List[float], digits: int = 4) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), digits),
+        "p50": round(_percentile(ordered, 0.50), digits),
+        "p95": round(_percentile(ordered, 0.95), digits),
+        "max": round(ordered[-1], digits),
+    }
+
+
+@dataclass
+class DayFrame:
+    """One trading day of execution events as parallel column lists."""
+
+    day: date
+    columns: Dict[str, List[Any]] = field(default_factory=lambda: {name: [] for name in _FRAME_COLUMNS})
+    built_at: float = field(default_factory=time.time)
+
+    def __len__(self) -> int:
+        return len(self.columns["event_id"])
+
+    def append_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        cols = self.columns
+        seen = set(cols["event_id"])
+        for row in rows:
+            if row["event_id"] in seen:
+                continue
+            seen.add(row["event_id"])
+            for name in _FRAME_COLUMNS:
+                cols[name].append(row.get(name))
+
+
+def _order_fields(segment: Optional[str], order_type, product_type, side, quantity, created_at) -> Dict[str, Any]:
+    segment = (segment or "").upper() or None
+    return {
+        "segment": segment,
+        "exchange": segment.split("_")[0] if segment else None,
+        "order_type": order_type,
+        "product_type": product_type,
+        "side": side,
+        "order_qty": quantity,
+        "order_at": created_at,
+    }
+
+
+def _live_rows(day: date) -> List[Dict[str, Any]]:
+    from app.storage.db import SessionLocal
+    from app.storage.models import ExecutionEvent, MockOrder
+
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(
+                ExecutionEvent.id, ExecutionEvent.order_id, ExecutionEvent.user_id, ExecutionEvent.symbol,
+                ExecutionEvent.event_type, ExecutionEvent.decision_time_price, ExecutionEvent.fill_price,
+                ExecutionEvent.fill_quantity, ExecutionEvent.reason, ExecutionEvent.latency_ms,
+                ExecutionEvent.slippage, ExecutionEvent.created_at,
+                MockOrder.exchange_segment, MockOrder.order_type, MockOrder.product_type,
+                MockOrder.transaction_type, MockOrder.quantity, MockOrder.created_at,
+            )
+            .outerjoin(MockOrder, MockOrder.id == ExecutionEvent.order_id)
+            .filter(ExecutionEvent.created_at >= start, ExecutionEvent.created_at < end)
+        )
+        rows = []
+        for (event_id, order_id, user_id, symbol, event_type, decision, fill_price, fill_qty, reason,
+             latency, slippage, event_at, segment, order_type, product_type, side, qty, order_at) in query:
+            rows.append({
+                "event_id": event_id, "order_id": order_id, "user": user_id, "symbol": symbol,
+                "event_type": event_type, "decision_price": decision, "fill_price": fill_price,
+                "fill_qty": fill_qty, "reason": reason, "latency_ms": latency, "slippage": slippage,
+                "event_at": event_at,
+                **_order_fields(segment, order_type, product_type, side, qty, order_at),
+            })
+        return rows
+    finally:
+        db.close()
+
+
+def _archived_rows(day: date) -> List[Dict[str, Any]]:
+    from app.storage.order_archive import ORDER_ARCHIVE
+
+    orders: Dict[int, Dict[str, Any]] = {}
+    # Events are partitioned by their own date; their orders may date from the day before.
+    for batch in ORDER_ARCHIVE.scan(
+        "orders",
+        start_date=day - timedelta(days=1),
+        end_date=day,
+        columns=("id", "exchange_segment", "order_type", "product_type", "transaction_type", "quantity", "created_at"),
+    ):
+        for oid, segment, order_type, product_type, side, qty, created_at in zip(
+            batch["id"], batch["exchange_segment"], batch["order_type"], batch["product_type"],
+            batch["transaction_type"], batch["quantity"], batch["created_at"],
+        ):
+            orders[oid] = _order_fields(segment, order_type, product_type, side, qty, created_at)
+
+    empty = _order_fields(None, None, None, None, None, None)
+    rows = []
+    for batch in ORDER_ARCHIVE.scan("execution_events", start_date=day, end_date=day):
+        for (event_id, order_id, user_id, symbol, event_type, decision, fill_price, fill_qty, reason,
+             latency, slippage, event_at) in zip(
+            batch["id"], batch["order_id"], batch["user_id"], batch["symbol"], batch["event_type"],
+            batch["decision_time_price"], batch["fill_price"], batch["fill_quantity"], batch["reason"],
+            batch["latency_ms"], batch["slippage"], batch["created_at"],
+        ):
+            rows.append({
+                "event_id": event_id, "order_id": order_id, "user": user_id, "symbol": symbol,
+                "event_type": event_type, "decision_price": decision, "fill_price": fill_price,
+                "fill_qty": fill_qty, "reason": reason, "latency_ms": latency, "slippage": slippage,
+                "event_at": event_at, **orders.get(order_id, empty),
+            })
+    return rows
+
+
+class _Group:
+    __slots__ = ("orders", "order_qty", "filled_qty", "rejected_orders", "reasons", "fills",
+                 "slippage", "slippage_bps", "slippage_value", "latency", "first_fill")
+
+    def __init__(self) -> None:
+        self.orders = set()
+        self.order_qty: Dict[Any, int] = {}
+        self.filled_qty: Dict[Any, int] = defaultdict(int)
+        self.rejected_orders = set()
+        self.reasons: Dict[str, int] = defaultdict(int)
+        self.fills = 0
+        self.slippage: List[float] = []
+        self.slippage_bps: List[float] = []
+        self.slippage_value = 0.0
+        self.latency: List[float] = []
+        self.first_fill: Dict[Any, Tuple[datetime, Optional[datetime]]] = {}
+
+    def result(self) -> Dict[str, Any]:
+        ordered = sum(self.order_qty.values())
+        filled = sum(min(self.filled_qty[oid], qty) for oid, qty in self.order_qty.items())
+        fill_qty_total = sum(self.filled_qty.values())
+        time_to_fill = [
+            (first - placed).total_seconds() * 1000.0
+            for first, placed in self.first_fill.values()
+            if placed is not None and first >= placed
+        ]
+        return {
+            "orders": len(self.orders),
+            "fills": self.fills,
+            "filled_qty": fill_qty_total,
+            "fill_ratio": round(filled / ordered, 4) if ordered else None,
+            "rejected_orders": len(self.rejected_orders),
+            "rejection_rate": round(len(self.rejected_orders) / len(self.orders), 4) if self.orders else None,
+            "rejection_reasons": dict(sorted(self.reasons.items(), key=lambda kv: -kv[1])),
+            "slippage": _summary(self.slippage),
+            "slippage_bps": _summary(self.slippage_bps, 2),
+            "slippage_qty_weighted": round(self.slippage_value / fill_qty_total, 4) if fill_qty_total else None,
+            "latency_ms": _summary(self.latency, 1),
+            "time_to_fill_ms": _summary(time_to_fill, 1),
+        }
+
+
+def aggregate(frames: Sequence[DayFrame], group_by: Sequence[str] = (), symbol: Optional[str] = None,
+              user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Execution-quality metrics per distinct ``group_by`` key (one overall row when empty)."""
+    dims = [d for d in group_by if d in DIMENSIONS]
+    groups: Dict[Tuple, _Group] = {}
+    symbol = symbol.strip().upper() if symbol else None
+
+    for frame in frames:
+        c = frame.columns
+        key_columns = [c[d] for d in dims]
+        for i, (order_id, event_type) in enumerate(zip(c["order_id"], c["event_type"])):
+            if symbol is not None and (c["symbol"][i] or "").upper() != symbol:
+                continue
+            if user_id is not None and c["user"][i] != user_id:
+                continue
+            key = tuple(col[i] for col in key_columns)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _Group()
+            oid = order_id if order_id is not None else ("event", c["event_id"][i])
+            group.orders.add(oid)
+            qty = c["order_qty"][i]
+            if qty:
+                group.order_qty[oid] = int(qty)
+            latency = c["latency_ms"][i]
+            if event_type in FILL_EVENTS:
+                group.fills += 1
+                fill_qty = int(c["fill_qty"][i] or 0)
+                group.filled_qty[oid] += fill_qty
+                slip = c["slippage"][i]
+                if slip is not None:
+                    group.slippage.append(slip)
+                    group.slippage_value += slip * fill_qty
+                    ref = c["decision_price"][i]
+                    if ref:
+                        group.slippage_bps.append(slip / ref * 1e4)
+                at = c["event_at"][i]
+                if at is not None:
+                    first = group.first_fill.get(oid)
+                    if first is None or at < first[0]:
+                        group.first_fill[oid] = (at, c["order_at"][i])
+            elif event_type == "ORDER_REJECTED":
+                group.rejected_orders.add(oid)
+                group.reasons[c["reason"][i] or "UNSPECIFIED"] += 1
+            elif event_type == "ORDER_ACCEPTED" and latency is not None:
+                group.latency.append(float(latency))
+
+    results = []
+    for key, group in groups.items():
+        row = {dim: value for dim, value in zip(dims, key)}
+        row.update(group.result())
+        results.append(row)
+    results.sort(key=lambda r: (-r["orders"], tuple(str(r.get(d)) for d in dims)))
+    return results
+
+
+class ExecutionAnalytics:
+    def __init__(self, max_days: int = 90):
+        self.today_ttl = float(os.getenv("EXECUTION_ANALYTICS_TODAY_TTL", "30"))
+        self.max_days = max_days
+        self._frames: "OrderedDict[date, DayFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def frame(self, day: date) -> DayFrame:
+        """Cached events for ``day``; final once built after the day ended."""
+        today = _ist_today()
+        with self._lock:
+            cached = self._frames.get(day)
+            if cached is not None and (
+                cached.built_at >= _ist_day_end(day)
+                or (day >= today and time.time() - cached.built_at < self.today_ttl)
+            ):
+                self._frames.move_to_end(day)
+                return cached
+        frame = DayFrame(day)
+        frame.append_rows(_live_rows(day))
+        if day < today:
+            frame.append_rows(_archived_rows(day))
+        with self._lock:
+            self._frames[day] = frame
+            self._frames.move_to_end(day)
+            while len(self._frames) > self.max_days:
+                self._frames.popitem(last=False)
+        return frame
+
+    def report(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+               group_by: Sequence[str] = ("symbol",), symbol: Optional[str] = None,
+               user_id: Optional[int] = None) -> Dict[str, Any]:
+        end = end_date or _ist_today()
+        start = start_date or end
+        if start > end:
+            start, end = end, start
+        if (end - start).days >= self.max_days:
+            raise ValueError(f"date range is limited to {self.max_days} days")
+        started = time.perf_counter()
+        frames = [self.frame(start + timedelta(days=n)) for n in range((end - start).days + 1)]
+        dims = [d for d in group_by if d in DIMENSIONS]
+        return {
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "group_by": dims,
+            "events": sum(len(f) for f in frames),
+            "overall": (aggregate(frames, (), symbol, user_id) or [None])[0],
+            "groups": aggregate(frames, dims, symbol, user_id) if dims else [],
+            "configured": self._configured(),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    @staticmethod
+    def _configured() -> Dict[str, Dict[str, Any]]:
+        """Current ExecutionConfig per exchange, for comparing against realized numbers."""
+        try:
+            from app.execution_simulator.execution_engine import get_execution_engine
+
+            config = get_execution_engine().config
+            return {
+                name: {
+                    "latency_ms": list(cfg.latency_ms),
+                    "base_slippage_bps": round(cfg.base_slippage_pct * 1e4, 2),
+                    "timeout_seconds": cfg.timeout_seconds,
+                }
+                for name, cfg in config.exchange.items()
+            }
+        except Exception:
+            return {}
+
+    def invalidate(self, day: Optional[date] = None) -> None:
+        with self._lock:
+            if day is None:
+                self._frames.clear()
+            else:
+                self._frames.pop(day, None)
+
+
+EXECUTION_ANALYTICS = ExecutionAnalytics()
@@ -22,6 +22,12 @@ class ExecutionConfig:
     default_bid_qty: int = 100
     default_ask_qty: int = 100
     max_queue_depth: int = 5000
+    depth_sweep_enabled: bool = True
+    depth_queue_ahead_pct: float = 0.0
+    depth_replenish_pct: float = 0.0
+    depth_replenish_rounds: int = 0
+    latency_model: str = "uniform"
+    slippage_model: str = "linear"
 
     @staticmethod
     def defaults() -> "ExecutionConfig":
@@ -62,6 +68,16 @@ class ExecutionConfig:
         config.default_bid_qty = int(payload.get("default_bid_qty", config.default_bid_qty)) if isinstance(payload, dict) else config.default_bid_qty
         config.default_ask_qty = int(payload.get("default_ask_qty", config.default_ask_qty)) if isinstance(payload, dict) else config.default_ask_qty
         config.max_queue_depth = int(payload.get("max_queue_depth", config.max_queue_depth)) if isinstance(payload, dict) else config.max_queue_depth
+        depth_cfg = payload.get("depth", {}) if isinstance(payload, dict) else {}
+        if isinstance(depth_cfg, dict):
+            config.depth_sweep_enabled = bool(depth_cfg.get("enabled", config.depth_sweep_enabled))
+            config.depth_queue_ahead_pct = float(depth_cfg.get("queue_ahead_pct", config.depth_queue_ahead_pct))
+            config.depth_replenish_pct = float(depth_cfg.get("replenish_pct", config.depth_replenish_pct))
+            config.depth_replenish_rounds = int(depth_cfg.get("replenish_rounds", config.depth_replenish_rounds))
+        models_cfg = payload.get("models", {}) if isinstance(payload, dict) else {}
+        if isinstance(models_cfg, dict):
+            config.latency_model = str(models_cfg.get("latency", config.latency_model)).lower()
+            config.slippage_model = str(models_cfg.get("slippage", config.slippage_model)).lower()
         return config
 
     def for_exchange(self, exchange: str) -> ExchangeConfig:
@@ -10,27 +10,150 @@ def ist_now():
     """Get current IST time"""
     return datetime.utcnow() + IST_OFFSET
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
+from app.execution_simulator.depth_ladder import DepthLadder
 from app.execution_simulator.execution_config import ExecutionConfig
-from app.execution_simulator.latency_model import LatencyModel
-from app.execution_simulator.slippage_model import SlippageModel
 from app.execution_simulator.fill_engine import FillEngine, FillResult
+from app.execution_simulator.model_registry import build_latency_model, build_slippage_model
 from app.execution_simulator.order_queue_manager import OrderQueueManager
 from app.execution_simulator.rejection_engine import RejectionEngine
+from app.ledger.running_balance import ledger_balances
+from app.market.tick_latency import tick_latency
 from app.market_cache.equities import get_equity
 from app.market_cache.futures import list_futures
 from app.market_cache.options import list_option_chains
 from app.storage import models
 
 
+class _FillBatch:
+    """Rows touched while applying fills, kept for one order or one pending pass.
+
+    Account, margin, brokerage-plan and position rows are loaded once per
+    batch, and the append-only rows (trades, execution events, ledger
+    entries) are buffered and bulk-inserted by ``flush``; ledger balances
+    are assigned there in one running-balance update per user. The caller
+    owns the commit, so a whole sweep lands in a single transaction.
+    """
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        self._users: Dict[int, Optional[models.UserAccount]] = {}
+        self._margins: Dict[int, models.MarginAccount] = {}
+        self._plans: Dict[Optional[int], models.BrokeragePlan] = {}
+        self._positions: Dict[Tuple[int, str, str], models.MockPosition] = {}
+        self.trades: List[Dict[str, object]] = []
+        self.events: List[Dict[str, object]] = []
+        self.ledger: List[Dict[str, object]] = []
+
+    def user(self, user_id: int) -> Optional[models.UserAccount]:
+        if user_id not in self._users:
+            self._users[user_id] = self.db.query(models.UserAccount).filter(models.UserAccount.id == user_id).first()
+        return self._users[user_id]
+
+    def margin(self, user_id: int) -> models.MarginAccount:
+        margin = self._margins.get(user_id)
+        if margin is None:
+            margin = self.db.query(models.MarginAccount).filter(models.MarginAccount.user_id == user_id).first()
+            if not margin:
+                margin = models.MarginAccount(user_id=user_id, available_margin=0.0, used_margin=0.0)
+                self.db.add(margin)
+            self._margins[user_id] = margin
+        return margin
+
+    def brokerage_plan(self, user: models.UserAccount) -> models.BrokeragePlan:
+        plan = self._plans.get(user.brokerage_plan_id)
+        if plan is not None:
+            return plan
+        if user.brokerage_plan_id:
+            plan = self.db.query(models.BrokeragePlan).filter(models.BrokeragePlan.id == user.brokerage_plan_id).first()
+        if not plan:
+            plan = self._plans.get(None)
+        if not plan:
+            plan = self.db.query(models.BrokeragePlan).filter(models.BrokeragePlan.name == "DEFAULT").first()
+        if not plan:
+            plan = models.BrokeragePlan(name="DEFAULT", flat_fee=20.0, percent_fee=0.0, max_fee=20.0)
+            self.db.add(plan)
+            self.db.flush()
+        self._plans[user.brokerage_plan_id] = plan
+        if plan.name == "DEFAULT":
+            self._plans[None] = plan
+        return plan
+
+    def position(self, order: models.MockOrder) -> models.MockPosition:
+        key = (order.user_id, order.symbol, order.product_type)
+        position = self._positions.get(key)
+        if position is None:
+            position = (
+                self.db.query(models.MockPosition)
+                .filter(
+                    models.MockPosition.user_id == order.user_id,
+                    models.MockPosition.symbol == order.symbol,
+                    models.MockPosition.product_type == order.product_type,
+                )
+                .first()
+            )
+            if not position:
+                position = models.MockPosition(
+                    user_id=order.user_id,
+                    symbol=order.symbol,
+                    exchange_segment=order.exchange_segment,
+                    product_type=order.product_type,
+                    quantity=0,
+                    avg_price=0.0,
+                    realized_pnl=0.0,
+                    status="OPEN",
+                )
+                self.db.add(position)
+            self._positions[key] = position
+        return position
+
+    def preload(self, positions: List[models.MockPosition]) -> None:
+        """Seed the row caches for these positions and their users with two IN queries."""
+        user_ids = {pos.user_id for pos in positions} - set(self._users)
+        if user_ids:
+            for user in self.db.query(models.UserAccount).filter(models.UserAccount.id.in_(user_ids)):
+                self._users[user.id] = user
+            for margin in self.db.query(models.MarginAccount).filter(models.MarginAccount.user_id.in_(user_ids)):
+                self._margins[margin.user_id] = margin
+            for user_id in user_ids:
+                self._users.setdefault(user_id, None)
+                if user_id not in self._margins:
+                    margin = models.MarginAccount(user_id=user_id, available_margin=0.0, used_margin=0.0)
+                    self.db.add(margin)
+                    self._margins[user_id] = margin
+        for pos in positions:
+            self._positions.setdefault((pos.user_id, pos.symbol, pos.product_type), pos)
+
+    def flush(self) -> None:
+        if not (self.trades or self.events or self.ledger):
+            return
+        # Orders/accounts must exist before the buffered rows that reference them.
+        self.db.flush()
+        if self.trades:
+            self.db.bulk_insert_mappings(models.MockTrade, self.trades)
+        if self.events:
+            self.db.bulk_insert_mappings(models.ExecutionEvent, self.events)
+        if self.ledger:
+            by_user: Dict[int, List[Dict[str, object]]] = {}
+            for row in self.ledger:
+                by_user.setdefault(row["user_id"], []).append(row)
+            # One compare-and-set per user assigns the running balances.
+            for user_id, rows in by_user.items():
+                ledger_balances.append_entries(self.db, self._users[user_id], rows)
+            self.db.bulk_insert_mappings(models.LedgerEntry, self.ledger)
+        self.trades = []
+        self.events = []
+        self.ledger = []
+
+
 class ExecutionEngine:
     def __init__(self, config: Optional[ExecutionConfig] = None) -> None:
         self.config = config or ExecutionConfig.load()
-        self.latency_model = LatencyModel(self.config)
-        self.slippage_model = SlippageModel(self.config)
+        self.latency_model = build_latency_model(self.config)
+        self.slippage_model = build_slippage_model(self.config)
         self.fill_engine = FillEngine(self.slippage_model)
         self.rejection_engine = RejectionEngine(self.config)
         self.queue_manager = OrderQueueManager()
@@ -40,7 +163,7 @@ class ExecutionEngine:
         parts = symbol_text.split()
         try:
             from app.market.market_state import state
-            depth = (state.get("depth") or {}).get(symbol_text)
+            depth = state["depth"].get(symbol_text)
             if isinstance(depth, dict):
                 bids = depth.get("bids") or depth.get("bid") or []
                 asks = depth.get("asks") or depth.get("ask") or []
@@ -54,6 +177,8 @@ class ExecutionEngine:
                         "best_ask": best_ask,
                         "bid_qty": bid_qty,
                         "ask_qty": ask_qty,
+                        "bids": bids,
+                        "asks": asks,
                         "last_update_time": depth.get("timestamp"),
                     }
         except Exception:
@@ -86,6 +211,16 @@ class ExecutionEngine:
                             best = data
                             break
 
+                        if best and best.source == "SNAPSHOT":
+                            # Restored by the warm start with no tick since: no live
+                            # quote, so MARKET orders reject and LIMIT orders rest.
+                            return {
+                                "best_bid": None,
+                                "best_ask": None,
+                                "bid_qty": None,
+                                "ask_qty": None,
+                                "last_update_time": None,
+                            }
                         if best:
                             bid = best.bid if best.bid is not None else best.ltp
                             ask = best.ask if best.ask is not None else best.ltp
@@ -183,6 +318,39 @@ class ExecutionEngine:
         age_ms = (ist_now() - ts).total_seconds() * 1000.0
         return age_ms > max_age_ms
 
+    def _depth_ladder(self, snapshot: Dict[str, object], side: str) -> Optional[DepthLadder]:
+        """Opposite-side depth ladder for an order, or None when depth is off or missing."""
+        if not self.config.depth_sweep_enabled:
+            return None
+        levels = snapshot.get("asks") if side == "BUY" else snapshot.get("bids")
+        return DepthLadder.from_levels(
+            levels,
+            "ASK" if side == "BUY" else "BID",
+            queue_ahead_pct=self.config.depth_queue_ahead_pct,
+            replenish_pct=self.config.depth_replenish_pct,
+            replenish_rounds=self.config.depth_replenish_rounds,
+        )
+
+    def _compute_limit_fills(
+        self,
+        exchange: str,
+        side: str,
+        order_qty: int,
+        limit_price: float,
+        top_price: float,
+        top_qty: int,
+        spread: float,
+        lot_step: int = 1,
+        ladder: Optional[DepthLadder] = None,
+        symbol: Optional[str] = None,
+    ) -> List[FillResult]:
+        # A marketable limit walks the ladder up to its price; the rest stays pending.
+        if ladder is not None:
+            fills = ladder.sweep(order_qty, limit_price=limit_price, lot_step=lot_step)
+            if fills:
+                return fills
+        return self.fill_engine.compute_fills(exchange, side, order_qty, top_price, top_qty, spread, lot_step=lot_step, symbol=symbol)
+
     def _compute_market_sweep_fills(
         self,
         exchange: str,
@@ -192,10 +360,25 @@ class ExecutionEngine:
         top_qty: Optional[int],
         spread: float,
         lot_step: int = 1,
+        ladder: Optional[DepthLadder] = None,
+        symbol: Optional[str] = None,
     ) -> List[FillResult]:
         if order_qty <= 0 or top_price is None:
             return []
 
+        if ladder is not None:
+            fills = ladder.sweep(order_qty, lot_step=lot_step)
+            swept = sum(fill.fill_quantity for fill in fills)
+            if swept >= order_qty:
+                return fills
+            # Past the visible ladder the remainder is priced synthetically off the last level.
+            tail = self._compute_market_sweep_fills(
+                exchange, side, order_qty - swept, ladder.prices[-1], top_qty, spread, lot_step=lot_step, symbol=symbol,
+            )
+            for fill in tail:
+                fill.slippage = abs(fill.fill_price - float(top_price))
+            return fills + tail
+
         remaining = int(order_qty)
         step = max(1, int(lot_step or 1))
         visible_qty = int(top_qty or 0)
@@ -223,6 +406,7 @@ class ExecutionEngine:
                 max(visible_qty, 1),
                 spread,
                 float(top_price),
+                symbol=symbol,
             )
             fill_price = float(top_price) + slippage if side == "BUY" else float(top_price) - slippage
             fills.append(FillResult(fill_price=fill_price, fill_quantity=int(chunk), slippage=slippage))
@@ -285,8 +469,8 @@ class ExecutionEngine:
             pass
         return 1
 
-    def _log_event(self, db: Session, order: models.MockOrder, event_type: str, decision_price: Optional[float], fill_price: Optional[float], fill_qty: Optional[int], reason: Optional[str], latency_ms: Optional[int], slippage: Optional[float]) -> None:
-        event = models.ExecutionEvent(
+    def _log_event(self, db: Session, order: models.MockOrder, event_type: str, decision_price: Optional[float], fill_price: Optional[float], fill_qty: Optional[int], reason: Optional[str], latency_ms: Optional[int], slippage: Optional[float], batch: Optional[_FillBatch] = None) -> None:
+        event = dict(
             order_id=order.id if order else None,
             user_id=order.user_id if order else None,
             symbol=order.symbol if order else "UNKNOWN",
@@ -298,33 +482,32 @@ class ExecutionEngine:
             latency_ms=latency_ms,
             slippage=slippage,
         )
-        db.add(event)
-
-    def _record_ledger(self, db: Session, user: models.UserAccount, *, credit: float, debit: float, remarks: str) -> None:
-        last_entry = (
-            db.query(models.LedgerEntry)
-            .filter(models.LedgerEntry.user_id == user.id)
-            .order_by(models.LedgerEntry.created_at.desc(), models.LedgerEntry.id.desc())
-            .first()
-        )
-        base_balance = (
-            last_entry.balance
-            if last_entry and last_entry.balance is not None
-            else (user.wallet_balance or 0.0)
-        )
-        next_balance = float(base_balance) + float(credit or 0.0) - float(debit or 0.0)
-        user.wallet_balance = next_balance
-        entry = models.LedgerEntry(
+        if batch is None:
+            db.add(models.ExecutionEvent(**event))
+            return
+        event["created_at"] = ist_now()
+        batch.events.append(event)
+
+    def _record_ledger(self, batch: _FillBatch, user: models.UserAccount, *, credit: float, debit: float, remarks: str) -> None:
+        # Balance is assigned when the batch is flushed.
+        batch.ledger.append(dict(
             user_id=user.id,
             entry_type="TRADE_PNL",
             credit=float(credit or 0.0),
             debit=float(debit or 0.0),
-            balance=next_balance,
             remarks=remarks,
-        )
-        db.add(entry)
+            created_at=ist_now(),
+        ))
+
+    def _apply_fill(self, db: Session, order: models.MockOrder, fill_price: float, fill_qty: int, batch: Optional[_FillBatch] = None) -> None:
+        """Apply one fill. Without ``batch`` the rows are written immediately."""
+        if batch is None:
+            batch = _FillBatch(db)
+            self._apply_fill(db, order, fill_price, fill_qty, batch)
+            batch.flush()
+            return
 
-    def _apply_fill(self, db: Session, order: models.MockOrder, fill_price: float, fill_qty: int) -> None:
+        now = ist_now()
         previous_filled_qty = int(order.filled_qty or 0)
         new_filled_qty = previous_filled_qty + int(fill_qty)
         order.filled_qty = new_filled_qty
@@ -341,36 +524,24 @@ class ExecutionEngine:
             order.status = "EXECUTED"
         else:
             order.status = "PARTIAL"
-        order.updated_at = ist_now()
+        order.updated_at = now
 
-        trade = models.MockTrade(
+        batch.trades.append(dict(
             order_id=order.id,
             user_id=order.user_id,
             price=fill_price,
             qty=fill_qty,
-        )
-        db.add(trade)
+            created_at=now,
+        ))
 
-        user = db.query(models.UserAccount).filter(models.UserAccount.id == order.user_id).first()
+        user = batch.user(order.user_id)
         if not user:
             return
 
-        margin = db.query(models.MarginAccount).filter(models.MarginAccount.user_id == order.user_id).first()
-        if not margin:
-            margin = models.MarginAccount(user_id=order.user_id, available_margin=0.0, used_margin=0.0)
-            db.add(margin)
-            db.flush()
+        margin = batch.margin(order.user_id)
 
         turnover = fill_price * fill_qty
-        brokerage_plan = None
-        if user.brokerage_plan_id:
-            brokerage_plan = db.query(models.BrokeragePlan).filter(models.BrokeragePlan.id == user.brokerage_plan_id).first()
-        if not brokerage_plan:
-            brokerage_plan = db.query(models.BrokeragePlan).filter(models.BrokeragePlan.name == "DEFAULT").first()
-        if not brokerage_plan:
-            brokerage_plan = models.BrokeragePlan(name="DEFAULT", flat_fee=20.0, percent_fee=0.0, max_fee=20.0)
-            db.add(brokerage_plan)
-            db.flush()
+        brokerage_plan = batch.brokerage_plan(user)
 
         brokerage = brokerage_plan.flat_fee + (turnover * (brokerage_plan.percent_fee or 0.0))
         brokerage = min(brokerage, brokerage_plan.max_fee or brokerage)
@@ -383,11 +554,11 @@ class ExecutionEngine:
             required_margin = required_margin / multiplier
         margin.used_margin += required_margin
         margin.available_margin -= required_margin
-        margin.updated_at = ist_now()
+        margin.updated_at = now
 
         if order.transaction_type == "BUY":
             self._record_ledger(
-                db,
+                batch,
                 user,
                 credit=0.0,
                 debit=turnover + brokerage,
@@ -395,35 +566,14 @@ class ExecutionEngine:
             )
         else:
             self._record_ledger(
-                db,
+                batch,
                 user,
                 credit=turnover - brokerage,
                 debit=0.0,
                 remarks="Order filled SELL",
             )
 
-        position = (
-            db.query(models.MockPosition)
-            .filter(
-                models.MockPosition.user_id == order.user_id,
-                models.MockPosition.symbol == order.symbol,
-                models.MockPosition.product_type == order.product_type,
-            )
-            .first()
-        )
-        if not position:
-            position = models.MockPosition(
-                user_id=order.user_id,
-                symbol=order.symbol,
-                exchange_segment=order.exchange_segment,
-                product_type=order.product_type,
-                quantity=0,
-                avg_price=0.0,
-                realized_pnl=0.0,
-                status="OPEN",
-            )
-            db.add(position)
-            db.flush()
+        position = batch.position(order)
 
         qty = fill_qty if order.transaction_type == "BUY" else -fill_qty
         new_qty = position.quantity + qty
@@ -450,10 +600,61 @@ class ExecutionEngine:
                 position.avg_price = ((position.avg_price * position.quantity) + (fill_price * qty)) / total_qty
             position.quantity = total_qty
         position.status = "OPEN" if int(position.quantity or 0) != 0 else "CLOSED"
-        position.updated_at = ist_now()
-        db.commit()  # Commit position update immediately
+        position.updated_at = now
+
+    def execute_closes(
+        self,
+        db: Session,
+        closes: List[Tuple[models.MockPosition, float]],
+        remarks: str,
+        batch: Optional[_FillBatch] = None,
+    ) -> List[models.MockOrder]:
+        """Flatten each position with one MARKET order filled at the given price.
+
+        Orders are inserted with a single flush; trades, ledger entries and
+        execution events are buffered in ``batch`` (flushed here when the
+        caller passes none). The caller owns the commit.
+        """
+        from app.oms.order_ids import generate_many as generate_order_ids
+
+        own_batch = batch is None
+        batch = batch or _FillBatch(db)
+        now = ist_now()
+        orders = []
+        for (pos, _price), order_ref in zip(closes, generate_order_ids(len(closes))):
+            qty = abs(int(pos.quantity or 0))
+            orders.append(models.MockOrder(
+                order_ref=order_ref,
+                user_id=pos.user_id,
+                symbol=pos.symbol,
+                exchange_segment=pos.exchange_segment,
+                transaction_type="SELL" if int(pos.quantity or 0) > 0 else "BUY",
+                quantity=qty,
+                filled_qty=0,
+                order_type="MARKET",
+                product_type=pos.product_type,
+                price=0.0,
+                status="PENDING",
+                remarks=remarks,
+                created_at=now,
+                updated_at=now,
+            ))
+        db.add_all(orders)
+        db.flush()
+        batch.preload([pos for pos, _price in closes])
+        for order, (_pos, price) in zip(orders, closes):
+            self._apply_fill(db, order, float(price), order.quantity, batch)
+            self._log_event(db, order, "FULL_FILL", price, price, order.quantity, remarks, 0, 0.0, batch=batch)
+        if own_batch:
+            batch.flush()
+        return orders
 
     def process_new_order(self, db: Session, order: models.MockOrder) -> None:
+        batch = _FillBatch(db)
+        self._process_new_order(db, order, batch)
+        batch.flush()
+
+    def _process_new_order(self, db: Session, order: models.MockOrder, batch: _FillBatch) -> None:
         exchange = self._exchange_from_segment(order.exchange_segment)
         snapshot = self._snapshot_for_order(order.symbol, order.exchange_segment)
         effective_type = order.order_type
@@ -465,7 +666,7 @@ class ExecutionEngine:
                 order.status = "REJECTED"
                 order.remarks = "INVALID_TRIGGER"
                 order.updated_at = ist_now()
-                self._log_event(db, order, "ORDER_REJECTED", ask or bid, None, None, "INVALID_TRIGGER", None, None)
+                self._log_event(db, order, "ORDER_REJECTED", ask or bid, None, None, "INVALID_TRIGGER", None, None, batch=batch)
                 return
             if order.transaction_type == "BUY" and ask is not None and ask >= trigger:
                 effective_type = "MARKET" if order.order_type in {"SL-M", "TRIGGER"} else "LIMIT"
@@ -489,10 +690,10 @@ class ExecutionEngine:
             order.status = "REJECTED"
             order.remarks = reason
             order.updated_at = ist_now()
-            self._log_event(db, order, "ORDER_REJECTED", snapshot.get("best_ask") or snapshot.get("best_bid"), None, None, reason, None, None)
+            self._log_event(db, order, "ORDER_REJECTED", snapshot.get("best_ask") or snapshot.get("best_bid"), None, None, reason, None, None, batch=batch)
             return
 
-        latency_ms = self.latency_model.sample_latency_ms(exchange, order.user_id)
+        latency_ms = self.latency_model.sample_latency_ms(exchange, order.user_id, symbol=order.symbol)
         time.sleep(latency_ms / 1000.0)
 
         # Refresh after latency so execution uses latest bid/ask instead of pre-latency snapshot.
@@ -507,7 +708,7 @@ class ExecutionEngine:
         ask = snapshot.get("best_ask")
 
         decision_price = ask if order.transaction_type == "BUY" else bid
-        self._log_event(db, order, "ORDER_ACCEPTED", decision_price, None, None, None, latency_ms, None)
+        self._log_event(db, order, "ORDER_ACCEPTED", decision_price, None, None, None, latency_ms, None, batch=batch)
 
         remaining = order.quantity - order.filled_qty
         if remaining <= 0:
@@ -517,7 +718,7 @@ class ExecutionEngine:
             order.status = "REJECTED"
             order.remarks = "NO_LIQUIDITY"
             order.updated_at = ist_now()
-            self._log_event(db, order, "ORDER_REJECTED", decision_price, None, None, "NO_LIQUIDITY", latency_ms, None)
+            self._log_event(db, order, "ORDER_REJECTED", decision_price, None, None, "NO_LIQUIDITY", latency_ms, None, batch=batch)
             return
 
         bid_qty = snapshot.get("bid_qty") or self.config.default_bid_qty
@@ -528,22 +729,23 @@ class ExecutionEngine:
         if effective_type == "MARKET":
             top_price = ask if order.transaction_type == "BUY" else bid
             top_qty = ask_qty if order.transaction_type == "BUY" else bid_qty
-            fills = self._compute_market_sweep_fills(exchange, order.transaction_type, remaining, top_price, top_qty, spread, lot_step=lot_step)
+            ladder = self._depth_ladder(snapshot, order.transaction_type)
+            fills = self._compute_market_sweep_fills(exchange, order.transaction_type, remaining, top_price, top_qty, spread, lot_step=lot_step, ladder=ladder, symbol=order.symbol)
             if not fills:
                 order.status = "REJECTED"
                 order.remarks = "NO_LIQUIDITY"
                 order.updated_at = ist_now()
-                self._log_event(db, order, "ORDER_REJECTED", top_price, None, None, "NO_LIQUIDITY", latency_ms, None)
+                self._log_event(db, order, "ORDER_REJECTED", top_price, None, None, "NO_LIQUIDITY", latency_ms, None, batch=batch)
                 return
             for fill in fills:
-                self._apply_fill(db, order, fill.fill_price, fill.fill_quantity)
+                self._apply_fill(db, order, fill.fill_price, fill.fill_quantity, batch)
                 event_type = "FULL_FILL" if order.filled_qty >= order.quantity else "PARTIAL_FILL"
-                self._log_event(db, order, event_type, top_price, fill.fill_price, fill.fill_quantity, None, latency_ms, fill.slippage)
+                self._log_event(db, order, event_type, top_price, fill.fill_price, fill.fill_quantity, None, latency_ms, fill.slippage, batch=batch)
             if order.filled_qty < order.quantity:
                 order.status = "REJECTED"
                 order.remarks = "NO_LIQUIDITY"
                 order.updated_at = ist_now()
-                self._log_event(db, order, "ORDER_REJECTED", top_price, None, None, "NO_LIQUIDITY", latency_ms, None)
+                self._log_event(db, order, "ORDER_REJECTED", top_price, None, None, "NO_LIQUIDITY", latency_ms, None, batch=batch)
             return
 
         if effective_type == "LIMIT":
@@ -558,18 +760,22 @@ class ExecutionEngine:
                 order.status = "PENDING"
                 return
 
-            fills = self.fill_engine.compute_fills(exchange, order.transaction_type, remaining, top_price, top_qty, spread, lot_step=lot_step)
+            ladder = self._depth_ladder(snapshot, order.transaction_type)
+            fills = self._compute_limit_fills(exchange, order.transaction_type, remaining, order.price, top_price, top_qty, spread, lot_step=lot_step, ladder=ladder, symbol=order.symbol)
             if not fills:
                 return
             for fill in fills:
-                self._apply_fill(db, order, fill.fill_price, fill.fill_quantity)
+                self._apply_fill(db, order, fill.fill_price, fill.fill_quantity, batch)
                 event_type = "FULL_FILL" if order.filled_qty >= order.quantity else "PARTIAL_FILL"
-                self._log_event(db, order, event_type, top_price, fill.fill_price, fill.fill_quantity, None, latency_ms, fill.slippage)
+                self._log_event(db, order, event_type, top_price, fill.fill_price, fill.fill_quantity, None, latency_ms, fill.slippage, batch=batch)
             return
 
         order.status = "PENDING"
 
     def process_pending_orders(self, db: Session) -> None:
+        """Run one matching pass; all resulting rows are flushed together."""
+        tick_latency.order_pass_started()
+        batch = _FillBatch(db)
         pending = (
             db.query(models.MockOrder)
             .filter(models.MockOrder.status.in_(["PENDING", "PARTIAL"]))
@@ -584,7 +790,7 @@ class ExecutionEngine:
                 order.status = "REJECTED"
                 order.remarks = "NO_LIQUIDITY_TIMEOUT"
                 order.updated_at = ist_now()
-                self._log_event(db, order, "ORDER_REJECTED", snapshot.get("best_ask") or snapshot.get("best_bid"), None, None, "NO_LIQUIDITY_TIMEOUT", None, None)
+                self._log_event(db, order, "ORDER_REJECTED", snapshot.get("best_ask") or snapshot.get("best_bid"), None, None, "NO_LIQUIDITY_TIMEOUT", None, None, batch=batch)
                 continue
 
             remaining = order.quantity - order.filled_qty
@@ -603,7 +809,7 @@ class ExecutionEngine:
                     order.status = "REJECTED"
                     order.remarks = "NO_LIQUIDITY"
                     order.updated_at = ist_now()
-                    self._log_event(db, order, "ORDER_REJECTED", None, None, None, "NO_LIQUIDITY", None, None)
+                    self._log_event(db, order, "ORDER_REJECTED", None, None, None, "NO_LIQUIDITY", None, None, batch=batch)
                 continue
 
             spread = ask - bid
@@ -631,28 +837,31 @@ class ExecutionEngine:
                 else:
                     continue
 
+            ladder = self._depth_ladder(snapshot, order.transaction_type)
             if effective_type == "MARKET":
-                fills = self._compute_market_sweep_fills(exchange, order.transaction_type, remaining, top_price, top_qty, spread, lot_step=lot_step)
+                fills = self._compute_market_sweep_fills(exchange, order.transaction_type, remaining, top_price, top_qty, spread, lot_step=lot_step, ladder=ladder, symbol=order.symbol)
             else:
-                fills = self.fill_engine.compute_fills(exchange, order.transaction_type, remaining, top_price, top_qty, spread, lot_step=lot_step)
+                fills = self._compute_limit_fills(exchange, order.transaction_type, remaining, order.price, top_price, top_qty, spread, lot_step=lot_step, ladder=ladder, symbol=order.symbol)
             if not fills:
                 if effective_type == "MARKET":
                     order.status = "REJECTED"
                     order.remarks = "NO_LIQUIDITY"
                     order.updated_at = ist_now()
-                    self._log_event(db, order, "ORDER_REJECTED", top_price, None, None, "NO_LIQUIDITY", None, None)
+                    self._log_event(db, order, "ORDER_REJECTED", top_price, None, None, "NO_LIQUIDITY", None, None, batch=batch)
                 continue
-            latency_ms = self.latency_model.sample_latency_ms(exchange, order.user_id)
+            latency_ms = self.latency_model.sample_latency_ms(exchange, order.user_id, symbol=order.symbol)
             for fill in fills:
-                self._apply_fill(db, order, fill.fill_price, fill.fill_quantity)
+                self._apply_fill(db, order, fill.fill_price, fill.fill_quantity, batch)
                 event_type = "FULL_FILL" if order.filled_qty >= order.quantity else "PARTIAL_FILL"
-                self._log_event(db, order, event_type, top_price, fill.fill_price, fill.fill_quantity, None, latency_ms, fill.slippage)
+                self._log_event(db, order, event_type, top_price, fill.fill_price, fill.fill_quantity, None, latency_ms, fill.slippage, batch=batch)
 
             if effective_type == "MARKET" and order.filled_qty < order.quantity:
                 order.status = "REJECTED"
                 order.remarks = "NO_LIQUIDITY"
                 order.updated_at = ist_now()
-                self._log_event(db, order, "ORDER_REJECTED", top_price, None, None, "NO_LIQUIDITY", None, None)
+                self._log_event(db, order, "ORDER_REJECTED", top_price, None, None, "NO_LIQUIDITY", None, None, batch=batch)
+
+        batch.flush()
 
 _ENGINE = ExecutionEngine()
 
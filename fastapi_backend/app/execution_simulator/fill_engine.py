@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 
 from app.execution_simulator.slippage_model import SlippageModel
 
@@ -27,6 +27,7 @@ class FillEngine:
         top_qty: int,
         spread: float,
         lot_step: int = 1,
+        symbol: Optional[str] = None,
     ) -> List[FillResult]:
         if order_qty <= 0 or top_qty <= 0:
             return []
@@ -35,6 +36,6 @@ class FillEngine:
         fill_qty = (raw_fill_qty // step) * step
         if fill_qty <= 0:
             return []
-        slippage = self.slippage_model.compute_slippage(exchange, order_qty, top_qty, spread, top_price)
+        slippage = self.slippage_model.compute_slippage(exchange, order_qty, top_qty, spread, top_price, symbol=symbol)
         price = top_price + slippage if side == "BUY" else top_price - slippage
         return [FillResult(fill_price=price, fill_quantity=fill_qty, slippage=slippage)]
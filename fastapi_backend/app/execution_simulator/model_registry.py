@@ -0,0 +1,95 @@
+"""Registry of latency / slippage models selectable from ``ExecutionConfig``.
+
+``models.latency`` / ``models.slippage`` in the execution config pick a
+registered factory by name:
+
+* ``uniform`` / ``linear`` – the parametric per-exchange models (default);
+* ``empirical`` – draws from the latest calibration table (see
+  ``calibration``), keyed by symbol, liquidity bucket or exchange, and falls
+  back to the parametric model where the table has no distribution.
+
+Further models can be added with ``register_latency_model`` /
+``register_slippage_model``; a factory takes the ``ExecutionConfig``.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable, Dict, Optional
+
+from app.execution_simulator.calibration import CALIBRATION_STORE, CalibrationTable
+from app.execution_simulator.execution_config import ExecutionConfig
+from app.execution_simulator.latency_model import LatencyModel
+from app.execution_simulator.slippage_model import SlippageModel
+
+logger = logging.getLogger(__name__)
+
+
+class _CalibratedModel:
+    """Holds the calibration table shared by the empirical models."""
+
+    def __init__(self, table: Optional[CalibrationTable] = None) -> None:
+        self.table = table if table is not None else (CALIBRATION_STORE.load() or CalibrationTable())
+
+    def reload(self, version: Optional[int] = None) -> int:
+        table = CALIBRATION_STORE.load(version)
+        if table is not None:
+            self.table = table
+        return self.table.version
+
+
+class EmpiricalLatencyModel(_CalibratedModel, LatencyModel):
+    def __init__(self, config: ExecutionConfig, table: Optional[CalibrationTable] = None) -> None:
+        LatencyModel.__init__(self, config)
+        _CalibratedModel.__init__(self, table)
+
+    def sample_latency_ms(self, exchange: str, user_id: int | None = None, symbol: Optional[str] = None) -> int:
+        dist = self.table.lookup("latency", exchange, symbol)
+        if dist is None:
+            return super().sample_latency_ms(exchange, user_id, symbol)
+        return max(0, int(dist.sample()))
+
+
+class EmpiricalSlippageModel(_CalibratedModel, SlippageModel):
+    def __init__(self, config: ExecutionConfig, table: Optional[CalibrationTable] = None) -> None:
+        SlippageModel.__init__(self, config)
+        _CalibratedModel.__init__(self, table)
+
+    def compute_slippage(self, exchange: str, order_qty: int, top_qty: int, spread: float, ref_price: float, symbol: Optional[str] = None) -> float:
+        dist = self.table.lookup("slippage", exchange, symbol)
+        if dist is None:
+            return super().compute_slippage(exchange, order_qty, top_qty, spread, ref_price, symbol)
+        return ref_price * max(0.0, dist.sample())
+
+
+LATENCY_MODELS: Dict[str, Callable[[ExecutionConfig], LatencyModel]] = {
+    "uniform": LatencyModel,
+    "empirical": EmpiricalLatencyModel,
+}
+SLIPPAGE_MODELS: Dict[str, Callable[[ExecutionConfig], SlippageModel]] = {
+    "linear": SlippageModel,
+    "empirical": EmpiricalSlippageModel,
+}
+
+
+def register_latency_model(name: str, factory: Callable[[ExecutionConfig], LatencyModel]) -> None:
+    LATENCY_MODELS[name.lower()] = factory
+
+
+def register_slippage_model(name: str, factory: Callable[[ExecutionConfig], SlippageModel]) -> None:
+    SLIPPAGE_MODELS[name.lower()] = factory
+
+
+def build_latency_model(config: ExecutionConfig) -> LatencyModel:
+    factory = LATENCY_MODELS.get(config.latency_model)
+    if factory is None:
+        logger.warning("Unknown latency model %r; using uniform", config.latency_model)
+        factory = LatencyModel
+    return factory(config)
+
+
+def build_slippage_model(config: ExecutionConfig) -> SlippageModel:
+    factory = SLIPPAGE_MODELS.get(config.slippage_model)
+    if factory is None:
+        logger.warning("Unknown slippage model %r; using linear", config.slippage_model)
+        factory = SlippageModel
+    return factory(config)
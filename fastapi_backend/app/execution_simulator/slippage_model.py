@@ -1,6 +1,8 @@
 """Slippage model for execution simulation."""
 from __future__ import annotations
 
+from typing import Optional
+
 from app.execution_simulator.execution_config import ExecutionConfig
 
 
@@ -8,7 +10,7 @@ class SlippageModel:
     def __init__(self, config: ExecutionConfig) -> None:
         self.config = config
 
-    def compute_slippage(self, exchange: str, order_qty: int, top_qty: int, spread: float, ref_price: float) -> float:
+    def compute_slippage(self, exchange: str, order_qty: int, top_qty: int, spread: float, ref_price: float, symbol: Optional[str] = None) -> float:
         cfg = self.config.for_exchange(exchange)
         liquidity = max(float(top_qty), 1.0)
         size_ratio = min(order_qty / liquidity, 5.0)
@@ -0,0 +1,215 @@
+"""Authoritative per-user running ledger balance.
+
+The balance (and the credit/debit totals shown by ``/admin/ledger/summary``)
+lives on ``UserAccount`` next to a ``ledger_version`` counter. Writers never
+look up the latest ``LedgerEntry``: they take the last known state from an
+in-process cache, assign balances to the new rows and compare-and-set the
+user row on ``ledger_version``. A lost race (another worker, or a rolled back
+transaction that left the cache ahead of the database) reloads the row and
+retries, so ledger rows stay append-only.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.storage import models
+from app.storage.models import ist_now
+
+# Entry types counted by the admin ledger summary (OPENING is excluded).
+SUMMARY_ENTRY_TYPES = ("PAYIN", "PAYOUT", "TRADE_PNL", "ADJUST")
+
+_MAX_ATTEMPTS = 5
+
+
+class LedgerConflictError(RuntimeError):
+    """The user row kept changing underneath us."""
+
+
+@dataclass(frozen=True)
+class LedgerState:
+    balance: float
+    credit_total: float
+    debit_total: float
+    version: int
+
+
+class RunningBalanceCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._states: Dict[int, LedgerState] = {}
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(user_id, None)
+
+    def current(self, db: Session, user_id: int) -> LedgerState:
+        with self._lock:
+            state = self._states.get(user_id)
+        if state is None:
+            state = self._load(db, user_id)
+            with self._lock:
+                self._states[user_id] = state
+        return state
+
+    def _load(self, db: Session, user_id: int) -> LedgerState:
+        row = (
+            db.query(
+                models.UserAccount.ledger_balance,
+                models.UserAccount.ledger_credit_total,
+                models.UserAccount.ledger_debit_total,
+                models.UserAccount.ledger_version,
+                models.UserAccount.wallet_balance,
+            )
+            .filter(models.UserAccount.id == user_id)
+            .one()
+        )
+        balance, credit_total, debit_total, version, wallet_balance = row
+        if balance is not None:
+            return LedgerState(float(balance), float(credit_total or 0.0), float(debit_total or 0.0), int(version or 0))
+
+        # Not seeded yet (user created after the backfill): derive it once.
+        last_entry = (
+            db.query(models.LedgerEntry.balance)
+            .filter(models.LedgerEntry.user_id == user_id)
+            .order_by(models.LedgerEntry.created_at.desc(), models.LedgerEntry.id.desc())
+            .first()
+        )
+        credit_total, debit_total = (
+            db.query(func.coalesce(func.sum(models.LedgerEntry.credit), 0.0), func.coalesce(func.sum(models.LedgerEntry.debit), 0.0))
+            .filter(
+                models.LedgerEntry.user_id == user_id,
+                models.LedgerEntry.entry_type.in_(SUMMARY_ENTRY_TYPES),
+            )
+            .one()
+        )
+        base = last_entry[0] if last_entry and last_entry[0] is not None else (wallet_balance or 0.0)
+        return LedgerState(float(base), float(credit_total or 0.0), float(debit_total or 0.0), int(version or 0))
+
+    def _compare_and_set(self, db: Session, user: models.UserAccount, expected: LedgerState, new: LedgerState) -> bool:
+        now = ist_now()
+        result = db.execute(
+            update(models.UserAccount)
+            .where(
+                models.UserAccount.id == user.id,
+                func.coalesce(models.UserAccount.ledger_version, 0) == expected.version,
+            )
+            .values(
+                wallet_balance=new.balance,
+                ledger_balance=new.balance,
+                ledger_credit_total=new.credit_total,
+                ledger_debit_total=new.debit_total,
+                ledger_version=new.version,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            self.invalidate(user.id)
+            return False
+
+        with self._lock:
+            self._states[user.id] = new
+        # Keep the caller's ORM object in step without scheduling another UPDATE.
+        for attr, value in (
+            ("wallet_balance", new.balance),
+            ("ledger_balance", new.balance),
+            ("ledger_credit_total", new.credit_total),
+            ("ledger_debit_total", new.debit_total),
+            ("ledger_version", new.version),
+            ("updated_at", now),
+        ):
+            set_committed_value(user, attr, value)
+        return True
+
+    def append_entries(self, db: Session, user: models.UserAccount, entries: List[Dict[str, object]]) -> float:
+        """Fill in ``balance`` on each pending ledger row dict and advance the user's state.
+
+        Rows need ``credit``, ``debit`` and ``entry_type``; the caller inserts them.
+        Returns the closing balance.
+        """
+        for _ in range(_MAX_ATTEMPTS):
+            state = self.current(db, user.id)
+            balance, credit_total, debit_total = state.balance, state.credit_total, state.debit_total
+            for entry in entries:
+                credit = float(entry.get("credit") or 0.0)
+                debit = float(entry.get("debit") or 0.0)
+                balance = balance + credit - debit
+                entry["balance"] = balance
+                if entry.get("entry_type") in SUMMARY_ENTRY_TYPES:
+                    credit_total += credit
+                    debit_total += debit
+            new_state = LedgerState(balance, credit_total, debit_total, state.version + 1)
+            if self._compare_and_set(db, user, state, new_state):
+                return balance
+        raise LedgerConflictError(f"Ledger balance for user {user.id} changed concurrently; retry")
+
+    def post(
+        self,
+        db: Session,
+        user: models.UserAccount,
+        *,
+        credit: float,
+        debit: float,
+        entry_type: str,
+        remarks: Optional[str],
+    ) -> models.LedgerEntry:
+        row: Dict[str, object] = {
+            "user_id": user.id,
+            "entry_type": entry_type,
+            "credit": float(credit or 0.0),
+            "debit": float(debit or 0.0),
+            "remarks": remarks,
+        }
+        self.append_entries(db, user, [row])
+        entry = models.LedgerEntry(**row)
+        db.add(entry)
+        return entry
+
+    def rebuild(self, db: Session, user_id: int) -> None:
+        """Re-derive totals after ledger rows were deleted; the balance is kept."""
+        credit_total, debit_total = (
+            db.query(func.coalesce(func.sum(models.LedgerEntry.credit), 0.0), func.coalesce(func.sum(models.LedgerEntry.debit), 0.0))
+            .filter(
+                models.LedgerEntry.user_id == user_id,
+                models.LedgerEntry.entry_type.in_(SUMMARY_ENTRY_TYPES),
+            )
+            .one()
+        )
+        db.execute(
+            update(models.UserAccount)
+            .where(models.UserAccount.id == user_id)
+            .values(
+                ledger_credit_total=float(credit_total or 0.0),
+                ledger_debit_total=float(debit_total or 0.0),
+                ledger_version=func.coalesce(models.UserAccount.ledger_version, 0) + 1,
+            )
+            .execution_options(synchronize_session="fetch")
+        )
+        self.invalidate(user_id)
+
+    @staticmethod
+    def summary(db: Session, user_ids: Optional[Iterable[int]] = None, exclude_roles: Tuple[str, ...] = ()) -> Tuple[float, float]:
+        """Total credit/debit over ``SUMMARY_ENTRY_TYPES`` from the per-user running totals."""
+        query = db.query(
+            func.coalesce(func.sum(models.UserAccount.ledger_credit_total), 0.0),
+            func.coalesce(func.sum(models.UserAccount.ledger_debit_total), 0.0),
+        )
+        if user_ids is not None:
+            query = query.filter(models.UserAccount.id.in_(list(user_ids)))
+        if exclude_roles:
+            query = query.filter(~models.UserAccount.role.in_(exclude_roles))
+        total_credit, total_debit = query.one()
+        return float(total_credit or 0.0), float(total_debit or 0.0)
+
+
+ledger_balances = RunningBalanceCache()
@@ -30,7 +30,23 @@ def get_scheduler():
 
 
 def purge_previous_day_orders() -> dict:
-    """Delete all order-book data older than current IST trading day."""
+    """Archive, then delete, all order-book data older than current IST trading day."""
+    from app.storage.process_lock import exclusive
+
+    # Two workers archiving the same rows would write duplicate archive parts.
+    with exclusive("order_purge") as held:
+        if not held:
+            logger.info("[PURGE] Order purge already running in another worker; skipping")
+            return {
+                "skipped": "locked",
+                "orders_removed": 0,
+                "trades_removed": 0,
+                "execution_events_removed": 0,
+            }
+        return _purge_previous_day_orders()
+
+
+def _purge_previous_day_orders() -> dict:
     db = None
     try:
         from app.storage.db import SessionLocal
@@ -55,6 +71,12 @@ def purge_previous_day_orders() -> dict:
                 "cutoff": ist_day_start.isoformat(),
             }
 
+        # Columnar copy first (raises on failure, so nothing is deleted unarchived).
+        archived = {}
+        if _env_bool("ORDER_ARCHIVE_ENABLED", default=True):
+            from app.storage.order_archive import ORDER_ARCHIVE
+            archived = ORDER_ARCHIVE.archive_before(db, ist_day_start)
+
         execution_events_removed = (
             db.query(ExecutionEvent)
             .filter(ExecutionEvent.order_id.in_(old_order_ids))
@@ -77,6 +99,7 @@ def purge_previous_day_orders() -> dict:
             "trades_removed": int(trades_removed or 0),
             "execution_events_removed": int(execution_events_removed or 0),
             "cutoff": ist_day_start.isoformat(),
+            **archived,
         }
     except Exception:
         if db is not None:
@@ -149,6 +172,9 @@ def run_one_time_legacy_cleanup() -> dict:
             }
 
         order_cleanup = purge_previous_day_orders()
+        if order_cleanup.get("skipped"):
+            # Another worker is running (and will record) the one-time cleanup.
+            return {"already_done": True, **order_cleanup, "superadmin_positions_removed": 0}
         superadmin_pos_cleanup = purge_superadmin_previous_day_positions()
 
         log_entry = SubscriptionLog(
@@ -181,6 +207,17 @@ def run_one_time_legacy_cleanup() -> dict:
             db.close()
 
 def eod_cleanup():
+    """Scheduled in every worker; only the holder of the ``eod_cleanup`` process lock runs it."""
+    from app.storage.process_lock import exclusive
+
+    with exclusive("eod_cleanup") as held:
+        if not held:
+            logger.info("[EOD] Cleanup already running in another worker; skipping")
+            return
+        _eod_cleanup()
+
+
+def _eod_cleanup():
     """
     End-of-Day (4:00 PM IST) cleanup task
     - Unsubscribe Tier A (user watchlist) subscriptions except globally protected open-position symbols
@@ -649,6 +686,17 @@ async def on_start():
         logger.info("[STARTUP] Background bootstrap started")
         is_production = (os.getenv("ENVIRONMENT") or "").strip().lower() == "production"
 
+        # Serve the last persisted market state while everything below rebuilds it.
+        warm_start = _env_bool("WARM_SNAPSHOT_ENABLED", default=True)
+        if warm_start:
+            from app.market.warm_snapshot import SAVE_INTERVAL_SECONDS, WARM_SNAPSHOT
+            try:
+                await WARM_SNAPSHOT.restore_async()
+                if await asyncio.to_thread(WARM_SNAPSHOT.restore_instruments):
+                    logger.info("[STARTUP] Instrument store restored from snapshot")
+            except Exception:
+                logger.exception("[STARTUP] Warm snapshot restore failed")
+
         # Start EOD scheduler
         try:
             scheduler = get_scheduler()
@@ -662,6 +710,9 @@ async def on_start():
                 replace_existing=True,
                 max_instances=1
             )
+            if _env_bool("MIS_SQUAREOFF_ENABLED", default=True):
+                from app.rms.squareoff_engine import SQUAREOFF_ENGINE
+                SQUAREOFF_ENGINE.schedule(scheduler)
             if not scheduler.running:
                 scheduler.start()
             logger.info("[STARTUP] EOD scheduler started")
@@ -695,6 +746,8 @@ async def on_start():
             logger.info("[STARTUP] Loading instrument master...")
             await asyncio.to_thread(MASTER.load)
             logger.info("[STARTUP] Instrument master loaded")
+            if warm_start:
+                await asyncio.to_thread(WARM_SNAPSHOT.save_instruments)
         else:
             logger.warning("[STARTUP] Skipping instrument master load (STARTUP_LOAD_MASTER=false)")
 
@@ -736,8 +789,17 @@ async def on_start():
         else:
             logger.warning("[STARTUP] Skipping automatic stream start (STARTUP_START_STREAMS=false)")
 
+        if warm_start:
+            WARM_SNAPSHOT.start()
+            logger.info("[STARTUP] Warm snapshot saving every %ss", SAVE_INTERVAL_SECONDS)
+
     loop = asyncio.get_running_loop()
 
+    # Order placement runs on db_executor threads, which have no running loop;
+    # they hand margin checks to the reconciler through this one.
+    from app.rms.margin_engine import MARGIN_RECONCILER
+    MARGIN_RECONCILER.start(loop)
+
     def _schedule_bootstrap() -> None:
         global _bootstrap_task
         _bootstrap_task = asyncio.create_task(_bootstrap_after_startup())
@@ -748,6 +810,9 @@ async def on_start():
 
 def on_stop():
     """Application shutdown - cleanup"""
+    from app.rms.margin_engine import MARGIN_RECONCILER
+    MARGIN_RECONCILER.stop()
+
     print("\n[SHUTDOWN] Stopping scheduler...")
     scheduler = get_scheduler()
     if scheduler.running:
@@ -47,6 +47,22 @@ from app.lifecycle import hooks as lifecycle_hooks
 app.add_event_handler("startup", lifecycle_hooks.on_start)
 app.add_event_handler("shutdown", lifecycle_hooks.on_stop)
 
+from app.services.dhan_async_http import close_sessions as close_dhan_http_sessions
+
+app.add_event_handler("shutdown", close_dhan_http_sessions)
+
+from app.storage.db_executor import shutdown_db_executor
+
+app.add_event_handler("shutdown", shutdown_db_executor)
+
+from app.market.tick_journal import tick_journal
+
+app.add_event_handler("shutdown", tick_journal.close)
+
+from app.market.warm_snapshot import WARM_SNAPSHOT
+
+app.add_event_handler("shutdown", WARM_SNAPSHOT.stop)
+
 # CORS: restrict to known frontend origins to allow credentials safely
 app.add_middleware(
     CORSMiddleware,
@@ -87,12 +103,19 @@ def health_deep():
     try:
         with storage_db.engine.connect() as conn:
             conn.execute(text("SELECT 1"))
-        results["checks"]["database"] = {"status": "ok"}
+        results["checks"]["database"] = {"status": "ok", "pool": storage_db.get_pool_status()}
+        from app.storage.db_executor import db_executor
+        results["checks"]["db_executor"] = db_executor.get_status()
     except Exception as e:
         tb = traceback.format_exc()
         log.error("Deep health: DB check failed:\n%s", tb)
         results["checks"]["database"] = {"status": "error", "error": str(e)}
         results["status"] = "fail"
+    # Informational: a restart that is still serving warm-snapshot data is not a failure.
+    try:
+        results["checks"]["warm_snapshot"] = WARM_SNAPSHOT.get_status()
+    except Exception as e:
+        results["checks"]["warm_snapshot"] = {"status": "error", "error": str(e)}
 
     status_code = 200 if results["status"] == "ok" else 500
     return JSONResponse(status_code=status_code, content=results)
@@ -1,17 +1,17 @@
-import csv
-from pathlib import Path
-
-MASTER_PATH = Path(__file__).parent / "api-scrip-master-detailed.csv"
+from app.market.instrument_master.store import INSTRUMENT_STORE, MASTER_PATH
 
 class InstrumentMaster:
-    def __init__(self):
-        self.rows = []
+    """Startup/admin entry point for the shared instrument store."""
+
+    def __init__(self, store=None):
+        self.store = INSTRUMENT_STORE if store is None else store
 
-    def load(self):
-        with open(MASTER_PATH, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            self.rows = list(reader)
+    @property
+    def rows(self):
+        return self.store.rows
 
+    def load(self, force: bool = False):
+        self.store.load(force=force)
         print(f"[OK] Instrument master loaded: {len(self.rows)} records")
 
 MASTER = InstrumentMaster()
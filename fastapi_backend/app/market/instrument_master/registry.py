@@ -4,86 +4,67 @@ Indexes instruments by symbol, expiry, segment, and F&O eligibility.
 Provides fast lookups and strike generation logic.
 """
 
-import csv
-from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
 from datetime import datetime
-import threading
 
-MASTER_PATH = Path(__file__).parent / "api-scrip-master-detailed.csv"
+from app.market.instrument_master.store import INSTRUMENT_STORE, MASTER_PATH, InstrumentStore
 
 class InstrumentRegistry:
-    """Indexed instrument master for fast lookups and strike generation"""
+    """Indexed instrument master for fast lookups and strike generation.
+
+    Rows and indexes live in the shared ``InstrumentStore``; the attributes
+    below are views onto it, so a store reload is picked up here too.
+    """
     
-    def __init__(self):
-        self.instruments = []  # All 289k+ records
-        self.by_symbol = defaultdict(list)  # symbol -> [records]
-        self.by_symbol_expiry = defaultdict(list)  # (symbol, expiry) -> [records]
-        self.by_underlying = defaultdict(list)  # underlying_symbol -> [records]
-        self.by_underlying_expiry = defaultdict(list)  # (underlying_symbol, expiry) -> [records]
-        self.by_segment = defaultdict(list)  # segment -> [records]
-        self.f_o_stocks = set()  # F&O-eligible stock symbols
-        self.strike_steps = {}  # symbol -> strike_step (float)
+    def __init__(self, store: Optional[InstrumentStore] = None):
+        self.store = INSTRUMENT_STORE if store is None else store
         self.mcx_nearest_cache = {}  # symbol -> nearest MCX future cache
-        self.loaded = False
-        self._load_lock = threading.Lock()
-        
-    def load(self):
-        """Load and index the instrument master CSV"""
-        if self.loaded:
-            return
-
-        with self._load_lock:
-            if self.loaded:
-                return
+        self._generation = 0
 
-            with open(MASTER_PATH, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
+    @property
+    def loaded(self) -> bool:
+        return self.store.loaded
 
-                for row in reader:
-                    self.instruments.append(row)
+    @property
+    def instruments(self):
+        return self.store.rows  # All 289k+ records
 
-                    symbol = row.get("SYMBOL_NAME", "").strip()
-                    expiry = row.get("SM_EXPIRY_DATE", "").strip()
-                    segment = row.get("SEGMENT", "").strip()
-                    instrument_type = row.get("INSTRUMENT_TYPE", "").strip()
-                    strike_price = row.get("STRIKE_PRICE", "").strip()
-                    underlying = row.get("UNDERLYING_SYMBOL", "").strip().upper()
+    @property
+    def by_symbol(self):
+        return self.store.by_symbol  # symbol -> [records]
 
-                    # Index by symbol
-                    if symbol:
-                        self.by_symbol[symbol].append(row)
+    @property
+    def by_symbol_expiry(self):
+        return self.store.by_symbol_expiry  # (symbol, expiry) -> [records]
 
-                    # Index by (symbol, expiry)
-                    if symbol and expiry:
-                        self.by_symbol_expiry[(symbol, expiry)].append(row)
+    @property
+    def by_underlying(self):
+        return self.store.by_underlying  # underlying_symbol -> [records]
 
-                    # Index by underlying symbol
-                    if underlying:
-                        self.by_underlying[underlying].append(row)
-                        if expiry:
-                            self.by_underlying_expiry[(underlying, expiry)].append(row)
+    @property
+    def by_underlying_expiry(self):
+        return self.store.by_underlying_expiry  # (underlying_symbol, expiry) -> [records]
 
-                    # Index by segment
-                    if segment:
-                        self.by_segment[segment].append(row)
+    @property
+    def by_segment(self):
+        return self.store.by_segment  # segment -> [records]
 
-                    # Track F&O stocks
-                    if instrument_type in ("FUTSTK", "OPTSTK"):
-                        base_symbol = row.get("UNDERLYING_SYMBOL", symbol).strip()
-                        self.f_o_stocks.add(base_symbol)
+    @property
+    def f_o_stocks(self):
+        return self.store.f_o_stocks  # F&O-eligible stock symbols
 
-                    # Cache strike steps (from first occurrence of each symbol)
-                    if symbol and strike_price:
-                        try:
-                            step = float(strike_price)
-                            if step > 0 and symbol not in self.strike_steps:
-                                self.strike_steps[symbol] = step
-                        except (ValueError, TypeError):
-                            pass
-
-            self.loaded = True
+    @property
+    def strike_steps(self):
+        return self.store.strike_steps  # symbol -> strike_step (float)
+        
+    def load(self):
+        """Load and index the instrument master CSV (shared store, parsed once)"""
+        first_load = not self.store.loaded
+        self.store.load()
+        if self._generation != self.store.generation:
+            self._generation = self.store.generation
+            self.mcx_nearest_cache = {}
+        if first_load:
             print(f"[OK] Instrument Registry loaded: {len(self.instruments)} records")
             print(f"[OK] F&O eligible stocks: {len(self.f_o_stocks)}")
             print(f"[OK] Unique symbols: {len(self.by_symbol)}")
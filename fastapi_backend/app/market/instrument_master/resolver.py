@@ -21,12 +21,13 @@ def get_crudeoil_near_month():
     today = datetime.today().date()
     futures = []
 
-    for r in MASTER.rows:
-        sym = _val(r, "TradingSymbol", "tradingsymbol", "Symbol").upper()
-        exp = _val(r, "Expiry", "expiry")
-        if "CRUDEOIL" in sym and exp:
+    for r in MASTER.store.rows_for_symbol("CRUDEOIL"):
+        if r.exchange != "MCX" or r.option_type not in ("", "XX"):
+            continue
+        exp = _val(r, "SM_EXPIRY_DATE")
+        if exp:
             try:
-                futures.append((datetime.strptime(exp, "%Y-%m-%d").date(), r))
+                futures.append((datetime.strptime(exp[:10], "%Y-%m-%d").date(), r))
             except:
                 pass
 
@@ -34,7 +35,7 @@ def get_crudeoil_near_month():
 
     for exp, r in futures:
         if exp >= today:
-            sid = _val(r, "SecurityId", "security_id")
+            sid = r.security_id
             if sid:
                 return int(sid)
 
@@ -0,0 +1,430 @@
+"""
+Shared instrument store: the scrip master parsed once per process.
+
+``InstrumentMaster`` (``MASTER``), ``InstrumentRegistry`` (``REGISTRY``) and
+``DhanSecurityIdMapper`` used to keep three copies of the ~289k-row master.
+They now all read ``INSTRUMENT_STORE``:
+
+* each row is an ``InstrumentRow`` - a tuple of the CSV column values with
+  read-only dict access (``row.get("SECURITY_ID")``, ``row["EXCH_ID"]``) so
+  existing callers keep working, plus typed properties (``row.security_id``,
+  ``row.strike``, ``row.lot_size``...);
+* repeated values (exchange, segment, symbols, expiries, option types, lot
+  sizes...) are deduplicated to one string object per distinct value;
+* the lookup indexes (by symbol, underlying, expiry, segment, security id)
+  are built in the same pass and hold references to the same rows.
+
+``load()`` is idempotent; ``load(force=True)`` re-reads the file and swaps
+every index at once.
+"""
+
+import csv
+import gc
+import logging
+import threading
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MASTER_PATH = Path(__file__).parent / "api-scrip-master-detailed.csv"
+
+F_O_STOCK_TYPES = ("FUTSTK", "OPTSTK")
+
+
+class InstrumentRow(tuple):
+    """One scrip-master row: column values in header order, readable like a dict."""
+
+    __slots__ = ()
+    _index: Dict[str, int] = {}
+
+    # ---- dict-style access ------------------------------------------------
+
+    def get(self, key: str, default=None):
+        idx = self._index.get(key)
+        if idx is None or idx >= len(self):
+            return default
+        return tuple.__getitem__(self, idx)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            idx = self._index.get(key)
+            if idx is None or idx >= len(self):
+                raise KeyError(key)
+            return tuple.__getitem__(self, idx)
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def keys(self) -> Iterable[str]:
+        return self._index.keys()
+
+    def values(self) -> Iterable[str]:
+        return tuple(self)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        return zip(self._index.keys(), self)
+
+    def to_dict(self) -> Dict[str, str]:
+        return dict(zip(self._index.keys(), self))
+
+    # ---- typed accessors ----------------------------------------------------
+
+    @property
+    def security_id(self) -> str:
+        return self.get("SECURITY_ID", "")
+
+    @property
+    def exchange(self) -> str:
+        return self.get("EXCH_ID", "").upper()
+
+    @property
+    def segment(self) -> str:
+        return self.get("SEGMENT", "")
+
+    @property
+    def symbol(self) -> str:
+        return self.get("SYMBOL_NAME", "")
+
+    @property
+    def underlying(self) -> str:
+        return self.get("UNDERLYING_SYMBOL", "").upper()
+
+    @property
+    def instrument_type(self) -> str:
+        return self.get("INSTRUMENT_TYPE", "")
+
+    @property
+    def expiry(self) -> str:
+        return self.get("SM_EXPIRY_DATE", "")
+
+    @property
+    def option_type(self) -> str:
+        return self.get("OPTION_TYPE", "").upper()
+
+    @property
+    def strike(self) -> Optional[float]:
+        try:
+            value = float(self.get("STRIKE_PRICE", ""))
+        except (TypeError, ValueError):
+            return None
+        return value if value > 0 else None
+
+    @property
+    def lot_size(self) -> Optional[int]:
+        for key in ("LOT_SIZE", "MARKET_LOT"):
+            try:
+                value = int(float(self.get(key, "")))
+            except (TypeError, ValueError):
+                continue
+            if value > 0:
+                return value
+        return None
+
+    @property
+    def is_option(self) -> bool:
+        return self.option_type in ("CE", "PE")
+
+    def __repr__(self) -> str:
+        return f"InstrumentRow({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return (_rebuild_row, (dict(self._index), tuple(self)))
+
+
+_ROW_CLASSES: Dict[Tuple[str, ...], type] = {}
+
+
+def _row_class(header: List[str]):
+    """``InstrumentRow`` bound to one CSV header (one class per distinct header)."""
+    key = tuple(header)
+    cls = _ROW_CLASSES.get(key)
+    if cls is None:
+        cls = type("InstrumentRow", (InstrumentRow,), {"__slots__": (), "_index": {name: i for i, name in enumerate(key)}})
+        _ROW_CLASSES[key] = cls
+    return cls
+
+
+def _rebuild_row(index: Dict[str, int], values: Tuple[str, ...]) -> InstrumentRow:
+    return _row_class(list(index))(values)
+
+
+def _codes(raw: bytes) -> array:
+    codes = array("I")
+    codes.frombytes(raw)
+    return codes
+
+
+@contextmanager
+def _gc_paused():
+    """Suspend cyclic GC while building ~289k row tuples (none of them form cycles)."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class InstrumentStore:
+    def __init__(self, path: Optional[Path] = None):
+        self._path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.header: List[str] = []
+        self.rows: List[InstrumentRow] = []
+        self.by_symbol: Dict[str, List[InstrumentRow]] = defaultdict(list)
+        self.by_symbol_expiry: Dict[Tuple[str, str], List[InstrumentRow]] = defaultdict(list)
+        self.by_underlying: Dict[str, List[InstrumentRow]] = defaultdict(list)
+        self.by_underlying_expiry: Dict[Tuple[str, str], List[InstrumentRow]] = defaultdict(list)
+        self.by_segment: Dict[str, List[InstrumentRow]] = defaultdict(list)
+        self.by_security_id: Dict[str, InstrumentRow] = {}
+        self.f_o_stocks: Set[str] = set()
+        self.strike_steps: Dict[str, float] = {}
+        self.loaded = False
+        self.source: Optional[str] = None
+        self.generation = 0
+
+    @property
+    def path(self) -> Path:
+        # Resolved at load time so tests/benchmarks can point the module at another file.
+        return self._path or MASTER_PATH
+
+    def exists(self) -> bool:
+        return self.loaded or self.path.exists()
+
+    def ensure_loaded(self) -> None:
+        if not self.loaded:
+            self.load()
+
+    def load(self, force: bool = False) -> None:
+        if self.loaded and not force:
+            return
+        with self._lock:
+            if self.loaded and not force:
+                return
+            path = self.path
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                built = self._build(csv.reader(f))
+            generation = self.generation + 1
+            self.__dict__.update(built)
+            self.generation = generation
+            self.source = str(path)
+            self.loaded = True
+            logger.info("Instrument store loaded: %s records from %s", len(self.rows), path)
+
+    def _build(self, reader) -> Dict[str, object]:
+        header = [name.strip().upper() for name in next(reader, [])]
+        row_cls = _row_class(header)
+        col = row_cls._index.get
+        i_symbol, i_expiry, i_segment = col("SYMBOL_NAME"), col("SM_EXPIRY_DATE"), col("SEGMENT")
+        i_type, i_strike, i_underlying = col("INSTRUMENT_TYPE"), col("STRIKE_PRICE"), col("UNDERLYING_SYMBOL")
+        i_security = col("SECURITY_ID")
+        width = len(header)
+
+        pool: Dict[str, str] = {}
+        intern = pool.setdefault
+        rows: List[InstrumentRow] = []
+        by_symbol = defaultdict(list)
+        by_symbol_expiry = defaultdict(list)
+        by_underlying = defaultdict(list)
+        by_underlying_expiry = defaultdict(list)
+        by_segment = defaultdict(list)
+        by_security_id: Dict[str, InstrumentRow] = {}
+        f_o_stocks: Set[str] = set()
+        strike_steps: Dict[str, float] = {}
+
+        # Missing columns read as "" (short rows are padded; the pad slot is width).
+        i_symbol, i_expiry, i_segment, i_type, i_strike, i_underlying, i_security = (
+            width if i is None else i
+            for i in (i_symbol, i_expiry, i_segment, i_type, i_strike, i_underlying, i_security)
+        )
+        pad = [""] * (width + 1)
+
+        for raw in reader:
+            if not raw:
+                continue
+            stripped = [v.strip() for v in raw[:width]]
+            values = list(map(intern, stripped, stripped))
+            row = row_cls(values)
+            rows.append(row)
+            if len(values) <= width:
+                values += pad[len(values):]
+
+            symbol = values[i_symbol]
+            expiry = values[i_expiry]
+            underlying = values[i_underlying]
+            if symbol:
+                by_symbol[symbol].append(row)
+                if expiry:
+                    by_symbol_expiry[(symbol, expiry)].append(row)
+            if underlying:
+                if not underlying.isupper():
+                    underlying = intern(underlying.upper(), underlying.upper())
+                by_underlying[underlying].append(row)
+                if expiry:
+                    by_underlying_expiry[(underlying, expiry)].append(row)
+            segment = values[i_segment]
+            if segment:
+                by_segment[segment].append(row)
+            security_id = values[i_security]
+            if security_id and security_id not in by_security_id:
+                by_security_id[security_id] = row
+            if values[i_type] in F_O_STOCK_TYPES:
+                f_o_stocks.add(values[i_underlying] or symbol)
+            strike_price = values[i_strike]
+            if strike_price and symbol and symbol not in strike_steps:
+                try:
+                    step = float(strike_price)
+                    if step > 0:
+                        strike_steps[symbol] = step
+                except (TypeError, ValueError):
+                    pass
+
+        return {
+            "header": header,
+            "rows": rows,
+            "by_symbol": by_symbol,
+            "by_symbol_expiry": by_symbol_expiry,
+            "by_underlying": by_underlying,
+            "by_underlying_expiry": by_underlying_expiry,
+            "by_segment": by_segment,
+            "by_security_id": by_security_id,
+            "f_o_stocks": f_o_stocks,
+            "strike_steps": strike_steps,
+        }
+
+    # ---- warm-start snapshot ---------------------------------------------------
+
+    _INDEX_NAMES = ("by_symbol", "by_symbol_expiry", "by_underlying", "by_underlying_expiry", "by_segment")
+
+    def export_state(self) -> Dict[str, object]:
+        """
+        Compact copy of the loaded rows and indexes for ``restore_state``.
+
+        Rows are stored column-wise as (distinct values, uint32 codes); each
+        index as its keys, per-key row counts and the row positions in key
+        order. With the master's heavy repetition this pickles to a fraction
+        of the CSV, and restoring it needs no parsing or re-indexing.
+        """
+        self.ensure_loaded()
+        width = len(self.header)
+        pad = ("",) * width
+        rows = self.rows
+        # Rows shorter than the header (truncated CSV lines) are rare; record only those.
+        short_rows = {i: len(row) for i, row in enumerate(rows) if len(row) < width}
+        if short_rows:
+            rows = [row + pad[len(row):] if i in short_rows else row for i, row in enumerate(rows)]
+        columns = []
+        for values in zip(*rows):
+            distinct: Dict[str, int] = {}
+            code = distinct.setdefault
+            codes = array("I", [code(value, len(distinct)) for value in values])
+            columns.append((list(distinct), codes.tobytes()))
+
+        position = {id(row): i for i, row in enumerate(self.rows)}
+        indexes = {}
+        for name in self._INDEX_NAMES:
+            index = getattr(self, name)
+            positions = array("I", [position[id(row)] for group in index.values() for row in group])
+            counts = array("I", map(len, index.values()))
+            indexes[name] = (list(index), counts.tobytes(), positions.tobytes())
+        by_security_id = (
+            list(self.by_security_id),
+            array("I", [position[id(row)] for row in self.by_security_id.values()]).tobytes(),
+        )
+        return {
+            "header": list(self.header),
+            "columns": columns,
+            "short_rows": short_rows,
+            "indexes": indexes,
+            "by_security_id": by_security_id,
+            "f_o_stocks": set(self.f_o_stocks),
+            "strike_steps": dict(self.strike_steps),
+            "source": self.source,
+        }
+
+    def restore_state(self, state: Dict[str, object], source: Optional[str] = None) -> None:
+        """Install rows and indexes from ``export_state`` output (same result as ``load``)."""
+        header = list(state["header"])
+        row_cls = _row_class(header)
+        with _gc_paused():
+            decoded = []
+            for distinct, raw in state["columns"]:
+                decoded.append(map(distinct.__getitem__, _codes(raw)))
+            rows = list(map(row_cls, zip(*decoded)))
+            for i, width in state["short_rows"].items():
+                rows[i] = row_cls(rows[i][:width])
+
+            at = rows.__getitem__
+            built: Dict[str, object] = {"header": header, "rows": rows}
+            for name in self._INDEX_NAMES:
+                keys, counts, positions = state["indexes"][name]
+                members = iter(map(at, _codes(positions)))
+                index = defaultdict(list)
+                index.update(zip(keys, (list(islice(members, n)) for n in _codes(counts))))
+                built[name] = index
+            keys, positions = state["by_security_id"]
+            built["by_security_id"] = dict(zip(keys, map(at, _codes(positions))))
+            built["f_o_stocks"] = set(state["f_o_stocks"])
+            built["strike_steps"] = dict(state["strike_steps"])
+
+        with self._lock:
+            generation = self.generation + 1
+            self.__dict__.update(built)
+            self.generation = generation
+            self.source = source or state.get("source")
+            self.loaded = True
+        logger.info("Instrument store restored: %s records from %s", len(self.rows), self.source)
+
+    # ---- typed accessors ------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, security_id) -> Optional[InstrumentRow]:
+        self.ensure_loaded()
+        return self.by_security_id.get(str(security_id).strip())
+
+    def rows_for_symbol(self, symbol: str) -> List[InstrumentRow]:
+        self.ensure_loaded()
+        return self.by_symbol.get(symbol, [])
+
+    def rows_for_underlying(self, underlying: str, expiry: Optional[str] = None) -> List[InstrumentRow]:
+        self.ensure_loaded()
+        key = (underlying or "").upper()
+        if expiry:
+            return self.by_underlying_expiry.get((key, expiry), [])
+        return self.by_underlying.get(key, [])
+
+    def rows_for_segment(self, segment: str) -> List[InstrumentRow]:
+        self.ensure_loaded()
+        return self.by_segment.get(segment, [])
+
+    def iter_rows(self, instrument_types: Optional[Iterable[str]] = None) -> Iterator[InstrumentRow]:
+        self.ensure_loaded()
+        wanted = set(instrument_types) if instrument_types else None
+        for row in self.rows:
+            if wanted is None or row.instrument_type in wanted:
+                yield row
+
+    def get_status(self) -> Dict[str, object]:
+        return {
+            "loaded": self.loaded,
+            "records": len(self.rows),
+            "symbols": len(self.by_symbol),
+            "underlyings": len(self.by_underlying),
+            "source": self.source,
+            "generation": self.generation,
+        }
+
+
+INSTRUMENT_STORE = InstrumentStore()
@@ -1,6 +1,8 @@
 import threading
 import logging
 
+from app.market.shared_market_data import shared_market_data
+
 # Only track the four Tier-B dashboard instruments.
 _DASHBOARD_SYMBOLS = ("NIFTY", "BANKNIFTY", "SENSEX", "CRUDEOIL", "RELIANCE")
 logger = logging.getLogger("trading_nexus.market.live_prices")
@@ -31,17 +33,26 @@ def update_price(symbol: str, price: float):
             if len(parts) >= 2:
                 underlying = _normalize_symbol(parts[1])
                 prices[underlying] = price
+                shared_market_data.publish_price(underlying, price)
                 logger.debug("[PRICE] Updated %s from option %s: %s", underlying, symbol, price)
             return
 
         normalized = _normalize_symbol(symbol)
         prices[normalized] = price
+        shared_market_data.publish_price(normalized, price)
         logger.debug("[PRICE] Updated %s: %s", normalized, price)
 
 def get_prices():
     """Get all dashboard prices"""
     with _lock:
-        return prices.copy()
+        snapshot = prices.copy()
+    # Non-feed workers: the feed owner's prices live in shared memory.
+    if shared_market_data.is_reader():
+        for symbol in list(snapshot.keys()):
+            shared_price = shared_market_data.read_price(symbol)
+            if shared_price is not None:
+                snapshot[symbol] = shared_price
+    return snapshot
 
 
 def get_dashboard_symbols():
@@ -50,6 +61,10 @@ def get_dashboard_symbols():
 
 def get_price(symbol: str):
     """Get price for a specific symbol"""
+    normalized = _normalize_symbol(symbol)
+    if shared_market_data.is_reader():
+        shared_price = shared_market_data.read_price(normalized)
+        if shared_price is not None:
+            return shared_price
     with _lock:
-        normalized = _normalize_symbol(symbol)
         return prices.get(normalized)
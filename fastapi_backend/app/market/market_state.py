@@ -1,7 +1,46 @@
+from app.market.shared_market_data import shared_market_data
+
+
+class _DepthBook(dict):
+    """Depth map that mirrors writes to, and falls back reads on, shared memory.
+
+    In the feed-owning worker writes are published to the shared market data
+    segment; in every other worker lookups for symbols this process never saw
+    a tick for are answered from that segment.
+    """
+
+    def __setitem__(self, symbol, depth):
+        super().__setitem__(symbol, depth)
+        shared_market_data.publish_depth(symbol, depth)
+
+    def _shared(self, symbol):
+        if isinstance(symbol, str) and shared_market_data.is_reader():
+            return shared_market_data.read_depth(symbol)
+        return None
+
+    def get(self, symbol, default=None):
+        shared = self._shared(symbol)
+        if shared is not None:
+            return shared
+        return super().get(symbol, default)
+
+    def __getitem__(self, symbol):
+        shared = self._shared(symbol)
+        if shared is not None:
+            return shared
+        return super().__getitem__(symbol)
+
+    def __contains__(self, symbol):
+        return super().__contains__(symbol) or self._shared(symbol) is not None
+
+    def __bool__(self):
+        # A reader's local dict stays empty; ``state.get("depth") or {}`` must still reach the segment.
+        return super().__len__() > 0 or shared_market_data.is_reader()
+
 
 # Central in-memory market state
 state = {
     "ltp": {},
     "bid_ask": {},
-    "depth": {}
+    "depth": _DepthBook()
 }
@@ -0,0 +1,466 @@
+"""
+Shared-memory market data plane for multi-worker deployments.
+
+Only the worker holding the live feed lock (see ``live_feed._acquire_feed_lock``)
+receives Dhan ticks. That worker publishes LTP, bid/ask and top-of-book depth
+into a fixed-layout shared memory segment; every other uvicorn worker attaches
+to it and answers price/depth/option-tick reads from the segment instead of
+its own, never-updated globals.
+
+Each slot is guarded by a seqlock: the writer bumps the slot sequence to an odd
+value, writes the fields, then bumps it back to even. Readers unpack straight
+from the mapped buffer and retry if the sequence was odd or moved underneath
+them, so nothing is locked across processes and readers never stall the feed.
+
+Enable with ``SHARED_MARKET_DATA=1`` (implied when ``WEB_CONCURRENCY`` > 1).
+"""
+
+import atexit
+import logging
+import math
+import mmap
+import os
+import secrets
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("trading_nexus.market.shared_market_data")
+
+_ON_VALUES = {"1", "true", "yes", "on"}
+
+SEGMENT_NAME = os.getenv("SHARED_MARKET_DATA_NAME", "tn_market_data")
+SLOT_CAPACITY = int(os.getenv("SHARED_MARKET_DATA_SLOTS", "16384"))
+DEPTH_LEVELS = 5
+
+_MAGIC = b"TNMD"
+_LAYOUT_VERSION = 1
+_HEARTBEAT_SECONDS = 1.0
+_STALE_WRITER_SECONDS = 30.0
+_REATTACH_CHECK_SECONDS = 5.0
+_READ_RETRIES = 64
+
+# Header: magic, layout version, capacity, slot size, slot count, generation,
+# writer heartbeat (epoch seconds), closed flag.
+_HEADER = struct.Struct("<4sIIIQQdI")
+_HEADER_SIZE = 64
+_COUNT = struct.Struct("<Q")
+_COUNT_OFFSET = 16
+_HEARTBEAT = struct.Struct("<d")
+_HEARTBEAT_OFFSET = 32
+_CLOSED = struct.Struct("<I")
+_CLOSED_OFFSET = 40
+
+# Slot: seq, key, then the seqlock-protected body.
+_SEQ = struct.Struct("<Q")
+_KEY_BYTES = 48
+_KEY = struct.Struct(f"<{_KEY_BYTES}s")
+_KEY_OFFSET = _SEQ.size
+# ltp, bid, ask, updated_at, bid levels, ask levels, (price, qty) x levels x 2
+_BODY = struct.Struct(f"<ddddBB6x{DEPTH_LEVELS * 4}d")
+_BODY_OFFSET = _KEY_OFFSET + _KEY_BYTES
+_SLOT_SIZE = _BODY_OFFSET + _BODY.size
+
+_NAN = float("nan")
+
+_KIND_PRICE = "px"
+_KIND_DEPTH = "dp"
+_KIND_OPTION = "opt"
+
+
+def _enabled_from_env() -> bool:
+    flag = (os.getenv("SHARED_MARKET_DATA") or "").strip().lower()
+    if flag:
+        return flag in _ON_VALUES
+    try:
+        return int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+    except ValueError:
+        return False
+
+
+def _num(value: Optional[float]) -> float:
+    if value is None:
+        return _NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+def _opt(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def option_key(symbol: str, expiry: str, strike: float, option_type: str) -> str:
+    return f"{_KIND_OPTION}:{symbol}|{expiry}|{float(strike)}|{option_type.upper()}"
+
+
+def _pack_depth(depth: Optional[Dict[str, list]]) -> Tuple[int, int, List[float]]:
+    levels = [_NAN] * (DEPTH_LEVELS * 4)
+    counts = []
+    for side_index, side in enumerate(("bids", "asks")):
+        rows = list((depth or {}).get(side) or [])[:DEPTH_LEVELS]
+        written = 0
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            price = _num(row.get("price"))
+            if math.isnan(price):
+                continue
+            qty = _num(row.get("qty", row.get("quantity")))
+            base = (side_index * DEPTH_LEVELS + written) * 2
+            levels[base] = price
+            levels[base + 1] = 0.0 if math.isnan(qty) else qty
+            written += 1
+        counts.append(written)
+    return counts[0], counts[1], levels
+
+
+def _unpack_depth(n_bids: int, n_asks: int, levels: Tuple[float, ...]) -> Optional[Dict[str, list]]:
+    if not n_bids and not n_asks:
+        return None
+    out: Dict[str, list] = {}
+    for side_index, (side, count) in enumerate((("bids", n_bids), ("asks", n_asks))):
+        rows = []
+        for level in range(min(count, DEPTH_LEVELS)):
+            base = (side_index * DEPTH_LEVELS + level) * 2
+            rows.append({"price": levels[base], "qty": levels[base + 1]})
+        out[side] = rows
+    return out
+
+
+class _UntrackedSegment:
+    """Read/write mapping of an existing POSIX segment, invisible to the resource tracker.
+
+    Attaching through ``SharedMemory`` before Python 3.13 registers the name
+    with the (shared) resource tracker, which then unlinks the writer's
+    segment when any reader exits.
+    """
+
+    def __init__(self, name: str):
+        import _posixshmem
+
+        fd = _posixshmem.shm_open("/" + name, os.O_RDWR, mode=0o600)
+        try:
+            self._mmap = mmap.mmap(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+        self.buf = memoryview(self._mmap)
+
+    def close(self) -> None:
+        self.buf.release()
+        self._mmap.close()
+
+
+def _attach_untracked(name: str):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=False, track=False)
+    if os.name == "posix":
+        return _UntrackedSegment(name)
+    return shared_memory.SharedMemory(name=name, create=False)
+
+
+class SharedMarketData:
+    """Single-writer / multi-reader market data segment."""
+
+    def __init__(self, name: str = SEGMENT_NAME, capacity: int = SLOT_CAPACITY, enabled: Optional[bool] = None):
+        self.name = name
+        self.capacity = max(1, int(capacity))
+        self.enabled = _enabled_from_env() if enabled is None else bool(enabled)
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._buf: Optional[memoryview] = None
+        self._writer = False
+        self._generation = 0
+        self._index: Dict[str, int] = {}
+        self._known_count = 0
+        self._write_lock = threading.Lock()
+        self._attach_lock = threading.Lock()
+        self._next_attach_check = 0.0
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._dropped_keys = 0
+
+    # ------------------------------------------------------------------
+    # Roles
+    # ------------------------------------------------------------------
+
+    @property
+    def is_writer(self) -> bool:
+        return self._writer
+
+    def is_reader(self) -> bool:
+        """True when this process should serve market reads from the segment."""
+        if not self.enabled or self._writer:
+            return False
+        return self._ensure_attached()
+
+    def start_writer(self) -> bool:
+        """Create the segment; call from the process that owns the live feed."""
+        if not self.enabled:
+            return False
+        with self._attach_lock:
+            if self._writer:
+                return True
+            self._detach()
+            size = _HEADER_SIZE + self.capacity * _SLOT_SIZE
+            try:
+                shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+            except FileExistsError:
+                # Left behind by a writer that died; flag it so stale readers move on.
+                try:
+                    stale = shared_memory.SharedMemory(name=self.name, create=False)
+                    _CLOSED.pack_into(stale.buf, _CLOSED_OFFSET, 1)
+                    stale.close()
+                    stale.unlink()
+                except Exception as exc:
+                    logger.warning("Could not remove stale market data segment %s: %s", self.name, exc)
+                shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+            except Exception as exc:
+                logger.error("Shared market data segment unavailable: %s", exc)
+                return False
+
+            self._shm = shm
+            self._buf = shm.buf
+            self._generation = secrets.randbits(63)
+            self._buf[:size] = bytes(size)
+            _HEADER.pack_into(
+                self._buf, 0, _MAGIC, _LAYOUT_VERSION, self.capacity, _SLOT_SIZE, 0, self._generation, time.time(), 0
+            )
+            self._index = {}
+            self._known_count = 0
+            self._writer = True
+
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, name="shared-market-data-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+        atexit.register(self.close)
+        logger.info("Shared market data writer started (%s, %s slots)", self.name, self.capacity)
+        return True
+
+    def close(self) -> None:
+        with self._attach_lock:
+            was_writer = self._writer
+            self._writer = False
+            if was_writer and self._buf is not None:
+                try:
+                    _CLOSED.pack_into(self._buf, _CLOSED_OFFSET, 1)
+                except Exception:
+                    pass
+            shm = self._shm
+            self._detach()
+            if was_writer and shm is not None:
+                try:
+                    shm.unlink()
+                except Exception:
+                    pass
+
+    def _detach(self) -> None:
+        if self._buf is not None:
+            try:
+                self._buf.release()
+            except Exception:
+                pass
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except Exception:
+                pass
+        self._shm = None
+        self._buf = None
+        self._index = {}
+        self._known_count = 0
+
+    def _heartbeat_loop(self) -> None:
+        while self._writer:
+            buf = self._buf
+            if buf is not None:
+                try:
+                    _HEARTBEAT.pack_into(buf, _HEARTBEAT_OFFSET, time.time())
+                except Exception:
+                    return
+            time.sleep(_HEARTBEAT_SECONDS)
+
+    def _ensure_attached(self) -> bool:
+        now = time.monotonic()
+        if self._buf is not None and now < self._next_attach_check:
+            return True
+        if self._buf is None and now < self._next_attach_check:
+            return False
+
+        with self._attach_lock:
+            self._next_attach_check = now + _REATTACH_CHECK_SECONDS
+            if self._buf is not None and not self._writer_gone(self._buf):
+                return True
+            try:
+                shm = _attach_untracked(self.name)
+            except FileNotFoundError:
+                self._detach()
+                return False
+            except Exception as exc:
+                logger.debug("Shared market data attach failed: %s", exc)
+                self._detach()
+                return False
+
+            header = _HEADER.unpack_from(shm.buf, 0)
+            magic, version, capacity, slot_size, _count, generation = header[:6]
+            if magic != _MAGIC or version != _LAYOUT_VERSION or slot_size != _SLOT_SIZE:
+                shm.close()
+                self._detach()
+                return False
+            if self._buf is not None and generation == self._generation:
+                shm.close()
+                return True
+
+            self._detach()
+            self._shm = shm
+            self._buf = shm.buf
+            self._generation = generation
+            self.capacity = capacity
+            logger.info("Attached to shared market data segment %s", self.name)
+            return True
+
+    @staticmethod
+    def _writer_gone(buf: memoryview) -> bool:
+        if _CLOSED.unpack_from(buf, _CLOSED_OFFSET)[0]:
+            return True
+        heartbeat = _HEARTBEAT.unpack_from(buf, _HEARTBEAT_OFFSET)[0]
+        return (time.time() - heartbeat) > _STALE_WRITER_SECONDS
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+
+    def _slot_for_write(self, key: str) -> Optional[int]:
+        idx = self._index.get(key)
+        if idx is not None:
+            return idx
+        encoded = key.encode("utf-8")
+        if len(encoded) > _KEY_BYTES or self._known_count >= self.capacity:
+            self._dropped_keys += 1
+            return None
+        idx = self._known_count
+        _KEY.pack_into(self._buf, _HEADER_SIZE + idx * _SLOT_SIZE + _KEY_OFFSET, encoded)
+        # Publish the key before the count so readers never see a blank slot.
+        self._known_count = idx + 1
+        _COUNT.pack_into(self._buf, _COUNT_OFFSET, self._known_count)
+        self._index[key] = idx
+        return idx
+
+    def _publish(
+        self,
+        key: str,
+        ltp: Optional[float] = None,
+        bid: Optional[float] = None,
+        ask: Optional[float] = None,
+        depth: Optional[Dict[str, list]] = None,
+    ) -> None:
+        if not self._writer:
+            return
+        n_bids, n_asks, levels = _pack_depth(depth)
+        with self._write_lock:
+            buf = self._buf
+            if buf is None:
+                return
+            idx = self._slot_for_write(key)
+            if idx is None:
+                return
+            offset = _HEADER_SIZE + idx * _SLOT_SIZE
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            _SEQ.pack_into(buf, offset, seq + 1)
+            _BODY.pack_into(
+                buf, offset + _BODY_OFFSET, _num(ltp), _num(bid), _num(ask), time.time(), n_bids, n_asks, *levels
+            )
+            _SEQ.pack_into(buf, offset, seq + 2)
+
+    def publish_price(self, symbol: str, ltp: float) -> None:
+        self._publish(f"{_KIND_PRICE}:{symbol}", ltp=ltp)
+
+    def publish_depth(self, symbol: str, depth: Optional[Dict[str, list]]) -> None:
+        self._publish(f"{_KIND_DEPTH}:{symbol}", depth=depth)
+
+    def publish_option(
+        self,
+        symbol: str,
+        expiry: str,
+        strike: float,
+        option_type: str,
+        ltp: float,
+        bid: Optional[float] = None,
+        ask: Optional[float] = None,
+        depth: Optional[Dict[str, list]] = None,
+    ) -> None:
+        self._publish(option_key(symbol, expiry, strike, option_type), ltp=ltp, bid=bid, ask=ask, depth=depth)
+
+    # ------------------------------------------------------------------
+    # Reader side
+    # ------------------------------------------------------------------
+
+    def _refresh_index(self, buf: memoryview) -> None:
+        count = min(_COUNT.unpack_from(buf, _COUNT_OFFSET)[0], self.capacity)
+        for idx in range(self._known_count, count):
+            raw = _KEY.unpack_from(buf, _HEADER_SIZE + idx * _SLOT_SIZE + _KEY_OFFSET)[0]
+            self._index[raw.rstrip(b"\0").decode("utf-8", errors="replace")] = idx
+        self._known_count = max(self._known_count, count)
+
+    def _read(self, key: str) -> Optional[Tuple]:
+        if not self.is_reader():
+            return None
+        buf = self._buf
+        if buf is None:
+            return None
+        idx = self._index.get(key)
+        if idx is None:
+            self._refresh_index(buf)
+            idx = self._index.get(key)
+            if idx is None:
+                return None
+        offset = _HEADER_SIZE + idx * _SLOT_SIZE
+        for _ in range(_READ_RETRIES):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            body = _BODY.unpack_from(buf, offset + _BODY_OFFSET)
+            if _SEQ.unpack_from(buf, offset)[0] == seq:
+                return body if seq else None
+        return None
+
+    def read_price(self, symbol: str) -> Optional[float]:
+        body = self._read(f"{_KIND_PRICE}:{symbol}")
+        return _opt(body[0]) if body else None
+
+    def read_depth(self, symbol: str) -> Optional[Dict[str, list]]:
+        body = self._read(f"{_KIND_DEPTH}:{symbol}")
+        return _unpack_depth(body[4], body[5], body[6:]) if body else None
+
+    def read_option(self, symbol: str, expiry: str, strike: float, option_type: str) -> Optional[Dict[str, object]]:
+        body = self._read(option_key(symbol, expiry, strike, option_type))
+        if not body:
+            return None
+        return {
+            "ltp": _opt(body[0]),
+            "bid": _opt(body[1]),
+            "ask": _opt(body[2]),
+            "updated_at": body[3],
+            "depth": _unpack_depth(body[4], body[5], body[6:]),
+        }
+
+    def get_status(self) -> Dict[str, object]:
+        buf = self._buf
+        status: Dict[str, object] = {
+            "enabled": self.enabled,
+            "name": self.name,
+            "role": "writer" if self._writer else ("reader" if buf is not None else "detached"),
+            "capacity": self.capacity,
+            "slot_bytes": _SLOT_SIZE,
+            "dropped_keys": self._dropped_keys,
+        }
+        if buf is not None:
+            status["slots_used"] = _COUNT.unpack_from(buf, _COUNT_OFFSET)[0]
+            status["writer_heartbeat_age_s"] = round(time.time() - _HEARTBEAT.unpack_from(buf, _HEARTBEAT_OFFSET)[0], 3)
+        return status
+
+
+shared_market_data = SharedMarketData()
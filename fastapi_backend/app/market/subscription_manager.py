@@ -297,6 +297,7 @@ class SubscriptionManager:
         self.lock = threading.RLock()
         self.db = SessionLocal()
         self._db_loaded = False
+        self._warm_metadata = {}  # token -> ((symbol, expiry, strike, option_type), metadata) from the warm snapshot
         
         # ✨ Database loading deferred to first use (after startup hook completes)
         # Don't load at import time to avoid connection issues
@@ -325,156 +326,226 @@ class SubscriptionManager:
             (success: bool, message: str, ws_id: int)
         """
         with self.lock:
-            requested_token = str(token)
+            ok, message, ws_id, added = self._subscribe_locked(
+                token, symbol, expiry, strike, option_type, tier, self._allowed_symbols()
+            )
+            if added:
+                # Log to DB
+                self._log_subscription("SUBSCRIBE", added, f"Added to {tier}")
+                self._sync_live_feed()
+            return (ok, message, ws_id)
+
+    def subscribe_many(self, requests: List[Dict], tier: str = "TIER_A") -> List[Tuple[bool, str, Optional[int]]]:
+        """
+        Subscribe a batch of instruments (e.g. every CE/PE of a strike window).
+
+        Each request is a dict with the ``subscribe`` keyword arguments
+        (token, symbol, expiry, strike, option_type). The allow-list is built
+        once, new subscriptions are persisted in one DB transaction and the
+        live feed is synced once for the whole batch instead of per token.
+
+        Returns one (success, message, ws_id) per request, in order.
+        """
+        results: List[Tuple[bool, str, Optional[int]]] = []
+        added: List[str] = []
+        with self.lock:
+            allowed_symbols = self._allowed_symbols()
+            for req in requests:
+                ok, message, ws_id, new_token = self._subscribe_locked(
+                    req["token"],
+                    req["symbol"],
+                    req.get("expiry"),
+                    req.get("strike"),
+                    req.get("option_type"),
+                    tier,
+                    allowed_symbols,
+                )
+                results.append((ok, message, ws_id))
+                if new_token:
+                    added.append(new_token)
+            if added:
+                self._log_subscriptions([("SUBSCRIBE", token, f"Added to {tier}") for token in added])
+                self._sync_live_feed()
+        return results
+
+    def _allowed_symbols(self) -> Optional[Set[str]]:
+        """Symbols allowed to subscribe; None when the allow-list could not be built (allow all)."""
+        try:
+            from app.market.security_ids import mcx_watch_symbols
+            if not REGISTRY.loaded:
+                REGISTRY.load()
+            allowed_indices = {"NIFTY", "BANKNIFTY", "SENSEX", "FINNIFTY", "MIDCPNIFTY", "BANKEX"}
+            allowed_equities = set()
             try:
-                from app.market.security_ids import mcx_watch_symbols
-                if not REGISTRY.loaded:
-                    REGISTRY.load()
-                allowed_indices = {"NIFTY", "BANKNIFTY", "SENSEX", "FINNIFTY", "MIDCPNIFTY", "BANKEX"}
+                allowed_equities = get_tier_a_equity_symbols()
+            except Exception:
                 allowed_equities = set()
-                try:
-                    allowed_equities = get_tier_a_equity_symbols()
-                except Exception:
-                    allowed_equities = set()
 
-                # Tier-B equities are controlled via a small allowlist (env), not the ETF list.
-                try:
-                    raw_tb = (os.getenv("TIER_B_EQUITY_SYMBOLS") or "").strip()
-                    tb_equities = {s.strip().upper() for s in raw_tb.split(",") if s.strip()}
-                    allowed_equities |= tb_equities
-                except Exception:
-                    pass
-                allowed_symbols = set(REGISTRY.f_o_stocks) | allowed_indices | set(mcx_watch_symbols().keys()) | allowed_equities
-                if canonical_symbol(symbol) not in allowed_symbols:
-                    return (False, "NOT_ALLOWED", None)
+            # Tier-B equities are controlled via a small allowlist (env), not the ETF list.
+            try:
+                raw_tb = (os.getenv("TIER_B_EQUITY_SYMBOLS") or "").strip()
+                tb_equities = {s.strip().upper() for s in raw_tb.split(",") if s.strip()}
+                allowed_equities |= tb_equities
             except Exception:
                 pass
+            return set(REGISTRY.f_o_stocks) | allowed_indices | set(mcx_watch_symbols().keys()) | allowed_equities
+        except Exception:
+            return None
 
-            # Resolve metadata first; for non-option instruments, Dhan websocket expects numeric security_id as token.
-            metadata = _resolve_security_metadata(symbol, expiry, strike, option_type)
+    def _subscribe_locked(
+        self,
+        token: str,
+        symbol: str,
+        expiry: Optional[str],
+        strike: Optional[float],
+        option_type: Optional[str],
+        tier: str,
+        allowed_symbols: Optional[Set[str]],
+    ) -> Tuple[bool, str, Optional[int], Optional[str]]:
+        """Subscribe one instrument (caller holds ``self.lock``); the last item is the token newly added, if any."""
+        requested_token = str(token)
+        if allowed_symbols is not None and canonical_symbol(symbol) not in allowed_symbols:
+            return (False, "NOT_ALLOWED", None, None)
+
+        # Resolve metadata first; for non-option instruments, Dhan websocket expects numeric security_id as token.
+        metadata = _resolve_security_metadata(symbol, expiry, strike, option_type)
+        actual_token = requested_token
+        try:
+            security_id = metadata.get("security_id")
+            if security_id is not None and str(security_id).strip() != "" and not option_type:
+                actual_token = str(security_id).strip()
+        except Exception:
             actual_token = requested_token
-            try:
-                security_id = metadata.get("security_id")
-                if security_id is not None and str(security_id).strip() != "" and not option_type:
-                    actual_token = str(security_id).strip()
-            except Exception:
-                actual_token = requested_token
 
-            if actual_token != requested_token:
-                self.token_alias[requested_token] = actual_token
+        if actual_token != requested_token:
+            self.token_alias[requested_token] = actual_token
 
-            if actual_token in self.subscriptions:
-                return (True, f"Already subscribed: {actual_token}", self.subscriptions[actual_token]["ws_id"])
-            canonical = canonical_symbol(symbol)
-            exchange_name = _exchange_name_from_meta(metadata.get("exchange"), metadata.get("segment"))
-            segment_name = (metadata.get("segment") or exchange_name).upper()
+        if actual_token in self.subscriptions:
+            return (True, f"Already subscribed: {actual_token}", self.subscriptions[actual_token]["ws_id"], None)
+        canonical = canonical_symbol(symbol)
+        exchange_name = _exchange_name_from_meta(metadata.get("exchange"), metadata.get("segment"))
+        segment_name = (metadata.get("segment") or exchange_name).upper()
 
-            orchestrator = get_orchestrator()
-            ok, reason, ws_id = orchestrator.subscribe(
-                token=str(actual_token),
-                exchange=exchange_name,
-                segment=segment_name,
-                symbol=canonical or symbol,
-                expiry=expiry,
-                meta=metadata,
-            )
+        orchestrator = get_orchestrator()
+        ok, reason, ws_id = orchestrator.subscribe(
+            token=str(actual_token),
+            exchange=exchange_name,
+            segment=segment_name,
+            symbol=canonical or symbol,
+            expiry=expiry,
+            meta=metadata,
+        )
+
+        if not ok and tier == "TIER_A":
+            evicted = self._evict_lru_tier_a()
+            if evicted:
+                ok, reason, ws_id = orchestrator.subscribe(
+                    token=str(actual_token),
+                    exchange=exchange_name,
+                    segment=segment_name,
+                    symbol=canonical or symbol,
+                    expiry=expiry,
+                    meta=metadata,
+                )
 
-            if not ok and tier == "TIER_A":
-                evicted = self._evict_lru_tier_a()
-                if evicted:
-                    ok, reason, ws_id = orchestrator.subscribe(
-                        token=str(actual_token),
-                        exchange=exchange_name,
-                        segment=segment_name,
-                        symbol=canonical or symbol,
-                        expiry=expiry,
-                        meta=metadata,
-                    )
+        if not ok or ws_id is None:
+            return (False, f"Rate limit: {reason}", None, None)
 
-            if not ok or ws_id is None:
-                return (False, f"Rate limit: {reason}", None)
+        # Reflect subscription in WS manager for admin visibility
+        try:
+            from app.market.ws_manager import get_ws_manager
+            ws_mgr = get_ws_manager()
+            ws_mgr.add_instrument(str(actual_token), ws_id)
+        except Exception:
+            pass
 
-            # Reflect subscription in WS manager for admin visibility
-            try:
-                from app.market.ws_manager import get_ws_manager
-                ws_mgr = get_ws_manager()
-                ws_mgr.add_instrument(str(actual_token), ws_id)
-            except Exception:
-                pass
+        self.ws_usage[ws_id] = self.ws_usage.get(ws_id, 0) + 1
+
+        # Store subscription
+        self.subscriptions[actual_token] = {
+            "symbol": symbol,
+            "symbol_canonical": canonical or symbol,
+            "expiry": expiry,
+            "strike": strike,
+            "option_type": option_type,
+            "tier": tier,
+            "subscribed_at": datetime.utcnow(),
+            "ws_id": ws_id,
+            "active": True,
+            "exchange": metadata.get("exchange"),
+            "security_id": metadata.get("security_id"),
+            "segment": metadata.get("segment"),
+        }
+        
+        # Track LRU for Tier A
+        if tier == "TIER_A":
+            self.tier_a_lru.append((actual_token, datetime.utcnow()))
 
-            self.ws_usage[ws_id] = self.ws_usage.get(ws_id, 0) + 1
-
-            # Store subscription
-            self.subscriptions[actual_token] = {
-                "symbol": symbol,
-                "symbol_canonical": canonical or symbol,
-                "expiry": expiry,
-                "strike": strike,
-                "option_type": option_type,
-                "tier": tier,
-                "subscribed_at": datetime.utcnow(),
-                "ws_id": ws_id,
-                "active": True,
-                "exchange": metadata.get("exchange"),
-                "security_id": metadata.get("security_id"),
-                "segment": metadata.get("segment"),
-            }
-            
-            # Track LRU for Tier A
-            if tier == "TIER_A":
-                self.tier_a_lru.append((actual_token, datetime.utcnow()))
-            
-            # Log to DB
-            self._log_subscription("SUBSCRIBE", actual_token, f"Added to {tier}")
+        return (True, f"Subscribed to {tier} on WS-{ws_id}", ws_id, actual_token)
 
-            # Push dynamic watchlist changes to live feed immediately (don't wait periodic sync).
-            try:
-                from app.dhan.live_feed import sync_subscriptions_with_watchlist
-                sync_subscriptions_with_watchlist()
-            except Exception:
-                pass
-            
-            return (True, f"Subscribed to {tier} on WS-{ws_id}", ws_id)
+    @staticmethod
+    def _sync_live_feed() -> None:
+        # Push dynamic watchlist changes to live feed immediately (don't wait periodic sync).
+        try:
+            from app.dhan.live_feed import sync_subscriptions_with_watchlist
+            sync_subscriptions_with_watchlist()
+        except Exception:
+            pass
     
     def unsubscribe(self, token: str, reason: str = "User") -> Tuple[bool, str]:
         """Unsubscribe an instrument"""
         with self.lock:
-            requested_token = str(token)
-            actual_token = self.token_alias.get(requested_token, requested_token)
-            if actual_token not in self.subscriptions:
-                return (False, f"Not subscribed: {actual_token}")
-
-            sub = self.subscriptions[actual_token]
-            ws_id = sub["ws_id"]
-            orchestrator = get_orchestrator()
-            orchestrator.unsubscribe(str(actual_token))
-            if ws_id in self.ws_usage:
-                self.ws_usage[ws_id] = max(self.ws_usage[ws_id] - 1, 0)
-            
-            # Reflect removal in WS manager
-            try:
-                from app.market.ws_manager import get_ws_manager
-                ws_mgr = get_ws_manager()
-                ws_mgr.remove_instrument(str(actual_token))
-            except Exception:
-                pass
-
-            del self.subscriptions[actual_token]
-            
-            # Remove from LRU if present
-            self.tier_a_lru = [(t, ts) for t, ts in self.tier_a_lru if t != actual_token]
-            
-            # Log to DB
-            self._log_subscription("UNSUBSCRIBE", actual_token, reason)
+            ok, message, removed = self._unsubscribe_locked(token)
+            if ok:
+                # Log to DB
+                self._log_subscription("UNSUBSCRIBE", removed, reason)
+                # Push dynamic watchlist changes to live feed immediately.
+                self._sync_live_feed()
+            return (ok, message)
+
+    def unsubscribe_many(self, tokens: List[str], reason: str = "User") -> List[Tuple[bool, str]]:
+        """Unsubscribe a batch of instruments with one DB transaction and one live-feed sync."""
+        results: List[Tuple[bool, str]] = []
+        removed: List[str] = []
+        with self.lock:
+            for token in tokens:
+                ok, message, actual_token = self._unsubscribe_locked(token)
+                results.append((ok, message))
+                if ok:
+                    removed.append(actual_token)
+            if removed:
+                self._log_subscriptions([("UNSUBSCRIBE", token, reason) for token in removed])
+                self._sync_live_feed()
+        return results
+
+    def _unsubscribe_locked(self, token: str) -> Tuple[bool, str, str]:
+        """Unsubscribe one instrument (caller holds ``self.lock``); also returns the resolved token."""
+        requested_token = str(token)
+        actual_token = self.token_alias.get(requested_token, requested_token)
+        if actual_token not in self.subscriptions:
+            return (False, f"Not subscribed: {actual_token}", actual_token)
+
+        sub = self.subscriptions[actual_token]
+        ws_id = sub["ws_id"]
+        orchestrator = get_orchestrator()
+        orchestrator.unsubscribe(str(actual_token))
+        if ws_id in self.ws_usage:
+            self.ws_usage[ws_id] = max(self.ws_usage[ws_id] - 1, 0)
+        
+        # Reflect removal in WS manager
+        try:
+            from app.market.ws_manager import get_ws_manager
+            ws_mgr = get_ws_manager()
+            ws_mgr.remove_instrument(str(actual_token))
+        except Exception:
+            pass
 
-            # Push dynamic watchlist changes to live feed immediately.
-            try:
-                from app.dhan.live_feed import sync_subscriptions_with_watchlist
-                sync_subscriptions_with_watchlist()
-            except Exception:
-                pass
-            
-            return (True, f"Unsubscribed: {actual_token}")
+        del self.subscriptions[actual_token]
+        
+        # Remove from LRU if present
+        self.tier_a_lru = [(t, ts) for t, ts in self.tier_a_lru if t != actual_token]
+        
+        return (True, f"Unsubscribed: {actual_token}", actual_token)
     
     def get_subscription(self, token: str) -> Optional[Dict]:
         """Get subscription details"""
@@ -601,34 +672,42 @@ class SubscriptionManager:
     
     def _log_subscription(self, action: str, token: str, reason: str):
         """Log subscription event to database"""
+        self._log_subscriptions([(action, token, reason)])
+
+    def _log_subscriptions(self, events: List[Tuple[str, str, str]]):
+        """Log (action, token, reason) events and update subscription rows in one transaction"""
         session = None
         try:
             from app.storage.db import SessionLocal
             from app.storage.models import Subscription, SubscriptionLog
 
             session = SessionLocal()
-            log = SubscriptionLog(action=action, instrument_token=token, reason=reason)
-            session.add(log)
-
-            if action == "SUBSCRIBE":
-                sub_state = self.subscriptions.get(token)
-                if sub_state:
-                    row = session.query(Subscription).filter(Subscription.instrument_token == token).first()
-                    if not row:
-                        row = Subscription(instrument_token=token)
-                        session.add(row)
-
-                    row.symbol = sub_state.get("symbol")
-                    row.expiry_date = sub_state.get("expiry")
-                    row.strike_price = sub_state.get("strike")
-                    row.option_type = sub_state.get("option_type")
-                    row.tier = sub_state.get("tier") or "TIER_A"
-                    row.subscribed_at = sub_state.get("subscribed_at") or datetime.utcnow()
-                    row.ws_connection_id = sub_state.get("ws_id")
-                    row.active = True
-            else:
-                row = session.query(Subscription).filter(Subscription.instrument_token == token).first()
-                if row:
+            tokens = [token for _action, token, _reason in events]
+            rows = {
+                row.instrument_token: row
+                for row in session.query(Subscription).filter(Subscription.instrument_token.in_(tokens)).all()
+            }
+            for action, token, reason in events:
+                session.add(SubscriptionLog(action=action, instrument_token=token, reason=reason))
+
+                row = rows.get(token)
+                if action == "SUBSCRIBE":
+                    sub_state = self.subscriptions.get(token)
+                    if sub_state:
+                        if not row:
+                            row = Subscription(instrument_token=token)
+                            session.add(row)
+                            rows[token] = row
+
+                        row.symbol = sub_state.get("symbol")
+                        row.expiry_date = sub_state.get("expiry")
+                        row.strike_price = sub_state.get("strike")
+                        row.option_type = sub_state.get("option_type")
+                        row.tier = sub_state.get("tier") or "TIER_A"
+                        row.subscribed_at = sub_state.get("subscribed_at") or datetime.utcnow()
+                        row.ws_connection_id = sub_state.get("ws_id")
+                        row.active = True
+                elif row:
                     row.active = False
 
             session.commit()
@@ -638,7 +717,8 @@ class SubscriptionManager:
                     session.rollback()
             except Exception:
                 pass
-            print(f"[WARN] Failed to persist subscription log/state for {token}: {e}")
+            label = events[0][1] if len(events) == 1 else f"{len(events)} instruments"
+            print(f"[WARN] Failed to persist subscription log/state for {label}: {e}")
         finally:
             try:
                 if session:
@@ -665,31 +745,38 @@ class SubscriptionManager:
             orchestrator = get_orchestrator()
             active_subs = self.db.query(Subscription).filter(Subscription.active == True).all()
             
-            loaded_count = 0
-            for sub in active_subs:
-                token = sub.instrument_token
+            allowed_symbols = None
+            try:
+                from app.market.security_ids import mcx_watch_symbols
+                allowed_indices = {"NIFTY", "BANKNIFTY", "SENSEX", "FINNIFTY", "MIDCPNIFTY", "BANKEX"}
+                equities = set()
                 try:
-                    from app.market.security_ids import mcx_watch_symbols
-                    allowed_indices = {"NIFTY", "BANKNIFTY", "SENSEX", "FINNIFTY", "MIDCPNIFTY", "BANKEX"}
-                    equities = set()
-                    try:
-                        for r in REGISTRY.get_equity_stocks_nse(limit=2000):
-                            sym = (r.get("UNDERLYING_SYMBOL") or r.get("SYMBOL") or "").strip().upper()
-                            if sym:
-                                equities.add(sym)
-                    except Exception:
-                        pass
-                    allowed_symbols = set(REGISTRY.f_o_stocks) | allowed_indices | set(mcx_watch_symbols().keys()) | equities
-                    if canonical_symbol(sub.symbol) not in allowed_symbols:
-                        continue
+                    for r in REGISTRY.get_equity_stocks_nse(limit=2000):
+                        sym = (r.get("UNDERLYING_SYMBOL") or r.get("SYMBOL") or "").strip().upper()
+                        if sym:
+                            equities.add(sym)
                 except Exception:
                     pass
-                metadata = _resolve_security_metadata(
-                    symbol=sub.symbol,
-                    expiry=sub.expiry_date,
-                    strike=sub.strike_price,
-                    option_type=sub.option_type,
-                )
+                allowed_symbols = set(REGISTRY.f_o_stocks) | allowed_indices | set(mcx_watch_symbols().keys()) | equities
+            except Exception:
+                pass
+
+            warm_metadata, self._warm_metadata = self._warm_metadata, {}
+            loaded_count = 0
+            for sub in active_subs:
+                token = sub.instrument_token
+                if allowed_symbols is not None and canonical_symbol(sub.symbol) not in allowed_symbols:
+                    continue
+                warm = warm_metadata.get(token)
+                if warm and warm[0] == (sub.symbol, sub.expiry_date, sub.strike_price, sub.option_type):
+                    metadata = dict(warm[1])
+                else:
+                    metadata = _resolve_security_metadata(
+                        symbol=sub.symbol,
+                        expiry=sub.expiry_date,
+                        strike=sub.strike_price,
+                        option_type=sub.option_type,
+                    )
                 exchange_name = _exchange_name_from_meta(metadata.get("exchange"), metadata.get("segment"))
                 segment_name = (metadata.get("segment") or exchange_name).upper()
                 ok, _reason, ws_id = orchestrator.subscribe(
@@ -734,6 +821,34 @@ class SubscriptionManager:
             print(f"[ERROR] Failed to load subscriptions from database: {e}")
             self._db_loaded = True  # Mark as attempted even if failed
     
+    def export_snapshot(self) -> Dict[str, Dict]:
+        """Resolved metadata per active subscription, for the warm-start snapshot."""
+        with self.lock:
+            return {
+                token: (
+                    (data.get("symbol"), data.get("expiry"), data.get("strike"), data.get("option_type")),
+                    {
+                        "security_id": data.get("security_id"),
+                        "exchange": data.get("exchange"),
+                        "segment": data.get("segment"),
+                        "symbol": canonical_symbol(data.get("symbol") or "") or data.get("symbol"),
+                    },
+                )
+                for token, data in self.subscriptions.items()
+                if data.get("active") and data.get("security_id")
+            }
+
+    def seed_metadata(self, entries: Dict[str, Dict]) -> None:
+        """
+        Reuse security metadata from a warm-start snapshot in ``_load_from_database``.
+
+        The database stays the source of truth for which tokens are subscribed;
+        a seeded entry is only used when its symbol/expiry/strike/option type
+        still match the stored row, otherwise the registry lookup runs as usual.
+        """
+        if not self._db_loaded:
+            self._warm_metadata = dict(entries or {})
+
     def sync_to_db(self):
         """Sync all current subscriptions to database"""
         try:
@@ -0,0 +1,490 @@
+"""
+Append-only binary journal of decoded Dhan feed packets, with replay.
+
+Every packet that reaches ``live_feed.on_message_callback`` is packed into a
+fixed-size little-endian record (receive time, exchange timestamp, security
+id, segment, packet type, LTP, bid/ask, volume and five depth levels) and
+appended to the current segment file. Segments rotate by size and by IST
+trading day. Fixed-size records keep a segment seekable and memory-mappable:
+readers ``mmap`` it and ``iter_unpack`` the body, and a torn tail record from
+a crash is simply ignored.
+
+A ``<segment>.instruments.json`` sidecar holds the feed's security-id ->
+symbol and option subscription maps. Replay installs them, so a recorded
+session can be pushed back through ``on_message_callback`` (and from there
+the option chain cache, market state and orchestrator) without a Dhan
+connection, at 1x, Nx or maximum speed.
+
+Enable recording with ``TICK_JOURNAL_ENABLED=1``; segments go to
+``TICK_JOURNAL_DIR`` (default ``database/tick_journal``).
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from app.storage.db import DB_DIR
+
+logger = logging.getLogger("trading_nexus.market.tick_journal")
+
+_ON_VALUES = {"1", "true", "yes", "on"}
+
+JOURNAL_DIR = Path(os.getenv("TICK_JOURNAL_DIR") or (DB_DIR / "tick_journal"))
+SEGMENT_BYTES = int(float(os.getenv("TICK_JOURNAL_SEGMENT_MB", "64")) * 1024 * 1024)
+FLUSH_SECONDS = float(os.getenv("TICK_JOURNAL_FLUSH_SECONDS", "1.0"))
+DEPTH_LEVELS = 5
+
+SEGMENT_SUFFIX = ".tnj"
+INSTRUMENTS_SUFFIX = ".instruments.json"
+
+_MAGIC = b"TNXJ"
+_FORMAT_VERSION = 1
+
+# Record: recv_ns, exchange_ts, security_id, segment code, packet type,
+# bid levels, ask levels, ltp, bid, ask, volume, then per level
+# (bid price, bid qty, ask price, ask qty).
+_RECORD = struct.Struct(f"<qqIBBBBdddq{DEPTH_LEVELS}d{DEPTH_LEVELS}I{DEPTH_LEVELS}d{DEPTH_LEVELS}I")
+RECORD_SIZE = _RECORD.size
+# Header: magic, format version, record size, segment created (epoch ns).
+_HEADER = struct.Struct("<4sHHq")
+_HEADER_SIZE = 32
+
+_NAN = float("nan")
+_IST_OFFSET = timedelta(hours=5, minutes=30)
+
+PACKET_TYPES = {
+    "Ticker Data": 1,
+    "Quote Data": 2,
+    "Full Data": 3,
+    "OI Data": 4,
+    "Previous Close": 5,
+    "Market Status": 6,
+}
+_PACKET_TYPE_NAMES = {code: name for name, code in PACKET_TYPES.items()}
+
+SEGMENT_CODES = {
+    "IDX_I": 0,
+    "NSE_EQ": 1,
+    "NSE_FNO": 2,
+    "NSE_CURRENCY": 3,
+    "BSE_EQ": 4,
+    "MCX_COMM": 5,
+    "BSE_CURRENCY": 7,
+    "BSE_FNO": 8,
+}
+_SEGMENT_NAMES = {code: name for name, code in SEGMENT_CODES.items()}
+_UNKNOWN_CODE = 255
+
+
+def _enabled_from_env() -> bool:
+    return (os.getenv("TICK_JOURNAL_ENABLED") or "").strip().lower() in _ON_VALUES
+
+
+def _to_float(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(result) else result
+
+
+def _first_float(payload: dict, keys: Tuple[str, ...]) -> Optional[float]:
+    for key in keys:
+        value = _to_float(payload.get(key))
+        if value is not None:
+            return value
+    return None
+
+
+def _exchange_timestamp(payload: dict) -> int:
+    """Epoch seconds, or seconds since midnight for ``HH:MM:SS`` LTT strings."""
+    for key in ("exchange_timestamp", "exchangeTimestamp", "LTT", "ltt", "last_trade_time"):
+        value = payload.get(key)
+        if value is None or value == "":
+            continue
+        if isinstance(value, (int, float)):
+            return int(value)
+        text = str(value).strip()
+        if text.isdigit():
+            return int(text)
+        parts = text.split(":")
+        if len(parts) == 3 and all(p.isdigit() for p in parts):
+            return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    return 0
+
+
+def _depth_levels(payload: dict) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+    depth = payload.get("depth") or payload.get("market_depth")
+    bids: List[Tuple[float, float]] = []
+    asks: List[Tuple[float, float]] = []
+    if isinstance(depth, list):
+        # dhanhq "Full Data": one dict per level with bid_/ask_ price and quantity.
+        for level in depth[:DEPTH_LEVELS]:
+            if not isinstance(level, dict):
+                continue
+            bid_price = _to_float(level.get("bid_price"))
+            ask_price = _to_float(level.get("ask_price"))
+            if bid_price:
+                bids.append((bid_price, _to_float(level.get("bid_quantity")) or 0.0))
+            if ask_price:
+                asks.append((ask_price, _to_float(level.get("ask_quantity")) or 0.0))
+        return bids, asks
+
+    if not isinstance(depth, dict):
+        depth = payload
+    for side, out in (("bids", bids), ("asks", asks)):
+        levels = depth.get(side) or []
+        if not isinstance(levels, list):
+            continue
+        for level in levels[:DEPTH_LEVELS]:
+            if isinstance(level, dict):
+                price = _to_float(level.get("price"))
+                qty = _to_float(level.get("qty", level.get("quantity")))
+            elif isinstance(level, (list, tuple)) and len(level) >= 2:
+                price, qty = _to_float(level[0]), _to_float(level[1])
+            else:
+                continue
+            if price:
+                out.append((price, qty or 0.0))
+    return bids, asks
+
+
+def _segment_code(value) -> int:
+    if isinstance(value, int):
+        return value if 0 <= value < _UNKNOWN_CODE else _UNKNOWN_CODE
+    return SEGMENT_CODES.get(str(value or "").strip().upper(), _UNKNOWN_CODE)
+
+
+def pack_message(message: dict, recv_ns: Optional[int] = None) -> Optional[bytes]:
+    """Pack one decoded feed packet; ``None`` when it carries no security id."""
+    security_id = message.get("security_id") or message.get("securityId")
+    try:
+        security_id = int(security_id)
+    except (TypeError, ValueError):
+        return None
+
+    bids, asks = _depth_levels(message)
+    bid = _first_float(message, ("bid", "best_bid", "BID", "bid_price"))
+    ask = _first_float(message, ("ask", "best_ask", "ASK", "ask_price"))
+    if bid is None and bids:
+        bid = bids[0][0]
+    if ask is None and asks:
+        ask = asks[0][0]
+    ltp = _first_float(message, ("LTP", "ltp", "last_price", "lastPrice"))
+    volume = _first_float(message, ("volume", "Volume"))
+
+    bid_prices = [price for price, _ in bids] + [0.0] * (DEPTH_LEVELS - len(bids))
+    bid_qtys = [int(qty) for _, qty in bids] + [0] * (DEPTH_LEVELS - len(bids))
+    ask_prices = [price for price, _ in asks] + [0.0] * (DEPTH_LEVELS - len(asks))
+    ask_qtys = [int(qty) for _, qty in asks] + [0] * (DEPTH_LEVELS - len(asks))
+    return _RECORD.pack(
+        recv_ns if recv_ns is not None else time.time_ns(),
+        _exchange_timestamp(message),
+        security_id & 0xFFFFFFFF,
+        _segment_code(message.get("exchange_segment")),
+        PACKET_TYPES.get(str(message.get("type") or ""), 0),
+        len(bids),
+        len(asks),
+        _NAN if ltp is None else ltp,
+        _NAN if bid is None else bid,
+        _NAN if ask is None else ask,
+        -1 if volume is None else int(volume),
+        *bid_prices,
+        *[min(q, 0xFFFFFFFF) for q in bid_qtys],
+        *ask_prices,
+        *[min(q, 0xFFFFFFFF) for q in ask_qtys],
+    )
+
+
+@dataclass(frozen=True)
+class TickRecord:
+    recv_ns: int
+    exchange_ts: int
+    security_id: int
+    segment: int
+    packet_type: int
+    ltp: Optional[float]
+    bid: Optional[float]
+    ask: Optional[float]
+    volume: Optional[int]
+    bids: Tuple[Tuple[float, int], ...]
+    asks: Tuple[Tuple[float, int], ...]
+
+    @classmethod
+    def from_fields(cls, fields: tuple) -> "TickRecord":
+        recv_ns, exchange_ts, security_id, segment, packet_type, n_bids, n_asks, ltp, bid, ask, volume = fields[:11]
+        base = 11
+        bid_prices = fields[base:base + DEPTH_LEVELS]
+        bid_qtys = fields[base + DEPTH_LEVELS:base + 2 * DEPTH_LEVELS]
+        ask_prices = fields[base + 2 * DEPTH_LEVELS:base + 3 * DEPTH_LEVELS]
+        ask_qtys = fields[base + 3 * DEPTH_LEVELS:base + 4 * DEPTH_LEVELS]
+        return cls(
+            recv_ns=recv_ns,
+            exchange_ts=exchange_ts,
+            security_id=security_id,
+            segment=segment,
+            packet_type=packet_type,
+            ltp=None if math.isnan(ltp) else ltp,
+            bid=None if math.isnan(bid) else bid,
+            ask=None if math.isnan(ask) else ask,
+            volume=None if volume < 0 else volume,
+            bids=tuple(zip(bid_prices[:n_bids], bid_qtys[:n_bids])),
+            asks=tuple(zip(ask_prices[:n_asks], ask_qtys[:n_asks])),
+        )
+
+    def to_message(self) -> Dict[str, object]:
+        """Rebuild a packet in the shape ``on_message_callback`` extracts from."""
+        message: Dict[str, object] = {
+            "type": _PACKET_TYPE_NAMES.get(self.packet_type, ""),
+            "exchange_segment": _SEGMENT_NAMES.get(self.segment, self.segment),
+            "security_id": self.security_id,
+        }
+        if self.ltp is not None:
+            message["LTP"] = self.ltp
+        if self.bid is not None:
+            message["bid"] = self.bid
+        if self.ask is not None:
+            message["ask"] = self.ask
+        if self.volume is not None:
+            message["volume"] = self.volume
+        if self.exchange_ts:
+            message["exchange_timestamp"] = self.exchange_ts
+        if self.bids or self.asks:
+            message["depth"] = {
+                "bids": [{"price": price, "qty": qty} for price, qty in self.bids],
+                "asks": [{"price": price, "qty": qty} for price, qty in self.asks],
+            }
+        return message
+
+
+def _ist_day() -> str:
+    return (datetime.utcnow() + _IST_OFFSET).strftime("%Y%m%d")
+
+
+class TickJournal:
+    def __init__(self, directory: Path = JOURNAL_DIR, segment_bytes: int = SEGMENT_BYTES, enabled: Optional[bool] = None):
+        self.directory = Path(directory)
+        self.segment_bytes = max(_HEADER_SIZE + RECORD_SIZE, int(segment_bytes))
+        self.enabled = _enabled_from_env() if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._file = None
+        self._path: Optional[Path] = None
+        self._day: Optional[str] = None
+        self._written = 0
+        self._last_flush = 0.0
+        self._records = 0
+        self._dropped = 0
+        self._suspended = 0
+        self._instruments: Tuple[Dict[str, str], Dict[str, Dict[str, object]]] = ({}, {})
+
+    # ---- recording --------------------------------------------------------
+
+    def _open_segment(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        day = _ist_day()
+        stamp = (datetime.utcnow() + _IST_OFFSET).strftime("%H%M%S")
+        seq = len(list(self.directory.glob(f"ticks-{day}-*{SEGMENT_SUFFIX}"))) + 1
+        path = self.directory / f"ticks-{day}-{stamp}-{seq:04d}{SEGMENT_SUFFIX}"
+        handle = open(path, "ab", buffering=1024 * 1024)
+        header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, RECORD_SIZE, time.time_ns())
+        handle.write(header.ljust(_HEADER_SIZE, b"\0"))
+        self._file = handle
+        self._path = path
+        self._day = day
+        self._written = _HEADER_SIZE
+        self._write_instruments()
+        logger.info("Tick journal segment opened: %s", path)
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
+
+    def _write_instruments(self) -> None:
+        if self._path is None:
+            return
+        symbol_map, subscription_map = self._instruments
+        target = self._path.with_name(self._path.stem + INSTRUMENTS_SUFFIX)
+        tmp = target.with_suffix(".tmp")
+        try:
+            tmp.write_text(
+                json.dumps({"symbols": symbol_map, "subscriptions": subscription_map}, default=str),
+                encoding="utf-8",
+            )
+            os.replace(tmp, target)
+        except Exception as exc:
+            logger.warning("Failed to write tick journal instruments %s: %s", target, exc)
+
+    def note_instruments(self, symbol_map: Dict[str, str], subscription_map: Dict[str, Dict[str, object]]) -> None:
+        """Record the feed's id -> symbol/option maps alongside the current segment."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._instruments = (dict(symbol_map), dict(subscription_map))
+            if self._file is not None:
+                self._write_instruments()
+
+    def record(self, message) -> None:
+        if not self.enabled or self._suspended:
+            return
+        if isinstance(message, list):
+            for item in message:
+                self.record(item)
+            return
+        if not isinstance(message, dict):
+            return
+        try:
+            packed = pack_message(message)
+        except Exception:
+            packed = None
+        if packed is None:
+            self._dropped += 1
+            return
+        with self._lock:
+            try:
+                if self._file is None or self._day != _ist_day() or self._written + RECORD_SIZE > self.segment_bytes:
+                    self._close_segment()
+                    self._open_segment()
+                self._file.write(packed)
+                self._written += RECORD_SIZE
+                self._records += 1
+                now = time.monotonic()
+                if now - self._last_flush >= FLUSH_SECONDS:
+                    self._file.flush()
+                    self._last_flush = now
+            except Exception as exc:
+                self._dropped += 1
+                logger.warning("Tick journal write failed: %s", exc)
+                self._close_segment()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_segment()
+
+    def get_status(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "directory": str(self.directory),
+            "segment": str(self._path) if self._path else None,
+            "records": self._records,
+            "dropped": self._dropped,
+            "replaying": bool(self._suspended),
+        }
+
+
+tick_journal = TickJournal()
+
+
+# ---- reading --------------------------------------------------------------
+
+def list_segments(path: Union[str, Path]) -> List[Path]:
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    return sorted(path.glob(f"*{SEGMENT_SUFFIX}"))
+
+
+def iter_segment(path: Union[str, Path]) -> Iterator[TickRecord]:
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size < _HEADER_SIZE:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, record_size, _created = _HEADER.unpack_from(mapped, 0)
+            if magic != _MAGIC or version != _FORMAT_VERSION or record_size != RECORD_SIZE:
+                raise ValueError(f"{path} is not a v{_FORMAT_VERSION} tick journal segment")
+            count = (size - _HEADER_SIZE) // RECORD_SIZE
+            body = memoryview(mapped)[_HEADER_SIZE:_HEADER_SIZE + count * RECORD_SIZE]
+            try:
+                for fields in _RECORD.iter_unpack(body):
+                    yield TickRecord.from_fields(fields)
+            finally:
+                body.release()
+
+
+def iter_records(path: Union[str, Path]) -> Iterator[TickRecord]:
+    """All records of a segment file, or of every segment in a directory, in order."""
+    for segment in list_segments(path):
+        yield from iter_segment(segment)
+
+
+def load_instruments(path: Union[str, Path]) -> Tuple[Dict[str, str], Dict[str, Dict[str, object]]]:
+    symbols: Dict[str, str] = {}
+    subscriptions: Dict[str, Dict[str, object]] = {}
+    for segment in list_segments(path):
+        sidecar = segment.with_name(segment.stem + INSTRUMENTS_SUFFIX)
+        if not sidecar.exists():
+            continue
+        try:
+            payload = json.loads(sidecar.read_text(encoding="utf-8"))
+        except Exception as exc:
+            logger.warning("Skipping unreadable instruments sidecar %s: %s", sidecar, exc)
+            continue
+        symbols.update(payload.get("symbols") or {})
+        subscriptions.update(payload.get("subscriptions") or {})
+    return symbols, subscriptions
+
+
+# ---- replay ---------------------------------------------------------------
+
+def replay(
+    path: Union[str, Path],
+    speed: Optional[float] = 1.0,
+    sink: Optional[Callable[[object, Dict[str, object]], None]] = None,
+    install_instruments: bool = True,
+    limit: Optional[int] = None,
+) -> Dict[str, object]:
+    """Feed a recorded session back through the live tick path.
+
+    ``speed`` is a multiple of recorded time (``1`` = real time, ``10`` = 10x);
+    ``None`` or ``0`` replays as fast as the sink accepts ticks. ``sink``
+    defaults to ``live_feed.on_message_callback``.
+    """
+    if sink is None:
+        from app.dhan import live_feed
+
+        if install_instruments:
+            symbols, subscriptions = load_instruments(path)
+            live_feed.install_instrument_maps(symbols, subscriptions)
+        sink = live_feed.on_message_callback
+
+    pace = float(speed) if speed else 0.0
+    tick_journal._suspended += 1
+    started = time.perf_counter()
+    first_recv_ns: Optional[int] = None
+    count = 0
+    try:
+        for record in iter_records(path):
+            if limit is not None and count >= limit:
+                break
+            if pace > 0:
+                if first_recv_ns is None:
+                    first_recv_ns = record.recv_ns
+                due = (record.recv_ns - first_recv_ns) / 1e9 / pace
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            sink(None, record.to_message())
+            count += 1
+    finally:
+        tick_journal._suspended -= 1
+    elapsed = time.perf_counter() - started
+    return {
+        "ticks": count,
+        "elapsed_seconds": elapsed,
+        "ticks_per_second": (count / elapsed) if elapsed > 0 else None,
+        "speed": pace or "max",
+    }
@@ -0,0 +1,280 @@
+"""
+Tick-to-client latency instrumentation.
+
+``live_feed.on_message_callback`` takes a ``time.perf_counter_ns()`` stamp as
+soon as a decoded packet arrives and every later stage records the elapsed
+time since that stamp into a per-stage histogram:
+
+``decode``             fields extracted from the packet
+``cache_update``       live prices / market depth / option chain cache written
+``orchestrator``       orchestrator caches and exchange router updated
+``order_wakeup``       first pending-order pass that starts after the tick
+``broadcast_enqueue``  a websocket payload containing the tick was built
+``socket_send``        that payload was handed to the client socket
+
+Downstream consumers poll rather than subscribe, so the last three stages use
+"oldest unconsumed tick" stamps: the first tick after a consumer's previous
+run opens a window and the consumer's next run closes it; ticks arriving in
+between are counted as ``superseded`` (coalesced into the same frame/pass).
+That is the staleness a client actually sees.
+
+Histograms are log-linear (HDR style): 32 linear sub-buckets per power of two
+from 1 microsecond up, so any recorded value is reported within ~3%.
+``render_prometheus()`` emits them with p50/p99/p999 gauges and the drop
+counters; ``/admin/metrics`` serves it.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_ON_VALUES = {"1", "true", "yes", "on"}
+
+STAGES = (
+    "decode",
+    "cache_update",
+    "orchestrator",
+    "order_wakeup",
+    "broadcast_enqueue",
+    "socket_send",
+)
+CHANNELS = ("prices", "option_chain", "commodities")
+QUANTILES = (0.5, 0.99, 0.999)
+
+_SUB_BUCKET_BITS = 5
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_MIN_NS = 1_000  # values below 1 microsecond share the first bucket
+_MAX_NS = 60 * 1_000_000_000
+_MIN_EXPONENT = _MIN_NS.bit_length()
+_MAX_EXPONENT = _MAX_NS.bit_length()
+
+# Prometheus histogram buckets (seconds) exported alongside the quantiles.
+_EXPORT_BOUNDS_NS = tuple(int(b * 1e9) for b in (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+))
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram over nanosecond values."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: List[int] = [0] * ((_MAX_EXPONENT - _MIN_EXPONENT + 2) * _SUB_BUCKETS)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    @staticmethod
+    def _index(value_ns: int) -> int:
+        if value_ns < _MIN_NS:
+            return 0
+        value_ns = min(value_ns, _MAX_NS)
+        exponent = value_ns.bit_length()
+        shift = exponent - _SUB_BUCKET_BITS - 1
+        sub = (value_ns >> shift) - _SUB_BUCKETS if shift > 0 else 0
+        return (exponent - _MIN_EXPONENT + 1) * _SUB_BUCKETS + sub
+
+    @staticmethod
+    def _upper_bound(index: int) -> int:
+        octave, sub = divmod(index, _SUB_BUCKETS)
+        if octave == 0:
+            return _MIN_NS - 1
+        exponent = octave + _MIN_EXPONENT - 1
+        shift = exponent - _SUB_BUCKET_BITS - 1
+        return ((_SUB_BUCKETS + sub + 1) << shift) - 1 if shift > 0 else (1 << exponent) - 1
+
+    def record(self, value_ns: int) -> None:
+        if value_ns < 0:
+            value_ns = 0
+        index = self._index(value_ns)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_ns += value_ns
+            if value_ns > self.max_ns:
+                self.max_ns = value_ns
+
+    def _snapshot(self) -> Tuple[List[int], int, int, int]:
+        with self._lock:
+            return list(self._counts), self.count, self.total_ns, self.max_ns
+
+    def percentiles(self, quantiles: Iterable[float] = QUANTILES) -> Dict[float, int]:
+        counts, total, _sum, max_ns = self._snapshot()
+        result: Dict[float, int] = {}
+        if not total:
+            return {q: 0 for q in quantiles}
+        wanted = sorted(quantiles)
+        targets = [(q, max(1, int(q * total + 0.999999))) for q in wanted]
+        seen = 0
+        position = 0
+        for index, bucket in enumerate(counts):
+            if not bucket:
+                continue
+            seen += bucket
+            while position < len(targets) and seen >= targets[position][1]:
+                result[targets[position][0]] = min(self._upper_bound(index), max_ns)
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+    def cumulative(self, bounds_ns: Iterable[int] = _EXPORT_BOUNDS_NS) -> List[Tuple[int, int]]:
+        """``(upper bound ns, count <= bound)`` pairs for Prometheus buckets."""
+        counts, _total, _sum, _max = self._snapshot()
+        pairs = []
+        running = 0
+        index = 0
+        for bound in bounds_ns:
+            while index < len(counts) and self._upper_bound(index) <= bound:
+                running += counts[index]
+                index += 1
+            pairs.append((bound, running))
+        return pairs
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self.count = 0
+            self.total_ns = 0
+            self.max_ns = 0
+
+
+class TickLatencyTracker:
+    def __init__(self, enabled: Optional[bool] = None) -> None:
+        if enabled is None:
+            enabled = (os.getenv("TICK_LATENCY_METRICS", "1") or "").strip().lower() in _ON_VALUES
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self._lock = threading.Lock()
+        self._drops: Dict[str, int] = {}
+        self._ticks = 0
+        # Oldest tick not yet seen by the next pending-order pass / each broadcast channel.
+        self._order_pending_ns: Optional[int] = None
+        self._channel_pending_ns: Dict[str, Optional[int]] = {channel: None for channel in CHANNELS}
+        self._superseded: Dict[str, int] = {name: 0 for name in ("order_wakeup",) + CHANNELS}
+
+    @staticmethod
+    def now() -> int:
+        return time.perf_counter_ns()
+
+    # ---- feed side ------------------------------------------------------------
+
+    def stage(self, name: str, start_ns: Optional[int]) -> None:
+        if start_ns is None or not self.enabled:
+            return
+        self.histograms[name].record(time.perf_counter_ns() - start_ns)
+
+    def drop(self, reason: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._drops[reason] = self._drops.get(reason, 0) + 1
+
+    def tick_published(self, start_ns: Optional[int], channels: Iterable[str] = ("prices",)) -> None:
+        """Open the order-wakeup and broadcast windows for a tick that updated the caches."""
+        if start_ns is None or not self.enabled:
+            return
+        with self._lock:
+            self._ticks += 1
+            if self._order_pending_ns is None:
+                self._order_pending_ns = start_ns
+            else:
+                self._superseded["order_wakeup"] += 1
+            for channel in channels:
+                if self._channel_pending_ns.get(channel) is None:
+                    self._channel_pending_ns[channel] = start_ns
+                else:
+                    self._superseded[channel] += 1
+
+    # ---- consumer side --------------------------------------------------------
+
+    def order_pass_started(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            pending, self._order_pending_ns = self._order_pending_ns, None
+        if pending is not None:
+            self.histograms["order_wakeup"].record(time.perf_counter_ns() - pending)
+
+    def broadcast_enqueued(self, channel: str) -> Optional[int]:
+        """Call once the frame is built; pass the return value to ``broadcast_sent``."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            pending = self._channel_pending_ns.get(channel)
+            self._channel_pending_ns[channel] = None
+        if pending is not None:
+            self.histograms["broadcast_enqueue"].record(time.perf_counter_ns() - pending)
+        return pending
+
+    def broadcast_sent(self, pending_ns: Optional[int]) -> None:
+        if pending_ns is None or not self.enabled:
+            return
+        self.histograms["socket_send"].record(time.perf_counter_ns() - pending_ns)
+
+    # ---- reporting ------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, object]:
+        stages = {}
+        for name, histogram in self.histograms.items():
+            quantiles = histogram.percentiles()
+            stages[name] = {
+                "count": histogram.count,
+                "p50_ms": quantiles[0.5] / 1e6,
+                "p99_ms": quantiles[0.99] / 1e6,
+                "p999_ms": quantiles[0.999] / 1e6,
+                "max_ms": histogram.max_ns / 1e6,
+            }
+        with self._lock:
+            drops = dict(self._drops)
+            superseded = dict(self._superseded)
+            ticks = self._ticks
+        return {"enabled": self.enabled, "ticks": ticks, "stages": stages, "drops": drops, "superseded": superseded}
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP tn_tick_stage_latency_seconds Time from tick receipt to the end of each pipeline stage.",
+            "# TYPE tn_tick_stage_latency_seconds histogram",
+        ]
+        for name, histogram in self.histograms.items():
+            for bound_ns, cumulative in histogram.cumulative():
+                lines.append(f'tn_tick_stage_latency_seconds_bucket{{stage="{name}",le="{bound_ns / 1e9:g}"}} {cumulative}')
+            lines.append(f'tn_tick_stage_latency_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'tn_tick_stage_latency_seconds_sum{{stage="{name}"}} {histogram.total_ns / 1e9:.9f}')
+            lines.append(f'tn_tick_stage_latency_seconds_count{{stage="{name}"}} {histogram.count}')
+
+        lines.append("# HELP tn_tick_stage_latency_quantile_seconds Stage latency quantiles from the HDR histogram.")
+        lines.append("# TYPE tn_tick_stage_latency_quantile_seconds gauge")
+        for name, histogram in self.histograms.items():
+            for quantile, value_ns in sorted(histogram.percentiles().items()):
+                lines.append(f'tn_tick_stage_latency_quantile_seconds{{stage="{name}",quantile="{quantile:g}"}} {value_ns / 1e9:.9f}')
+            lines.append(f'tn_tick_stage_latency_quantile_seconds{{stage="{name}",quantile="1"}} {histogram.max_ns / 1e9:.9f}')
+
+        snapshot = self.snapshot()
+        lines.append("# HELP tn_ticks_total Ticks that reached the market caches.")
+        lines.append("# TYPE tn_ticks_total counter")
+        lines.append(f"tn_ticks_total {snapshot['ticks']}")
+        lines.append("# HELP tn_tick_drops_total Packets discarded before reaching the caches, by reason.")
+        lines.append("# TYPE tn_tick_drops_total counter")
+        for reason, count in sorted(snapshot["drops"].items()):
+            lines.append(f'tn_tick_drops_total{{reason="{reason}"}} {count}')
+        lines.append("# HELP tn_tick_superseded_total Ticks coalesced into a later order pass or client frame.")
+        lines.append("# TYPE tn_tick_superseded_total counter")
+        for consumer, count in sorted(snapshot["superseded"].items()):
+            lines.append(f'tn_tick_superseded_total{{consumer="{consumer}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        for histogram in self.histograms.values():
+            histogram.reset()
+        with self._lock:
+            self._drops.clear()
+            self._ticks = 0
+            self._order_pending_ns = None
+            self._channel_pending_ns = {channel: None for channel in CHANNELS}
+            self._superseded = {name: 0 for name in self._superseded}
+
+
+tick_latency = TickLatencyTracker()
@@ -0,0 +1,344 @@
+"""
+Warm-start snapshot of the market caches.
+
+A restart used to rebuild everything before the first useful response: the
+instrument master parse, the security-id mapper, the option chain population
+and the closing-price synthesis. ``WARM_SNAPSHOT`` persists that state and
+seeds it back at startup, while the usual bootstrap still runs in the
+background and replaces it.
+
+Two pickle files, each written to a ``.tmp`` sibling and swapped in with
+``os.replace`` so a crash never leaves a torn snapshot:
+
+* ``market_warm_snapshot.pkl`` (``WARM_SNAPSHOT_PATH``) - option chain cache
+  and registries, dashboard prices, market depth and the resolved metadata of
+  active subscriptions. Small; saved every ``WARM_SNAPSHOT_INTERVAL_SECONDS``
+  and on shutdown.
+* ``instrument_store_snapshot.pkl`` (``WARM_SNAPSHOT_INSTRUMENTS_PATH``) - the
+  shared ``InstrumentStore`` rows and indexes in columnar form. Written once
+  per master file and only restored while the master file (size + mtime)
+  still matches.
+
+Restored data is flagged rather than trusted: option legs carry
+``source="SNAPSHOT"`` until a tick or the regular population replaces them,
+depth is only restored from a recent snapshot
+(``WARM_SNAPSHOT_DEPTH_MAX_AGE_SECONDS``), and ``get_status()`` lists the
+chains and prices still served from the snapshot.
+"""
+
+import asyncio
+import logging
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.storage.db import DB_DIR
+
+logger = logging.getLogger("trading_nexus.market.warm_snapshot")
+
+SNAPSHOT_PATH = Path(os.getenv("WARM_SNAPSHOT_PATH") or (DB_DIR / "market_warm_snapshot.pkl"))
+INSTRUMENT_SNAPSHOT_PATH = Path(os.getenv("WARM_SNAPSHOT_INSTRUMENTS_PATH") or (DB_DIR / "instrument_store_snapshot.pkl"))
+SNAPSHOT_VERSION = 1
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+SAVE_INTERVAL_SECONDS = _env_float("WARM_SNAPSHOT_INTERVAL_SECONDS", 60.0)
+# Long enough to carry closing-price chains over a weekend or holiday.
+MAX_AGE_SECONDS = _env_float("WARM_SNAPSHOT_MAX_AGE_SECONDS", 4 * 24 * 3600.0)
+DEPTH_MAX_AGE_SECONDS = _env_float("WARM_SNAPSHOT_DEPTH_MAX_AGE_SECONDS", 300.0)
+
+
+def _file_signature(path: Optional[str]) -> Optional[Tuple[str, int, int]]:
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (str(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _read(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as fh:
+            snapshot = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        logger.warning("Ignoring unreadable warm snapshot %s: %s", path, exc)
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def _write(path: Path, payload: bytes) -> bool:
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as fh:
+            fh.write(payload)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as exc:
+        logger.warning("Failed to write warm snapshot %s: %s", path, exc)
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        return False
+
+
+class WarmSnapshot:
+    def __init__(self, path: Optional[Path] = None, instruments_path: Optional[Path] = None):
+        self.path = Path(path) if path else SNAPSHOT_PATH
+        self.instruments_path = Path(instruments_path) if instruments_path else INSTRUMENT_SNAPSHOT_PATH
+        self._task: Optional[asyncio.Task] = None
+        self._instrument_signature: Optional[Tuple[str, int, int]] = None
+        self._restored_chains: Dict[Tuple[str, str], Any] = {}
+        self._restored_prices: Dict[str, Any] = {}
+        self.status: Dict[str, Any] = {
+            "restored": False,
+            "saved_at": None,
+            "age_seconds": None,
+            "restore_ms": None,
+            "instruments_restored": False,
+            "instruments_restore_ms": None,
+            "chains": 0,
+            "prices": 0,
+            "depth": 0,
+            "subscriptions": 0,
+            "last_save_at": None,
+            "last_save_ms": None,
+            "last_save_bytes": None,
+            "saves": 0,
+        }
+
+    # ---- capture ----------------------------------------------------------------
+
+    def capture(self) -> Optional[bytes]:
+        """
+        Pickled market state, or None when there is nothing worth keeping.
+
+        Runs on the event loop thread (the caches are mutated there); only the
+        file write is handed to a worker thread.
+        """
+        from app.market.live_prices import get_prices
+        from app.market.market_state import state as market_state
+        from app.market.shared_market_data import shared_market_data
+        from app.market.subscription_manager import SUBSCRIPTION_MGR
+        from app.services.authoritative_option_chain_service import authoritative_option_chain_service
+
+        # Non-feed workers only mirror shared memory; the feed owner persists.
+        if shared_market_data.is_reader():
+            return None
+        chains = authoritative_option_chain_service.export_cache_snapshot()
+        if not chains["chains"]:
+            # Never replace a useful snapshot with an empty cache (e.g. shutdown mid-bootstrap).
+            return None
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "option_chains": chains,
+            "prices": {symbol: price for symbol, price in get_prices().items() if price is not None},
+            "depth": dict(dict.items(market_state["depth"])),
+            "subscriptions": SUBSCRIPTION_MGR.export_snapshot(),
+        }
+        return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def save(self) -> bool:
+        """Write the market snapshot now (the instrument snapshot is left to ``save_async``)."""
+        started = time.perf_counter()
+        payload = self.capture()
+        saved = payload is not None and _write(self.path, payload)
+        self._record_save(saved, payload, started)
+        return saved
+
+    async def save_async(self) -> bool:
+        started = time.perf_counter()
+        payload = self.capture()
+        saved = payload is not None and await asyncio.to_thread(_write, self.path, payload)
+        self._record_save(saved, payload, started)
+        await asyncio.to_thread(self.save_instruments)
+        return saved
+
+    def _record_save(self, saved: bool, payload: Optional[bytes], started: float) -> None:
+        if not saved:
+            return
+        self.status["saves"] += 1
+        self.status["last_save_at"] = time.time()
+        self.status["last_save_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.status["last_save_bytes"] = len(payload)
+
+    def save_instruments(self) -> bool:
+        """Columnar copy of the instrument store; rewritten only when the master file changes."""
+        from app.market.instrument_master.store import INSTRUMENT_STORE
+
+        if not INSTRUMENT_STORE.loaded:
+            return False
+        signature = _file_signature(INSTRUMENT_STORE.source)
+        if signature is None or signature == self._instrument_signature:
+            return False
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "master": signature,
+            "store": INSTRUMENT_STORE.export_state(),
+        }
+        if _write(self.instruments_path, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)):
+            self._instrument_signature = signature
+            logger.info("Instrument store snapshot written: %s", self.instruments_path)
+            return True
+        return False
+
+    # ---- restore ----------------------------------------------------------------
+
+    async def restore_async(self) -> bool:
+        snapshot = await asyncio.to_thread(_read, self.path)
+        return self.apply(snapshot)
+
+    def restore(self) -> bool:
+        return self.apply(_read(self.path))
+
+    def apply(self, snapshot: Optional[Dict[str, Any]]) -> bool:
+        """Seed caches from a read snapshot; anything already populated is left alone."""
+        if not snapshot:
+            return False
+        started = time.perf_counter()
+        age = max(0.0, time.time() - float(snapshot.get("saved_at") or 0))
+        if age > MAX_AGE_SECONDS:
+            logger.info("Warm snapshot is %.0fs old (max %.0fs); not restoring", age, MAX_AGE_SECONDS)
+            return False
+
+        from app.market.live_prices import get_price, update_price
+        from app.market.market_state import state as market_state
+        from app.market.subscription_manager import SUBSCRIPTION_MGR
+        from app.services.authoritative_option_chain_service import authoritative_option_chain_service
+
+        restored = authoritative_option_chain_service.restore_cache_snapshot(snapshot.get("option_chains") or {})
+        self._restored_chains = {
+            (underlying, expiry): skeleton
+            for underlying, expiries in restored.items()
+            for expiry, skeleton in expiries.items()
+        }
+        chains = len(self._restored_chains)
+
+        self._restored_prices = {}
+        for symbol, price in (snapshot.get("prices") or {}).items():
+            if get_price(symbol) is None:
+                update_price(symbol, price)
+                self._restored_prices[symbol] = price
+
+        depth_restored = 0
+        if age <= DEPTH_MAX_AGE_SECONDS:
+            depth_book = market_state["depth"]
+            for symbol, depth in (snapshot.get("depth") or {}).items():
+                if not dict.__contains__(depth_book, symbol):
+                    depth_book[symbol] = depth
+                    depth_restored += 1
+
+        subscriptions = snapshot.get("subscriptions") or {}
+        SUBSCRIPTION_MGR.seed_metadata(subscriptions)
+
+        self.status.update({
+            "restored": True,
+            "saved_at": snapshot.get("saved_at"),
+            "age_seconds": round(age, 1),
+            "restore_ms": round((time.perf_counter() - started) * 1000, 2),
+            "chains": chains,
+            "prices": len(self._restored_prices),
+            "depth": depth_restored,
+            "subscriptions": len(subscriptions),
+        })
+        logger.info(
+            "Warm snapshot restored in %.1fms (age %.0fs): chains=%s prices=%s depth=%s subscriptions=%s",
+            self.status["restore_ms"], age, chains, len(self._restored_prices), depth_restored, len(subscriptions),
+        )
+        return True
+
+    def restore_instruments(self) -> bool:
+        """Install the instrument store from its snapshot if the master file is unchanged."""
+        from app.market.instrument_master.store import INSTRUMENT_STORE
+
+        if INSTRUMENT_STORE.loaded:
+            return False
+        started = time.perf_counter()
+        snapshot = _read(self.instruments_path)
+        if not snapshot:
+            return False
+        signature = tuple(snapshot.get("master") or ())
+        current = _file_signature(str(INSTRUMENT_STORE.path))
+        if not signature or signature != current:
+            logger.info("Instrument store snapshot is for a different master file; parsing the CSV instead")
+            return False
+        try:
+            INSTRUMENT_STORE.restore_state(snapshot["store"], source=signature[0])
+        except Exception as exc:
+            logger.warning("Instrument store snapshot unusable (%s); parsing the CSV instead", exc)
+            return False
+        self._instrument_signature = current
+        self.status["instruments_restored"] = True
+        self.status["instruments_restore_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    # ---- periodic save ----------------------------------------------------------
+
+    def start(self, interval: float = SAVE_INTERVAL_SECONDS) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(interval))
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save_async()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Warm snapshot save failed")
+
+    def stop(self) -> None:
+        """Cancel the periodic task and write a final snapshot (shutdown hook)."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        try:
+            self.save()
+        except Exception:
+            logger.exception("Final warm snapshot save failed")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Restore/save counters plus what is still being served from the snapshot."""
+        from app.market.live_prices import get_price
+        from app.services.authoritative_option_chain_service import authoritative_option_chain_service
+
+        cache = authoritative_option_chain_service.option_chain_cache
+        stale_chains = [
+            f"{underlying} {expiry}"
+            for (underlying, expiry), skeleton in self._restored_chains.items()
+            if (cache.get(underlying) or {}).get(expiry) is skeleton
+        ]
+        stale_prices = [
+            symbol for symbol, price in self._restored_prices.items()
+            if get_price(symbol) == price
+        ]
+        return {
+            **self.status,
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": SAVE_INTERVAL_SECONDS,
+            "stale": bool(stale_chains or stale_prices),
+            "stale_chains": stale_chains,
+            "stale_prices": stale_prices,
+        }
+
+
+WARM_SNAPSHOT = WarmSnapshot()
@@ -25,14 +25,47 @@ class WatchlistManager:
     3. System generates option chain (ATM-based strikes)
     4. System subscribes to all strikes (CE + PE)
     5. At EOD 4:00 PM: unsubscribe Tier A + clear watchlists (except protected open-position symbols)
+
+    Every call opens its own short-lived DB session and only serializes with
+    other calls for the same user, so concurrent users don't queue behind
+    each other; a chain's strike window is subscribed as one batch.
     """
     
     def __init__(self):
-        self.db = SessionLocal()
-        self.lock = threading.RLock()
+        self._user_locks: Dict[int, threading.RLock] = {}
+        self._user_locks_guard = threading.Lock()
         self.sub_mgr = get_subscription_manager()
         self.atm_engine = get_atm_engine()
 
+    def _user_lock(self, user_id: int) -> threading.RLock:
+        with self._user_locks_guard:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = threading.RLock()
+                self._user_locks[user_id] = lock
+            return lock
+
+    @staticmethod
+    def _chain_tokens(symbol: str, expiry: str, strikes: List[float]) -> List[Dict]:
+        requests = []
+        for strike in strikes:
+            for option_type in ("CE", "PE"):
+                requests.append({
+                    "token": f"{symbol}_{expiry}_{strike:.0f}{option_type}",
+                    "symbol": symbol,
+                    "expiry": expiry,
+                    "strike": strike,
+                    "option_type": option_type,
+                })
+        return requests
+
+    def _subscribe_chain(self, symbol: str, expiry: str, strikes: List[float]) -> Tuple[int, List[str]]:
+        """Subscribe CE + PE for every strike in one batch; returns (subscribed, failed tokens)."""
+        requests = self._chain_tokens(symbol, expiry, strikes)
+        results = self.sub_mgr.subscribe_many(requests, tier="TIER_A")
+        failed = [req["token"] for req, (success, _msg, _ws_id) in zip(requests, results) if not success]
+        return len(requests) - len(failed), failed
+
     def _normalize_expiry(self, expiry: Optional[str], instrument_type: Optional[str]) -> str:
         normalized_type = (instrument_type or "").upper()
         expiry_text = (expiry or "").strip()
@@ -86,228 +119,45 @@ class WatchlistManager:
             "error": str if failed
         }
         """
-        with self.lock:
-            try:
-                instrument_type = (instrument_type or "").upper()
-                symbol = (symbol or "").strip().upper()
-                expiry = self._normalize_expiry(expiry, instrument_type)
+        instrument_type = (instrument_type or "").upper()
+        symbol = (symbol or "").strip().upper()
+        expiry = self._normalize_expiry(expiry, instrument_type)
 
+        with self._user_lock(user_id):
+            db = SessionLocal()
+            try:
                 # Check if already in watchlist
-                existing = self.db.query(Watchlist).filter(
+                existing = db.query(Watchlist).filter(
                     Watchlist.user_id == user_id,
                     Watchlist.symbol == symbol,
                     Watchlist.expiry_date == expiry
                 ).first()
-                
-                if existing:
-                    existing_type = (existing.instrument_type or instrument_type or "").upper()
-                    if existing_type in ("STOCK_OPTION", "INDEX_OPTION"):
-                        ltp_value = underlying_ltp
-                        if ltp_value is None:
-                            try:
-                                from app.market.live_prices import get_price
-                                ltp_value = get_price((symbol or "").upper())
-                            except Exception:
-                                ltp_value = None
-
-                        if ltp_value is not None:
-                            chain = self.atm_engine.generate_chain(
-                                symbol=symbol,
-                                expiry=expiry,
-                                underlying_ltp=ltp_value,
-                                force_recalc=True
-                            )
-                            strikes = chain.get("strikes", [])
-                            subscribed = 0
-                            for strike in strikes:
-                                token_ce = f"{symbol}_{expiry}_{strike:.0f}CE"
-                                success_ce, _msg_ce, _ws_id_ce = self.sub_mgr.subscribe(
-                                    token=token_ce,
-                                    symbol=symbol,
-                                    expiry=expiry,
-                                    strike=strike,
-                                    option_type="CE",
-                                    tier="TIER_A"
-                                )
-                                if success_ce:
-                                    subscribed += 1
-
-                                token_pe = f"{symbol}_{expiry}_{strike:.0f}PE"
-                                success_pe, _msg_pe, _ws_id_pe = self.sub_mgr.subscribe(
-                                    token=token_pe,
-                                    symbol=symbol,
-                                    expiry=expiry,
-                                    strike=strike,
-                                    option_type="PE",
-                                    tier="TIER_A"
-                                )
-                                if success_pe:
-                                    subscribed += 1
-
-                            return {
-                                "success": True,
-                                "message": f"{symbol} already in watchlist for {expiry}; ensured subscriptions",
-                                "error": "DUPLICATE",
-                                "strikes_subscribed": subscribed
-                            }
-
-                    if existing_type == "EQUITY":
-                        token_eq = f"EQUITY_{symbol.upper()}"
-                        self.sub_mgr.subscribe(
-                            token=token_eq,
-                            symbol=symbol,
-                            expiry=None,
-                            strike=None,
-                            option_type=None,
-                            tier="TIER_A"
-                        )
-                        return {
-                            "success": True,
-                            "message": f"{symbol} already in watchlist; ensured equity subscription",
-                            "error": "DUPLICATE",
-                            "token": token_eq
-                        }
+                existing_type = (existing.instrument_type or instrument_type or "").upper() if existing else None
 
-                    return {
-                        "success": False,
-                        "message": f"{symbol} already in watchlist for {expiry}",
-                        "error": "DUPLICATE"
-                    }
-                
-                # Enforce Tier-A/Tier-B-only universe
-                if not REGISTRY.loaded:
-                    REGISTRY.load()
-                allowed_indices = {"NIFTY", "BANKNIFTY", "SENSEX", "FINNIFTY", "MIDCPNIFTY", "BANKEX"}
-                allowed_equities = set()
-                try:
-                    allowed_equities = get_tier_a_equity_symbols()
-                except Exception:
-                    allowed_equities = set()
-                allowed_symbols = set(REGISTRY.f_o_stocks) | allowed_indices | allowed_equities
-                if symbol.upper() not in allowed_symbols:
-                    return {
-                        "success": False,
-                        "message": f"{symbol} not allowed in watchlist",
-                        "error": "SYMBOL_NOT_ALLOWED"
-                    }
-                
-                # Allow only EQUITY, STOCK_OPTION, INDEX_OPTION
-                if instrument_type not in ("EQUITY", "STOCK_OPTION", "INDEX_OPTION"):
-                    return {
-                        "success": False,
-                        "message": f"instrument_type {instrument_type} not allowed",
-                        "error": "INSTRUMENT_TYPE_NOT_ALLOWED"
-                    }
-                
-                # Get added_order (for LRU eviction)
-                max_order = self.db.query(Watchlist).filter(
-                    Watchlist.user_id == user_id
-                ).count()
-                added_order = max_order + 1
-                
-                # Add to watchlist
-                watchlist_entry = Watchlist(
-                    user_id=user_id,
-                    symbol=symbol,
-                    expiry_date=expiry,
-                    instrument_type=instrument_type,
-                    added_order=added_order
-                )
-                self.db.add(watchlist_entry)
-                self.db.commit()
-                
-                # Generate and subscribe option chain
-                if instrument_type in ("STOCK_OPTION", "INDEX_OPTION"):
-                    if underlying_ltp is None:
-                        return {
-                            "success": False,
-                            "message": "underlying_ltp required for option chains",
-                            "error": "MISSING_LTP"
-                        }
-                    
-                    # Generate chain
-                    chain = self.atm_engine.generate_chain(
-                        symbol=symbol,
-                        expiry=expiry,
-                        underlying_ltp=underlying_ltp,
-                        force_recalc=True
-                    )
-                    
-                    # Subscribe to all strikes (CE + PE)
-                    strikes = chain["strikes"]
-                    failed_strikes = []
-                    
-                    for strike in strikes:
-                        # CE
-                        token_ce = f"{symbol}_{expiry}_{strike:.0f}CE"
-                        success, msg, ws_id = self.sub_mgr.subscribe(
-                            token=token_ce,
-                            symbol=symbol,
-                            expiry=expiry,
-                            strike=strike,
-                            option_type="CE",
-                            tier="TIER_A"
-                        )
-                        if not success:
-                            failed_strikes.append(token_ce)
-                        
-                        # PE
-                        token_pe = f"{symbol}_{expiry}_{strike:.0f}PE"
-                        success, msg, ws_id = self.sub_mgr.subscribe(
-                            token=token_pe,
-                            symbol=symbol,
-                            expiry=expiry,
-                            strike=strike,
-                            option_type="PE",
-                            tier="TIER_A"
-                        )
-                        if not success:
-                            failed_strikes.append(token_pe)
-                    
-                    if failed_strikes:
-                        return {
-                            "success": False,
-                            "message": f"Failed to subscribe {len(failed_strikes)} strikes",
-                            "error": "SUBSCRIPTION_FAILED",
-                            "failed_count": len(failed_strikes)
-                        }
-                    
-                    return {
-                        "success": True,
-                        "message": f"Added {symbol} to watchlist ({expiry})",
-                        "option_chain": chain,
-                        "strikes_subscribed": len(strikes) * 2  # CE + PE
-                    }
-                
-                else:
-                    # EQUITY on-demand subscription (single token)
-                    token_eq = f"EQUITY_{symbol.upper()}"
-                    success, msg, ws_id = self.sub_mgr.subscribe(
-                        token=token_eq,
+                if not existing:
+                    rejected = self._check_allowed(symbol, instrument_type)
+                    if rejected:
+                        return rejected
+
+                    # Get added_order (for LRU eviction)
+                    max_order = db.query(Watchlist).filter(
+                        Watchlist.user_id == user_id
+                    ).count()
+                    added_order = max_order + 1
+
+                    # Add to watchlist
+                    watchlist_entry = Watchlist(
+                        user_id=user_id,
                         symbol=symbol,
-                        expiry=None,
-                        strike=None,
-                        option_type=None,
-                        tier="TIER_A"
+                        expiry_date=expiry,
+                        instrument_type=instrument_type,
+                        added_order=added_order
                     )
-                    if not success:
-                        return {
-                            "success": False,
-                            "message": f"Failed to subscribe equity {symbol}",
-                            "error": "SUBSCRIPTION_FAILED"
-                        }
-                    return {
-                        "success": True,
-                        "message": f"Added {symbol} equity to watchlist",
-                        "instrument_type": "EQUITY",
-                        "token": token_eq,
-                        "ws_id": ws_id,
-                        "ltp": self._get_live_ltp(symbol),
-                    }
-            
+                    db.add(watchlist_entry)
+                    db.commit()
             except Exception as e:
                 try:
-                    self.db.rollback()
+                    db.rollback()
                 except Exception:
                     pass
                 return {
@@ -315,16 +165,180 @@ class WatchlistManager:
                     "message": f"Error adding to watchlist: {str(e)}",
                     "error": "EXCEPTION"
                 }
+            finally:
+                db.close()
+
+            try:
+                if existing_type is not None:
+                    return self._ensure_existing_subscriptions(symbol, expiry, existing_type, underlying_ltp)
+                return self._subscribe_new_entry(symbol, expiry, instrument_type, underlying_ltp)
+            except Exception as e:
+                return {
+                    "success": False,
+                    "message": f"Error adding to watchlist: {str(e)}",
+                    "error": "EXCEPTION"
+                }
+
+    def _check_allowed(self, symbol: str, instrument_type: str) -> Optional[Dict]:
+        """Error payload when symbol/instrument_type is outside the Tier-A/Tier-B universe, else None."""
+        # Enforce Tier-A/Tier-B-only universe
+        if not REGISTRY.loaded:
+            REGISTRY.load()
+        allowed_indices = {"NIFTY", "BANKNIFTY", "SENSEX", "FINNIFTY", "MIDCPNIFTY", "BANKEX"}
+        allowed_equities = set()
+        try:
+            allowed_equities = get_tier_a_equity_symbols()
+        except Exception:
+            allowed_equities = set()
+        allowed_symbols = set(REGISTRY.f_o_stocks) | allowed_indices | allowed_equities
+        if symbol.upper() not in allowed_symbols:
+            return {
+                "success": False,
+                "message": f"{symbol} not allowed in watchlist",
+                "error": "SYMBOL_NOT_ALLOWED"
+            }
+        
+        # Allow only EQUITY, STOCK_OPTION, INDEX_OPTION
+        if instrument_type not in ("EQUITY", "STOCK_OPTION", "INDEX_OPTION"):
+            return {
+                "success": False,
+                "message": f"instrument_type {instrument_type} not allowed",
+                "error": "INSTRUMENT_TYPE_NOT_ALLOWED"
+            }
+        return None
+
+    def _ensure_existing_subscriptions(
+        self,
+        symbol: str,
+        expiry: str,
+        existing_type: str,
+        underlying_ltp: Optional[float],
+    ) -> Dict:
+        if existing_type in ("STOCK_OPTION", "INDEX_OPTION"):
+            ltp_value = underlying_ltp
+            if ltp_value is None:
+                try:
+                    from app.market.live_prices import get_price
+                    ltp_value = get_price((symbol or "").upper())
+                except Exception:
+                    ltp_value = None
+
+            if ltp_value is not None:
+                chain = self.atm_engine.generate_chain(
+                    symbol=symbol,
+                    expiry=expiry,
+                    underlying_ltp=ltp_value,
+                    force_recalc=True
+                )
+                subscribed, _failed = self._subscribe_chain(symbol, expiry, chain.get("strikes", []))
+                return {
+                    "success": True,
+                    "message": f"{symbol} already in watchlist for {expiry}; ensured subscriptions",
+                    "error": "DUPLICATE",
+                    "strikes_subscribed": subscribed
+                }
+
+        if existing_type == "EQUITY":
+            token_eq = f"EQUITY_{symbol.upper()}"
+            self.sub_mgr.subscribe(
+                token=token_eq,
+                symbol=symbol,
+                expiry=None,
+                strike=None,
+                option_type=None,
+                tier="TIER_A"
+            )
+            return {
+                "success": True,
+                "message": f"{symbol} already in watchlist; ensured equity subscription",
+                "error": "DUPLICATE",
+                "token": token_eq
+            }
+
+        return {
+            "success": False,
+            "message": f"{symbol} already in watchlist for {expiry}",
+            "error": "DUPLICATE"
+        }
+
+    def _subscribe_new_entry(
+        self,
+        symbol: str,
+        expiry: str,
+        instrument_type: str,
+        underlying_ltp: Optional[float],
+    ) -> Dict:
+        # Generate and subscribe option chain
+        if instrument_type in ("STOCK_OPTION", "INDEX_OPTION"):
+            if underlying_ltp is None:
+                return {
+                    "success": False,
+                    "message": "underlying_ltp required for option chains",
+                    "error": "MISSING_LTP"
+                }
+            
+            # Generate chain
+            chain = self.atm_engine.generate_chain(
+                symbol=symbol,
+                expiry=expiry,
+                underlying_ltp=underlying_ltp,
+                force_recalc=True
+            )
+            
+            # Subscribe to all strikes (CE + PE) in one batch
+            strikes = chain["strikes"]
+            _subscribed, failed_strikes = self._subscribe_chain(symbol, expiry, strikes)
+            
+            if failed_strikes:
+                return {
+                    "success": False,
+                    "message": f"Failed to subscribe {len(failed_strikes)} strikes",
+                    "error": "SUBSCRIPTION_FAILED",
+                    "failed_count": len(failed_strikes)
+                }
+            
+            return {
+                "success": True,
+                "message": f"Added {symbol} to watchlist ({expiry})",
+                "option_chain": chain,
+                "strikes_subscribed": len(strikes) * 2  # CE + PE
+            }
+        
+        # EQUITY on-demand subscription (single token)
+        token_eq = f"EQUITY_{symbol.upper()}"
+        success, msg, ws_id = self.sub_mgr.subscribe(
+            token=token_eq,
+            symbol=symbol,
+            expiry=None,
+            strike=None,
+            option_type=None,
+            tier="TIER_A"
+        )
+        if not success:
+            return {
+                "success": False,
+                "message": f"Failed to subscribe equity {symbol}",
+                "error": "SUBSCRIPTION_FAILED"
+            }
+        return {
+            "success": True,
+            "message": f"Added {symbol} equity to watchlist",
+            "instrument_type": "EQUITY",
+            "token": token_eq,
+            "ws_id": ws_id,
+            "ltp": self._get_live_ltp(symbol),
+        }
     
     def remove_from_watchlist(self, user_id: int, symbol: str, expiry: str) -> Dict:
         """Remove from watchlist and unsubscribe all related chains"""
-        with self.lock:
-            try:
-                symbol = (symbol or "").strip().upper()
-                expiry_text = (expiry or "").strip()
+        symbol = (symbol or "").strip().upper()
+        expiry_text = (expiry or "").strip()
 
+        with self._user_lock(user_id):
+            db = SessionLocal()
+            try:
                 # Find watchlist entry
-                query = self.db.query(Watchlist).filter(
+                query = db.query(Watchlist).filter(
                     Watchlist.user_id == user_id,
                     Watchlist.symbol == symbol,
                 )
@@ -342,59 +356,71 @@ class WatchlistManager:
                         "success": False,
                         "message": f"{symbol} not in watchlist"
                     }
-                
-                # Unsubscribe all related chains (if option)
-                if entry.instrument_type in ("STOCK_OPTION", "INDEX_OPTION"):
-                    # Get all strikes for this symbol+expiry
-                    chain = self.atm_engine.get_cached_chain(symbol, expiry)
-                    if chain:
-                        strikes = chain["strikes"]
-                        for strike in strikes:
-                            token_ce = f"{symbol}_{expiry}_{strike:.0f}CE"
-                            token_pe = f"{symbol}_{expiry}_{strike:.0f}PE"
-                            self.sub_mgr.unsubscribe(token_ce, reason="USER_REMOVAL")
-                            self.sub_mgr.unsubscribe(token_pe, reason="USER_REMOVAL")
-                
+                entry_type = entry.instrument_type
+
                 # Delete from watchlist
-                self.db.delete(entry)
-                self.db.commit()
-                
-                return {
-                    "success": True,
-                    "message": f"Removed {symbol} from watchlist"
-                }
-            
+                db.delete(entry)
+                db.commit()
             except Exception as e:
                 try:
-                    self.db.rollback()
+                    db.rollback()
                 except Exception:
                     pass
                 return {
                     "success": False,
                     "message": f"Error removing from watchlist: {str(e)}"
                 }
+            finally:
+                db.close()
+
+            try:
+                # Unsubscribe all related chains (if option)
+                if entry_type in ("STOCK_OPTION", "INDEX_OPTION"):
+                    # Get all strikes for this symbol+expiry
+                    chain = self.atm_engine.get_cached_chain(symbol, expiry)
+                    if chain:
+                        tokens = [req["token"] for req in self._chain_tokens(symbol, expiry, chain["strikes"])]
+                        self.sub_mgr.unsubscribe_many(tokens, reason="USER_REMOVAL")
+            except Exception as e:
+                return {
+                    "success": False,
+                    "message": f"Error removing from watchlist: {str(e)}"
+                }
+
+            return {
+                "success": True,
+                "message": f"Removed {symbol} from watchlist"
+            }
     
     def get_user_watchlist(self, user_id: int) -> List[Dict]:
         """Get user's watchlist"""
-        with self.lock:
-            entries = self.db.query(Watchlist).filter(
+        db = SessionLocal()
+        try:
+            entries = db.query(Watchlist).filter(
                 Watchlist.user_id == user_id
             ).order_by(Watchlist.added_at.desc()).all()
+            snapshot = [
+                (e.id, e.symbol, e.expiry_date, e.instrument_type, e.added_at, e.added_order)
+                for e in entries
+            ]
+        finally:
+            db.close()
 
-            rows = []
-            for e in entries:
-                rows.append(
-                    {
-                        "id": e.id,
-                        "symbol": e.symbol,
-                        "expiry_date": None if (e.instrument_type or "").upper() == "EQUITY" and e.expiry_date == EQUITY_EXPIRY_MARKER else e.expiry_date,
-                        "instrument_type": e.instrument_type,
-                        "added_at": e.added_at.isoformat(),
-                        "added_order": e.added_order,
-                        "ltp": self._get_live_ltp(e.symbol),
-                    }
-                )
-            return rows
+        # LTP lookups can fall back to a REST call, so they run after the session is released.
+        rows = []
+        for entry_id, symbol, expiry_date, instrument_type, added_at, added_order in snapshot:
+            rows.append(
+                {
+                    "id": entry_id,
+                    "symbol": symbol,
+                    "expiry_date": None if (instrument_type or "").upper() == "EQUITY" and expiry_date == EQUITY_EXPIRY_MARKER else expiry_date,
+                    "instrument_type": instrument_type,
+                    "added_at": added_at.isoformat(),
+                    "added_order": added_order,
+                    "ltp": self._get_live_ltp(symbol),
+                }
+            )
+        return rows
     
     def clear_all_user_watchlist(self, user_id: int) -> Dict:
         """Clear entire user watchlist (used at EOD)"""
@@ -415,9 +441,10 @@ class WatchlistManager:
         protected_keys: Optional[Set[Tuple[str, Optional[str]]]]
     ) -> Dict:
         """Clear user watchlist while preserving globally protected symbol+expiry keys."""
-        with self.lock:
+        with self._user_lock(user_id):
+            db = SessionLocal()
             try:
-                entries = self.db.query(Watchlist).filter(
+                entries = db.query(Watchlist).filter(
                     Watchlist.user_id == user_id
                 ).all()
                 
@@ -434,10 +461,10 @@ class WatchlistManager:
                         skipped += 1
                         continue
                     
-                    self.db.delete(entry)
+                    db.delete(entry)
                     count += 1
                 
-                self.db.commit()
+                db.commit()
                 
                 return {
                     "success": True,
@@ -447,52 +474,56 @@ class WatchlistManager:
             
             except Exception as e:
                 try:
-                    self.db.rollback()
+                    db.rollback()
                 except Exception:
                     pass
                 return {
                     "success": False,
                     "message": f"Error clearing watchlist: {str(e)}"
                 }
+            finally:
+                db.close()
 
     def clear_all_watchlists(self, protected_keys: Optional[Set[Tuple[str, Optional[str]]]] = None) -> Dict:
         """Clear all users' watchlists while preserving globally protected symbol+expiry keys."""
-        with self.lock:
-            try:
-                entries = self.db.query(Watchlist).all()
+        db = SessionLocal()
+        try:
+            entries = db.query(Watchlist).all()
 
-                count = 0
-                skipped = 0
-                protected = protected_keys or set()
+            count = 0
+            skipped = 0
+            protected = protected_keys or set()
 
-                for entry in entries:
-                    entry_key = self._normalize_eod_key(
-                        entry.symbol,
-                        entry.expiry_date,
-                        entry.instrument_type
-                    )
-                    if entry_key in protected:
-                        skipped += 1
-                        continue
+            for entry in entries:
+                entry_key = self._normalize_eod_key(
+                    entry.symbol,
+                    entry.expiry_date,
+                    entry.instrument_type
+                )
+                if entry_key in protected:
+                    skipped += 1
+                    continue
 
-                    self.db.delete(entry)
-                    count += 1
+                db.delete(entry)
+                count += 1
 
-                self.db.commit()
-                return {
-                    "success": True,
-                    "cleared_count": count,
-                    "skipped_count": skipped
-                }
-            except Exception as e:
-                try:
-                    self.db.rollback()
-                except Exception:
-                    pass
-                return {
-                    "success": False,
-                    "message": f"Error clearing all watchlists: {str(e)}"
-                }
+            db.commit()
+            return {
+                "success": True,
+                "cleared_count": count,
+                "skipped_count": skipped
+            }
+        except Exception as e:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            return {
+                "success": False,
+                "message": f"Error clearing all watchlists: {str(e)}"
+            }
+        finally:
+            db.close()
 
 
 # Global watchlist manager
@@ -21,3 +21,22 @@ def generate(length: int = 14) -> str:
     rand = ''.join(secrets.choice(ALPHABET) for _ in range(rand_len))
     candidate = (rand + ts)[-length:]
     return candidate
+
+
+def generate_many(count: int, length: int = 14, rand_len: int = 5) -> list:
+    """
+    ``count`` distinct identifiers for one bulk insert.
+
+    ``generate`` leaves a single random character next to the millisecond
+    stamp, so ids minted in the same millisecond collide; bulk callers trade
+    leading timestamp digits for ``rand_len`` random characters instead.
+    """
+    ts = str(int(time.time() * 1000))[-(length - rand_len):]
+    seen = set()
+    out = []
+    while len(out) < count:
+        candidate = (''.join(secrets.choice(ALPHABET) for _ in range(rand_len)) + ts)[-length:]
+        if candidate not in seen:
+            seen.add(candidate)
+            out.append(candidate)
+    return out
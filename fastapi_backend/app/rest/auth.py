@@ -10,6 +10,7 @@ from sqlalchemy import func
 
 from app.storage.db import SessionLocal
 from app.storage.models import UserAccount
+from app.users.identity_cache import invalidate_identity
 from app.users.passwords import verify_password, hash_password
 
 router = APIRouter()
@@ -156,6 +157,7 @@ def change_password(req: ChangePasswordRequest):
         user.password_hash = digest
         user.require_password_reset = False
         db.commit()
+        invalidate_identity(user.id)
         return {"success": True}
     finally:
         db.close()
@@ -7,6 +7,7 @@ import logging
 import threading
 from app.storage.db import SessionLocal
 from app.storage.models import DhanCredential
+from app.dhan.credential_provider import notify_credentials_changed
 from app.market_orchestrator import get_orchestrator
 from app.users.auth import get_current_user
 from app.users.permissions import require_role
@@ -186,6 +187,7 @@ def save_credentials(c: CredSaveIn):
         row.is_default = True
 
         db.commit()
+        notify_credentials_changed("credentials saved")
 
         # Persist to disk for auto-restore
         save_settings(force=True)
@@ -223,6 +225,7 @@ def switch_mode(payload: SwitchModeIn | str = Body(...)):
         db.query(DhanCredential).update({DhanCredential.is_default: False})
         target.is_default = True
         db.commit()
+        notify_credentials_changed("mode switched")
 
         # On mode switch, clear any connection cooldown and restart streams in background.
         try:
@@ -298,6 +301,7 @@ def clear_credentials():
     try:
         db.query(DhanCredential).delete()
         db.commit()
+        notify_credentials_changed("credentials cleared")
         return {"success": True, "message": "All credentials cleared successfully"}
     finally:
         db.close()
@@ -389,6 +393,7 @@ def save_creds(c: CredIn):
         )
         db.add(row)
         db.commit()
+        notify_credentials_changed("test credentials saved")
 
         # Start market data streams in background to avoid blocking this endpoint
         _restart_streams_background()
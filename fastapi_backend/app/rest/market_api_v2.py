@@ -11,8 +11,10 @@ import requests
 import os
 import threading
 import time
+from app.dhan.credential_provider import get_active_credential
 from app.market_orchestrator import get_orchestrator
-from app.services.dhan_sdk_bridge import sdk_ltp_data, sdk_quote_data
+from app.services.dhan_quote_batcher import dhan_quote_batcher
+from app.services.dhan_sdk_bridge import sdk_quote_data
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -98,23 +100,6 @@ def normalize_expiry(expiry: Optional[str]) -> Optional[date]:
         return None
 
 
-def _extract_segment_payload(quote_data: object, exchange_segment: str):
-    if not isinstance(quote_data, dict):
-        return None
-
-    segment_data = quote_data.get(exchange_segment)
-    if isinstance(segment_data, dict):
-        return segment_data
-
-    nested = quote_data.get("data")
-    if isinstance(nested, dict):
-        nested_segment = nested.get(exchange_segment)
-        if isinstance(nested_segment, dict):
-            return nested_segment
-
-    return None
-
-
 def _extract_ltp_from_quote_payload(sec_payload: object) -> Optional[float]:
     if isinstance(sec_payload, list):
         sec_payload = sec_payload[0] if sec_payload else None
@@ -122,8 +107,9 @@ def _extract_ltp_from_quote_payload(sec_payload: object) -> Optional[float]:
     if not isinstance(sec_payload, dict):
         return None
 
-    ltp = sec_payload.get("ltp") or sec_payload.get("LTP")
+    ltp = sec_payload.get("ltp") or sec_payload.get("LTP") or sec_payload.get("last_price")
     if ltp is None:
+        # Quote payloads without a traded price still carry ohlc.close.
         ohlc = sec_payload.get("ohlc") or sec_payload.get("OHLC")
         if isinstance(ohlc, dict):
             ltp = (
@@ -149,26 +135,6 @@ def _extract_ltp_from_quote_payload(sec_payload: object) -> Optional[float]:
     return None
 
 
-def _extract_ltp_from_sdk_quote_result(sdk_result: dict, exchange_segment: str, security_id: object) -> Optional[float]:
-    if not isinstance(sdk_result, dict) or not sdk_result.get("ok"):
-        return None
-
-    body = sdk_result.get("data") or {}
-    segment_data = _extract_segment_payload(body, exchange_segment)
-    if not isinstance(segment_data, dict):
-        return None
-
-    sec_key = str(security_id)
-    sec_payload = segment_data.get(sec_key)
-    if sec_payload is None:
-        try:
-            sec_payload = segment_data.get(int(sec_key))
-        except Exception:
-            sec_payload = None
-
-    return _extract_ltp_from_quote_payload(sec_payload)
-
-
 # =====================================
 # SECTION 2 — HEALTH CHECK ROUTE
 # =====================================
@@ -204,8 +170,6 @@ def underlying_ltp(underlying: str):
         if price is None:
             # Fallback: on-demand Dhan quote snapshot for NSE/BSE equities and ETFs.
             from app.market.instrument_master.registry import REGISTRY
-            from app.storage.db import SessionLocal
-            from app.storage.models import DhanCredential
 
             if not REGISTRY.loaded:
                 REGISTRY.load()
@@ -261,13 +225,9 @@ def underlying_ltp(underlying: str):
                     exchange_segment = None
 
             if security_id and exchange_segment:
-                db = SessionLocal()
-                try:
-                    creds = db.query(DhanCredential).first()
-                    access_token = (getattr(creds, "daily_token", None) or getattr(creds, "auth_token", None)) if creds else None
-                    client_id = getattr(creds, "client_id", None) if creds else None
-                finally:
-                    db.close()
+                creds = get_active_credential()
+                access_token = creds.access_token if creds else None
+                client_id = creds.client_id if creds else None
 
                 if access_token and client_id:
                     segment_candidates = [exchange_segment]
@@ -276,35 +236,24 @@ def underlying_ltp(underlying: str):
                     elif exchange_segment == "BSE_EQ":
                         segment_candidates.append("NSE_EQ")
 
-                    for segment_candidate in segment_candidates:
-                        payload = {segment_candidate: [int(str(security_id))]}
+                    # Submit every candidate up front so they share one batched quote request.
+                    quote_creds = {"client_id": client_id, "access_token": access_token}
+                    pending = [
+                        dhan_quote_batcher.submit(segment_candidate, security_id, quote_creds)
+                        for segment_candidate in segment_candidates
+                    ]
+                    for future in pending:
                         try:
-                            sdk_result = sdk_ltp_data(
-                                creds={"client_id": client_id, "access_token": access_token},
-                                securities=payload,
-                            )
-                            ltp_value = _extract_ltp_from_sdk_quote_result(
-                                sdk_result=sdk_result,
-                                exchange_segment=segment_candidate,
-                                security_id=security_id,
-                            )
-                            if ltp_value is None:
-                                # Secondary fallback: /marketfeed/quote can provide ohlc.close even when last_price is missing.
-                                sdk_result = sdk_quote_data(
-                                    creds={"client_id": client_id, "access_token": access_token},
-                                    securities=payload,
-                                )
-                                ltp_value = _extract_ltp_from_sdk_quote_result(
-                                    sdk_result=sdk_result,
-                                    exchange_segment=segment_candidate,
-                                    security_id=security_id,
-                                )
-                            if ltp_value is not None:
-                                price = float(ltp_value)
-                                update_price(sym, price)
-                                break
+                            quote_result = future.result(timeout=15)
                         except Exception:
                             continue
+                        if not quote_result.get("ok"):
+                            continue
+                        ltp_value = _extract_ltp_from_quote_payload(quote_result.get("data"))
+                        if ltp_value is not None:
+                            price = float(ltp_value)
+                            update_price(sym, price)
+                            break
 
             # Index fallback (NIFTY/BANKNIFTY/SENSEX) via static security map.
             if price is None:
@@ -314,35 +263,21 @@ def underlying_ltp(underlying: str):
                     index_meta = get_default_index_security(sym)
                     index_sec = index_meta.get("security_id") if index_meta else None
                     if index_sec:
-                        db = SessionLocal()
-                        try:
-                            creds = db.query(DhanCredential).first()
-                            access_token = (getattr(creds, "daily_token", None) or getattr(creds, "auth_token", None)) if creds else None
-                            client_id = getattr(creds, "client_id", None) if creds else None
-                        finally:
-                            db.close()
+                        creds = get_active_credential()
+                        access_token = creds.access_token if creds else None
+                        client_id = creds.client_id if creds else None
 
                         if access_token and client_id:
-                            payload = {"IDX_I": [int(str(index_sec))]}
-                            sdk_result = sdk_ltp_data(
-                                creds={"client_id": client_id, "access_token": access_token},
-                                securities=payload,
+                            quote_result = dhan_quote_batcher.get(
+                                "IDX_I",
+                                index_sec,
+                                {"client_id": client_id, "access_token": access_token},
                             )
-                            ltp_value = _extract_ltp_from_sdk_quote_result(
-                                sdk_result=sdk_result,
-                                exchange_segment="IDX_I",
-                                security_id=index_sec,
+                            ltp_value = (
+                                _extract_ltp_from_quote_payload(quote_result.get("data"))
+                                if quote_result.get("ok")
+                                else None
                             )
-                            if ltp_value is None:
-                                sdk_result = sdk_quote_data(
-                                    creds={"client_id": client_id, "access_token": access_token},
-                                    securities=payload,
-                                )
-                                ltp_value = _extract_ltp_from_sdk_quote_result(
-                                    sdk_result=sdk_result,
-                                    exchange_segment="IDX_I",
-                                    security_id=index_sec,
-                                )
                             if ltp_value is not None:
                                 price = float(ltp_value)
                                 update_price(sym, price)
@@ -410,18 +345,9 @@ def market_stream_status():
             database_status = {"status": "error", "message": f"{db_err}"}
 
         try:
-            from app.storage.db import SessionLocal
-            from app.storage.models import DhanCredential
-
-            db = SessionLocal()
-            try:
-                creds = db.query(DhanCredential).first()
-                has_client = bool(getattr(creds, "client_id", None)) if creds else False
-                has_token = bool(
-                    (getattr(creds, "daily_token", None) or getattr(creds, "auth_token", None))
-                ) if creds else False
-            finally:
-                db.close()
+            creds = get_active_credential()
+            has_client = bool(creds.client_id) if creds else False
+            has_token = bool(creds.access_token) if creds else False
 
             ws_connected = (equity_ws.get("connected_connections") or 0) > 0 or (mcx_ws.get("connected_connections") or 0) > 0
             cooldown_active = bool(live_feed.get("cooldown_active"))
@@ -587,8 +513,6 @@ def market_depth(symbol: str):
             pass
 
         from app.market.instrument_master.registry import REGISTRY
-        from app.storage.db import SessionLocal
-        from app.storage.models import DhanCredential
         from app.market.security_ids import get_default_index_security
 
         if not REGISTRY.loaded:
@@ -628,13 +552,9 @@ def market_depth(symbol: str):
         if not security_id or not exchange_segment:
             return {"status": "success", "data": {"bids": [], "asks": []}}
 
-        db = SessionLocal()
-        try:
-            creds = db.query(DhanCredential).first()
-            access_token = (getattr(creds, "daily_token", None) or getattr(creds, "auth_token", None)) if creds else None
-            client_id = getattr(creds, "client_id", None) if creds else None
-        finally:
-            db.close()
+        creds = get_active_credential()
+        access_token = creds.access_token if creds else None
+        client_id = creds.client_id if creds else None
 
         if not access_token or not client_id:
             return {"status": "success", "data": {"bids": [], "asks": []}}
@@ -1,21 +1,26 @@
 from datetime import datetime, timedelta
 import asyncio
-from typing import Optional, List
+from typing import Dict, List, Optional, Tuple
 import json
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Header, Query
 from pydantic import BaseModel, Field
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.orm import Session
 
 from app.storage.db import SessionLocal
+from app.storage.db_executor import db_executor
+from app.storage.pagination import DEFAULT_PAGE_SIZE, InvalidCursor, keyset_page
 from app.users.auth import get_current_user
+from app.users.identity_cache import invalidate_identity
 from app.users.permissions import require_role
 from app.storage import models
 from app.users.passwords import hash_password
 from app.market.live_prices import get_prices, update_price
 from app.rms.kill_switch import blocked as kill_switch_blocked
 from app.execution_simulator import get_execution_engine
+from app.ledger.running_balance import ledger_balances
 from app.rms.span_margin_calculator import (
     fetch_user_positions as fetch_fno_positions,
     position_from_order as span_position_from_order,
@@ -25,6 +30,7 @@ from app.rms.mcx_margin_calculator import (
     position_from_order as mcx_position_from_order,
 )
 from app.services.dhan_margin_service import dhan_margin_service
+from app.rms.margin_engine import LOCAL_MARGIN_ENGINE, MARGIN_RECONCILER
 from app.market.watchlist_manager import get_watchlist_manager
 from app.market.subscription_manager import get_subscription_manager
 from app.market.instrument_master.registry import REGISTRY
@@ -74,6 +80,15 @@ def _serialize(model_obj):
     return data
 
 
+def _keyset_response(query, model, limit: Optional[int], cursor: Optional[str]) -> dict:
+    """Newest-first page of ``query`` plus the cursor for the next page."""
+    try:
+        rows, next_cursor = keyset_page(query, model, limit=limit or DEFAULT_PAGE_SIZE, cursor=cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"data": [_serialize(r) for r in rows], "next_cursor": next_cursor}
+
+
 def _load_theme_settings() -> dict:
     try:
         if not THEME_SETTINGS_FILE.exists():
@@ -159,6 +174,45 @@ def _get_or_create_margin(db: Session, user_id: int) -> models.MarginAccount:
     return margin
 
 
+def _get_or_create_margins(db: Session, user_ids) -> Dict[int, models.MarginAccount]:
+    """Margin accounts for many users in one query (missing rows created in one commit)."""
+    ids = list({int(uid) for uid in user_ids})
+    if not ids:
+        return {}
+    margins = {
+        m.user_id: m
+        for m in db.query(models.MarginAccount).filter(models.MarginAccount.user_id.in_(ids)).all()
+    }
+    missing = [uid for uid in ids if uid not in margins]
+    if missing:
+        for uid in missing:
+            margins[uid] = models.MarginAccount(user_id=uid, available_margin=0.0, used_margin=0.0)
+            db.add(margins[uid])
+        db.commit()
+    return margins
+
+
+def _refresh_expired(db: Session, *instances) -> None:
+    """Reload rows a get-or-create commit expired, so nothing lazy-loads on the event loop."""
+    seen = set()
+    for instance in instances:
+        if id(instance) in seen:
+            continue
+        seen.add(id(instance))
+        if sa_inspect(instance).expired:
+            db.refresh(instance)
+
+
+def _load_user_and_margin(db: Session, user_id: Optional[int]):
+    user = db.query(models.UserAccount).filter(models.UserAccount.id == (user_id or 1)).first()
+    if not user:
+        user = _get_or_create_admin(db)
+    margin = _get_or_create_margin(db, user.id)
+    # Creating the margin row commits and expires ``user``.
+    _refresh_expired(db, user, margin)
+    return user, margin
+
+
 def _get_ltp(symbol: str, fallback_price: float) -> float:
     prices = get_prices()
     key = (symbol or "").upper().strip()
@@ -363,6 +417,30 @@ def _build_market_data_for_positions(positions: List[dict]) -> dict:
     return market_data
 
 
+def _numeric_security_id(security_id: Optional[str]) -> Optional[str]:
+    try:
+        return str(int(str(security_id).strip())) if security_id not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _dhan_scripts_payload(scripts: List["MarginScript"]) -> List[dict]:
+    dhan_scripts = []
+    for script in scripts:
+        dhan_script = {
+            "exchangeSegment": script.exchange_segment or "NSE_EQ",
+            "transactionType": script.transaction_type or "BUY",
+            "quantity": int(script.quantity or 0),
+            "productType": script.product_type or "MIS",
+            "securityId": script.security_id or script.symbol,
+            "price": float(script.price or 0.0),
+        }
+        if script.trigger_price is not None:
+            dhan_script["triggerPrice"] = float(script.trigger_price)
+        dhan_scripts.append(dhan_script)
+    return dhan_scripts
+
+
 def _local_margin_for_order(
     user_id: int,
     exchange_segment: Optional[str],
@@ -370,14 +448,48 @@ def _local_margin_for_order(
     transaction_type: str,
     quantity: int,
     price: float,
+    product_type: Optional[str] = None,
+    security_id: Optional[str] = None,
 ) -> Optional[dict]:
-    """Fetch margin from Dhan API - NO LOCAL CALCULATION"""
-    return None
+    """Margin from the local SPAN/MCX engine; Dhan's calculator re-checks it in the background."""
+    try:
+        local = LOCAL_MARGIN_ENGINE.margin_for_order(exchange_segment, symbol, transaction_type, quantity, price)
+    except Exception as e:
+        print(f"[MARGIN] Local margin error for {symbol}: {e}")
+        return None
+    if local is None:
+        return None
+    dhan_security_id = _numeric_security_id(security_id)
+    if dhan_security_id:
+        MARGIN_RECONCILER.submit("single", {
+            "exchange_segment": exchange_segment or "NSE_EQ",
+            "transaction_type": transaction_type or "BUY",
+            "quantity": int(quantity or 0),
+            "product_type": product_type or "MIS",
+            "security_id": dhan_security_id,
+            "price": float(price or 0.0),
+        }, local["margin"])
+    return local
 
 
 def _local_margin_for_scripts(user_id: int, scripts: List["MarginScript"]) -> Optional[dict]:
-    """Fetch margin from Dhan API - NO LOCAL CALCULATION"""
-    return None
+    """Margin for a set of legs from the local engine; Dhan re-checks it in the background."""
+    if not scripts:
+        return {"margin": 0.0, "source": "LOCAL_EMPTY"}
+    try:
+        local = LOCAL_MARGIN_ENGINE.margin_for_scripts([script.dict() for script in scripts])
+    except Exception as e:
+        print(f"[MARGIN] Local multi-script margin error: {e}")
+        return None
+    if local is None:
+        return None
+    if all(_numeric_security_id(script.security_id) for script in scripts):
+        MARGIN_RECONCILER.submit("multi", {
+            "scripts": _dhan_scripts_payload(scripts),
+            "include_positions": False,
+            "include_orders": False,
+        }, local["margin"])
+    return local
 
 
 async def _dhan_margin_for_order(
@@ -418,19 +530,7 @@ async def _dhan_margin_for_scripts(user_id: int, scripts: List["MarginScript"])
     """Fetch multi-script margin from Dhan API with proper rate limiting"""
     try:
         # Convert scripts to Dhan API format
-        dhan_scripts = []
-        for script in scripts:
-            dhan_script = {
-                "exchangeSegment": script.exchange_segment or "NSE_EQ",
-                "transactionType": script.transaction_type or "BUY",
-                "quantity": int(script.quantity or 0),
-                "productType": script.product_type or "MIS",
-                "securityId": script.security_id or script.symbol,
-                "price": float(script.price or 0.0),
-            }
-            if script.trigger_price is not None:
-                dhan_script["triggerPrice"] = float(script.trigger_price)
-            dhan_scripts.append(dhan_script)
+        dhan_scripts = _dhan_scripts_payload(scripts)
         
         if not dhan_scripts:
             return {
@@ -533,25 +633,7 @@ def _segment_allowed(user: models.UserAccount, exchange_segment: str) -> bool:
 
 
 def _update_ledger(db: Session, user: models.UserAccount, credit: float, debit: float, entry_type: str, remarks: str):
-    last_entry = (
-        db.query(models.LedgerEntry)
-        .filter(models.LedgerEntry.user_id == user.id)
-        .order_by(models.LedgerEntry.created_at.desc(), models.LedgerEntry.id.desc())
-        .first()
-    )
-    base_balance = (last_entry.balance if last_entry and last_entry.balance is not None else (user.wallet_balance or 0.0))
-    balance = base_balance + credit - debit
-    user.wallet_balance = balance
-    user.updated_at = ist_now()
-    entry = models.LedgerEntry(
-        user_id=user.id,
-        entry_type=entry_type,
-        credit=credit,
-        debit=debit,
-        balance=balance,
-        remarks=remarks,
-    )
-    db.add(entry)
+    ledger_balances.post(db, user, credit=credit, debit=debit, entry_type=entry_type, remarks=remarks)
 
 
 def _apply_position(db: Session, user_id: int, symbol: str, exchange_segment: str, product_type: str, qty: int, price: float):
@@ -761,6 +843,8 @@ def _place_order_core(req: OrderRequest, db: Session, user: models.UserAccount):
         transaction_type=req.transaction_type,
         quantity=req.quantity,
         price=exec_price,
+        product_type=req.product_type,
+        security_id=req.security_id,
     )
     if local_margin and local_margin.get("margin") is not None:
         required = float(local_margin["margin"])
@@ -917,6 +1001,8 @@ class PortfolioMarginRequest(BaseModel):
 def list_orders(
     user_id: Optional[int] = None,
     current_session_only: bool = Query(True),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
     _get_or_create_admin(db)
@@ -927,6 +1013,8 @@ def list_orders(
         now_ist = ist_now()
         ist_day_start = now_ist.replace(hour=0, minute=0, second=0, microsecond=0)
         query = query.filter(models.MockOrder.created_at >= ist_day_start)
+    if limit or cursor:
+        return _keyset_response(query, models.MockOrder, limit, cursor)
     orders = query.order_by(models.MockOrder.created_at.desc()).all()
     return {"data": [_serialize(o) for o in orders]}
 
@@ -1190,6 +1278,10 @@ async def place_order(
     if any(k in SENSITIVE_KEYS for k in (payload.keys() if isinstance(payload, dict) else [])):
         raise HTTPException(status_code=400, detail="Credential-like fields are forbidden in order payload")
 
+    return await db_executor.run(_place_order_sync, db, req, current_user)
+
+
+def _place_order_sync(db: Session, req: "OrderRequest", current_user: Optional[models.UserAccount]):
     # If a current user is present, enforce user_id matches
     if current_user is not None:
         if req.user_id and int(req.user_id) != int(current_user.id):
@@ -1244,6 +1336,8 @@ async def place_order(
         transaction_type=req.transaction_type,
         quantity=req.quantity,
         price=exec_price,
+        product_type=req.product_type,
+        security_id=req.security_id,
     )
     if local_margin and local_margin.get("margin") is not None:
         required = float(local_margin["margin"])
@@ -1432,73 +1526,167 @@ def squareoff_position(position_id: int, req: SquareOffRequest, db: Session = De
     return close_position(position_id=position_id, req=req, db=db)
 
 
-@router.get("/trading/basket-orders")
-async def list_baskets(user_id: Optional[int] = None, db: Session = Depends(get_db)):
+# basket_id -> (version, raw margin before the MIS multiplier, source)
+_BASKET_MARGIN_CACHE: Dict[int, Tuple[tuple, float, str]] = {}
+_BASKET_MARGIN_CACHE_MAX = 4096
+
+
+def _load_baskets(db: Session, user_id: Optional[int]):
     _get_or_create_admin(db)
     query = db.query(models.MockBasket)
     if user_id:
         query = query.filter(models.MockBasket.user_id == user_id)
     baskets = query.all()
 
-    user_cache = {}
-    margin_cache = {}
-    available_margin_cache = {}
+    accounts = {}
+    user_ids = {b.user_id for b in baskets}
+    users = {
+        u.id: u
+        for u in db.query(models.UserAccount).filter(models.UserAccount.id.in_(user_ids)).all()
+    } if user_ids else {}
+    admin = None
+    for uid in user_ids:
+        if uid not in users:
+            admin = admin or _get_or_create_admin(db)
+            users[uid] = admin
+    margins = _get_or_create_margins(db, {u.id for u in users.values()})
+    for uid in user_ids:
+        basket_user = users[uid]
+        accounts[uid] = (basket_user, margins[basket_user.id])
+    # The get-or-create helpers may commit (expiring loaded rows); reload what the
+    # async caller reads.
+    _refresh_expired(db, *(row for pair in accounts.values() for row in pair))
+
+    legs_by_basket = {}
+    if baskets:
+        legs = (
+            db.query(models.MockBasketLeg)
+            .filter(models.MockBasketLeg.basket_id.in_([b.id for b in baskets]))
+            .order_by(models.MockBasketLeg.id)
+            .all()
+        )
+        for leg in legs:
+            legs_by_basket.setdefault(leg.basket_id, []).append(leg)
 
-    def _get_user_and_margin(uid: int):
-        if uid not in user_cache:
-            basket_user = db.query(models.UserAccount).filter(models.UserAccount.id == uid).first()
-            if not basket_user:
-                basket_user = _get_or_create_admin(db)
-            user_cache[uid] = basket_user
-            margin_cache[uid] = _get_or_create_margin(db, basket_user.id)
-        return user_cache[uid], margin_cache[uid]
+    # Market legs are priced once per distinct symbol, not once per leg.
+    ltps = {}
+    for legs in legs_by_basket.values():
+        for leg in legs:
+            if float(leg.price or 0.0) <= 0 and leg.symbol and leg.symbol not in ltps:
+                ltps[leg.symbol] = _get_ltp(leg.symbol, 0.0)
 
-    result = []
+    loaded = []
     for b in baskets:
-        basket_user, user_margin = _get_user_and_margin(b.user_id)
-        if b.user_id not in available_margin_cache:
-            available_margin_cache[b.user_id] = await _resolve_available_margin(b.user_id, user_margin)
-        effective_available_margin = available_margin_cache[b.user_id]
-        legs = db.query(models.MockBasketLeg).filter(models.MockBasketLeg.basket_id == b.id).all()
-        serialized_legs = [_serialize(l) for l in legs]
-
-        required_margin = 0.0
-        if legs:
-            scripts = []
-            for leg in legs:
-                leg_price = float(leg.price or 0.0)
-                if leg_price <= 0 and leg.symbol:
-                    leg_price = _get_ltp(leg.symbol, leg_price)
-                scripts.append(
-                    MarginScript(
-                        exchange_segment=leg.exchange_segment or "NSE_EQ",
-                        transaction_type=leg.transaction_type or "BUY",
-                        quantity=max(1, int(leg.quantity or 1)),
-                        product_type=leg.product_type or "MIS",
-                        security_id=str(leg.security_id or leg.symbol or ""),
-                        price=leg_price,
-                        symbol=leg.symbol,
-                    )
+        legs = legs_by_basket.get(b.id, [])
+        scripts = []
+        for leg in legs:
+            leg_price = float(leg.price or 0.0)
+            if leg_price <= 0 and leg.symbol:
+                leg_price = ltps.get(leg.symbol, leg_price)
+            scripts.append(
+                MarginScript(
+                    exchange_segment=leg.exchange_segment or "NSE_EQ",
+                    transaction_type=leg.transaction_type or "BUY",
+                    quantity=max(1, int(leg.quantity or 1)),
+                    product_type=leg.product_type or "MIS",
+                    security_id=str(leg.security_id or leg.symbol or ""),
+                    price=leg_price,
+                    symbol=leg.symbol,
                 )
+            )
+        basket_user, user_margin = accounts[b.user_id]
+        loaded.append({
+            "basket": {"id": b.id, "name": b.name, "status": b.status},
+            "user_id": b.user_id,
+            "user": basket_user,
+            "margin": user_margin,
+            "legs": [_serialize(l) for l in legs],
+            "scripts": scripts,
+            # Any leg edit or price move changes the version and invalidates the cached margin.
+            "version": (
+                b.updated_at.isoformat() if b.updated_at else None,
+                tuple(
+                    (leg.id, script.transaction_type, script.quantity, script.product_type, script.price)
+                    for leg, script in zip(legs, scripts)
+                ),
+            ),
+        })
+    return loaded
+
+
+async def _basket_raw_margins(loaded: List[dict]) -> Dict[int, Optional[float]]:
+    """Raw margin per basket: cache by version, else the local engine, else Dhan (concurrently)."""
+    margins: Dict[int, Optional[float]] = {}
+    remote: List[dict] = []
+    for item in loaded:
+        basket_id = item["basket"]["id"]
+        if not item["scripts"]:
+            margins[basket_id] = None
+            continue
+        cached = _BASKET_MARGIN_CACHE.get(basket_id)
+        if cached and cached[0] == item["version"]:
+            margins[basket_id] = cached[1]
+            continue
+        local = _local_margin_for_scripts(item["user_id"], item["scripts"])
+        if local and local.get("margin") is not None:
+            margins[basket_id] = float(local["margin"])
+            _cache_basket_margin(basket_id, item["version"], margins[basket_id], local.get("source") or "LOCAL")
+        else:
+            remote.append(item)
+
+    if remote:
+        # Dhan calls share dhan_margin_service's rate limiter, so gathering them
+        # overlaps their network time without exceeding the request budget.
+        results = await asyncio.gather(
+            *(_dhan_margin_for_scripts(item["user"].id, item["scripts"]) for item in remote),
+            return_exceptions=True,
+        )
+        for item, dhan_margin in zip(remote, results):
+            basket_id = item["basket"]["id"]
+            if isinstance(dhan_margin, dict) and dhan_margin.get("margin") is not None:
+                margins[basket_id] = float(dhan_margin.get("margin") or 0.0)
+                _cache_basket_margin(basket_id, item["version"], margins[basket_id], "DHAN_API_MULTI")
+            else:
+                margins[basket_id] = None
+    return margins
+
+
+def _cache_basket_margin(basket_id: int, version: tuple, margin: float, source: str) -> None:
+    if len(_BASKET_MARGIN_CACHE) >= _BASKET_MARGIN_CACHE_MAX:
+        _BASKET_MARGIN_CACHE.clear()
+    _BASKET_MARGIN_CACHE[basket_id] = (version, margin, source)
+
+
+@router.get("/trading/basket-orders")
+async def list_baskets(user_id: Optional[int] = None, db: Session = Depends(get_db)):
+    loaded = await db_executor.run(_load_baskets, db, user_id)
 
-            if scripts:
-                dhan_margin = await _dhan_margin_for_scripts(basket_user.id, scripts)
-                if dhan_margin and dhan_margin.get("margin") is not None:
-                    product_types = {str(s.product_type or "MIS").upper() for s in scripts}
-                    product_type = "MIS" if product_types == {"MIS"} else None
-                    required_margin = _apply_margin_multiplier(
-                        float(dhan_margin.get("margin") or 0.0),
-                        basket_user,
-                        product_type,
-                    )
+    margin_by_user = {}
+    for item in loaded:
+        margin_by_user.setdefault(item["user_id"], item["margin"])
+    user_ids = list(margin_by_user)
+    available = await asyncio.gather(*(_resolve_available_margin(uid, margin_by_user[uid]) for uid in user_ids))
+    available_margin_cache = dict(zip(user_ids, available))
+    raw_margins = await _basket_raw_margins(loaded)
+
+    result = []
+    for item in loaded:
+        basket_user = item["user"]
+        effective_available_margin = available_margin_cache[item["user_id"]]
+
+        required_margin = 0.0
+        scripts = item["scripts"]
+        raw_margin = raw_margins.get(item["basket"]["id"])
+        if scripts and raw_margin is not None:
+            product_types = {str(s.product_type or "MIS").upper() for s in scripts}
+            product_type = "MIS" if product_types == {"MIS"} else None
+            required_margin = _apply_margin_multiplier(raw_margin, basket_user, product_type)
 
         result.append({
-            "id": b.id,
-            "name": b.name,
-            "status": b.status,
+            **item["basket"],
             "requiredMargin": max(0.0, float(required_margin or 0.0)),
             "availableMargin": float(effective_available_margin),
-            "legs": serialized_legs,
+            "legs": item["legs"],
         })
     return {"data": result}
 
@@ -1591,10 +1779,7 @@ def execute_basket(req: BasketExecuteRequest, db: Session = Depends(get_db)):
 
 @router.post("/api/calculate-margin")
 async def calculate_margin(req: MarginRequest, db: Session = Depends(get_db)):
-    user = db.query(models.UserAccount).filter(models.UserAccount.id == (req.user_id or 1)).first()
-    if not user:
-        user = _get_or_create_admin(db)
-    margin = _get_or_create_margin(db, user.id)
+    user, margin = await db_executor.run(_load_user_and_margin, db, req.user_id)
 
     price = req.price or 0.0
     if price <= 0 and req.symbol:
@@ -1686,7 +1871,27 @@ async def calculate_margin(req: MarginRequest, db: Session = Depends(get_db)):
                 symbol_for_margin = f"{underlying} {expiry_norm or req.expiry} {strike_val} {opt_type}"
             except Exception:
                 pass
-    # Fetch margin from Dhan API - NO LOCAL CALCULATION
+    local_margin = _local_margin_for_order(
+        user_id=user.id,
+        exchange_segment=exchange_segment or req.exchange_segment,
+        symbol=symbol_for_margin,
+        transaction_type=req.transaction_type or "BUY",
+        quantity=req.quantity,
+        price=price,
+        product_type=req.product_type or "MIS",
+        security_id=security_id,
+    )
+    if local_margin:
+        required = _apply_margin_multiplier(float(local_margin.get("margin") or 0.0), user, req.product_type)
+        effective_available_margin = await _resolve_available_margin(user.id, margin)
+        return {
+            "margin": required,
+            "availableMargin": effective_available_margin,
+            "source": local_margin.get("source") or "LOCAL",
+            "breakdown": {k: local_margin.get(k) for k in ("span", "mcx", "equity_margin")},
+        }
+
+    # Local engine couldn't price the instrument - ask Dhan directly
     dhan_margin = None
     try:
         dhan_margin = await _dhan_margin_for_order(
@@ -1713,7 +1918,6 @@ async def calculate_margin(req: MarginRequest, db: Session = Depends(get_db)):
             "raw": dhan_margin.get("raw"),
         }
 
-    # Dhan API failed - no fallback to local calculation
     return {
         "margin": None,
         "availableMargin": await _resolve_available_margin(user.id, margin),
@@ -1728,17 +1932,26 @@ async def calculate_margin_v2(req: MarginRequest, db: Session = Depends(get_db))
 
 @router.post("/margin/calculate-multi")
 async def calculate_margin_multi(req: MultiMarginRequest, db: Session = Depends(get_db)):
-    user = db.query(models.UserAccount).filter(models.UserAccount.id == (req.user_id or 1)).first()
-    if not user:
-        user = _get_or_create_admin(db)
-    margin = _get_or_create_margin(db, user.id)
+    user, margin = await db_executor.run(_load_user_and_margin, db, req.user_id)
+
+    product_types = {str(s.product_type or "MIS").upper() for s in req.scripts}
+    product_type = "MIS" if product_types == {"MIS"} else None
 
-    # Fetch margin from Dhan API - NO LOCAL CALCULATION
+    local_margin = _local_margin_for_scripts(user.id, req.scripts)
+    if local_margin:
+        required = _apply_margin_multiplier(float(local_margin.get("margin") or 0.0), user, product_type)
+        effective_available_margin = await _resolve_available_margin(user.id, margin)
+        return {
+            "margin": required,
+            "availableMargin": effective_available_margin,
+            "source": local_margin.get("source") or "LOCAL",
+            "breakdown": {k: local_margin.get(k) for k in ("span", "mcx", "equity_margin")},
+        }
+
+    # Local engine couldn't price a leg - ask Dhan directly
     dhan_margin = await _dhan_margin_for_scripts(user.id, req.scripts)
     
     if dhan_margin:
-        product_types = {str(s.product_type or "MIS").upper() for s in req.scripts}
-        product_type = "MIS" if product_types == {"MIS"} else None
         required = _apply_margin_multiplier(float(dhan_margin.get("margin") or 0.0), user, product_type)
         effective_available_margin = await _resolve_available_margin(user.id, margin)
         return {
@@ -1748,7 +1961,6 @@ async def calculate_margin_multi(req: MultiMarginRequest, db: Session = Depends(
             "raw": dhan_margin.get("raw"),
         }
 
-    # Dhan API failed - no fallback to local calculation
     return {
         "margin": None,
         "availableMargin": await _resolve_available_margin(user.id, margin),
@@ -1758,10 +1970,7 @@ async def calculate_margin_multi(req: MultiMarginRequest, db: Session = Depends(
 
 @router.get("/margin/account")
 async def margin_account(user_id: Optional[int] = None, db: Session = Depends(get_db)):
-    user = db.query(models.UserAccount).filter(models.UserAccount.id == (user_id or 1)).first()
-    if not user:
-        user = _get_or_create_admin(db)
-    margin = _get_or_create_margin(db, user.id)
+    user, margin = await db_executor.run(_load_user_and_margin, db, user_id)
     local_available = _safe_float(margin.available_margin, 0.0)
     effective_available = await _resolve_available_margin(user.id, margin)
     payload = _serialize(margin)
@@ -1772,17 +1981,15 @@ async def margin_account(user_id: Optional[int] = None, db: Session = Depends(ge
 
 @router.post("/margin/portfolio")
 async def portfolio_margin(req: PortfolioMarginRequest, db: Session = Depends(get_db)):
-    user = db.query(models.UserAccount).filter(models.UserAccount.id == (req.user_id or 1)).first()
-    if not user:
-        user = _get_or_create_admin(db)
-    margin = _get_or_create_margin(db, user.id)
+    user, margin = await db_executor.run(_load_user_and_margin, db, req.user_id)
     effective_available_margin = await _resolve_available_margin(user.id, margin)
 
-    # Convert portfolio positions to Dhan API format
-    fno_positions = fetch_fno_positions(user.id)
-    mcx_positions = fetch_mcx_positions(user.id)
+    fno_positions, mcx_positions = await asyncio.gather(
+        db_executor.run(fetch_fno_positions, user.id),
+        db_executor.run(fetch_mcx_positions, user.id),
+    )
     
-    # Build scripts list for Dhan API
+    # Dhan-format scripts (for the background reconciliation / fallback)
     portfolio_scripts = []
     
     # Add FNO positions
@@ -1817,8 +2024,28 @@ async def portfolio_margin(req: PortfolioMarginRequest, db: Session = Depends(ge
             "span": {"total_margin": 0.0},
             "mcx": {"total_margin": 0.0},
         }
-    
-    # Fetch portfolio margin from Dhan API
+
+    try:
+        local = LOCAL_MARGIN_ENGINE.positions_margin(fno_positions, mcx_positions)
+    except Exception as e:
+        print(f"[MARGIN] Local portfolio margin error: {e}")
+        local = None
+    if local is not None:
+        if all(_numeric_security_id(script["securityId"]) for script in portfolio_scripts):
+            MARGIN_RECONCILER.submit("multi", {
+                "scripts": portfolio_scripts,
+                "include_positions": False,
+                "include_orders": False,
+            }, local["margin"])
+        return {
+            "margin": float(local["margin"]),
+            "availableMargin": effective_available_margin,
+            "source": "LOCAL_PORTFOLIO",
+            "span": local["span"],
+            "mcx": local["mcx"],
+        }
+
+    # Local engine failed - ask Dhan directly
     try:
         margin_result = await dhan_margin_service.calculate_margin_multi(
             scripts=portfolio_scripts,
@@ -1838,7 +2065,6 @@ async def portfolio_margin(req: PortfolioMarginRequest, db: Session = Depends(ge
     except Exception as e:
         print(f"[MARGIN] Portfolio Dhan API error: {e}")
     
-    # Dhan API failed - no fallback to local calculation
     return {
         "margin": None,
         "availableMargin": effective_available_margin,
@@ -1896,10 +2122,11 @@ def list_users(user=Depends(get_current_user), db: Session = Depends(get_db)):
     else:
         # ADMIN: hide SUPER_ADMIN accounts
         users = db.query(models.UserAccount).filter(models.UserAccount.role != "SUPER_ADMIN").all()
+    margins = _get_or_create_margins(db, [u.id for u in users])
     payload = []
     for u in users:
         item = _serialize(u)
-        margin = _get_or_create_margin(db, u.id)
+        margin = margins[u.id]
         allotted = _safe_float(u.wallet_balance, 0.0) * _normalize_margin_multiplier(u.margin_multiplier)
         available = _safe_float(margin.available_margin, 0.0)
         used_stored = _safe_float(margin.used_margin, 0.0)
@@ -1962,6 +2189,7 @@ def create_user(req: UserRequest, user=Depends(get_current_user), db: Session =
     )
     db.add(margin)
     db.commit()
+    invalidate_identity(user.id)
     return {"data": _serialize(user)}
 
 
@@ -2016,6 +2244,7 @@ def update_user(user_id: int, req: UserUpdateRequest, user=Depends(get_current_u
         margin.updated_at = ist_now()
     target.updated_at = ist_now()
     db.commit()
+    invalidate_identity(target.id)
     return {"data": _serialize(target)}
 
 # List all brokerage plans
@@ -2041,6 +2270,7 @@ def delete_user(user_id: int, user=Depends(get_current_user), db: Session = Depe
     target.status = "BLOCKED"
     target.updated_at = ist_now()
     db.commit()
+    invalidate_identity(target.id)
     return {"status": "blocked"}
 
 
@@ -2218,6 +2448,7 @@ def admin_restrict_user(user_id: int, req: RestrictRequest, user=Depends(get_cur
     target.allowed_segments = req.allowed_segments
     target.updated_at = ist_now()
     db.commit()
+    invalidate_identity(target.id)
     return {"data": _serialize(target)}
 
 
@@ -2232,6 +2463,7 @@ def admin_set_brokerage_plan(user_id: int, req: BrokeragePlanRequest, user=Depen
     target.brokerage_plan_id = req.brokerage_plan_id
     target.updated_at = ist_now()
     db.commit()
+    invalidate_identity(target.id)
     return {"data": _serialize(target)}
 
 
@@ -2267,7 +2499,13 @@ def adjust_ledger(req: LedgerAdjustRequest, caller=Depends(get_current_user), db
 
 
 @router.get("/admin/ledger")
-def list_ledger(caller=Depends(get_current_user), user_id: Optional[int] = None, db: Session = Depends(get_db)):
+def list_ledger(
+    caller=Depends(get_current_user),
+    user_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
     require_role(caller, ["ADMIN", "SUPER_ADMIN"])
     allowed_entry_types = ["PAYIN", "PAYOUT", "TRADE_PNL", "ADJUST"]
     query = db.query(models.LedgerEntry).filter(models.LedgerEntry.entry_type.in_(allowed_entry_types))
@@ -2284,6 +2522,8 @@ def list_ledger(caller=Depends(get_current_user), user_id: Optional[int] = None,
             # ADMIN should not see SUPER_ADMIN ledger entries
             sub = db.query(models.UserAccount.id).filter(models.UserAccount.role == "SUPER_ADMIN").subquery()
             query = query.filter(~models.LedgerEntry.user_id.in_(sub))
+    if limit or cursor:
+        return _keyset_response(query, models.LedgerEntry, limit, cursor)
     entries = query.order_by(models.LedgerEntry.created_at.desc()).all()
     return {"data": [_serialize(e) for e in entries]}
 
@@ -2291,27 +2531,28 @@ def list_ledger(caller=Depends(get_current_user), user_id: Optional[int] = None,
 @router.get("/admin/ledger/summary")
 def ledger_summary(caller=Depends(get_current_user), user_id: Optional[int] = None, db: Session = Depends(get_db)):
     require_role(caller, ["ADMIN", "SUPER_ADMIN"])
-    allowed_entry_types = ["PAYIN", "PAYOUT", "TRADE_PNL", "ADJUST"]
-    query = db.query(models.LedgerEntry).filter(models.LedgerEntry.entry_type.in_(allowed_entry_types))
     if user_id:
         target = db.query(models.UserAccount).filter(models.UserAccount.id == user_id).first()
         if not target:
             raise HTTPException(status_code=404, detail="User not found")
         if caller.role == "ADMIN" and target.role in ["ADMIN", "SUPER_ADMIN"] and target.id != caller.id:
             raise HTTPException(status_code=403, detail="Insufficient permissions to view this summary")
-        query = query.filter(models.LedgerEntry.user_id == user_id)
+        total_credit, total_debit = ledger_balances.summary(db, user_ids=[user_id])
+    elif caller.role == "ADMIN":
+        total_credit, total_debit = ledger_balances.summary(db, exclude_roles=("SUPER_ADMIN",))
     else:
-        if caller.role == "ADMIN":
-            sub = db.query(models.UserAccount.id).filter(models.UserAccount.role == "SUPER_ADMIN").subquery()
-            query = query.filter(~models.LedgerEntry.user_id.in_(sub))
-    entries = query.all()
-    total_credit = sum(e.credit or 0.0 for e in entries)
-    total_debit = sum(e.debit or 0.0 for e in entries)
+        total_credit, total_debit = ledger_balances.summary(db)
     return {"data": {"total_credit": total_credit, "total_debit": total_debit}}
 
 
 @router.get("/admin/pnl/snapshots")
-def list_pnl_snapshots(caller=Depends(get_current_user), user_id: Optional[int] = None, db: Session = Depends(get_db)):
+def list_pnl_snapshots(
+    caller=Depends(get_current_user),
+    user_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
     require_role(caller, ["ADMIN", "SUPER_ADMIN"])
     query = db.query(models.PnlSnapshot)
     if user_id:
@@ -2326,6 +2567,8 @@ def list_pnl_snapshots(caller=Depends(get_current_user), user_id: Optional[int]
             # ADMIN should only see USER snapshots (exclude ADMIN/SUPER_ADMIN)
             user_ids = [u.id for u in db.query(models.UserAccount).filter(models.UserAccount.role == "USER").all()]
             query = query.filter(models.PnlSnapshot.user_id.in_(user_ids))
+    if limit or cursor:
+        return _keyset_response(query, models.PnlSnapshot, limit, cursor)
     snapshots = query.order_by(models.PnlSnapshot.created_at.desc()).all()
     return {"data": [_serialize(s) for s in snapshots]}
 
@@ -2370,23 +2613,37 @@ def record_pnl_snapshot(req: PnlSnapshotRequest, caller=Depends(get_current_user
 
 
 @router.get("/admin/payouts")
-def list_payouts(caller=Depends(get_current_user), db: Session = Depends(get_db)):
+def list_payouts(
+    caller=Depends(get_current_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
     require_role(caller, ["ADMIN", "SUPER_ADMIN"])
     query = db.query(models.LedgerEntry).filter(models.LedgerEntry.entry_type == "PAYOUT")
     if caller.role == "ADMIN":
         sub = db.query(models.UserAccount.id).filter(models.UserAccount.role == "SUPER_ADMIN").subquery()
         query = query.filter(~models.LedgerEntry.user_id.in_(sub))
+    if limit or cursor:
+        return _keyset_response(query, models.LedgerEntry, limit, cursor)
     entries = query.all()
     return {"data": [_serialize(e) for e in entries]}
 
 
 @router.get("/admin/payins")
-def list_payins(caller=Depends(get_current_user), db: Session = Depends(get_db)):
+def list_payins(
+    caller=Depends(get_current_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
     require_role(caller, ["ADMIN", "SUPER_ADMIN"])
     query = db.query(models.LedgerEntry).filter(models.LedgerEntry.entry_type == "PAYIN")
     if caller.role == "ADMIN":
         sub = db.query(models.UserAccount.id).filter(models.UserAccount.role == "SUPER_ADMIN").subquery()
         query = query.filter(~models.LedgerEntry.user_id.in_(sub))
+    if limit or cursor:
+        return _keyset_response(query, models.LedgerEntry, limit, cursor)
     entries = query.all()
     return {"data": [_serialize(e) for e in entries]}
 
@@ -2,6 +2,7 @@ import asyncio
 from datetime import datetime
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.market.live_prices import get_prices, get_dashboard_symbols
+from app.market.tick_latency import tick_latency
 from app.ems.exchange_clock import is_market_open
 
 router = APIRouter()
@@ -46,10 +47,12 @@ async def prices_ws(ws: WebSocket):
         msg_count = 0
         while True:
             payload = _serialize_prices()
+            pending_tick = tick_latency.broadcast_enqueued("prices")
             msg_count += 1
             if msg_count % 10 == 0:  # Log every 10th message to avoid spam
                 print(f"[WS] Sending prices to client: {msg_count} messages, payload: {payload}")
             await ws.send_json(payload)
+            tick_latency.broadcast_sent(pending_tick)
             sleep_seconds = 1 if payload.get("status") == "active" else 30
             await asyncio.sleep(sleep_seconds)
     except Exception as e:
@@ -0,0 +1,394 @@
+"""
+Local real-time margin engine with background Dhan reconciliation.
+
+Order placement and the margin endpoints answer from ``LOCAL_MARGIN_ENGINE``:
+the SPAN / MCX calculators in ``app.rms`` fed by the parsed SPAN risk arrays
+(``span_parameters_service``), live prices and instrument-master lot sizes.
+Nothing on that path touches the network.
+
+Dhan's margin calculator is still consulted, but off the request path:
+``MARGIN_RECONCILER.submit`` queues the same request and a background task
+replays it against ``dhan_margin_service`` (with its rate limiting), compares
+the two numbers and logs discrepancies beyond ``MARGIN_RECONCILE_TOLERANCE``.
+Recent discrepancies and counters are exposed via ``get_status()``.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.rms.mcx_margin_calculator import (
+    calculate_mcx_margin_for_positions,
+    position_from_order as mcx_position_from_order,
+)
+from app.rms.span_margin_calculator import (
+    calculate_span_margin_for_positions,
+    position_from_order as span_position_from_order,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _is_mcx_segment(exchange_segment: Optional[str]) -> bool:
+    return "MCX" in (exchange_segment or "").upper()
+
+
+def _is_fno_segment(exchange_segment: Optional[str]) -> bool:
+    text = (exchange_segment or "").upper()
+    if "MCX" in text:
+        return False
+    return "FNO" in text or "NFO" in text
+
+
+def _needs_risk_parameters(pos: Dict[str, Any]) -> bool:
+    """Futures and short options are margined from SPAN data; long options only pay premium."""
+    return pos["instrument"] == "FUT" or (pos["instrument"] == "OPT" and pos["quantity"] < 0)
+
+
+def _has_risk_parameters(pos: Dict[str, Any], mcx: bool) -> bool:
+    """Whether the parsed SPAN files cover this leg (risk array, or the short-option addon)."""
+    try:
+        from app.services.span_parameters_service import span_parameters_service
+    except Exception:
+        return False
+    key = pos.get("underlying") or pos.get("symbol")
+    strike = str(pos.get("strike")) if pos.get("strike") is not None else None
+    lookup = span_parameters_service.get_mcx_risk_array if mcx else span_parameters_service.get_equity_risk_array
+    if lookup(pos["instrument"], key, pos.get("expiry"), strike if pos["instrument"] == "OPT" else None,
+              pos.get("option_type") if pos["instrument"] == "OPT" else None):
+        return True
+    if not mcx and pos["instrument"] == "OPT":
+        # The addon formula is a percentage of the underlying, so it needs a live spot too.
+        if span_parameters_service.get_short_option_addon(key, fallback=None) is None:
+            return False
+        try:
+            from app.market.live_prices import get_price
+
+            spot = get_price(key)
+            return spot is not None and float(spot) > 0
+        except Exception:
+            return False
+    return False
+
+
+def _option_symbol(script: Dict[str, Any]) -> str:
+    """Script symbol, or "UNDERLYING EXPIRY STRIKE CE" built from its option fields."""
+    symbol = (script.get("symbol") or "").strip()
+    expiry = script.get("expiry")
+    strike = script.get("strike")
+    option_type = (script.get("option_type") or "").upper()
+    if symbol and expiry and strike is not None and option_type in ("CE", "PE"):
+        parts = symbol.split()
+        if len(parts) < 3 or parts[-1].upper() not in ("CE", "PE"):
+            return f"{parts[0]} {expiry} {float(strike)} {option_type}"
+    return symbol
+
+
+class LocalMarginEngine:
+    """Margin from local SPAN parameters; every lookup is an in-memory dict hit."""
+
+    def __init__(self, lot_cache_size: int = 4096):
+        self._lot_cache: Dict[Tuple[str, str], int] = {}
+        self._lot_cache_size = lot_cache_size
+
+    # ---- market data ---------------------------------------------------------
+
+    def _lot_size(self, underlying: str, expiry: Optional[str]) -> int:
+        key = ((underlying or "").upper(), str(expiry or ""))
+        cached = self._lot_cache.get(key)
+        if cached is not None:
+            return cached
+        lot = 1
+        try:
+            from app.market.instrument_master.store import INSTRUMENT_STORE
+
+            if INSTRUMENT_STORE.exists():
+                rows = INSTRUMENT_STORE.rows_for_underlying(key[0])
+                for row in rows:
+                    if key[1] and row.expiry and not row.expiry.startswith(key[1][:10]):
+                        continue
+                    if row.lot_size:
+                        lot = row.lot_size
+                        break
+                else:
+                    lot = next((row.lot_size for row in rows if row.lot_size), 1)
+        except Exception:
+            lot = 1
+        if len(self._lot_cache) >= self._lot_cache_size:
+            self._lot_cache.clear()
+        self._lot_cache[key] = lot
+        return lot
+
+    def _market_data(self, positions: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Underlying spot + lot size per underlying (the calculators fall back to the leg price)."""
+        from app.market.live_prices import get_price
+
+        market_data: Dict[str, Dict[str, Any]] = {}
+        for pos in positions:
+            underlying = (pos.get("underlying") or "").strip()
+            if not underlying or underlying in market_data:
+                continue
+            entry: Dict[str, Any] = {"lot_size": self._lot_size(underlying, pos.get("expiry"))}
+            try:
+                ltp = get_price(underlying)
+                if ltp is not None and float(ltp) > 0:
+                    entry["ltp"] = float(ltp)
+            except Exception:
+                pass
+            market_data[underlying] = entry
+        return market_data
+
+    # ---- margin ----------------------------------------------------------------
+
+    def positions_margin(
+        self,
+        fno_positions: List[Dict[str, Any]],
+        mcx_positions: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Combined SPAN (NSE/BSE F&O) and MCX margin for already-parsed positions."""
+        market_data = self._market_data(list(fno_positions) + list(mcx_positions))
+        span = calculate_span_margin_for_positions(fno_positions, market_data) if fno_positions else {"total_margin": 0.0}
+        mcx = calculate_mcx_margin_for_positions(mcx_positions, market_data) if mcx_positions else {"total_margin": 0.0}
+        return {
+            "margin": float(span["total_margin"]) + float(mcx["total_margin"]),
+            "span": span,
+            "mcx": mcx,
+        }
+
+    def margin_for_scripts(self, scripts: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Margin for a set of order legs (hedges inside the set are netted by the calculators).
+
+        Each script needs exchange_segment, symbol (or option fields),
+        transaction_type, quantity and price. Returns None when a derivative
+        leg can't be parsed, when a future or short option has no SPAN risk
+        parameters loaded, or when such legs would come out at zero margin,
+        so the caller falls back to Dhan or notional.
+        """
+        started = time.perf_counter()
+        fno_positions: List[Dict[str, Any]] = []
+        mcx_positions: List[Dict[str, Any]] = []
+        equity_margin = 0.0
+        for script in scripts:
+            segment = script.get("exchange_segment")
+            quantity = int(script.get("quantity") or 0)
+            price = float(script.get("price") or 0.0)
+            transaction_type = script.get("transaction_type") or "BUY"
+            if _is_mcx_segment(segment):
+                pos = mcx_position_from_order(_option_symbol(script), segment, transaction_type, quantity, price)
+                target = mcx_positions
+            elif _is_fno_segment(segment):
+                pos = span_position_from_order(_option_symbol(script), segment, transaction_type, quantity, price)
+                target = fno_positions
+            else:
+                equity_margin += abs(price * quantity)
+                continue
+            if pos["instrument"] not in ("FUT", "OPT"):
+                return None
+            if _needs_risk_parameters(pos) and not _has_risk_parameters(pos, target is mcx_positions):
+                return None
+            target.append(pos)
+
+        result = self.positions_margin(fno_positions, mcx_positions)
+        if result["margin"] <= 0 and any(_needs_risk_parameters(pos) for pos in fno_positions + mcx_positions):
+            return None
+        result["margin"] += equity_margin
+        result["equity_margin"] = equity_margin
+        if fno_positions and mcx_positions:
+            source = "LOCAL_SPAN_MCX"
+        elif mcx_positions:
+            source = "LOCAL_MCX"
+        elif fno_positions:
+            source = "LOCAL_SPAN"
+        else:
+            source = "LOCAL_EQUITY"
+        result["source"] = source
+        result["elapsed_us"] = round((time.perf_counter() - started) * 1e6, 1)
+        return result
+
+    def margin_for_order(
+        self,
+        exchange_segment: Optional[str],
+        symbol: str,
+        transaction_type: str,
+        quantity: int,
+        price: float,
+    ) -> Optional[Dict[str, Any]]:
+        return self.margin_for_scripts([{
+            "exchange_segment": exchange_segment,
+            "symbol": symbol,
+            "transaction_type": transaction_type,
+            "quantity": quantity,
+            "price": price,
+        }])
+
+
+def _remote_margin(result: Optional[Dict[str, Any]]) -> Optional[float]:
+    if not isinstance(result, dict):
+        return None
+    for key in ("margin", "totalMargin", "total_margin"):
+        value = result.get(key)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class MarginReconciler:
+    """Replays local margin decisions against Dhan in the background and logs disagreements."""
+
+    def __init__(self, tolerance: Optional[float] = None, max_pending: int = 256, keep: int = 50):
+        self.enabled = (os.getenv("MARGIN_RECONCILE_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off"))
+        self.tolerance = tolerance if tolerance is not None else _env_float("MARGIN_RECONCILE_TOLERANCE", 0.10)
+        self.max_pending = max_pending
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self.discrepancies: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.stats = {"submitted": 0, "checked": 0, "matched": 0, "mismatched": 0, "unavailable": 0, "dropped": 0}
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Bind to the app event loop and start the worker task.
+
+        Called from ``on_start`` on that loop; ``submit`` from ``db_executor``
+        threads hands items over with ``call_soon_threadsafe`` on the stored loop.
+        """
+        loop = loop or asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is loop and self._task is not None and not self._task.done():
+                return
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = loop.create_task(self._run())
+
+    def stop(self) -> None:
+        with self._lock:
+            task, self._task, self._loop = self._task, None, None
+        if task is not None and not task.done():
+            task.cancel()
+
+    def submit(self, kind: str, request: Dict[str, Any], local_margin: float) -> bool:
+        """
+        Queue a Dhan check of ``local_margin``.
+
+        ``kind`` is "single" (``request`` = calculate_margin_single kwargs) or
+        "multi" (calculate_margin_multi kwargs). Safe to call from the event
+        loop or from worker threads once ``start`` has run; never blocks.
+        """
+        if not self.enabled:
+            return False
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self.stats["dropped"] += 1
+            return False
+        item = (kind, request, float(local_margin), time.time())
+        self.stats["submitted"] += 1
+        try:
+            if self._in_loop(loop):
+                self._enqueue(item)
+            else:
+                loop.call_soon_threadsafe(self._enqueue, item)
+        except RuntimeError:
+            self.stats["dropped"] += 1
+            return False
+        return True
+
+    @staticmethod
+    def _in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    def _enqueue(self, item) -> None:
+        # Always runs on the stored loop.
+        if self._loop is None:
+            self.stats["dropped"] += 1
+            return
+        if self._task is None or self._task.done():
+            self.start(self._loop)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+
+    async def _run(self) -> None:
+        from app.services.dhan_margin_service import dhan_margin_service
+
+        while True:
+            kind, request, local_margin, submitted_at = await self._queue.get()
+            try:
+                if kind == "multi":
+                    result = await dhan_margin_service.calculate_margin_multi(**request)
+                else:
+                    result = await dhan_margin_service.calculate_margin_single(**request)
+                self._record(kind, request, local_margin, _remote_margin(result), submitted_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.stats["unavailable"] += 1
+                logger.debug("Margin reconciliation failed: %s", exc)
+
+    def _record(
+        self,
+        kind: str,
+        request: Dict[str, Any],
+        local_margin: float,
+        remote_margin: Optional[float],
+        submitted_at: float,
+    ) -> None:
+        if remote_margin is None:
+            self.stats["unavailable"] += 1
+            return
+        self.stats["checked"] += 1
+        diff = local_margin - remote_margin
+        base = max(abs(remote_margin), 1.0)
+        if abs(diff) / base <= self.tolerance:
+            self.stats["matched"] += 1
+            return
+        self.stats["mismatched"] += 1
+        entry = {
+            "kind": kind,
+            "request": request,
+            "local_margin": round(local_margin, 2),
+            "dhan_margin": round(remote_margin, 2),
+            "diff": round(diff, 2),
+            "diff_pct": round(diff / base * 100, 2),
+            "submitted_at": submitted_at,
+            "checked_at": time.time(),
+        }
+        self.discrepancies.append(entry)
+        logger.warning(
+            "[MARGIN-RECON] %s local=%.2f dhan=%.2f diff=%+.2f (%.1f%%)",
+            kind, local_margin, remote_margin, diff, entry["diff_pct"],
+        )
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "tolerance": self.tolerance,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            **self.stats,
+            "recent_discrepancies": list(self.discrepancies),
+        }
+
+
+LOCAL_MARGIN_ENGINE = LocalMarginEngine()
+MARGIN_RECONCILER = MarginReconciler()
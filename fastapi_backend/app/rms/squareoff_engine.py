@@ -1,7 +1,265 @@
+"""
+Scheduled MIS auto square-off.
 
-# MIS auto square-off between 15:20–15:25
-from datetime import time, datetime
+At each exchange's cutoff (IST, ``MIS_SQUAREOFF_CUTOFFS``, default NSE/BSE
+15:15 and MCX 23:00) ``SQUAREOFF_ENGINE`` runs one pass for that exchange:
 
-def should_squareoff(product):
-    now = datetime.now().time()
-    return product == "MIS" and time(15,20) <= now <= time(15,25)
+1. pending MIS orders on the exchange are cancelled with one UPDATE;
+2. every open MIS position is loaded with one query;
+3. each distinct symbol is priced once from the live store (longs exit at
+   the bid, shorts at the ask);
+4. all closes go through ``ExecutionEngine.execute_closes`` in chunks that
+   share one ``_FillBatch`` and a single commit.
+
+Runs are serialised by a thread lock plus a cross-process file lock
+(``app.storage.process_lock``), so the job every worker schedules runs once
+and never overlaps a manual ``POST /admin/squareoff/run``; progress is exposed via
+``get_status()``. Positions with no price anywhere are left open and listed
+as ``unpriced`` for a manual force-exit.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+_IST = ZoneInfo("Asia/Kolkata")
+DEFAULT_CUTOFFS = {"NSE": dtime(15, 15), "BSE": dtime(15, 15), "MCX": dtime(23, 0)}
+CHUNK_SIZE = 500
+
+
+def _parse_cutoffs(text: str) -> Dict[str, dtime]:
+    """``"NSE=15:15,BSE=15:15,MCX=23:00"`` -> {exchange: time}; bad entries are ignored."""
+    cutoffs = dict(DEFAULT_CUTOFFS)
+    for item in (text or "").split(","):
+        if "=" not in item:
+            continue
+        exchange, _, hhmm = item.partition("=")
+        try:
+            hour, minute = [int(x) for x in hhmm.strip().split(":")]
+            cutoffs[exchange.strip().upper()] = dtime(hour, minute)
+        except ValueError:
+            logger.warning("Ignoring invalid MIS square-off cutoff %r", item)
+    return cutoffs
+
+
+def should_squareoff(product, exchange: str = "NSE", now: Optional[datetime] = None) -> bool:
+    """True for MIS once the exchange's square-off cutoff has passed (until its close)."""
+    if product != "MIS":
+        return False
+    return SQUAREOFF_ENGINE.is_due(exchange, now)
+
+
+class SquareOffEngine:
+    def __init__(self, chunk_size: int = CHUNK_SIZE) -> None:
+        self.cutoffs = _parse_cutoffs(os.getenv("MIS_SQUAREOFF_CUTOFFS", ""))
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self.progress: Dict[str, Any] = {"running": False}
+        self.last_runs: Dict[str, Dict[str, Any]] = {}
+
+    # ---- exchange clock ----------------------------------------------------------
+
+    def is_due(self, exchange: str, now: Optional[datetime] = None) -> bool:
+        from app.ems.market_config import market_config
+
+        exchange = (exchange or "").upper()
+        cutoff = self.cutoffs.get(exchange)
+        hours = market_config.exchanges.get(exchange)
+        if cutoff is None or hours is None:
+            return False
+        now = now or datetime.now(_IST)
+        if now.weekday() not in hours.working_days:
+            return False
+        return cutoff <= now.time() <= hours.close_time
+
+    def schedule(self, scheduler) -> None:
+        """Add one IST cron job per exchange; catch up at once if started past a cutoff."""
+        for exchange, cutoff in self.cutoffs.items():
+            scheduler.add_job(
+                self._scheduled_run,
+                "cron",
+                args=[exchange],
+                hour=cutoff.hour,
+                minute=cutoff.minute,
+                timezone=_IST,
+                id=f"mis_squareoff_{exchange}",
+                name=f"MIS square-off {exchange}",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+                misfire_grace_time=600,
+            )
+            if self.is_due(exchange):
+                scheduler.add_job(
+                    self._scheduled_run,
+                    "date",
+                    args=[exchange],
+                    run_date=datetime.now(_IST) + timedelta(seconds=5),
+                    id=f"mis_squareoff_{exchange}_catchup",
+                    replace_existing=True,
+                )
+
+    def _scheduled_run(self, exchange: str) -> None:
+        if not self.is_due(exchange):
+            logger.info("[SQUAREOFF] %s not a trading session now; skipping", exchange)
+            return
+        try:
+            self.run([exchange], reason="AUTO_SQUAREOFF")
+        except Exception:
+            logger.exception("[SQUAREOFF] Scheduled square-off for %s failed", exchange)
+
+    # ---- pass ----------------------------------------------------------------------
+
+    @staticmethod
+    def _segment_filter(column, exchanges: Iterable[str]):
+        from sqlalchemy import or_
+
+        return or_(*[column.like(f"{exchange}\\_%", escape="\\") for exchange in exchanges])
+
+    @staticmethod
+    def _price_symbols(engine, positions) -> Dict[Tuple[str, str], Tuple[Optional[float], Optional[float]]]:
+        """(bid, ask) per distinct (symbol, segment), each looked up once."""
+        prices = {}
+        for pos in positions:
+            key = (pos.symbol, pos.exchange_segment)
+            if key in prices:
+                continue
+            snapshot = engine._snapshot_for_order(pos.symbol, pos.exchange_segment)
+            bid, ask = snapshot.get("best_bid"), snapshot.get("best_ask")
+            prices[key] = (bid if bid is not None else ask, ask if ask is not None else bid)
+        return prices
+
+    def run(
+        self,
+        exchanges: Optional[List[str]] = None,
+        reason: str = "AUTO_SQUAREOFF",
+        user_id: Optional[int] = None,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        """Square off open MIS positions on ``exchanges`` (all configured when None)."""
+        exchanges = sorted({(e or "").upper() for e in (exchanges or self.cutoffs)} - {""})
+        from app.storage.process_lock import exclusive
+
+        if not self._lock.acquire(blocking=False):
+            return {"status": "already_running", "progress": dict(self.progress)}
+        try:
+            # Every worker schedules the cutoff job; only the lock holder runs the pass.
+            with exclusive("mis_squareoff") as held:
+                if not held:
+                    logger.info("[SQUAREOFF] %s pass already running in another worker", ",".join(exchanges))
+                    return {"status": "already_running", "progress": dict(self.progress)}
+                return self._run(exchanges, reason, user_id, dry_run)
+        finally:
+            self.progress["running"] = False
+            self._lock.release()
+
+    def _run(self, exchanges: List[str], reason: str, user_id: Optional[int], dry_run: bool) -> Dict[str, Any]:
+        from app.execution_simulator.execution_engine import _FillBatch, get_execution_engine, ist_now
+        from app.storage.db import SessionLocal
+        from app.storage.models import MockOrder, MockPosition
+
+        started = time.time()
+        self.progress = {
+            "running": True, "exchanges": exchanges, "reason": reason, "dry_run": dry_run,
+            "phase": "loading", "total": 0, "closed": 0, "started_at": started,
+        }
+        engine = get_execution_engine()
+        db = SessionLocal()
+        try:
+            position_query = (
+                db.query(MockPosition)
+                .filter(
+                    MockPosition.product_type == "MIS",
+                    MockPosition.quantity != 0,
+                    self._segment_filter(MockPosition.exchange_segment, exchanges),
+                )
+                .order_by(MockPosition.id)
+                .with_for_update()
+            )
+            if user_id is not None:
+                position_query = position_query.filter(MockPosition.user_id == user_id)
+            positions = position_query.all()
+
+            self.progress.update(phase="pricing", total=len(positions))
+            prices = self._price_symbols(engine, positions)
+            closes: List[Tuple[MockPosition, float]] = []
+            unpriced = []
+            for pos in positions:
+                bid, ask = prices[(pos.symbol, pos.exchange_segment)]
+                price = bid if int(pos.quantity) > 0 else ask
+                if price is None or float(price) <= 0:
+                    unpriced.append({"position_id": pos.id, "user_id": pos.user_id, "symbol": pos.symbol, "quantity": pos.quantity})
+                else:
+                    closes.append((pos, float(price)))
+
+            cancelled = 0
+            if not dry_run:
+                self.progress["phase"] = "cancelling"
+                order_query = db.query(MockOrder).filter(
+                    MockOrder.product_type == "MIS",
+                    MockOrder.status.in_(["PENDING", "PARTIAL"]),
+                    self._segment_filter(MockOrder.exchange_segment, exchanges),
+                )
+                if user_id is not None:
+                    order_query = order_query.filter(MockOrder.user_id == user_id)
+                cancelled = order_query.update(
+                    {"status": "CANCELLED", "remarks": reason, "updated_at": ist_now()},
+                    synchronize_session=False,
+                )
+
+                self.progress["phase"] = "closing"
+                batch = _FillBatch(db)
+                for start in range(0, len(closes), self.chunk_size):
+                    chunk = closes[start:start + self.chunk_size]
+                    engine.execute_closes(db, chunk, reason, batch=batch)
+                    batch.flush()
+                    self.progress["closed"] = start + len(chunk)
+                self.progress["phase"] = "committing"
+                db.commit()
+        except Exception as exc:
+            db.rollback()
+            self.progress.update(phase="failed", error=str(exc))
+            logger.exception("[SQUAREOFF] %s pass failed; rolled back", ",".join(exchanges))
+            raise
+        finally:
+            db.close()
+
+        result = {
+            "status": "ok",
+            "exchanges": exchanges,
+            "reason": reason,
+            "dry_run": dry_run,
+            "positions": len(positions),
+            "closed": 0 if dry_run else len(closes),
+            "symbols": len(prices),
+            "cancelled_orders": cancelled,
+            "unpriced": unpriced,
+            "elapsed_ms": round((time.time() - started) * 1000, 1),
+            "finished_at": time.time(),
+        }
+        self.progress.update(phase="done")
+        if not dry_run:
+            for exchange in exchanges:
+                self.last_runs[exchange] = result
+        logger.info(
+            "[SQUAREOFF] %s: closed %d/%d MIS positions (%d symbols, %d orders cancelled, %d unpriced) in %.0fms",
+            ",".join(exchanges), result["closed"], len(positions), len(prices), cancelled, len(unpriced), result["elapsed_ms"],
+        )
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "cutoffs": {exchange: cutoff.strftime("%H:%M") for exchange, cutoff in self.cutoffs.items()},
+            "due": {exchange: self.is_due(exchange) for exchange in self.cutoffs},
+            "progress": dict(self.progress),
+            "last_runs": self.last_runs,
+        }
+
+
+SQUAREOFF_ENGINE = SquareOffEngine()
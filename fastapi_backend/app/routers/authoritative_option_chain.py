@@ -11,6 +11,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 from app.services.authoritative_option_chain_service import authoritative_option_chain_service
+from app.market.tick_latency import tick_latency
 
 logger = logging.getLogger(__name__)
 
@@ -205,7 +206,9 @@ async def option_chain_live_ws(
         while True:
             try:
                 payload = await get_option_chain_live(underlying=symbol, expiry=exp)
+                pending_tick = tick_latency.broadcast_enqueued("option_chain")
                 await ws.send_json(payload)
+                tick_latency.broadcast_sent(pending_tick)
             except HTTPException as http_error:
                 await ws.send_json({
                     "status": "error",
@@ -61,15 +61,10 @@ class ExpiryRefreshScheduler:
             List of expiry dates in YYYY-MM-DD format
         """
         try:
-            # Get active credentials from database
-            from app.storage.db import SessionLocal
-            from app.storage.models import DhanCredential
+            # Active credentials (cached in memory by the credential provider)
+            from app.dhan.credential_provider import get_active_credential
             
-            db = SessionLocal()
-            creds_record = db.query(DhanCredential).filter(
-                DhanCredential.is_default == True
-            ).first() or db.query(DhanCredential).first()
-            db.close()
+            creds_record = get_active_credential()
             
             if not creds_record:
                 logger.warning(f"No active credentials found for {underlying} expiry fetch")
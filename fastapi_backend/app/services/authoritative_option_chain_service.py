@@ -7,7 +7,7 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Set, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 from enum import Enum
 import aiohttp
 import json
@@ -15,9 +15,11 @@ import json
 logger = logging.getLogger(__name__)
 
 from app.market.atm_engine import ATM_ENGINE
+from app.market.shared_market_data import shared_market_data
 from app.ems.exchange_clock import is_market_open
 from app.services.dhan_rate_limiter import DhanRateLimiter
-from app.services.dhan_sdk_bridge import sdk_expiry_list_async, sdk_option_chain_async, sdk_quote_data_async
+from app.services.dhan_quote_batcher import dhan_quote_batcher
+from app.services.dhan_sdk_bridge import sdk_expiry_list_async, sdk_option_chain_async
 
 class ExchangeSegment(Enum):
     NSE = "NSE"
@@ -76,6 +78,8 @@ class OptionChainSkeleton:
             "last_updated": self.last_updated.isoformat()
         }
 
+_OPTION_FIELDS = [f.name for f in fields(OptionData)]
+
 @dataclass
 class ATMRegistry:
     """Stores computed ATM strikes for underlyings"""
@@ -410,6 +414,7 @@ class AuthoritativeOptionChainService:
             
             closing_payload: Dict[str, Any] = {}
             underlyings = ["NIFTY", "BANKNIFTY", "SENSEX"]
+            await self._prefetch_underlying_quotes(underlyings)
             
             for underlying in underlyings:
                 try:
@@ -620,74 +625,68 @@ class AuthoritativeOptionChainService:
         try:
             logger.info("🔄 Loading instrument master from DhanHQ API...")
             
-            # Get credentials from database
-            from app.storage.db import SessionLocal
-            from app.storage.models import DhanCredential
+            # Get credentials (cached in memory by the credential provider)
+            from app.dhan.credential_provider import get_active_credential
             
-            db = SessionLocal()
-            try:
-                creds_record = db.query(DhanCredential).first()
-                if not creds_record:
-                    raise Exception("No DhanHQ credentials found in database")
-                
-                # Use instrument registry as fallback for metadata
-                from app.market.instrument_master.registry import REGISTRY
-                if not REGISTRY.loaded:
-                    REGISTRY.load()
-                
-                # Build instrument master cache from registry
-                self.instrument_master_cache = {}
+            creds_record = get_active_credential()
+            if not creds_record:
+                raise Exception("No DhanHQ credentials found in database")
+            
+            # Use instrument registry as fallback for metadata
+            from app.market.instrument_master.registry import REGISTRY
+            if not REGISTRY.loaded:
+                REGISTRY.load()
+            
+            # Build instrument master cache from registry
+            self.instrument_master_cache = {}
+            
+            # Load index options from registry
+            # Use DhanHQ index security IDs for REST quote/expiry API
+            index_mapping = {
+                "NIFTY": {"segment": "IDX_I", "security_id": 13},
+                "BANKNIFTY": {"segment": "IDX_I", "security_id": 25},
+                "SENSEX": {"segment": "IDX_I", "security_id": 51},
+                "FINNIFTY": {"segment": "IDX_I", "security_id": None},
+                "MIDCPNIFTY": {"segment": "IDX_I", "security_id": None},
+                # BANKEX ID not present in compliance rules; use registry if available
+                "BANKEX": {"segment": "IDX_I", "security_id": None},
+            }
+            
+            for symbol in index_symbols:
+                # Get strike step from registry
+                strike_step = REGISTRY.get_strike_step(symbol)
                 
-                # Load index options from registry
-                # Use DhanHQ index security IDs for REST quote/expiry API
-                index_mapping = {
-                    "NIFTY": {"segment": "IDX_I", "security_id": 13},
-                    "BANKNIFTY": {"segment": "IDX_I", "security_id": 25},
-                    "SENSEX": {"segment": "IDX_I", "security_id": 51},
-                    "FINNIFTY": {"segment": "IDX_I", "security_id": None},
-                    "MIDCPNIFTY": {"segment": "IDX_I", "security_id": None},
-                    # BANKEX ID not present in compliance rules; use registry if available
-                    "BANKEX": {"segment": "IDX_I", "security_id": None},
-                }
+                # Get lot size from index_options configuration (NOT from registry)
+                lot_size = self.index_options.get(symbol, {}).get("lot_size", 50)
                 
-                for symbol in index_symbols:
-                    # Get strike step from registry
-                    strike_step = REGISTRY.get_strike_step(symbol)
-                    
-                    # Get lot size from index_options configuration (NOT from registry)
-                    lot_size = self.index_options.get(symbol, {}).get("lot_size", 50)
-                    
-                    # Get security_id/segment from registry (ONLY for security IDs and segments)
-                    records = REGISTRY.get_by_symbol(symbol)
-                    mapping = index_mapping.get(symbol, {})
-                    security_id = mapping.get("security_id")
-                    segment = mapping.get("segment", "NSE_IDX")
+                # Get security_id/segment from registry (ONLY for security IDs and segments)
+                records = REGISTRY.get_by_symbol(symbol)
+                mapping = index_mapping.get(symbol, {})
+                security_id = mapping.get("security_id")
+                segment = mapping.get("segment", "NSE_IDX")
 
-                    if records:
-                        try:
-                            registry_security_id = int(records[0].get("SECURITY_ID", 0))
-                        except (ValueError, TypeError):
-                            registry_security_id = 0
-                        registry_segment = (records[0].get("SEGMENT", "") or "").strip() or segment
-                        if not security_id and registry_security_id:
-                            security_id = registry_security_id
-                        if registry_segment:
-                            segment = registry_segment
-
-                    if not security_id:
-                        logger.warning(f"⚠️ Missing SecurityId for {symbol}; DhanHQ quote API may fail")
-
-                    self.instrument_master_cache[symbol] = {
-                        "segment": segment,
-                        "security_id": security_id or 0,
-                        "strike_interval": strike_step,
-                        "lot_size": lot_size
-                    }
-                
-                logger.info(f"✅ Loaded {len(self.instrument_master_cache)} instruments from registry")
-                
-            finally:
-                db.close()
+                if records:
+                    try:
+                        registry_security_id = int(records[0].get("SECURITY_ID", 0))
+                    except (ValueError, TypeError):
+                        registry_security_id = 0
+                    registry_segment = (records[0].get("SEGMENT", "") or "").strip() or segment
+                    if not security_id and registry_security_id:
+                        security_id = registry_security_id
+                    if registry_segment:
+                        segment = registry_segment
+
+                if not security_id:
+                    logger.warning(f"⚠️ Missing SecurityId for {symbol}; DhanHQ quote API may fail")
+
+                self.instrument_master_cache[symbol] = {
+                    "segment": segment,
+                    "security_id": security_id or 0,
+                    "strike_interval": strike_step,
+                    "lot_size": lot_size
+                }
+            
+            logger.info(f"✅ Loaded {len(self.instrument_master_cache)} instruments from registry")
             
         except Exception as e:
             logger.error(f"❌ Failed to load instrument master from API/Registry: {e}")
@@ -768,35 +767,42 @@ class AuthoritativeOptionChainService:
             return False
         
     async def _fetch_dhanhq_credentials(self) -> Optional[Dict[str, str]]:
-        """Fetch DhanHQ credentials from database"""
+        """Fetch DhanHQ credentials from the in-memory credential provider"""
         try:
-            from app.storage.db import SessionLocal
-            from app.storage.models import DhanCredential
-            
-            db = SessionLocal()
-            try:
-                creds_record = db.query(DhanCredential).first()
-                if not creds_record:
-                    logger.error("❌ No DhanHQ credentials found in database")
-                    return None
-                
-                return {
-                    "client_id": creds_record.client_id,
-                    "access_token": creds_record.daily_token or creds_record.auth_token
-                }
-            finally:
-                db.close()
+            from app.dhan.credential_provider import get_sdk_credentials
+
+            creds = get_sdk_credentials()
+            if not creds:
+                logger.error("❌ No DhanHQ credentials found in database")
+                return None
+            return creds
                 
         except Exception as e:
             logger.error(f"❌ Error fetching DhanHQ credentials: {e}")
             return None
     
+    async def _prefetch_underlying_quotes(self, underlyings: List[str]) -> None:
+        """Warm the quote batcher cache for all underlyings with a single batched request."""
+        try:
+            if await self.rate_limiter.is_blocked_async("quote"):
+                return
+            if not self.instrument_master_cache:
+                await self._load_instrument_master_cache()
+            creds = await self._fetch_dhanhq_credentials()
+            if not creds:
+                return
+            metas = [self.instrument_master_cache[u] for u in underlyings if u in self.instrument_master_cache]
+            await asyncio.gather(
+                *(dhan_quote_batcher.get_async(meta["segment"], meta["security_id"], creds) for meta in metas)
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Underlying quote prefetch failed: {e}")
+
     async def _fetch_market_data_from_api(self, underlying: str) -> Optional[Dict[str, Any]]:
         """Fetch live market data from DhanHQ REST API"""
         try:
             if await self.rate_limiter.is_blocked_async("quote"):
                 return None
-            await self._enforce_rest_rate_limit("quote")
 
             # Lazy-load instrument metadata cache when startup preload is disabled.
             if not self.instrument_master_cache:
@@ -813,9 +819,9 @@ class AuthoritativeOptionChainService:
             
             instrument_meta = self.instrument_master_cache[underlying]
             security_id = instrument_meta["security_id"]
-            quote_payload = {instrument_meta["segment"]: [int(security_id)]}
 
-            quote_result = await sdk_quote_data_async(creds=creds, securities=quote_payload)
+            # Quote batcher paces the quote API and shares one request across pending lookups.
+            quote_result = await dhan_quote_batcher.get_async(instrument_meta["segment"], security_id, creds)
             if not quote_result.get("ok"):
                 error_kind = quote_result.get("error_kind")
                 if error_kind == "auth":
@@ -829,11 +835,7 @@ class AuthoritativeOptionChainService:
                 )
                 return None
 
-            quote_data = quote_result.get("data") or {}
-            segment_data = quote_data.get("data", {}).get(instrument_meta["segment"], {})
-            sec_payload = segment_data.get(str(security_id)) or segment_data.get(int(security_id))
-            if isinstance(sec_payload, list) and sec_payload:
-                sec_payload = sec_payload[0]
+            sec_payload = quote_result.get("data")
 
             ltp = None
             if isinstance(sec_payload, dict):
@@ -1113,6 +1115,87 @@ class AuthoritativeOptionChainService:
             logger.error(f"❌ Failed to get cache statistics: {e}")
             return {}
     
+    def export_cache_snapshot(self) -> Dict[str, Any]:
+        """Plain-tuple copy of the option chain cache and registries for the warm-start snapshot."""
+        option_fields = _OPTION_FIELDS
+        chains = []
+        for underlying, expiries in list(self.option_chain_cache.items()):
+            for expiry, skeleton in list(expiries.items()):
+                strikes = [
+                    (
+                        strike,
+                        tuple(getattr(data.CE, name) for name in option_fields),
+                        tuple(getattr(data.PE, name) for name in option_fields),
+                    )
+                    for strike, data in list(skeleton.strikes.items())
+                ]
+                chains.append((
+                    underlying, expiry, skeleton.lot_size, skeleton.strike_interval,
+                    skeleton.atm_strike, skeleton.last_updated, strikes,
+                ))
+        return {
+            "option_fields": option_fields,
+            "chains": chains,
+            "atm_cache": dict(self.atm_cache),
+            "expiry_cache": dict(self.expiry_cache),
+            "last_cache_update": dict(self.last_cache_update),
+            "expiries": dict(self.expiry_registry.expiries),
+            "expiries_updated": dict(self.expiry_registry.last_updated),
+            "atm_strikes": dict(self.atm_registry.atm_strikes),
+            "atm_updated": dict(self.atm_registry.last_updated),
+            "cache_source": dict(self.cache_source),
+        }
+
+    def restore_cache_snapshot(self, snapshot: Dict[str, Any]) -> Dict[str, Dict[str, OptionChainSkeleton]]:
+        """
+        Seed the cache from ``export_cache_snapshot`` output; returns what was installed.
+
+        Only underlyings with nothing cached yet are filled. Every leg is marked
+        ``source="SNAPSHOT"`` so it is treated as non-live until a tick or the
+        regular population replaces it.
+        """
+        option_fields = list(snapshot.get("option_fields") or [])
+        if option_fields != _OPTION_FIELDS:
+            if option_fields:
+                logger.warning("⚠️ Ignoring option chain snapshot with a different OptionData layout")
+            return {}
+        source_at = option_fields.index("source")
+        restored: Dict[str, Dict[str, OptionChainSkeleton]] = {}
+        for underlying, expiry, lot_size, strike_interval, atm_strike, last_updated, strikes in snapshot.get("chains") or []:
+            if self.option_chain_cache.get(underlying):
+                continue
+            strike_map = {}
+            for strike, ce, pe in strikes:
+                ce = list(ce)
+                pe = list(pe)
+                ce[source_at] = pe[source_at] = "SNAPSHOT"
+                strike_map[strike] = StrikeData(strike_price=strike, CE=OptionData(*ce), PE=OptionData(*pe))
+            restored.setdefault(underlying, {})[expiry] = OptionChainSkeleton(
+                underlying=underlying,
+                expiry=expiry,
+                lot_size=lot_size,
+                strike_interval=strike_interval,
+                atm_strike=atm_strike,
+                strikes=strike_map,
+                last_updated=last_updated,
+            )
+
+        for underlying, expiries in restored.items():
+            self.option_chain_cache[underlying] = expiries
+            for attr, key in (
+                (self.atm_cache, "atm_cache"),
+                (self.expiry_cache, "expiry_cache"),
+                (self.last_cache_update, "last_cache_update"),
+                (self.expiry_registry.expiries, "expiries"),
+                (self.expiry_registry.last_updated, "expiries_updated"),
+                (self.atm_registry.atm_strikes, "atm_strikes"),
+                (self.atm_registry.last_updated, "atm_updated"),
+            ):
+                value = (snapshot.get(key) or {}).get(underlying)
+                if value is not None and underlying not in attr:
+                    attr[underlying] = value
+        return restored
+
     def get_available_underlyings(self) -> List[str]:
         """Get list of available underlyings in cache"""
         return list(self.option_chain_cache.keys())
@@ -1199,12 +1282,30 @@ class AuthoritativeOptionChainService:
                 return None
             
             skeleton = self.option_chain_cache[underlying][expiry]
-            return skeleton.to_dict()
+            chain = skeleton.to_dict()
+            if shared_market_data.is_reader():
+                self._overlay_shared_ticks(underlying, expiry, chain)
+            return chain
             
         except Exception as e:
             logger.error(f"❌ Failed to get option chain from cache for {underlying} {expiry}: {e}")
             return None
     
+    def _overlay_shared_ticks(self, underlying: str, expiry: str, chain: Dict[str, Any]) -> None:
+        """Apply option ticks published by the feed-owning worker (multi-worker mode)."""
+        for strike_row in (chain.get("strikes") or {}).values():
+            for opt_type in ("CE", "PE"):
+                tick = shared_market_data.read_option(underlying, expiry, strike_row["strike_price"], opt_type)
+                if not tick or not tick.get("ltp"):
+                    continue
+                leg = strike_row[opt_type]
+                leg["ltp"] = tick["ltp"]
+                leg["source"] = "WEBSOCKET"
+                leg["bid"] = tick["bid"] if tick["bid"] is not None else tick["ltp"] * 0.99
+                leg["ask"] = tick["ask"] if tick["ask"] is not None else tick["ltp"] * 1.01
+                if tick.get("depth"):
+                    leg["depth"] = tick["depth"]
+    
     def update_option_price_from_websocket(self, symbol: str, ltp: float) -> int:
         """
         Update all option strikes for a symbol with new LTP
@@ -1419,6 +1520,9 @@ class AuthoritativeOptionChainService:
             if not symbol or not expiry or strike is None or not option_type:
                 return 0
 
+            if shared_market_data.is_writer:
+                shared_market_data.publish_option(symbol, expiry, strike, option_type, ltp, bid, ask, depth)
+
             if symbol not in self.option_chain_cache:
                 return 0
             if expiry not in self.option_chain_cache[symbol]:
@@ -1779,6 +1883,7 @@ class AuthoritativeOptionChainService:
 
             from app.market.live_prices import get_prices
             live_prices = get_prices()
+            await self._prefetch_underlying_quotes(permitted_underlyings)
             
             for underlying in permitted_underlyings:
                 try:
@@ -0,0 +1,217 @@
+"""Natively async, connection-pooled HTTP transport for DhanHQ REST.
+
+``DhanAsyncHTTP`` mirrors the request/response contract of the vendored
+``dhanhq.dhan_http.DhanHTTP`` (same endpoints, same ``status``/``remarks``/
+``data`` response dict) but its ``get``/``post``/``put``/``delete`` are
+coroutines backed by a shared keep-alive ``aiohttp`` session. Because the SDK
+modules (``MarketFeed``, ``OptionChain``, ``Funds``, ...) simply return
+``self.dhan_http.post(...)``, binding them to an ``AsyncDhanContext`` makes
+those SDK methods awaitable without touching the vendored code.
+
+Requests are split into lanes, each with its own connection pool, so the
+order path (margin / fund limits) never queues behind bulk market-data
+refreshes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import weakref
+from json import dumps as json_dumps, loads as json_loads
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+API_BASE_URL = "https://api.dhan.co/v2"
+
+LANE_ORDERS = "orders"
+LANE_MARKET = "market"
+LANE_BULK = "bulk"
+
+_LANE_POOL_SIZES: Dict[str, int] = {
+    LANE_ORDERS: int(os.getenv("DHAN_HTTP_POOL_ORDERS", "8")),
+    LANE_MARKET: int(os.getenv("DHAN_HTTP_POOL_MARKET", "8")),
+    LANE_BULK: int(os.getenv("DHAN_HTTP_POOL_BULK", "2")),
+}
+
+_KEEPALIVE_SECONDS = float(os.getenv("DHAN_HTTP_KEEPALIVE_SECONDS", "60"))
+_DEFAULT_TIMEOUT_SECONDS = float(os.getenv("DHAN_HTTP_TIMEOUT_SECONDS", "30"))
+
+# Endpoint prefix -> total timeout (seconds). Order-path calls fail fast.
+ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    "/margincalculator": 5.0,
+    "/fundlimit": 5.0,
+    "/marketfeed": 10.0,
+    "/optionchain": 15.0,
+    "/charts": 30.0,
+}
+
+# Endpoint prefix -> lane used when the caller does not pin one.
+ENDPOINT_LANES: Dict[str, str] = {
+    "/margincalculator": LANE_ORDERS,
+    "/fundlimit": LANE_ORDERS,
+    "/orders": LANE_ORDERS,
+    "/marketfeed": LANE_MARKET,
+    "/optionchain": LANE_MARKET,
+}
+
+_SUCCESS = "success"
+_FAILURE = "failure"
+
+# aiohttp sessions are bound to the loop that created them.
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, aiohttp.ClientSession]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _match_prefix(endpoint: str, table: Dict[str, Any], default: Any) -> Any:
+    for prefix, value in table.items():
+        if endpoint.startswith(prefix):
+            return value
+    return default
+
+
+def timeout_for(endpoint: str) -> float:
+    return float(_match_prefix(endpoint, ENDPOINT_TIMEOUTS, _DEFAULT_TIMEOUT_SECONDS))
+
+
+def lane_for(endpoint: str) -> str:
+    return str(_match_prefix(endpoint, ENDPOINT_LANES, LANE_BULK))
+
+
+def get_session(lane: str = LANE_MARKET) -> aiohttp.ClientSession:
+    """Return the pooled session for ``lane`` on the running event loop."""
+    loop = asyncio.get_running_loop()
+    by_lane = _sessions.get(loop)
+    if by_lane is None:
+        by_lane = {}
+        _sessions[loop] = by_lane
+
+    session = by_lane.get(lane)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=max(1, _LANE_POOL_SIZES.get(lane, 4)),
+            keepalive_timeout=_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        by_lane[lane] = session
+    return session
+
+
+async def close_sessions() -> None:
+    """Close pooled sessions for the running loop (call on shutdown)."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    by_lane = _sessions.pop(loop, None) or {}
+    for session in by_lane.values():
+        try:
+            await session.close()
+        except Exception:
+            pass
+
+
+def get_pool_status() -> Dict[str, Any]:
+    status: Dict[str, Any] = {}
+    for by_lane in list(_sessions.values()):
+        for lane, session in by_lane.items():
+            connector = session.connector
+            if connector is None:
+                continue
+            entry = status.setdefault(lane, {"limit": connector.limit, "acquired": 0, "closed": session.closed})
+            entry["acquired"] += len(getattr(connector, "_acquired", ()) or ())
+    return status
+
+
+class DhanAsyncHTTP:
+    """Async counterpart of ``dhanhq.dhan_http.DhanHTTP``."""
+
+    def __init__(self, client_id: str, access_token: str, lane: Optional[str] = None) -> None:
+        self.client_id = client_id
+        self.access_token = access_token
+        self.base_url = API_BASE_URL
+        self.lane = lane
+        self.header = {
+            "access-token": self.access_token,
+            "client-id": self.client_id,
+            "Content-type": "application/json",
+            "Accept": "application/json",
+        }
+
+    async def _send_request(self, method: str, endpoint: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        url = self.base_url + endpoint
+        body = None
+        if payload:
+            payload["dhanClientId"] = self.client_id
+            body = json_dumps(payload)
+        try:
+            session = get_session(self.lane or lane_for(endpoint))
+            timeout = aiohttp.ClientTimeout(total=timeout_for(endpoint))
+            async with session.request(method, url, data=body, headers=self.header, timeout=timeout) as response:
+                content = await response.read()
+                return self._parse_response(response.status, content)
+        except Exception as exc:
+            logger.error("Exception in DhanAsyncHTTP.%s %s: %s", method, endpoint, exc or type(exc).__name__)
+            return {
+                "status": _FAILURE,
+                "remarks": str(exc) or type(exc).__name__,
+                "data": "",
+            }
+
+    @staticmethod
+    def _parse_response(status_code: int, content: bytes) -> Dict[str, Any]:
+        status = _FAILURE
+        remarks: Any = ""
+        data: Any = ""
+        try:
+            json_response = json_loads(content)
+            if 200 <= status_code <= 299:
+                status = _SUCCESS
+                data = json_response
+            else:
+                remarks = {
+                    "error_code": json_response.get("errorCode"),
+                    "error_type": json_response.get("errorType"),
+                    "error_message": json_response.get("errorMessage"),
+                }
+        except Exception as exc:
+            logger.warning("Failed to parse Dhan response (HTTP %s): %s", status_code, exc)
+            remarks = f"HTTP {status_code}: {exc}"
+        return {"status": status, "remarks": remarks, "data": data}
+
+    async def get(self, endpoint: str) -> Dict[str, Any]:
+        return await self._send_request("GET", endpoint)
+
+    async def post(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._send_request("POST", endpoint, payload)
+
+    async def put(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._send_request("PUT", endpoint, payload)
+
+    async def delete(self, endpoint: str) -> Dict[str, Any]:
+        return await self._send_request("DELETE", endpoint)
+
+
+class AsyncDhanContext:
+    """Duck-typed ``dhanhq.DhanContext`` whose HTTP medium is ``DhanAsyncHTTP``."""
+
+    def __init__(self, client_id: str, access_token: str, lane: Optional[str] = None) -> None:
+        self.client_id = client_id
+        self.access_token = access_token
+        self.dhan_http = DhanAsyncHTTP(client_id, access_token, lane=lane)
+
+    def get_client_id(self) -> str:
+        return self.client_id
+
+    def get_access_token(self) -> str:
+        return self.access_token
+
+    def get_dhan_http(self) -> DhanAsyncHTTP:
+        return self.dhan_http
+
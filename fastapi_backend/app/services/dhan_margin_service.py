@@ -9,6 +9,8 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 
 import aiohttp
 
+from app.dhan.credential_provider import get_sdk_credentials
+from app.services.dhan_async_http import LANE_ORDERS, get_session, timeout_for
 from app.services.dhan_rate_limiter import DhanRateLimiter
 from app.services.dhan_sdk_bridge import sdk_margin_calculator_async, sdk_get_fund_limits_async
 
@@ -24,25 +26,7 @@ class DhanMarginService:
 
     async def _fetch_credentials(self) -> Optional[Dict[str, str]]:
         try:
-            from app.storage.db import SessionLocal
-            from app.storage.models import DhanCredential
-
-            db = SessionLocal()
-            try:
-                creds = db.query(DhanCredential).filter(DhanCredential.is_default == True).first()
-                if not creds:
-                    creds = db.query(DhanCredential).first()
-                if not creds:
-                    return None
-                access_token = (creds.daily_token or creds.auth_token or "").strip()
-                if not access_token:
-                    return None
-                return {
-                    "client_id": (creds.client_id or "").strip(),
-                    "access_token": access_token,
-                }
-            finally:
-                db.close()
+            return get_sdk_credentials()
         except Exception as exc:
             logger.error("Failed to load Dhan credentials: %s", exc)
             return None
@@ -139,18 +123,20 @@ class DhanMarginService:
             return cached
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers, timeout=10) as response:
-                    data = await response.json()
-                    if response.status != 200:
-                        logger.warning("Dhan margin API error %s: %s", response.status, data)
-                        if response.status in (401, 403):
-                            await self.rate_limiter.block_async("data", 900)
-                        if response.status == 429:
-                            await self.rate_limiter.block_async("data", 120)
-                        return None
-                    self._cache_set(key, data)
-                    return data
+            # Pooled keep-alive session on the order lane; not shared with bulk refreshes.
+            session = get_session(LANE_ORDERS)
+            timeout = aiohttp.ClientTimeout(total=timeout_for("/margincalculator"))
+            async with session.post(url, json=payload, headers=headers, timeout=timeout) as response:
+                data = await response.json()
+                if response.status != 200:
+                    logger.warning("Dhan margin API error %s: %s", response.status, data)
+                    if response.status in (401, 403):
+                        await self.rate_limiter.block_async("data", 900)
+                    if response.status == 429:
+                        await self.rate_limiter.block_async("data", 120)
+                    return None
+                self._cache_set(key, data)
+                return data
         except asyncio.TimeoutError:
             logger.warning("Dhan margin API timeout")
             return None
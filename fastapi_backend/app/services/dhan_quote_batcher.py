@@ -0,0 +1,335 @@
+"""Coalescing batcher for DhanHQ Market Quote (/v2/marketfeed/quote) lookups.
+
+Fallback paths (underlying LTP, MCX quotes, last-close lookups, closing
+snapshot bootstrap) used to fire one quote request per security. The quote
+API accepts up to 1000 instruments per call, so pending lookups are collected
+over a short window, grouped by exchange segment and sent as one request.
+Results are fanned back to every waiter through a short-TTL quote cache.
+
+Both sync callers (threadpool endpoints, feed threads) and async callers can
+use the same batcher: ``submit`` returns a ``concurrent.futures.Future`` and
+``get_async``/``get_many_async`` wrap it for the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.dhan_sdk_bridge import sdk_quote_data
+
+logger = logging.getLogger(__name__)
+
+MAX_INSTRUMENTS_PER_REQUEST = 1000
+
+_CredsKey = Tuple[str, str]
+_QuoteKey = Tuple[str, str]
+
+
+def _as_token(value: object) -> Optional[str]:
+    try:
+        return str(int(float(value)))
+    except Exception:
+        return None
+
+
+def _creds_key(creds: Dict[str, str]) -> Optional[_CredsKey]:
+    client_id = str((creds or {}).get("client_id") or "").strip()
+    access_token = str((creds or {}).get("access_token") or "").strip()
+    if not client_id or not access_token:
+        return None
+    return client_id, access_token
+
+
+def _result(ok: bool, data: Any = None, error_kind: Optional[str] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    return {"ok": ok, "data": data, "error_kind": error_kind, "error": error}
+
+
+def _segment_payload(body: Any, exchange_segment: str) -> Dict[str, Any]:
+    if not isinstance(body, dict):
+        return {}
+    segment_data = body.get(exchange_segment)
+    if isinstance(segment_data, dict):
+        return segment_data
+    nested = body.get("data")
+    if isinstance(nested, dict):
+        nested_segment = nested.get(exchange_segment)
+        if isinstance(nested_segment, dict):
+            return nested_segment
+    return {}
+
+
+class DhanQuoteBatcher:
+    def __init__(
+        self,
+        window_seconds: Optional[float] = None,
+        cache_ttl_seconds: Optional[float] = None,
+        min_interval_seconds: Optional[float] = None,
+        max_instruments: int = MAX_INSTRUMENTS_PER_REQUEST,
+    ) -> None:
+        self.window_seconds = (
+            window_seconds
+            if window_seconds is not None
+            else float(os.getenv("DHAN_QUOTE_BATCH_WINDOW_MS", "75")) / 1000.0
+        )
+        self.cache_ttl_seconds = (
+            cache_ttl_seconds
+            if cache_ttl_seconds is not None
+            else float(os.getenv("DHAN_QUOTE_CACHE_TTL_SECONDS", "3"))
+        )
+        self.min_interval_seconds = (
+            min_interval_seconds
+            if min_interval_seconds is not None
+            else float(os.getenv("DHAN_QUOTE_MIN_INTERVAL_SECONDS", "1.0"))
+        )
+        self.max_instruments = max(1, min(int(max_instruments), MAX_INSTRUMENTS_PER_REQUEST))
+
+        self._cond = threading.Condition()
+        self._pending: Dict[_CredsKey, Dict[_QuoteKey, List[Future]]] = {}
+        self._cache: Dict[_QuoteKey, Tuple[Dict[str, Any], float]] = {}
+        self._cache_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._last_request_at = 0.0
+        self.stats: Dict[str, int] = {"lookups": 0, "cache_hits": 0, "requests": 0, "instruments": 0}
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def get_cached(self, exchange_segment: str, security_id: object) -> Optional[Dict[str, Any]]:
+        token = _as_token(security_id)
+        if not token:
+            return None
+        key = (str(exchange_segment).upper(), token)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if not cached:
+                return None
+            payload, ts = cached
+            if (time.monotonic() - ts) <= self.cache_ttl_seconds:
+                return payload
+            self._cache.pop(key, None)
+        return None
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _count(self, **deltas: int) -> None:
+        # Callers and the flush worker update these concurrently.
+        with self._cache_lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    # ------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------
+
+    def submit(self, exchange_segment: str, security_id: object, creds: Dict[str, str]) -> Future:
+        """Queue a quote lookup and return a future resolving to a bridge-style result.
+
+        The result has the same shape as ``sdk_quote_data`` (``ok``/``data``/
+        ``error_kind``/``error``) but ``data`` is the single security's quote payload.
+        """
+        future: Future = Future()
+        segment = str(exchange_segment or "").strip().upper()
+        token = _as_token(security_id)
+        ckey = _creds_key(creds)
+        self._count(lookups=1)
+
+        if not segment or not token:
+            future.set_result(_result(False, error_kind="other", error="invalid security"))
+            return future
+        if ckey is None:
+            future.set_result(_result(False, error_kind="other", error="Missing Dhan credentials"))
+            return future
+
+        cached = self.get_cached(segment, token)
+        if cached is not None:
+            self._count(cache_hits=1)
+            future.set_result(_result(True, data=cached))
+            return future
+
+        with self._cond:
+            self._pending.setdefault(ckey, {}).setdefault((segment, token), []).append(future)
+            self._ensure_worker()
+            self._cond.notify()
+        return future
+
+    def get(
+        self,
+        exchange_segment: str,
+        security_id: object,
+        creds: Dict[str, str],
+        timeout: Optional[float] = 15.0,
+    ) -> Dict[str, Any]:
+        try:
+            return self.submit(exchange_segment, security_id, creds).result(timeout=timeout)
+        except Exception as exc:
+            return _result(False, error_kind="other", error=str(exc))
+
+    def get_many(
+        self,
+        exchange_segment: str,
+        security_ids: Iterable[object],
+        creds: Dict[str, str],
+        timeout: Optional[float] = 15.0,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Return ``{token: quote_payload}`` for every security that resolved."""
+        futures = {}
+        for security_id in security_ids:
+            token = _as_token(security_id)
+            if token and token not in futures:
+                futures[token] = self.submit(exchange_segment, token, creds)
+
+        deadline = (time.monotonic() + timeout) if timeout is not None else None
+        out: Dict[str, Dict[str, Any]] = {}
+        for token, future in futures.items():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                result = future.result(timeout=remaining)
+            except Exception:
+                continue
+            if result.get("ok") and isinstance(result.get("data"), dict):
+                out[token] = result["data"]
+        return out
+
+    async def get_async(
+        self,
+        exchange_segment: str,
+        security_id: object,
+        creds: Dict[str, str],
+        timeout: Optional[float] = 15.0,
+    ) -> Dict[str, Any]:
+        try:
+            future = self.submit(exchange_segment, security_id, creds)
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except Exception as exc:
+            return _result(False, error_kind="other", error=str(exc) or "timeout")
+
+    async def get_many_async(
+        self,
+        exchange_segment: str,
+        security_ids: Iterable[object],
+        creds: Dict[str, str],
+        timeout: Optional[float] = 15.0,
+    ) -> Dict[str, Dict[str, Any]]:
+        tokens = []
+        for security_id in security_ids:
+            token = _as_token(security_id)
+            if token and token not in tokens:
+                tokens.append(token)
+        results = await asyncio.gather(
+            *(self.get_async(exchange_segment, token, creds, timeout=timeout) for token in tokens)
+        )
+        return {
+            token: result["data"]
+            for token, result in zip(tokens, results)
+            if result.get("ok") and isinstance(result.get("data"), dict)
+        }
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._run, name="dhan-quote-batcher", daemon=True)
+        self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let concurrent callers join the batch before it is sent.
+            if self.window_seconds > 0:
+                time.sleep(self.window_seconds)
+            with self._cond:
+                batch = self._pending
+                self._pending = {}
+            for ckey, waiters in batch.items():
+                try:
+                    self._flush(ckey, waiters)
+                except Exception as exc:
+                    logger.warning("Quote batch flush failed: %s", exc)
+                    self._fail(waiters.values(), _result(False, error_kind="other", error=str(exc)))
+
+    def _throttle(self) -> None:
+        wait = self.min_interval_seconds - (time.monotonic() - self._last_request_at)
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request_at = time.monotonic()
+
+    @staticmethod
+    def _fail(future_lists: Iterable[List[Future]], result: Dict[str, Any]) -> None:
+        for futures in future_lists:
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
+
+    def _flush(self, ckey: _CredsKey, waiters: Dict[_QuoteKey, List[Future]]) -> None:
+        creds = {"client_id": ckey[0], "access_token": ckey[1]}
+        keys = list(waiters.keys())
+        for start in range(0, len(keys), self.max_instruments):
+            chunk = keys[start:start + self.max_instruments]
+            securities: Dict[str, List[int]] = {}
+            for segment, token in chunk:
+                securities.setdefault(segment, []).append(int(token))
+
+            self._throttle()
+            sdk_result = sdk_quote_data(creds, securities)
+            self._count(requests=1, instruments=len(chunk))
+
+            if not sdk_result.get("ok"):
+                failure = _result(
+                    False,
+                    error_kind=sdk_result.get("error_kind") or "other",
+                    error=sdk_result.get("error"),
+                )
+                self._fail((waiters[key] for key in chunk), failure)
+                continue
+
+            body = sdk_result.get("data") or {}
+            ts = time.monotonic()
+            for segment in securities:
+                segment_data = _segment_payload(body, segment)
+                for raw_token, payload in segment_data.items():
+                    token = _as_token(raw_token)
+                    if isinstance(payload, list) and payload:
+                        payload = payload[0]
+                    if not token or not isinstance(payload, dict):
+                        continue
+                    key = (segment, token)
+                    with self._cache_lock:
+                        self._cache[key] = (payload, ts)
+                    for future in waiters.get(key, []):
+                        if not future.done():
+                            future.set_result(_result(True, data=payload))
+
+            self._fail(
+                (waiters[key] for key in chunk),
+                _result(False, error_kind="other", error="security missing from quote response"),
+            )
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = sum(len(items) for items in self._pending.values())
+        with self._cache_lock:
+            cached = len(self._cache)
+            stats = dict(self.stats)
+        return {
+            "window_ms": int(self.window_seconds * 1000),
+            "pending": pending,
+            "cached": cached,
+            **stats,
+        }
+
+
+dhan_quote_batcher = DhanQuoteBatcher()
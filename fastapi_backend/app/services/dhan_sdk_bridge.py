@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import asyncio
 import logging
 import sys
 from functools import lru_cache
@@ -206,12 +205,61 @@ def sdk_margin_calculator(
 def clear_sdk_client_cache() -> None:
     try:
         _get_client.cache_clear()
+        _get_async_client.cache_clear()
     except Exception:
         pass
 
 
+def _register_credential_listener() -> None:
+    # Rebuild SDK clients only when the active credential actually changes.
+    try:
+        from app.dhan.credential_provider import credential_provider
+        credential_provider.subscribe(lambda _reason: clear_sdk_client_cache())
+    except Exception as exc:
+        logger.warning("Failed to register Dhan credential listener: %s", exc)
+
+
+_register_credential_listener()
+
+
+@lru_cache(maxsize=16)
+def _get_async_client(client_id: str, access_token: str):
+    """SDK client bound to the pooled async transport; its REST methods return awaitables."""
+    _ensure_local_sdk_on_path()
+    from dhanhq import dhanhq
+    from app.services.dhan_async_http import AsyncDhanContext
+
+    return dhanhq(AsyncDhanContext(client_id=client_id, access_token=access_token))
+
+
+def _async_client_from_creds(creds: Dict[str, str]):
+    client_id = str(creds.get("client_id") or "").strip()
+    access_token = str(creds.get("access_token") or "").strip()
+    if not client_id or not access_token:
+        raise ValueError("Missing Dhan credentials")
+    return _get_async_client(client_id, access_token)
+
+
+async def _call_async(purpose: str, method_name: str, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+    """Await an SDK method over the async transport instead of a to_thread worker."""
+    creds = kwargs.pop("creds")
+    try:
+        if purpose:
+            _ensure_dhan_enabled(purpose)
+        client = _async_client_from_creds(creds)
+        response = await getattr(client, method_name)(*args, **kwargs)
+        return _parse_sdk_response(response)
+    except Exception as exc:
+        return {
+            "ok": False,
+            "data": None,
+            "error_kind": "disabled" if "blocked" in str(exc).lower() else "other",
+            "error": str(exc),
+        }
+
+
 async def sdk_quote_data_async(creds: Dict[str, str], securities: Dict[str, Any]) -> Dict[str, Any]:
-    return await asyncio.to_thread(sdk_quote_data, creds, securities)
+    return await _call_async("Dhan REST", "quote_data", securities, creds=creds)
 
 
 async def sdk_expiry_list_async(
@@ -219,7 +267,13 @@ async def sdk_expiry_list_async(
     under_security_id: int,
     under_exchange_segment: str,
 ) -> Dict[str, Any]:
-    return await asyncio.to_thread(sdk_expiry_list, creds, under_security_id, under_exchange_segment)
+    return await _call_async(
+        "Dhan REST",
+        "expiry_list",
+        int(under_security_id),
+        str(under_exchange_segment),
+        creds=creds,
+    )
 
 
 async def sdk_option_chain_async(
@@ -228,7 +282,14 @@ async def sdk_option_chain_async(
     under_exchange_segment: str,
     expiry: str,
 ) -> Dict[str, Any]:
-    return await asyncio.to_thread(sdk_option_chain, creds, under_security_id, under_exchange_segment, expiry)
+    return await _call_async(
+        "Dhan REST",
+        "option_chain",
+        int(under_security_id),
+        str(under_exchange_segment),
+        str(expiry),
+        creds=creds,
+    )
 
 
 async def sdk_margin_calculator_async(
@@ -241,16 +302,17 @@ async def sdk_margin_calculator_async(
     price: float,
     trigger_price: float = 0,
 ) -> Dict[str, Any]:
-    return await asyncio.to_thread(
-        sdk_margin_calculator,
-        creds,
-        security_id,
-        exchange_segment,
-        transaction_type,
-        quantity,
-        product_type,
-        price,
-        trigger_price,
+    return await _call_async(
+        "Dhan REST",
+        "margin_calculator",
+        creds=creds,
+        security_id=str(security_id),
+        exchange_segment=str(exchange_segment),
+        transaction_type=str(transaction_type),
+        quantity=int(quantity),
+        product_type=str(product_type),
+        price=float(price),
+        trigger_price=float(trigger_price),
     )
 
 
@@ -269,4 +331,4 @@ def sdk_get_fund_limits(creds: Dict[str, str]) -> Dict[str, Any]:
 
 
 async def sdk_get_fund_limits_async(creds: Dict[str, str]) -> Dict[str, Any]:
-    return await asyncio.to_thread(sdk_get_fund_limits, creds)
\ No newline at end of file
+    return await _call_async("", "get_fund_limits", creds=creds)
\ No newline at end of file
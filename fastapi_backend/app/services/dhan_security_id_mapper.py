@@ -1,18 +1,43 @@
 """
 DhanHQ Security ID Mapper
 Maps option tokens to real DhanHQ security IDs from official CSV data
+
+When the local scrip master is present the maps are built from the shared
+instrument store, so the file is parsed once per process. Otherwise the
+detailed scrip master is parsed line-by-line while it downloads and only
+the columns we use are kept (option rows as compact tuples). The compiled
+result is snapshotted to disk together with the server's ETag/Last-Modified;
+restarts send a conditional GET and reuse the snapshot on 304 (or when Dhan
+is unreachable).
 """
 
+import codecs
 import csv
-import io
-import requests
-from typing import Dict, Optional, Tuple
+import os
+import pickle
+import sys
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 from datetime import datetime
 import threading
+import asyncio
+
+import aiohttp
+
+from app.market.instrument_master.store import INSTRUMENT_STORE
+from app.services.dhan_async_http import LANE_BULK, get_session
+from app.storage.db import DB_DIR
 
 logger = logging.getLogger(__name__)
 
+SCRIP_MASTER_URL = "https://images.dhan.co/api-data/api-scrip-master-detailed.csv"
+SCRIP_SNAPSHOT_PATH = Path(os.getenv("DHAN_SCRIP_SNAPSHOT_PATH") or (DB_DIR / "scrip_master_snapshot.pkl"))
+SCRIP_SNAPSHOT_VERSION = 1
+_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("DHAN_SCRIP_DOWNLOAD_TIMEOUT_SECONDS", "120"))
+_CHUNK_SIZE = 256 * 1024
+
 
 MCX_LOT_SIZE_OVERRIDES = {
     "CRUDEOIL": 100,
@@ -26,160 +51,385 @@ MCX_LOT_SIZE_OVERRIDES = {
     "ALUMINIUM": 5000,
 }
 
+# Logical field -> accepted CSV header names, in order of preference.
+_COLUMN_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "exchange": ("EXCHANGE", "EXCH_ID"),
+    "symbol": ("UNDERLYING_SYMBOL", "SYMBOL", "SYMBOL_NAME"),
+    "security_id": ("SECURITY_ID",),
+    "instrument": ("INSTRUMENT", "INSTRUMENT_TYPE"),
+    "expiry": ("EXPIRY_DATE", "SM_EXPIRY_DATE"),
+    "strike": ("STRIKE_PRICE",),
+    "option_type": ("OPTION_TYPE",),
+    "segment": ("SEGMENT",),
+    "lot_size": ("LOT_SIZE", "MARKET_LOT", "LOT"),
+}
+
+# (exchange, symbol, security_id, expiry, strike, option_type, segment)
+_OptionRow = Tuple[str, str, int, str, float, str, str]
+
+
+class OptionDataView(Mapping):
+    """Read-only ``{token_key: option dict}`` view over compact option rows."""
+
+    __slots__ = ("_rows",)
+
+    def __init__(self, rows: Optional[Dict[str, _OptionRow]] = None):
+        self._rows = rows or {}
+
+    def __getitem__(self, token_key: str) -> Dict:
+        exchange, symbol, security_id, expiry, strike, option_type, segment = self._rows[token_key]
+        return {
+            'exchange': exchange,
+            'symbol': symbol,
+            'security_id': security_id,
+            'expiry': expiry,
+            'strike': strike,
+            'option_type': option_type,
+            'segment': segment,
+        }
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, token_key: object) -> bool:
+        return token_key in self._rows
+
+
+class _ScripMasterParser:
+    """Incremental parser: feed it complete CSV lines as they arrive."""
+
+    def __init__(self, format_expiry, base_lot_sizes: Dict[str, int]):
+        self._format_expiry = format_expiry
+        self._columns: Optional[Dict[str, Tuple[int, ...]]] = None
+        self.rows_seen = 0
+        self.security_id_cache: Dict[str, int] = {}
+        self.option_rows: Dict[str, _OptionRow] = {}
+        self.equity_security: Dict[str, Dict[str, object]] = {}
+        self.lot_size_by_underlying: Dict[str, int] = dict(base_lot_sizes)
+
+    def _set_header(self, row: List[str]) -> None:
+        header = [name.strip().upper() for name in row]
+        self._columns = {
+            field: tuple(header.index(name) for name in aliases if name in header)
+            for field, aliases in _COLUMN_ALIASES.items()
+        }
+
+    def feed(self, lines: Iterable[str]) -> None:
+        for row in csv.reader(lines):
+            if not row:
+                continue
+            if self._columns is None:
+                self._set_header(row)
+                continue
+            self.rows_seen += 1
+            self._parse_row(row)
+
+    def feed_store(self, store) -> None:
+        """Build from the shared instrument store's rows (already split and deduplicated)."""
+        self._set_header(store.header)
+        for row in store.rows:
+            self.rows_seen += 1
+            self._parse_row(row)
+
+    def _field(self, row: List[str], field: str) -> str:
+        for idx in self._columns[field]:
+            if idx < len(row):
+                value = row[idx].strip()
+                if value:
+                    return value
+        return ''
+
+    def _parse_row(self, row: List[str]) -> None:
+        exchange = self._field(row, 'exchange')
+        symbol = self._field(row, 'symbol')
+        security_id = self._field(row, 'security_id')
+        instrument_type = self._field(row, 'instrument')
+        expiry = self._field(row, 'expiry')
+        strike = self._field(row, 'strike')
+        option_type = self._field(row, 'option_type')
+        segment = self._field(row, 'segment')
+        lot_size_raw = self._field(row, 'lot_size')
+
+        symbol_upper = symbol.upper()
+        if lot_size_raw and symbol_upper and symbol_upper not in self.lot_size_by_underlying:
+            try:
+                lot_val = int(float(lot_size_raw))
+                if lot_val > 0:
+                    self.lot_size_by_underlying[sys.intern(symbol_upper)] = lot_val
+            except Exception:
+                pass
+
+        instrument_upper = instrument_type.upper()
+        exchange_upper = exchange.upper()
+        segment_upper = segment.upper()
+
+        # Equity/ETF mapping (NSE_EQ/BSE_EQ) from official CSV.
+        # We only map cash-equity rows (SEGMENT='E') with no option fields.
+        if (
+            symbol_upper
+            and security_id
+            and segment_upper == "E"
+            and not option_type
+            and not strike
+            and (not expiry)
+            and instrument_upper in {"ES", "ETF", "EQUITY", "EQ"}
+        ):
+            try:
+                security_id_int = int(security_id)
+            except (ValueError, TypeError):
+                security_id_int = None
+
+            if security_id_int:
+                exchange_segment = "BSE_EQ" if exchange_upper == "BSE" else "NSE_EQ"
+                existing = self.equity_security.get(symbol_upper)
+                # Prefer NSE over BSE when both exist.
+                if not existing or (existing.get("exchange_segment") == "BSE_EQ" and exchange_segment == "NSE_EQ"):
+                    self.equity_security[symbol_upper] = {
+                        "security_id": security_id_int,
+                        "exchange_segment": exchange_segment,
+                        "exchange": sys.intern(exchange_upper),
+                        "segment": "E",
+                    }
+
+        # Options mapping (OPTIDX only) for strike subscriptions.
+        if 'OPTIDX' not in instrument_type:
+            return
+
+        if not all([exchange, symbol, security_id, expiry, strike, option_type]):
+            return
+
+        try:
+            security_id_int = int(security_id)
+            strike_float = float(strike)
+        except (ValueError, TypeError):
+            return
+
+        try:
+            expiry_formatted = self._format_expiry(expiry)
+        except Exception:
+            return
+
+        token_key = f"{option_type}_{symbol}_{strike_float}_{expiry_formatted}"
+        self.security_id_cache[token_key] = security_id_int
+
+        if "OPT" in instrument_upper:
+            if "BSE" in exchange_upper:
+                segment = "BSE_FNO"
+            elif "NSE" in exchange_upper:
+                segment = "NSE_FNO"
+
+        # Exchange/symbol/expiry/type repeat across thousands of strikes.
+        self.option_rows[token_key] = (
+            sys.intern(exchange),
+            sys.intern(symbol),
+            security_id_int,
+            sys.intern(expiry_formatted),
+            strike_float,
+            sys.intern(option_type),
+            sys.intern(segment),
+        )
+
+
 class DhanSecurityIdMapper:
     """Maps option tokens to real DhanHQ security IDs"""
     
-    def __init__(self):
+    def __init__(self, snapshot_path: Optional[Path] = None):
         self.security_id_cache: Dict[str, int] = {}
-        self.csv_data: Dict[str, Dict] = {}
+        self.csv_data: Mapping = OptionDataView()
         self.equity_security: Dict[str, Dict[str, object]] = {}
         self.lot_size_by_underlying: Dict[str, int] = {}
         self.last_updated = None
+        self.source: Optional[str] = None
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else SCRIP_SNAPSHOT_PATH
         self._load_lock = threading.Lock()
         
     async def load_security_ids(self) -> bool:
-        """Load security IDs from official DhanHQ CSV"""
-        with self._load_lock:
+        """Load security IDs from official DhanHQ CSV (or the on-disk snapshot)"""
+        if self._is_loaded():
+            return True
+
+        # The local scrip master is the same file; reuse the shared store's parse.
+        if INSTRUMENT_STORE.exists():
             try:
-                if self.last_updated and self.security_id_cache and self.csv_data and self.equity_security:
+                parser = await asyncio.to_thread(self._parse_store)
+            except Exception as e:
+                logger.warning(f"⚠️ Instrument store unavailable for security IDs ({e}); falling back to download")
+            else:
+                if parser.security_id_cache:
+                    with self._load_lock:
+                        if self._is_loaded():
+                            return True
+                        self._install(
+                            parser.security_id_cache,
+                            parser.option_rows,
+                            parser.equity_security,
+                            parser.lot_size_by_underlying,
+                            source="instrument store",
+                        )
                     return True
 
-                logger.info("Loading DhanHQ security IDs from official CSV...")
-
-                # Emergency admin disconnect: do not hit any Dhan-hosted endpoints.
-                try:
-                    from app.market.dhan_connection_guard import ensure_enabled
-                    ensure_enabled("Dhan REST")
-                except Exception as exc:
-                    logger.warning("Dhan security master download blocked: %s", exc)
-                    return False
-
-                url = "https://images.dhan.co/api-data/api-scrip-master-detailed.csv"
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-
-                csv_text = response.text
-                csv_reader = csv.DictReader(io.StringIO(csv_text))
-
-                local_security_id_cache: Dict[str, int] = {}
-                local_csv_data: Dict[str, Dict] = {}
-                local_equity_security: Dict[str, Dict[str, object]] = {}
-                local_lot_size_by_underlying: Dict[str, int] = dict(self.lot_size_by_underlying)
-
-                for row in csv_reader:
-                    exchange = (row.get('EXCHANGE') or row.get('EXCH_ID') or '').strip()
-                    symbol = (row.get('UNDERLYING_SYMBOL') or row.get('SYMBOL') or row.get('SYMBOL_NAME') or '').strip()
-                    security_id = (row.get('SECURITY_ID') or '').strip()
-                    instrument_type = (row.get('INSTRUMENT') or row.get('INSTRUMENT_TYPE') or '').strip()
-                    expiry = (row.get('EXPIRY_DATE') or row.get('SM_EXPIRY_DATE') or '').strip()
-                    strike = (row.get('STRIKE_PRICE') or '').strip()
-                    option_type = (row.get('OPTION_TYPE') or '').strip()
-                    segment = (row.get('SEGMENT') or '').strip()
-                    lot_size_raw = row.get('LOT_SIZE') or row.get('MARKET_LOT') or row.get('LOT') or ''
-
-                    try:
-                        lot_val = int(float(str(lot_size_raw).strip())) if str(lot_size_raw).strip() else None
-                        if lot_val and lot_val > 0 and symbol:
-                            key = symbol.strip().upper()
-                            if key not in local_lot_size_by_underlying:
-                                local_lot_size_by_underlying[key] = lot_val
-                    except Exception:
-                        pass
-
-                    symbol_upper = symbol.strip().upper() if symbol else ""
-                    instrument_upper = instrument_type.upper()
-                    exchange_upper = exchange.upper()
-                    segment_upper = segment.upper()
-
-                    # Equity/ETF mapping (NSE_EQ/BSE_EQ) from official CSV.
-                    # We only map cash-equity rows (SEGMENT='E') with no option fields.
-                    if (
-                        symbol_upper
-                        and security_id
-                        and segment_upper == "E"
-                        and not option_type
-                        and not strike
-                        and (not expiry)
-                        and instrument_upper in {"ES", "ETF", "EQUITY", "EQ"}
-                    ):
-                        try:
-                            security_id_int = int(security_id)
-                        except (ValueError, TypeError):
-                            security_id_int = None
-
-                        if security_id_int:
-                            exchange_segment = "BSE_EQ" if exchange_upper == "BSE" else "NSE_EQ"
-                            existing = local_equity_security.get(symbol_upper)
-                            # Prefer NSE over BSE when both exist.
-                            if not existing or (existing.get("exchange_segment") == "BSE_EQ" and exchange_segment == "NSE_EQ"):
-                                local_equity_security[symbol_upper] = {
-                                    "security_id": security_id_int,
-                                    "exchange_segment": exchange_segment,
-                                    "exchange": exchange_upper,
-                                    "segment": segment_upper,
-                                }
-
-                    # Options mapping (OPTIDX only) for strike subscriptions.
-                    if 'OPTIDX' not in instrument_type:
-                        continue
-
-                    if not all([exchange, symbol, security_id, expiry, strike, option_type]):
-                        continue
-
-                    try:
-                        security_id_int = int(security_id)
-                        strike_float = float(strike)
-                    except (ValueError, TypeError):
-                        continue
-
-                    try:
-                        expiry_formatted = self._format_expiry_date(expiry)
-                    except Exception:
-                        continue
-
-                    token_key = f"{option_type}_{symbol}_{strike_float}_{expiry_formatted}"
-                    local_security_id_cache[token_key] = security_id_int
-
-                    if "OPT" in instrument_upper:
-                        if "BSE" in exchange_upper:
-                            segment = "BSE_FNO"
-                        elif "NSE" in exchange_upper:
-                            segment = "NSE_FNO"
-
-                    local_csv_data[token_key] = {
-                        'exchange': exchange,
-                        'symbol': symbol,
-                        'security_id': security_id_int,
-                        'expiry': expiry_formatted,
-                        'strike': strike_float,
-                        'option_type': option_type,
-                        'segment': segment
-                    }
+        logger.info("Loading DhanHQ security IDs from official CSV...")
+        snapshot = await asyncio.to_thread(self._read_snapshot)
 
-                self.security_id_cache = local_security_id_cache
-                self.csv_data = local_csv_data
-                self.equity_security = local_equity_security
-                self.lot_size_by_underlying = local_lot_size_by_underlying
-                self.last_updated = datetime.now()
+        # Emergency admin disconnect: do not hit any Dhan-hosted endpoints.
+        try:
+            from app.market.dhan_connection_guard import ensure_enabled
+            ensure_enabled("Dhan REST")
+        except Exception as exc:
+            logger.warning("Dhan security master download blocked: %s", exc)
+            return self._apply_snapshot(snapshot, "snapshot (Dhan disconnected)")
+
+        # Download on the pooled async transport; holding the thread lock across
+        # an await would block the event loop for any concurrent caller.
+        try:
+            downloaded = await self._download(snapshot)
+        except Exception as e:
+            if snapshot:
+                logger.warning(f"⚠️ Scrip master download failed ({e}); using snapshot")
+                return self._apply_snapshot(snapshot, "snapshot (download failed)")
+            logger.error(f"❌ Failed to load DhanHQ security IDs: {e}")
+            return False
 
-                nifty_count = len([k for k in self.security_id_cache.keys() if 'NIFTY' in k])
-                banknifty_count = len([k for k in self.security_id_cache.keys() if 'BANKNIFTY' in k])
-                sensex_count = len([k for k in self.security_id_cache.keys() if 'SENSEX' in k])
+        if downloaded is None:
+            logger.info("Scrip master unchanged on server (304); using snapshot")
+            return self._apply_snapshot(snapshot, "snapshot (not modified)")
 
-                logger.info(f"✅ Loaded {len(self.security_id_cache):,} security IDs:")
-                logger.info(f"   • NIFTY options: {nifty_count:,}")
-                logger.info(f"   • BANKNIFTY options: {banknifty_count:,}")
-                logger.info(f"   • SENSEX options: {sensex_count:,}")
-                logger.info(f"   • Equities mapped: {len(self.equity_security):,}")
-                if self.lot_size_by_underlying:
-                    logger.info(f"   • Lot sizes mapped: {len(self.lot_size_by_underlying)} underlyings")
+        parser, validators = downloaded
+        if not parser.security_id_cache:
+            logger.error(f"❌ Scrip master parse produced no option rows ({parser.rows_seen:,} rows read)")
+            return self._apply_snapshot(snapshot, "snapshot (empty download)")
 
+        with self._load_lock:
+            if self._is_loaded():
                 return True
+            self._install(
+                parser.security_id_cache,
+                parser.option_rows,
+                parser.equity_security,
+                parser.lot_size_by_underlying,
+                source="download",
+            )
+
+        state = {
+            "version": SCRIP_SNAPSHOT_VERSION,
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+            "saved_at": datetime.now().isoformat(),
+            "security_id_cache": parser.security_id_cache,
+            "option_rows": parser.option_rows,
+            "equity_security": parser.equity_security,
+            "lot_size_by_underlying": parser.lot_size_by_underlying,
+        }
+        await asyncio.to_thread(self._write_snapshot, state)
+        return True
+
+    def _parse_store(self) -> _ScripMasterParser:
+        INSTRUMENT_STORE.ensure_loaded()
+        parser = _ScripMasterParser(self._format_expiry_date, self.lot_size_by_underlying)
+        parser.feed_store(INSTRUMENT_STORE)
+        return parser
+
+    async def _download(self, snapshot: Optional[Dict]) -> Optional[Tuple[_ScripMasterParser, Dict[str, Optional[str]]]]:
+        """Stream and parse the scrip master; ``None`` means 304 Not Modified."""
+        headers = {}
+        if snapshot:
+            if snapshot.get("etag"):
+                headers["If-None-Match"] = snapshot["etag"]
+            if snapshot.get("last_modified"):
+                headers["If-Modified-Since"] = snapshot["last_modified"]
+
+        session = get_session(LANE_BULK)
+        timeout = aiohttp.ClientTimeout(total=_DOWNLOAD_TIMEOUT_SECONDS)
+        async with session.get(SCRIP_MASTER_URL, headers=headers, timeout=timeout) as response:
+            if response.status == 304 and snapshot:
+                return None
+            response.raise_for_status()
+
+            parser = _ScripMasterParser(self._format_expiry_date, self.lot_size_by_underlying)
+            decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+            tail = ""
+            async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                lines = (tail + decoder.decode(chunk)).split("\n")
+                tail = lines.pop()
+                parser.feed(lines)
+            tail += decoder.decode(b"", final=True)
+            if tail:
+                parser.feed([tail])
+
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+        return parser, validators
+
+    def _install(self, security_id_cache, option_rows, equity_security, lot_size_by_underlying, source: str) -> None:
+        self.security_id_cache = security_id_cache
+        self.csv_data = OptionDataView(option_rows)
+        self.equity_security = equity_security
+        self.lot_size_by_underlying = lot_size_by_underlying
+        self.last_updated = datetime.now()
+        self.source = source
+
+        nifty_count = len([k for k in self.security_id_cache.keys() if 'NIFTY' in k])
+        banknifty_count = len([k for k in self.security_id_cache.keys() if 'BANKNIFTY' in k])
+        sensex_count = len([k for k in self.security_id_cache.keys() if 'SENSEX' in k])
+
+        logger.info(f"✅ Loaded {len(self.security_id_cache):,} security IDs ({source}):")
+        logger.info(f"   • NIFTY options: {nifty_count:,}")
+        logger.info(f"   • BANKNIFTY options: {banknifty_count:,}")
+        logger.info(f"   • SENSEX options: {sensex_count:,}")
+        logger.info(f"   • Equities mapped: {len(self.equity_security):,}")
+        if self.lot_size_by_underlying:
+            logger.info(f"   • Lot sizes mapped: {len(self.lot_size_by_underlying)} underlyings")
+
+    def _apply_snapshot(self, snapshot: Optional[Dict], source: str) -> bool:
+        if not snapshot:
+            return False
+        with self._load_lock:
+            if self._is_loaded():
+                return True
+            self._install(
+                snapshot["security_id_cache"],
+                snapshot["option_rows"],
+                snapshot["equity_security"],
+                snapshot["lot_size_by_underlying"],
+                source=source,
+            )
+        return True
+
+    def _read_snapshot(self) -> Optional[Dict]:
+        try:
+            with open(self.snapshot_path, "rb") as fh:
+                snapshot = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:
+            logger.warning(f"⚠️ Ignoring unreadable scrip master snapshot {self.snapshot_path}: {exc}")
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SCRIP_SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def _write_snapshot(self, state: Dict) -> None:
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as fh:
+                pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as exc:
+            logger.warning(f"⚠️ Failed to write scrip master snapshot: {exc}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+
+    def _is_loaded(self) -> bool:
+        return bool(self.last_updated and self.security_id_cache and self.csv_data and self.equity_security)
 
-            except Exception as e:
-                logger.error(f"❌ Failed to load DhanHQ security IDs: {e}")
-                return False
-    
     def _format_expiry_date(self, expiry: str) -> str:
         """Convert DD-MMM-YYYY to YYYY-MM-DD format"""
         try:
@@ -250,6 +500,7 @@ class DhanSecurityIdMapper:
                 'SENSEX': len([k for k in self.security_id_cache.keys() if 'SENSEX' in k]),
             },
             'equities_mapped': len(self.equity_security),
+            'source': self.source,
         }
 
 # Global instance
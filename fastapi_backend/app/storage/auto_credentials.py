@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 from sqlalchemy import text
 from app.storage.db import SessionLocal
 from app.storage.models import DhanCredential
+from app.dhan.credential_provider import notify_credentials_changed
 
 # Fix encoding for Windows
 if sys.stdout.encoding != 'utf-8':
@@ -41,6 +42,7 @@ def _upsert_credential(db, record, **fields):
         setattr(record, key, value)
     record.is_default = True
     db.commit()
+    notify_credentials_changed("loaded from environment")
     return record
 
 
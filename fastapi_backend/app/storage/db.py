@@ -1,5 +1,5 @@
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from pathlib import Path
@@ -20,8 +20,110 @@ else:
 print(f"[DB] Using DATABASE_URL={DATABASE_URL}")
 print(f"[DB] Local DB path: {DB_PATH} exists={DB_PATH.exists()}")
 
-# For SQLite we need check_same_thread; for other DBs omit it
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args, echo=False)
+def _env_int(name, default):
+	try:
+		return int(os.environ.get(name, default))
+	except (TypeError, ValueError):
+		return default
+
+
+def _is_sqlite(url):
+	return url.startswith("sqlite")
+
+
+def _is_sqlite_memory(url):
+	return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+# Per-backend performance profiles. Every knob can be overridden from the environment.
+SQLITE_BUSY_TIMEOUT_MS = _env_int("SQLITE_BUSY_TIMEOUT_MS", 15000)
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL").upper()
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_CACHE_SIZE_KB = _env_int("SQLITE_CACHE_SIZE_KB", 20000)
+SQLITE_STATEMENT_CACHE = _env_int("SQLITE_STATEMENT_CACHE", 256)
+
+
+def _engine_options(url):
+	if _is_sqlite(url):
+		options = {
+			"connect_args": {
+				# Sessions are handed between threads (db_executor, schedulers).
+				"check_same_thread": False,
+				# sqlite3 waits this long on a locked database before raising.
+				"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+				"cached_statements": SQLITE_STATEMENT_CACHE,
+			},
+		}
+		if not _is_sqlite_memory(url):
+			options.update(
+				pool_size=_env_int("DB_POOL_SIZE", 10),
+				max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+				pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+			)
+		return options
+	return {
+		"pool_size": _env_int("DB_POOL_SIZE", 10),
+		"max_overflow": _env_int("DB_MAX_OVERFLOW", 20),
+		"pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+		# Drop server-side idle connections before Postgres/pgbouncer does.
+		"pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+		"pool_pre_ping": True,
+		"pool_use_lifo": True,
+	}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+	cursor = dbapi_connection.cursor()
+	try:
+		# WAL lets readers (price/quote endpoints, schedulers) proceed while a
+		# writer commits instead of failing with "database is locked".
+		cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+		cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+		cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+		cursor.execute(f"PRAGMA cache_size=-{int(SQLITE_CACHE_SIZE_KB)}")
+		cursor.execute("PRAGMA temp_store=MEMORY")
+	finally:
+		cursor.close()
+
+
+def create_storage_engine(url=None, **overrides):
+	"""Build an engine with the performance profile for ``url``'s backend."""
+	url = url or DATABASE_URL
+	options = _engine_options(url)
+	options.update(overrides)
+	new_engine = create_engine(url, echo=False, **options)
+	if _is_sqlite(url) and not _is_sqlite_memory(url):
+		event.listen(new_engine, "connect", _apply_sqlite_pragmas)
+	return new_engine
+
+
+def get_pool_status(target=None):
+	"""Connection pool metrics for ``/health/deep`` and diagnostics."""
+	target = target or engine
+	pool = target.pool
+	status = {
+		"backend": target.dialect.name,
+		"pool_class": type(pool).__name__,
+	}
+	for name in ("size", "checkedin", "checkedout", "overflow"):
+		metric = getattr(pool, name, None)
+		if callable(metric):
+			try:
+				status[name] = metric()
+			except Exception:
+				pass
+	timeout = getattr(pool, "timeout", None)
+	if callable(timeout):
+		status["timeout"] = timeout()
+	if target.dialect.name == "sqlite" and not _is_sqlite_memory(str(target.url)):
+		try:
+			with target.connect() as conn:
+				status["journal_mode"] = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+		except Exception:
+			pass
+	return status
+
+
+engine = create_storage_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
@@ -0,0 +1,122 @@
+"""Run synchronous SQLAlchemy work from ``async def`` routes off the event loop.
+
+The ORM layer is synchronous (``SessionLocal``), so an ``async def`` route that
+queries or commits directly blocks every websocket and request on the loop for
+the whole round-trip. Routes hand their DB work to ``db_executor`` instead:
+
+* ``await db_executor.run(fn, *args)`` runs ``fn`` on a bounded worker pool,
+  e.g. with the request's ``Depends(get_db)`` session as an argument. A session
+  is only ever used by one thread at a time because the route awaits the call.
+* ``await db_executor.run_in_session(fn, *args)`` opens a fresh session in the
+  worker, passes it as the first argument and rolls back/closes it afterwards.
+
+``DB_EXECUTOR_MODE`` selects the strategy: ``thread`` (default) or ``inline``,
+which calls ``fn`` directly on the loop (the old behaviour, for debugging).
+``DB_EXECUTOR_WORKERS`` bounds concurrent DB jobs; keep it at or below the
+connection pool size so workers never queue on the pool while holding a thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.storage.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MODE_THREAD = "thread"
+MODE_INLINE = "inline"
+
+DB_EXECUTOR_MODE = (os.getenv("DB_EXECUTOR_MODE", MODE_THREAD) or MODE_THREAD).strip().lower()
+DB_EXECUTOR_WORKERS = max(1, int(os.getenv("DB_EXECUTOR_WORKERS", "8")))
+
+
+class DBExecutor:
+    def __init__(self, mode: str = DB_EXECUTOR_MODE, max_workers: int = DB_EXECUTOR_WORKERS) -> None:
+        if mode not in (MODE_THREAD, MODE_INLINE):
+            logger.warning("Unknown DB_EXECUTOR_MODE=%r; using %r", mode, MODE_THREAD)
+            mode = MODE_THREAD
+        self.mode = mode
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db-exec")
+        return self._pool
+
+    def _tracked(self, call: Callable[[], T]) -> T:
+        with self._stats_lock:
+            self._in_flight += 1
+        ok = False
+        try:
+            result = call()
+            ok = True
+            return result
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        call = functools.partial(fn, *args, **kwargs)
+        if self.mode == MODE_INLINE:
+            return self._tracked(call)
+        ctx = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), self._tracked, functools.partial(ctx.run, call))
+
+    async def run_in_session(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        def job() -> T:
+            db = SessionLocal()
+            try:
+                return fn(db, *args, **kwargs)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+        return await self.run(job)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+db_executor = DBExecutor()
+
+
+def shutdown_db_executor() -> None:
+    db_executor.shutdown()
@@ -67,6 +67,14 @@ def _ensure_user_accounts_columns():
     if "margin_multiplier" not in existing:
         additions.append("ALTER TABLE user_accounts ADD COLUMN margin_multiplier FLOAT DEFAULT 1.0")
         ensure_margin_multiplier = True
+    if "ledger_balance" not in existing:
+        additions.append("ALTER TABLE user_accounts ADD COLUMN ledger_balance FLOAT")
+    if "ledger_credit_total" not in existing:
+        additions.append("ALTER TABLE user_accounts ADD COLUMN ledger_credit_total FLOAT DEFAULT 0.0")
+    if "ledger_debit_total" not in existing:
+        additions.append("ALTER TABLE user_accounts ADD COLUMN ledger_debit_total FLOAT DEFAULT 0.0")
+    if "ledger_version" not in existing:
+        additions.append("ALTER TABLE user_accounts ADD COLUMN ledger_version INTEGER DEFAULT 0")
 
     if additions or ensure_margin_multiplier:
         with engine.connect() as conn:
@@ -79,6 +87,59 @@ def _ensure_user_accounts_columns():
                 conn.commit()
 
 
+def _ensure_indexes():
+    """Create secondary indexes declared on the models for tables that already exist.
+
+    ``create_all`` only builds indexes together with a new table, so existing
+    deployments (SQLite or Postgres) pick them up here.
+    """
+    inspector = inspect(engine)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if not table.indexes:
+            continue
+        try:
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        except Exception:
+            continue
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=engine, checkfirst=True)
+                created.append(index.name)
+            except Exception as exc:
+                print(f"[DB] ✗ Could not create index {index.name}: {exc}")
+    if created:
+        print(f"[DB] ✓ Created indexes: {', '.join(created)}")
+
+
+def _backfill_ledger_running_balances():
+    """Seed UserAccount running ledger state from existing ledger rows (once per user)."""
+    summary_types = ", ".join(f"'{t}'" for t in ("PAYIN", "PAYOUT", "TRADE_PNL", "ADJUST"))
+    stmt = f"""
+        UPDATE user_accounts SET
+            ledger_balance = COALESCE(
+                (SELECT le.balance FROM ledger_entries le
+                 WHERE le.user_id = user_accounts.id
+                 ORDER BY le.created_at DESC, le.id DESC LIMIT 1),
+                wallet_balance, 0.0),
+            ledger_credit_total = COALESCE(
+                (SELECT SUM(le.credit) FROM ledger_entries le
+                 WHERE le.user_id = user_accounts.id AND le.entry_type IN ({summary_types})), 0.0),
+            ledger_debit_total = COALESCE(
+                (SELECT SUM(le.debit) FROM ledger_entries le
+                 WHERE le.user_id = user_accounts.id AND le.entry_type IN ({summary_types})), 0.0),
+            ledger_version = COALESCE(ledger_version, 0)
+        WHERE ledger_balance IS NULL
+    """
+    with engine.connect() as conn:
+        result = conn.execute(text(stmt))
+        conn.commit()
+        if result.rowcount:
+            print(f"[DB] ✓ Seeded running ledger balance for {result.rowcount} users")
+
+
 def _ensure_bootstrap_admin_user():
     """Create/repair an admin login user for fresh deployments.
 
@@ -259,6 +320,8 @@ def init_db():
         
         _ensure_dhan_credentials_columns()
         _ensure_user_accounts_columns()
+        _backfill_ledger_running_balances()
+        _ensure_indexes()
         _restore_users_from_sqlite_if_configured()
         _ensure_bootstrap_admin_user()
         print("[DB] ✓ Schema migrations complete")
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, UniqueConstraint, Index
 from datetime import datetime, timezone, timedelta
 
 # IST timezone offset (UTC+5:30)
@@ -110,6 +110,11 @@ class UserAccount(Base):
     wallet_balance = Column(Float, default=0.0)
     margin_multiplier = Column(Float, default=5.0)
     brokerage_plan_id = Column(Integer, ForeignKey("brokerage_plans.id"), nullable=True)
+    # Running ledger state, maintained by app.ledger.running_balance.
+    ledger_balance = Column(Float, nullable=True)
+    ledger_credit_total = Column(Float, default=0.0)
+    ledger_debit_total = Column(Float, default=0.0)
+    ledger_version = Column(Integer, default=0)
     created_at = Column(DateTime, default=ist_now)
     updated_at = Column(DateTime, default=ist_now)
 
@@ -148,6 +153,11 @@ class MockOrder(Base):
     remarks = Column(Text, nullable=True)
     created_at = Column(DateTime, default=ist_now)
     updated_at = Column(DateTime, default=ist_now)
+    __table_args__ = (
+        Index('ix_mock_orders_status_created', 'status', 'created_at'),
+        Index('ix_mock_orders_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_mock_orders_created', 'created_at', 'id'),
+    )
 
 
 class MockTrade(Base):
@@ -158,6 +168,10 @@ class MockTrade(Base):
     price = Column(Float, nullable=False)
     qty = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=ist_now)
+    __table_args__ = (
+        Index('ix_mock_trades_order', 'order_id'),
+        Index('ix_mock_trades_user_created', 'user_id', 'created_at', 'id'),
+    )
 
 
 class ExecutionEvent(Base):
@@ -174,6 +188,10 @@ class ExecutionEvent(Base):
     latency_ms = Column(Integer, nullable=True)
     slippage = Column(Float, nullable=True)
     created_at = Column(DateTime, default=ist_now)
+    __table_args__ = (
+        Index('ix_execution_events_order', 'order_id'),
+        Index('ix_execution_events_user_created', 'user_id', 'created_at', 'id'),
+    )
 
 
 class MockPosition(Base):
@@ -189,7 +207,10 @@ class MockPosition(Base):
     status = Column(String, default="OPEN")  # OPEN | CLOSED
     created_at = Column(DateTime, default=ist_now)
     updated_at = Column(DateTime, default=ist_now)
-    __table_args__ = (UniqueConstraint('user_id', 'symbol', 'product_type', name='uq_user_symbol_product'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'symbol', 'product_type', name='uq_user_symbol_product'),
+        Index('ix_mock_positions_user_status', 'user_id', 'status'),
+    )
 
 
 class LedgerEntry(Base):
@@ -202,6 +223,10 @@ class LedgerEntry(Base):
     balance = Column(Float, default=0.0)
     remarks = Column(Text, nullable=True)
     created_at = Column(DateTime, default=ist_now)
+    __table_args__ = (
+        Index('ix_ledger_entries_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_ledger_entries_type_created', 'entry_type', 'created_at', 'id'),
+    )
 
 
 class PnlSnapshot(Base):
@@ -212,6 +237,10 @@ class PnlSnapshot(Base):
     mtm = Column(Float, default=0.0)
     total_pnl = Column(Float, default=0.0)
     created_at = Column(DateTime, default=ist_now)
+    __table_args__ = (
+        Index('ix_pnl_snapshots_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_pnl_snapshots_created', 'created_at', 'id'),
+    )
 
 
 class MockBasket(Base):
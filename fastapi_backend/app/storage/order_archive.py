@@ -0,0 +1,427 @@
+"""
+Columnar archive of purged orders, trades and execution events.
+
+``purge_previous_day_orders`` exports the rows it is about to delete into
+date-partitioned column files so history stays queryable without keeping it
+in the OLTP tables:
+
+    database/order_archive/<table>/date=YYYY-MM-DD/part-<stamp>.tnc
+
+(``ORDER_ARCHIVE_DIR`` overrides the root). The layout follows Parquet's
+hive-style partitioning; the files use a small stdlib format instead of
+pyarrow, which isn't a dependency here:
+
+* every column is one zlib-compressed chunk - integers/datetimes as int64,
+  floats as float64 (both with a null bitmap), strings dictionary-encoded as
+  uint32 codes plus the distinct values;
+* a JSON footer holds the schema, chunk offsets and per-column min/max, and
+  for strings the dictionary itself.
+
+``ORDER_ARCHIVE.query`` pushes predicates down in three steps: partitions
+outside the date range are never opened, files whose footer min/max (or
+symbol dictionary) can't match are skipped, and only the filter and
+projected columns of the remaining files are decompressed.
+"""
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from app.storage.db import DB_DIR
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(os.getenv("ORDER_ARCHIVE_DIR") or (DB_DIR / "order_archive"))
+FILE_SUFFIX = ".tnc"
+
+_MAGIC = b"TNXC"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sH")
+_TRAILER = struct.Struct("<Q4s")  # footer length, magic
+_NULL_CODE = 0xFFFFFFFF
+_EPOCH = datetime(1970, 1, 1)
+
+# Column kinds: "i" int64, "f" float64, "b" bool (int64), "t" datetime (int64 us), "s" string.
+TABLES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "orders": (
+        ("id", "i"), ("order_ref", "s"), ("user_id", "i"), ("symbol", "s"), ("security_id", "s"),
+        ("exchange_segment", "s"), ("transaction_type", "s"), ("quantity", "i"), ("filled_qty", "i"),
+        ("order_type", "s"), ("product_type", "s"), ("price", "f"), ("trigger_price", "f"),
+        ("status", "s"), ("basket_id", "i"), ("is_super", "b"), ("target_price", "f"),
+        ("stop_loss_price", "f"), ("trailing_jump", "f"), ("remarks", "s"),
+        ("created_at", "t"), ("updated_at", "t"),
+    ),
+    # Trades carry their order's symbol/side/segment so they can be filtered without a join.
+    "trades": (
+        ("id", "i"), ("order_id", "i"), ("user_id", "i"), ("symbol", "s"), ("exchange_segment", "s"),
+        ("transaction_type", "s"), ("price", "f"), ("qty", "i"), ("created_at", "t"),
+    ),
+    "execution_events": (
+        ("id", "i"), ("order_id", "i"), ("user_id", "i"), ("symbol", "s"), ("event_type", "s"),
+        ("decision_time_price", "f"), ("fill_price", "f"), ("fill_quantity", "i"), ("reason", "s"),
+        ("latency_ms", "i"), ("slippage", "f"), ("created_at", "t"),
+    ),
+}
+
+DateLike = Union[date, datetime, str, None]
+
+
+def _to_micros(value: datetime) -> int:
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def _as_date(value: DateLike) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+# ---- encoding -------------------------------------------------------------------
+
+
+def _null_bitmap(values: Sequence[Any]) -> Optional[bytes]:
+    if all(v is not None for v in values):
+        return None
+    bits = bytearray((len(values) + 7) // 8)
+    for i, v in enumerate(values):
+        if v is None:
+            bits[i >> 3] |= 1 << (i & 7)
+    return bytes(bits)
+
+
+def _encode_column(kind: str, values: Sequence[Any]) -> Tuple[bytes, Dict[str, Any]]:
+    """Raw chunk bytes and footer metadata for one column."""
+    meta: Dict[str, Any] = {}
+    if kind == "s":
+        distinct: Dict[str, int] = {}
+        code = distinct.setdefault
+        codes = array("I", [_NULL_CODE if v is None else code(str(v), len(distinct)) for v in values])
+        meta["dictionary"] = list(distinct)
+        if distinct:
+            meta["min"], meta["max"] = min(distinct), max(distinct)
+        return codes.tobytes(), meta
+
+    nulls = _null_bitmap(values)
+    if kind == "f":
+        data = array("d", [0.0 if v is None else float(v) for v in values])
+    elif kind == "t":
+        data = array("q", [0 if v is None else _to_micros(v) for v in values])
+    else:
+        data = array("q", [0 if v is None else int(v) for v in values])
+    present = [x for x, v in zip(data, values) if v is not None] if nulls else data
+    if len(present):
+        meta["min"], meta["max"] = min(present), max(present)
+    if nulls:
+        meta["null_bytes"] = len(nulls)
+        return nulls + data.tobytes(), meta
+    return data.tobytes(), meta
+
+
+def _decode_column(kind: str, raw: bytes, meta: Dict[str, Any], rows: int) -> List[Any]:
+    if kind == "s":
+        codes = array("I")
+        codes.frombytes(raw)
+        dictionary = meta.get("dictionary") or []
+        return [None if c == _NULL_CODE else dictionary[c] for c in codes]
+
+    null_bytes = int(meta.get("null_bytes") or 0)
+    nulls, body = raw[:null_bytes], raw[null_bytes:]
+    data = array("d" if kind == "f" else "q")
+    data.frombytes(body)
+    if kind == "t":
+        values: List[Any] = [_from_micros(v) for v in data]
+    elif kind == "b":
+        values = [bool(v) for v in data]
+    else:
+        values = data.tolist()
+    if nulls:
+        for i in range(rows):
+            if nulls[i >> 3] & (1 << (i & 7)):
+                values[i] = None
+    return values
+
+
+def write_part(path: Path, table: str, rows: Sequence[Dict[str, Any]]) -> None:
+    """Write ``rows`` (dicts keyed by the table's column names) as one column file."""
+    schema = TABLES[table]
+    columns = []
+    offset = _HEADER.size
+    chunks: List[bytes] = []
+    for name, kind in schema:
+        raw, meta = _encode_column(kind, [row.get(name) for row in rows])
+        packed = zlib.compress(raw, 6)
+        columns.append({"name": name, "kind": kind, "offset": offset, "length": len(packed), **meta})
+        chunks.append(packed)
+        offset += len(packed)
+    footer = json.dumps({"table": table, "rows": len(rows), "columns": columns}, separators=(",", ":")).encode()
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, "wb") as fh:
+        fh.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION))
+        for packed in chunks:
+            fh.write(packed)
+        fh.write(footer)
+        fh.write(_TRAILER.pack(len(footer), _MAGIC))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+class _Part:
+    """Lazily-read column file: footer on open, chunks on demand."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as fh:
+            magic, version = _HEADER.unpack(fh.read(_HEADER.size))
+            if magic != _MAGIC or version != _FORMAT_VERSION:
+                raise ValueError(f"not an order archive file: {path}")
+            fh.seek(-_TRAILER.size, os.SEEK_END)
+            footer_len, magic = _TRAILER.unpack(fh.read(_TRAILER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"truncated order archive file: {path}")
+            fh.seek(-(_TRAILER.size + footer_len), os.SEEK_END)
+            footer = json.loads(fh.read(footer_len))
+        self.rows = int(footer["rows"])
+        self.columns = {col["name"]: col for col in footer["columns"]}
+
+    def may_match(self, name: str, low: Any = None, high: Any = None, equals: Any = None) -> bool:
+        meta = self.columns.get(name)
+        if meta is None or self.rows == 0:
+            return self.rows > 0
+        if equals is not None and meta["kind"] == "s":
+            return equals in meta.get("dictionary", ())
+        if "min" not in meta:
+            return equals is None and low is None and high is None
+        if equals is not None:
+            low = high = equals
+        if low is not None and meta["max"] < low:
+            return False
+        if high is not None and meta["min"] > high:
+            return False
+        return True
+
+    def read(self, names: Iterable[str]) -> Dict[str, List[Any]]:
+        out: Dict[str, List[Any]] = {}
+        with open(self.path, "rb") as fh:
+            for name in names:
+                meta = self.columns.get(name)
+                if meta is None:
+                    out[name] = [None] * self.rows
+                    continue
+                fh.seek(meta["offset"])
+                raw = zlib.decompress(fh.read(meta["length"]))
+                out[name] = _decode_column(meta["kind"], raw, meta, self.rows)
+        return out
+
+
+class OrderArchive:
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root) if root else ARCHIVE_DIR
+        self._lock = threading.Lock()
+
+    # ---- write ------------------------------------------------------------------
+
+    def archive(self, table: str, rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Append ``rows`` to ``table``, one new part file per ``created_at`` date.
+
+        Returns rows written per partition date. Files are fsynced and renamed
+        into place before this returns, so callers may delete the source rows.
+        """
+        if table not in TABLES:
+            raise ValueError(f"unknown archive table: {table}")
+        by_date: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            created = row.get("created_at")
+            key = created.date().isoformat() if isinstance(created, datetime) else "unknown"
+            by_date.setdefault(key, []).append(row)
+
+        stamp = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        written: Dict[str, int] = {}
+        with self._lock:
+            for day, day_rows in sorted(by_date.items()):
+                part_dir = self.root / table / f"date={day}"
+                path = part_dir / f"part-{stamp}{FILE_SUFFIX}"
+                n = 1
+                while path.exists():
+                    path = part_dir / f"part-{stamp}-{n}{FILE_SUFFIX}"
+                    n += 1
+                write_part(path, table, day_rows)
+                written[day] = len(day_rows)
+        if written:
+            logger.info("Archived %s %s rows into %s partitions", sum(written.values()), table, len(written))
+        return written
+
+    def archive_before(self, db, cutoff: datetime) -> Dict[str, int]:
+        """
+        Archive every order created before ``cutoff`` with its trades and execution events.
+
+        Used by ``purge_previous_day_orders`` ahead of the delete; raises on any
+        write failure so the purge never removes rows that weren't archived.
+        """
+        from sqlalchemy import select
+        from app.storage.models import ExecutionEvent, MockOrder, MockTrade
+
+        old_orders = select(MockOrder.id).where(MockOrder.created_at < cutoff)
+        order_columns = [getattr(MockOrder, name) for name, _kind in TABLES["orders"]]
+        orders = [row._asdict() for row in db.query(*order_columns).filter(MockOrder.created_at < cutoff)]
+        order_info = {o["id"]: o for o in orders}
+
+        trades = []
+        for trade in (
+            db.query(MockTrade.id, MockTrade.order_id, MockTrade.user_id, MockTrade.price, MockTrade.qty, MockTrade.created_at)
+            .filter(MockTrade.order_id.in_(old_orders))
+        ):
+            row = trade._asdict()
+            order = order_info.get(row["order_id"]) or {}
+            row["symbol"] = order.get("symbol")
+            row["exchange_segment"] = order.get("exchange_segment")
+            row["transaction_type"] = order.get("transaction_type")
+            trades.append(row)
+
+        event_columns = [getattr(ExecutionEvent, name) for name, _kind in TABLES["execution_events"]]
+        events = [
+            row._asdict()
+            for row in db.query(*event_columns).filter(ExecutionEvent.order_id.in_(old_orders))
+        ]
+
+        return {
+            "orders_archived": sum(self.archive("orders", orders).values()),
+            "trades_archived": sum(self.archive("trades", trades).values()),
+            "execution_events_archived": sum(self.archive("execution_events", events).values()),
+        }
+
+    # ---- read -------------------------------------------------------------------
+
+    def partitions(self, table: str) -> List[str]:
+        base = self.root / table
+        if not base.exists():
+            return []
+        return sorted(p.name[5:] for p in base.iterdir() if p.is_dir() and p.name.startswith("date="))
+
+    def _parts(self, table: str, start: Optional[date], end: Optional[date]) -> Iterator[_Part]:
+        for day in self.partitions(table):
+            try:
+                day_value = date.fromisoformat(day)
+            except ValueError:
+                day_value = None
+            if day_value is not None and ((start and day_value < start) or (end and day_value > end)):
+                continue
+            for path in sorted((self.root / table / f"date={day}").glob(f"*{FILE_SUFFIX}")):
+                try:
+                    yield _Part(path)
+                except Exception as exc:
+                    logger.warning("Skipping unreadable archive file %s: %s", path, exc)
+
+    def scan(
+        self,
+        table: str,
+        user_id: Optional[int] = None,
+        symbol: Optional[str] = None,
+        start_date: DateLike = None,
+        end_date: DateLike = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Iterator[Dict[str, List[Any]]]:
+        """
+        Matching rows as column batches (one dict of lists per surviving file).
+
+        ``start_date``/``end_date`` are inclusive IST trading dates.
+        """
+        if table not in TABLES:
+            raise ValueError(f"unknown archive table: {table}")
+        schema = [name for name, _kind in TABLES[table]]
+        wanted = [c for c in (columns or schema) if c in schema]
+        start, end = _as_date(start_date), _as_date(end_date)
+        low = _to_micros(datetime.combine(start, datetime.min.time())) if start else None
+        high = _to_micros(datetime.combine(end, datetime.max.time())) if end else None
+        symbol = symbol.strip().upper() if symbol else None
+
+        for part in self._parts(table, start, end):
+            if user_id is not None and not part.may_match("user_id", equals=int(user_id)):
+                continue
+            if symbol is not None and not part.may_match("symbol", equals=symbol):
+                continue
+            if (low is not None or high is not None) and not part.may_match("created_at", low=low, high=high):
+                continue
+
+            filters = []
+            if user_id is not None:
+                filters.append("user_id")
+            if symbol is not None:
+                filters.append("symbol")
+            if low is not None or high is not None:
+                filters.append("created_at")
+            data = part.read(dict.fromkeys(filters + wanted))
+
+            keep: Optional[List[int]] = None
+            if filters:
+                uid = int(user_id) if user_id is not None else None
+                lo = _from_micros(low) if low is not None else None
+                hi = _from_micros(high) if high is not None else None
+                keep = [
+                    i for i in range(part.rows)
+                    if (uid is None or data["user_id"][i] == uid)
+                    and (symbol is None or data["symbol"][i] == symbol)
+                    and (lo is None or (data["created_at"][i] is not None and data["created_at"][i] >= lo))
+                    and (hi is None or (data["created_at"][i] is not None and data["created_at"][i] <= hi))
+                ]
+                if not keep:
+                    continue
+            batch = {name: data[name] if keep is None else [data[name][i] for i in keep] for name in wanted}
+            yield batch
+
+    def query(
+        self,
+        table: str,
+        user_id: Optional[int] = None,
+        symbol: Optional[str] = None,
+        start_date: DateLike = None,
+        end_date: DateLike = None,
+        columns: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Matching rows as dicts, oldest partition first (``limit`` caps the count)."""
+        out: List[Dict[str, Any]] = []
+        for batch in self.scan(table, user_id, symbol, start_date, end_date, columns):
+            names = list(batch)
+            for values in zip(*(batch[name] for name in names)):
+                out.append(dict(zip(names, values)))
+                if limit is not None and len(out) >= limit:
+                    return out
+        return out
+
+    def get_status(self) -> Dict[str, Any]:
+        tables = {}
+        for table in TABLES:
+            files = list((self.root / table).glob(f"date=*/*{FILE_SUFFIX}")) if (self.root / table).exists() else []
+            partitions = self.partitions(table)
+            tables[table] = {
+                "partitions": len(partitions),
+                "first_date": partitions[0] if partitions else None,
+                "last_date": partitions[-1] if partitions else None,
+                "files": len(files),
+                "bytes": sum(f.stat().st_size for f in files),
+            }
+        return {"root": str(self.root), "tables": tables}
+
+
+ORDER_ARCHIVE = OrderArchive()
@@ -0,0 +1,60 @@
+"""Keyset (cursor) pagination for newest-first list queries.
+
+Pages are ordered by ``(created_at DESC, id DESC)`` and continue from an opaque
+cursor holding the last row's key, so each page is an index range scan on the
+``(…, created_at, id)`` indexes instead of an ``OFFSET`` over the whole table.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    payload = {"t": created_at.isoformat() if created_at else None, "id": int(row_id)}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        created_at = datetime.fromisoformat(payload["t"]) if payload.get("t") else None
+        return created_at, int(payload["id"])
+    except Exception as exc:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from exc
+
+
+def keyset_page(query: Query, model: Any, *, limit: int, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """Return ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last page."""
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    created_col = model.created_at
+    id_col = model.id
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if created_at is None:
+            query = query.filter(id_col < row_id)
+        else:
+            query = query.filter(
+                or_(
+                    created_col < created_at,
+                    and_(created_col == created_at, id_col < row_id),
+                )
+            )
+    rows = query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
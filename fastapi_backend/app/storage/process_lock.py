@@ -0,0 +1,64 @@
+"""Cross-process exclusive locks for jobs every uvicorn worker schedules.
+
+The APScheduler jobs (EOD cleanup, order purge/archive, MIS square-off) are
+registered in each worker's startup, so with ``WEB_CONCURRENCY`` > 1 they fire
+once per worker. ``exclusive(name)`` takes a non-blocking OS lock on
+``<PROCESS_LOCK_DIR>/<name>.lock`` (default ``database/locks``); the worker
+that gets it runs the job, the others see ``False`` and skip. The OS drops the
+lock if its holder dies, so a crashed worker never wedges the job.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from app.storage.db import DB_DIR
+
+logger = logging.getLogger(__name__)
+
+LOCK_DIR = Path(os.getenv("PROCESS_LOCK_DIR", "") or DB_DIR / "locks")
+
+
+def _try_lock(handle) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(handle) -> None:
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    except OSError:
+        logger.debug("Releasing process lock failed", exc_info=True)
+
+
+@contextmanager
+def exclusive(name: str) -> Iterator[bool]:
+    """Yield True when this process holds ``name``, False when another one does."""
+    LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    handle = open(LOCK_DIR / f"{name}.lock", "a+b")
+    acquired = _try_lock(handle)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _unlock(handle)
+        handle.close()
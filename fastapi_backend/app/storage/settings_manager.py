@@ -10,6 +10,7 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 from app.storage.db import SessionLocal
 from app.storage.models import DhanCredential
+from app.dhan.credential_provider import notify_credentials_changed
 
 SETTINGS_DIR = Path(__file__).parent.parent.parent / "config"
 SETTINGS_FILE = SETTINGS_DIR / "settings.json"
@@ -150,6 +151,7 @@ def restore_settings_to_database() -> bool:
                 print(f"[SETTINGS] ✓ Auto-restored saved token (len={len(saved_token)})")
             
             db.commit()
+            notify_credentials_changed("settings restored")
             
             print(f"[SETTINGS] ✓ Restored settings for client_id: {cred.client_id[:8]}...")
             print(f"[SETTINGS] ✓ Auth mode: {cred.auth_mode}")
@@ -0,0 +1,177 @@
+"""In-memory identity index for ``X-USER`` header authentication.
+
+``get_current_user`` used to match the header against
+``lower(username|user_id|mobile|email)``, which no index can serve, so every
+authenticated request scanned ``user_accounts``. This module keeps:
+
+* an index from each normalized (stripped, lowercased) identity to the user's
+  primary key, rebuilt from one narrow query when it is missing or stale, and
+* a detached, fully loaded ``UserAccount`` per resolved user, attached to the
+  request session with ``Session.merge(load=False)`` so no SQL is emitted.
+
+Endpoints that create, update, block or delete users call
+``invalidate_identity``, which also bumps a stamp file next to the process
+locks; every worker stats it on each lookup and drops its cache when it has
+changed, so a block in one worker takes effect in all of them on the next
+request. A TTL bounds staleness for writes made outside the app. Balance columns maintained by the ledger are expired on the merged
+copy so they are read from the database if a caller touches them.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.storage.db import SessionLocal
+from app.storage.models import UserAccount
+from app.storage.process_lock import LOCK_DIR
+
+logger = logging.getLogger(__name__)
+
+_TTL_SECONDS = float(os.getenv("AUTH_IDENTITY_CACHE_TTL_SECONDS", "60"))
+
+# Written outside the user endpoints (running ledger balance); never served from cache.
+_VOLATILE_ATTRS = ("wallet_balance", "ledger_balance", "ledger_credit_total", "ledger_debit_total", "ledger_version")
+
+_STAMP_PATH = LOCK_DIR / "identity.stamp"
+_STAMP_MAX_BYTES = 4096
+
+
+def _read_stamp() -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(_STAMP_PATH)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _bump_stamp() -> None:
+    # Appending changes the size even when two bumps share an mtime tick.
+    try:
+        _STAMP_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(_STAMP_PATH, "ab") as handle:
+            if handle.tell() >= _STAMP_MAX_BYTES:
+                handle.truncate(0)
+            handle.write(b".")
+    except OSError:
+        logger.warning("Could not bump identity stamp %s; other workers rely on the TTL", _STAMP_PATH, exc_info=True)
+
+
+def normalize_identity(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+class IdentityCache:
+    def __init__(self, ttl_seconds: float = _TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._index_loaded_at = 0.0
+        self._users: Dict[int, UserAccount] = {}
+        self._loaded_at: Dict[int, float] = {}
+        self._stamp = _read_stamp()
+
+    def _sync_stamp(self) -> None:
+        """Drop everything when any worker has invalidated since the last check."""
+        stamp = _read_stamp()
+        if stamp != self._stamp:
+            self._clear()
+            self._stamp = stamp
+
+    def _index_fresh(self) -> bool:
+        return self._index_loaded_at > 0 and (time.monotonic() - self._index_loaded_at) < self.ttl_seconds
+
+    def _rebuild_index(self, db: Session) -> None:
+        rows = db.query(
+            UserAccount.id,
+            UserAccount.username,
+            UserAccount.user_id,
+            UserAccount.mobile,
+            UserAccount.email,
+        ).all()
+        index: Dict[str, int] = {}
+        # If two users collide on different columns, a username match wins.
+        for column in range(1, 5):
+            for row in rows:
+                key = normalize_identity(row[column])
+                if key and key not in index:
+                    index[key] = row[0]
+        with self._lock:
+            self._index = index
+            self._index_loaded_at = time.monotonic()
+
+    def resolve_id(self, db: Session, identity: str) -> Optional[int]:
+        """Primary key for ``identity`` (username, user id, mobile or email)."""
+        key = normalize_identity(identity)
+        if not key:
+            return None
+        self._sync_stamp()
+        if not self._index_fresh():
+            self._rebuild_index(db)
+        return self._index.get(key)
+
+    def _load_user(self, user_pk: int) -> Optional[UserAccount]:
+        # Separate short-lived session so the cached instance never carries
+        # request state and is fully loaded before it is detached.
+        session = SessionLocal()
+        try:
+            user = session.get(UserAccount, user_pk)
+            if user is not None:
+                session.expunge(user)
+            return user
+        finally:
+            session.close()
+
+    def get_user(self, db: Session, identity: str) -> Optional[UserAccount]:
+        """``UserAccount`` attached to ``db`` for ``identity``, or ``None``."""
+        user_pk = self.resolve_id(db, identity)
+        if user_pk is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            cached = self._users.get(user_pk)
+            fresh = cached is not None and (now - self._loaded_at.get(user_pk, 0.0)) < self.ttl_seconds
+        if not fresh:
+            cached = self._load_user(user_pk)
+            if cached is None:
+                self._clear()
+                return None
+            with self._lock:
+                self._users[user_pk] = cached
+                self._loaded_at[user_pk] = now
+        user = db.merge(cached, load=False)
+        db.expire(user, _VOLATILE_ATTRS)
+        return user
+
+    def invalidate(self, user_pk: Optional[int] = None) -> None:
+        """Drop cached state after a user write; ``None`` clears everything.
+
+        The identity index is always rebuilt because usernames, mobiles and
+        emails may have changed or been added. Other workers are told through
+        the stamp file and clear their whole cache.
+        """
+        self._clear(user_pk)
+        _bump_stamp()
+
+    def _clear(self, user_pk: Optional[int] = None) -> None:
+        with self._lock:
+            self._index_loaded_at = 0.0
+            if user_pk is None:
+                self._users.clear()
+                self._loaded_at.clear()
+            else:
+                self._users.pop(user_pk, None)
+                self._loaded_at.pop(user_pk, None)
+
+
+identity_cache = IdentityCache()
+
+
+def invalidate_identity(user_pk: Optional[int] = None) -> None:
+    """Call after committing any write to ``user_accounts``."""
+    identity_cache.invalidate(user_pk)
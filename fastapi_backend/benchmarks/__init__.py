@@ -0,0 +1,12 @@
+"""
+Performance benchmarks for the market-data and order hot paths.
+
+Each ``bench_*`` module registers cases with ``harness.benchmark``; fixtures
+(instrument master, subscribed tokens, tick bursts, resting orders, large
+portfolios) are built synthetically by ``fixtures`` at realistic sizes, or
+tick bursts can be taken from a recorded tick journal.
+
+Run with ``python scripts/run_benchmarks.py`` (``--help`` for options).
+Results are appended to ``benchmarks/results/history.jsonl`` with the git
+commit, so regressions show up when comparing runs across commits.
+"""
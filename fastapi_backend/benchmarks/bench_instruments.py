@@ -0,0 +1,53 @@
+"""Instrument master load and lookup benchmarks."""
+
+from contextlib import contextmanager
+
+from benchmarks.fixtures import INDEX_UNDERLYINGS
+from benchmarks.harness import benchmark
+
+
+@contextmanager
+def _registry_installed(module, registry):
+    original = module.REGISTRY
+    module.REGISTRY = registry
+    try:
+        yield
+    finally:
+        module.REGISTRY = original
+
+
+@benchmark("instruments.registry_load", group="instruments", rounds=3, once=True)
+def bench_registry_load(fixtures):
+    fixtures.master_csv()  # write the CSV outside the timed region
+    return fixtures.load_registry
+
+
+@benchmark("instruments.search", group="instruments", rounds=10, warmup=1)
+def bench_search(fixtures):
+    """``/instruments/search`` over the full master for a handful of typed prefixes."""
+    from app.rest import mock_exchange
+
+    registry = fixtures.registry()
+    queries = ("N", "NIF", "BANK", "STK0", "STK00123", "CRUDE")
+
+    def run():
+        with _registry_installed(mock_exchange, registry):
+            for q in queries:
+                mock_exchange.api_instruments_search(q=q, limit=50)
+
+    return run, len(queries)
+
+
+@benchmark("instruments.option_chain_strikes", group="instruments", rounds=50)
+def bench_option_chain_strikes(fixtures):
+    registry = fixtures.registry()
+    lookups = []
+    for symbol, (_sec_id, spot, _step, _lot, _exch) in INDEX_UNDERLYINGS.items():
+        for expiry in registry.get_expiries_for_underlying(symbol)[:4]:
+            lookups.append((symbol, expiry, spot))
+
+    def run():
+        for symbol, expiry, spot in lookups:
+            registry.get_option_chain(symbol, expiry, spot)
+
+    return run, max(1, len(lookups))
@@ -0,0 +1,17 @@
+"""SPAN margin benchmarks over large portfolios."""
+
+from benchmarks.harness import benchmark
+
+
+def _span_case(legs):
+    def prepare(fixtures):
+        from app.rms.span_margin_calculator import calculate_span_margin_for_positions
+
+        positions, market_data = fixtures.portfolio(legs)
+        return lambda: calculate_span_margin_for_positions(positions, market_data)
+
+    return prepare
+
+
+for _legs, _rounds in ((50, 50), (500, 10), (2000, 3)):
+    benchmark(f"margin.span.{_legs}_legs", group="margin", rounds=_rounds, warmup=1)(_span_case(_legs))
@@ -0,0 +1,87 @@
+"""Feed ingest and option chain cache benchmarks."""
+
+from benchmarks.fixtures import INDEX_UNDERLYINGS
+from benchmarks.harness import benchmark
+
+
+def _prepare_feed(fixtures):
+    from app.dhan import live_feed
+
+    symbol_map, option_map = fixtures.subscriptions()
+    live_feed.install_instrument_maps(symbol_map, option_map)
+    fixtures.install_option_chains()
+    return live_feed
+
+
+@benchmark("feed.on_message_callback", group="market_data", rounds=10)
+def bench_on_message_callback(fixtures):
+    """Full ingest path per decoded packet: maps, live prices, depth, option cache, orchestrator."""
+    live_feed = _prepare_feed(fixtures)
+    burst = fixtures.tick_burst()
+    callback = live_feed.on_message_callback
+
+    def run():
+        for message in burst:
+            callback(None, message)
+
+    return run, len(burst)
+
+
+@benchmark("option_chain.update_option_tick_from_websocket", group="market_data", rounds=10)
+def bench_update_option_tick(fixtures):
+    _symbol_map, option_map = fixtures.subscriptions()
+    service = fixtures.install_option_chains()
+    ticks = []
+    for message in fixtures.tick_burst():
+        meta = option_map.get(str(message.get("security_id")))
+        if meta:
+            ticks.append((meta, message.get("LTP"), message.get("bid"), message.get("ask"), message.get("depth")))
+    update = service.update_option_tick_from_websocket
+
+    def run():
+        for meta, ltp, bid, ask, depth in ticks:
+            update(meta["symbol"], meta["expiry"], meta["strike"], meta["option_type"], ltp, bid, ask, depth)
+
+    return run, len(ticks)
+
+
+@benchmark("option_chain.update_option_price_from_websocket", group="market_data", rounds=20)
+def bench_update_option_price(fixtures):
+    """Underlying ticks that stay inside the strike window (re-estimates every expiry's premiums)."""
+    service = fixtures.install_option_chains()
+    moves = []
+    for symbol, (_sec_id, spot, step, _lot, _exch) in INDEX_UNDERLYINGS.items():
+        for offset in (-0.2, 0.1, 0.3, -0.1):
+            moves.append((symbol, spot + offset * step))
+    update = service.update_option_price_from_websocket
+
+    def run():
+        for symbol, ltp in moves:
+            update(symbol, ltp)
+
+    return run, len(moves)
+
+
+@benchmark("option_chain.to_dict", group="market_data", rounds=50)
+def bench_to_dict(fixtures):
+    """Serialising one 51-strike chain with five-level depth on every leg."""
+    service = fixtures.install_option_chains()
+    expiries = fixtures.chain_layout()["NIFTY"]
+    skeleton = service.option_chain_cache["NIFTY"][expiries[0]]
+    return skeleton.to_dict
+
+
+@benchmark("option_chain.to_dict.all_subscribed", group="market_data", rounds=5)
+def bench_to_dict_all(fixtures):
+    service = fixtures.install_option_chains()
+    skeletons = [
+        service.option_chain_cache[symbol][expiry]
+        for symbol, expiries in fixtures.chain_layout().items()
+        for expiry in expiries
+    ]
+
+    def run():
+        for skeleton in skeletons:
+            skeleton.to_dict()
+
+    return run, len(skeletons)
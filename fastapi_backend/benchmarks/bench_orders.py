@@ -0,0 +1,23 @@
+"""Order matching benchmarks."""
+
+from benchmarks.harness import benchmark
+
+
+@benchmark("orders.process_pending_orders", group="orders", rounds=5, warmup=1)
+def bench_process_pending_orders(fixtures):
+    """One matching pass over the resting book (limit orders away from the touch, so nothing fills)."""
+    from app.execution_simulator import get_execution_engine
+
+    factory = fixtures.order_session_factory()
+    engine = get_execution_engine()
+
+    def run():
+        db = factory()
+        try:
+            engine.process_pending_orders(db)
+            db.commit()
+        finally:
+            db.close()
+
+    return run
+
@@ -0,0 +1,385 @@
+"""
+Synthetic, seeded fixtures at production sizes.
+
+``scale`` multiplies every size (1.0 = a 289k-row instrument master, 5k
+subscribed option tokens, 10k-tick bursts and 10k resting orders), so a
+quick smoke run can use ``--scale 0.05``. Everything is built lazily and
+cached on the ``Fixtures`` instance; files go under ``workdir``.
+"""
+
+import csv
+import math
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MASTER_ROWS = 289_000
+SUBSCRIBED_TOKENS = 5_000
+BURST_TICKS = 10_000
+RESTING_ORDERS = 10_000
+
+MASTER_COLUMNS = (
+    "EXCH_ID", "SEGMENT", "SECURITY_ID", "ISIN", "INSTRUMENT", "UNDERLYING_SECURITY_ID",
+    "UNDERLYING_SYMBOL", "SYMBOL_NAME", "DISPLAY_NAME", "INSTRUMENT_TYPE", "SERIES",
+    "LOT_SIZE", "SM_EXPIRY_DATE", "STRIKE_PRICE", "OPTION_TYPE", "TICK_SIZE", "EXPIRY_FLAG",
+)
+
+# symbol -> (security id, spot, strike interval, lot size, exchange)
+INDEX_UNDERLYINGS = {
+    "NIFTY": (13, 22_000.0, 50.0, 65, "NSE"),
+    "BANKNIFTY": (25, 48_000.0, 100.0, 30, "NSE"),
+    "SENSEX": (51, 73_000.0, 100.0, 20, "BSE"),
+}
+CHAIN_STRIKES_EACH_SIDE = 25
+MCX_UNDERLYINGS = {"CRUDEOIL": 6_500.0, "NATURALGAS": 250.0, "GOLD": 62_000.0, "SILVER": 72_000.0}
+
+
+def _expiries(count: int, start: Optional[date] = None) -> List[str]:
+    day = start or date.today()
+    day += timedelta(days=(3 - day.weekday()) % 7)  # next Thursday
+    return [(day + timedelta(weeks=i)).isoformat() for i in range(count)]
+
+
+class Fixtures:
+    def __init__(self, workdir: Path, scale: float = 1.0, seed: int = 11, journal: Optional[str] = None):
+        self.workdir = Path(workdir)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.scale = scale
+        self.seed = seed
+        self.journal = journal
+        self._cache: Dict[str, object] = {}
+
+    def size(self, base: int) -> int:
+        return max(1, int(base * self.scale))
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    # ---- instrument master -----------------------------------------------------
+
+    def master_csv(self) -> Path:
+        return self._cached("master_csv", self._write_master)
+
+    def _write_master(self) -> Path:
+        rng = random.Random(self.seed)
+        path = self.workdir / f"api-scrip-master-{self.size(MASTER_ROWS)}.csv"
+        target = self.size(MASTER_ROWS)
+        written = 0
+        next_id = 100_000
+
+        def row(**values):
+            return [values.get(col, "") for col in MASTER_COLUMNS]
+
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(MASTER_COLUMNS)
+            # Cash market and indices first, like the real file.
+            equities = max(1, target // 30)
+            for i in range(equities):
+                symbol = f"STK{i:05d}"
+                exch = "NSE" if i % 3 else "BSE"
+                writer.writerow(row(
+                    EXCH_ID=exch, SEGMENT="E", SECURITY_ID=next_id, INSTRUMENT="EQUITY",
+                    UNDERLYING_SYMBOL=symbol, SYMBOL_NAME=symbol, DISPLAY_NAME=f"{symbol} LTD",
+                    INSTRUMENT_TYPE="ES", SERIES="EQ", LOT_SIZE=1, TICK_SIZE=0.05,
+                ))
+                next_id += 1
+            for symbol, (sec_id, _spot, _step, _lot, exch) in INDEX_UNDERLYINGS.items():
+                writer.writerow(row(
+                    EXCH_ID=exch, SEGMENT="I", SECURITY_ID=sec_id, INSTRUMENT="INDEX",
+                    UNDERLYING_SYMBOL=symbol, SYMBOL_NAME=symbol, DISPLAY_NAME=symbol,
+                    INSTRUMENT_TYPE="INDEX", LOT_SIZE=1, TICK_SIZE=0.05,
+                ))
+            written = equities + len(INDEX_UNDERLYINGS)
+
+            # Derivatives: round-robin over index, stock and MCX underlyings.
+            underlyings: List[Tuple[str, float, float, int, str, str, str]] = []
+            for symbol, (_sec_id, spot, step, lot, exch) in INDEX_UNDERLYINGS.items():
+                underlyings.append((symbol, spot, step, lot, exch, "OPTIDX", "FUTIDX"))
+            for i in range(min(equities, 200)):
+                spot = round(rng.uniform(100, 5000), 1)
+                step = 5.0 if spot < 500 else (20.0 if spot < 2000 else 50.0)
+                underlyings.append((f"STK{i:05d}", spot, step, rng.choice((250, 500, 700, 1200)), "NSE", "OPTSTK", "FUTSTK"))
+            for symbol, spot in MCX_UNDERLYINGS.items():
+                underlyings.append((symbol, spot, round(spot / 100, 0) or 1.0, 100, "MCX", "OPTFUT", "FUTCOM"))
+
+            expiries = _expiries(12)
+            while written < target:
+                for symbol, spot, step, lot, exch, opt_type, fut_type in underlyings:
+                    if written >= target:
+                        break
+                    expiry = expiries[rng.randrange(len(expiries))]
+                    writer.writerow(row(
+                        EXCH_ID=exch, SEGMENT="M" if exch == "MCX" else "D", SECURITY_ID=next_id,
+                        INSTRUMENT=fut_type, UNDERLYING_SYMBOL=symbol, SYMBOL_NAME=f"{symbol}-{expiry}-FUT",
+                        DISPLAY_NAME=f"{symbol} {expiry} FUT", INSTRUMENT_TYPE=fut_type, LOT_SIZE=lot,
+                        SM_EXPIRY_DATE=expiry, STRIKE_PRICE="-0.01000", OPTION_TYPE="XX", TICK_SIZE=0.05,
+                        EXPIRY_FLAG="M",
+                    ))
+                    next_id += 1
+                    written += 1
+                    atm = round(spot / step) * step
+                    for k in range(-20, 21):
+                        strike = atm + k * step
+                        if strike <= 0:
+                            continue
+                        for option in ("CE", "PE"):
+                            if written >= target:
+                                break
+                            writer.writerow(row(
+                                EXCH_ID=exch, SEGMENT="M" if exch == "MCX" else "D", SECURITY_ID=next_id,
+                                INSTRUMENT=opt_type, UNDERLYING_SYMBOL=symbol,
+                                SYMBOL_NAME=f"{symbol}-{expiry}-{strike:g}-{option}",
+                                DISPLAY_NAME=f"{symbol} {expiry} {strike:g} {option}", INSTRUMENT_TYPE=opt_type,
+                                LOT_SIZE=lot, SM_EXPIRY_DATE=expiry, STRIKE_PRICE=f"{strike:.5f}",
+                                OPTION_TYPE=option, TICK_SIZE=0.05, EXPIRY_FLAG="W",
+                            ))
+                            next_id += 1
+                            written += 1
+        return path
+
+    def registry(self):
+        return self._cached("registry", self.load_registry)
+
+    def load_registry(self):
+        """A fresh ``InstrumentRegistry`` over its own store of the fixture master (timed by the load case)."""
+        from app.market.instrument_master.registry import InstrumentRegistry
+        from app.market.instrument_master.store import InstrumentStore
+
+        reg = InstrumentRegistry(InstrumentStore(self.master_csv()))
+        reg.load()
+        return reg
+
+    # ---- option chains and subscriptions ---------------------------------------
+
+    def chain_layout(self) -> Dict[str, List[str]]:
+        """Expiries per index so the chains hold ~5k subscribed option tokens."""
+        per_expiry = (2 * CHAIN_STRIKES_EACH_SIDE + 1) * 2
+        expiries_each = max(1, math.ceil(self.size(SUBSCRIBED_TOKENS) / per_expiry / len(INDEX_UNDERLYINGS)))
+        return {symbol: _expiries(expiries_each) for symbol in INDEX_UNDERLYINGS}
+
+    def subscriptions(self) -> Tuple[Dict[str, str], Dict[str, Dict[str, object]]]:
+        """``(security_id -> symbol, security_id -> option meta)`` as live_feed keeps them."""
+        return self._cached("subscriptions", self._build_subscriptions)
+
+    def _build_subscriptions(self):
+        symbol_map: Dict[str, str] = {}
+        option_map: Dict[str, Dict[str, object]] = {}
+        next_id = 900_000
+        limit = self.size(SUBSCRIBED_TOKENS)
+        for symbol, expiries in self.chain_layout().items():
+            sec_id, spot, step, _lot, exch = INDEX_UNDERLYINGS[symbol]
+            symbol_map[str(sec_id)] = symbol
+            atm = round(spot / step) * step
+            for expiry in expiries:
+                for k in range(-CHAIN_STRIKES_EACH_SIDE, CHAIN_STRIKES_EACH_SIDE + 1):
+                    for option in ("CE", "PE"):
+                        if len(option_map) >= limit:
+                            break
+                        token = str(next_id)
+                        next_id += 1
+                        symbol_map[token] = symbol
+                        option_map[token] = {
+                            "symbol": symbol,
+                            "expiry": expiry,
+                            "strike": atm + k * step,
+                            "option_type": option,
+                            "exchange": 8 if exch == "BSE" else 2,
+                            "segment": "BSE_FNO" if exch == "BSE" else "NSE_FNO",
+                        }
+        return symbol_map, option_map
+
+    def install_option_chains(self, service=None):
+        """Populate the option chain cache (the global service by default) with the subscribed chains."""
+        from datetime import datetime
+        from app.services.authoritative_option_chain_service import (
+            OptionChainSkeleton,
+            OptionData,
+            StrikeData,
+            authoritative_option_chain_service,
+        )
+
+        service = service or authoritative_option_chain_service
+        _symbols, option_map = self.subscriptions()
+        tokens: Dict[Tuple[str, str, float, str], str] = {
+            (meta["symbol"], meta["expiry"], float(meta["strike"]), meta["option_type"]): token
+            for token, meta in option_map.items()
+        }
+        for symbol, expiries in self.chain_layout().items():
+            _sec_id, spot, step, lot, _exch = INDEX_UNDERLYINGS[symbol]
+            atm = round(spot / step) * step
+            chains = service.option_chain_cache.setdefault(symbol, {})
+            for expiry in expiries:
+                strikes: Dict[float, StrikeData] = {}
+                for k in range(-CHAIN_STRIKES_EACH_SIDE, CHAIN_STRIKES_EACH_SIDE + 1):
+                    strike = float(atm + k * step)
+                    legs = {}
+                    for option in ("CE", "PE"):
+                        intrinsic = max(spot - strike, 0.0) if option == "CE" else max(strike - spot, 0.0)
+                        premium = round(intrinsic + 40.0 * math.exp(-abs(k) / 10.0), 2)
+                        legs[option] = OptionData(
+                            token=tokens.get((symbol, expiry, strike, option)) or f"{option}_{symbol}_{strike}_{expiry}",
+                            ltp=premium,
+                            source="WEBSOCKET",
+                            bid=round(premium - 0.05, 2),
+                            ask=round(premium + 0.05, 2),
+                            oi=10_000,
+                            volume=1_000,
+                            depth=_depth(premium, 0.05),
+                        )
+                    strikes[strike] = StrikeData(strike_price=strike, CE=legs["CE"], PE=legs["PE"])
+                chains[expiry] = OptionChainSkeleton(
+                    underlying=symbol,
+                    expiry=expiry,
+                    lot_size=lot,
+                    strike_interval=step,
+                    atm_strike=atm,
+                    strikes=strikes,
+                    last_updated=datetime.now(),
+                )
+            service.atm_registry.atm_strikes[symbol] = spot
+        return service
+
+    # ---- tick bursts -----------------------------------------------------------
+
+    def tick_burst(self) -> List[Dict[str, object]]:
+        """Decoded packets as ``on_message_callback`` receives them (recorded journal if given)."""
+        return self._cached("tick_burst", self._build_burst)
+
+    def _build_burst(self) -> List[Dict[str, object]]:
+        count = self.size(BURST_TICKS)
+        if self.journal:
+            from app.market.tick_journal import iter_records
+
+            burst = []
+            for record in iter_records(self.journal):
+                burst.append(record.to_message())
+                if len(burst) >= count:
+                    break
+            return burst
+
+        rng = random.Random(self.seed + 1)
+        symbol_map, option_map = self.subscriptions()
+        option_tokens = list(option_map.keys())
+        prices: Dict[str, float] = {}
+        underlying_ids = {str(v[0]): v[1] for v in INDEX_UNDERLYINGS.values()}
+        burst = []
+        for i in range(count):
+            # ~1 in 10 packets is an index tick, the rest option ticks.
+            if i % 10 == 0:
+                token = list(underlying_ids)[(i // 10) % len(underlying_ids)]
+                base = underlying_ids[token]
+                segment = "IDX_I"
+            else:
+                token = option_tokens[rng.randrange(len(option_tokens))]
+                base = 50.0
+                segment = option_map[token]["segment"]
+            price = prices.get(token, base) * math.exp(rng.gauss(0.0, 0.0005))
+            price = max(0.05, round(round(price / 0.05) * 0.05, 2))
+            prices[token] = price
+            message: Dict[str, object] = {
+                "type": "Full Data",
+                "exchange_segment": segment,
+                "security_id": int(token),
+                "LTP": price,
+                "volume": rng.randint(1_000, 1_000_000),
+            }
+            if segment != "IDX_I":
+                message["bid"] = round(price - 0.05, 2)
+                message["ask"] = round(price + 0.05, 2)
+                message["depth"] = _depth(price, 0.05)
+            burst.append(message)
+        return burst
+
+    # ---- orders and portfolios -------------------------------------------------
+
+    def order_session_factory(self):
+        """Session factory for a scratch SQLite DB holding ``RESTING_ORDERS`` limit orders."""
+        return self._cached("order_db", self._build_order_db)
+
+    def _build_order_db(self):
+        from sqlalchemy.orm import sessionmaker
+        from app.market.market_state import state
+        from app.storage import models
+        from app.storage.db import Base, create_storage_engine
+        from app.storage.models import ist_now
+
+        path = self.workdir / "orders.db"
+        if path.exists():
+            path.unlink()
+        engine = create_storage_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+
+        rng = random.Random(self.seed + 2)
+        _symbols, option_map = self.subscriptions()
+        metas = list(option_map.values())
+        depth_book = state.setdefault("depth", {})
+        db = factory()
+        try:
+            db.add(models.UserAccount(id=1, username="bench", role="USER"))
+            now = ist_now()
+            rows = []
+            for i in range(self.size(RESTING_ORDERS)):
+                meta = metas[i % len(metas)]
+                symbol = f"{meta['symbol']} {float(meta['strike']):g} {meta['option_type']}"
+                if symbol not in depth_book:
+                    depth_book[symbol] = _depth(100.0, 0.05)
+                side = "BUY" if rng.random() < 0.5 else "SELL"
+                # Resting: bids below the touch, offers above it.
+                price = round(100.0 - rng.uniform(1, 20), 2) if side == "BUY" else round(100.0 + rng.uniform(1, 20), 2)
+                rows.append({
+                    "user_id": 1,
+                    "symbol": symbol,
+                    "security_id": None,
+                    "exchange_segment": meta["segment"],
+                    "transaction_type": side,
+                    "quantity": 75,
+                    "filled_qty": 0,
+                    "order_type": "LIMIT",
+                    "product_type": "MIS",
+                    "price": price,
+                    "status": "PENDING",
+                    "created_at": now,
+                    "updated_at": now,
+                })
+            db.bulk_insert_mappings(models.MockOrder, rows)
+            db.commit()
+        finally:
+            db.close()
+        return factory
+
+    def portfolio(self, count: int) -> Tuple[List[Dict[str, object]], Dict[str, Dict[str, object]]]:
+        """``(positions, market_data)`` for ``span_margin_calculator`` with ``count`` legs."""
+        from app.rms.span_margin_calculator import position_from_order
+
+        rng = random.Random(self.seed + 3 + count)
+        _symbols, option_map = self.subscriptions()
+        metas = list(option_map.values())
+        positions = []
+        market_data: Dict[str, Dict[str, object]] = {}
+        for symbol, (_sec_id, spot, _step, lot, _exch) in INDEX_UNDERLYINGS.items():
+            market_data[symbol] = {"ltp": spot, "lot_size": lot}
+        for i in range(count):
+            meta = metas[rng.randrange(len(metas))]
+            lot = INDEX_UNDERLYINGS[meta["symbol"]][3]
+            if i % 10 == 0:
+                symbol = f"{meta['symbol']}_{meta['expiry']}_FUT"
+                price = INDEX_UNDERLYINGS[meta["symbol"]][1]
+            else:
+                symbol = f"{meta['symbol']}_{meta['expiry']}_{float(meta['strike']):g}{meta['option_type']}"
+                price = round(rng.uniform(5, 400), 2)
+            positions.append(position_from_order(
+                symbol, meta["segment"], "SELL" if rng.random() < 0.6 else "BUY", lot * rng.randint(1, 10), price,
+            ))
+        return positions, market_data
+
+
+def _depth(price: float, tick: float, levels: int = 5) -> Dict[str, List[Dict[str, float]]]:
+    return {
+        "bids": [{"price": round(max(tick, price - (i + 1) * tick), 2), "qty": 75.0 * (i + 1)} for i in range(levels)],
+        "asks": [{"price": round(price + (i + 1) * tick, 2), "qty": 75.0 * (i + 1)} for i in range(levels)],
+    }
@@ -0,0 +1,190 @@
+"""
+Minimal benchmark runner and result store.
+
+A case is a function decorated with ``@benchmark(...)`` that receives the
+shared ``Fixtures`` and returns the callable to time (optionally a
+``(callable, ops_per_call)`` pair when one call processes a batch, e.g. a
+tick burst). Setup cost is never timed. ``once=True`` cases (load times)
+are run a fixed small number of rounds with a fresh setup per round.
+"""
+
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+RESULTS_DIR = Path(__file__).parent / "results"
+HISTORY_PATH = RESULTS_DIR / "history.jsonl"
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    group: str
+    func: Callable
+    rounds: int = 20
+    warmup: int = 2
+    once: bool = False
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    group: str
+    rounds: int
+    ops_per_call: int
+    min_ms: float
+    median_ms: float
+    mean_ms: float
+    p95_ms: float
+    stdev_ms: float
+    ns_per_op: float
+    ops_per_sec: float
+
+
+CASES: Dict[str, BenchmarkCase] = {}
+
+
+def benchmark(name: str, group: str, rounds: int = 20, warmup: int = 2, once: bool = False):
+    def decorator(func):
+        CASES[name] = BenchmarkCase(name=name, group=group, func=func, rounds=rounds, warmup=warmup, once=once)
+        return func
+    return decorator
+
+
+def _unpack(prepared):
+    if isinstance(prepared, tuple):
+        return prepared[0], int(prepared[1])
+    return prepared, 1
+
+
+def run_case(case: BenchmarkCase, fixtures, rounds: Optional[int] = None) -> BenchmarkResult:
+    rounds = max(1, rounds or case.rounds)
+    samples: List[int] = []
+    ops = 1
+    if case.once:
+        for _ in range(rounds):
+            fn, ops = _unpack(case.func(fixtures))
+            gc.collect()
+            start = time.perf_counter_ns()
+            fn()
+            samples.append(time.perf_counter_ns() - start)
+    else:
+        fn, ops = _unpack(case.func(fixtures))
+        for _ in range(case.warmup):
+            fn()
+        gc.collect()
+        for _ in range(rounds):
+            start = time.perf_counter_ns()
+            fn()
+            samples.append(time.perf_counter_ns() - start)
+
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    ns_per_op = median / max(1, ops)
+    return BenchmarkResult(
+        name=case.name,
+        group=case.group,
+        rounds=len(samples),
+        ops_per_call=ops,
+        min_ms=ordered[0] / 1e6,
+        median_ms=median / 1e6,
+        mean_ms=statistics.fmean(ordered) / 1e6,
+        p95_ms=p95 / 1e6,
+        stdev_ms=(statistics.stdev(ordered) / 1e6) if len(ordered) > 1 else 0.0,
+        ns_per_op=ns_per_op,
+        ops_per_sec=(1e9 / ns_per_op) if ns_per_op > 0 else 0.0,
+    )
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", *args], cwd=Path(__file__).parent, capture_output=True, text=True, timeout=10)
+    except Exception:
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def run_metadata(scale: float) -> Dict[str, object]:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "python": platform.python_version(),
+        "machine": platform.node() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "scale": scale,
+    }
+
+
+def save_run(meta: Dict[str, object], results: List[BenchmarkResult], path: Path = HISTORY_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = {**meta, "results": [asdict(r) for r in results]}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def load_history(path: Path = HISTORY_PATH) -> List[Dict[str, object]]:
+    if not path.exists():
+        return []
+    runs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue
+    return runs
+
+
+def find_baseline(history: List[Dict[str, object]], meta: Dict[str, object], ref: Optional[str] = None) -> Optional[Dict[str, object]]:
+    """Latest comparable run: same machine and scale, and ``ref`` commit when given."""
+    for run in reversed(history):
+        if run.get("machine") != meta.get("machine") or run.get("scale") != meta.get("scale"):
+            continue
+        if ref and not str(run.get("commit") or "").startswith(ref):
+            continue
+        if not ref and run.get("commit") == meta.get("commit") and run.get("dirty") == meta.get("dirty"):
+            continue
+        return run
+    return None
+
+
+def compare(results: List[BenchmarkResult], baseline: Dict[str, object], threshold: float) -> List[Dict[str, object]]:
+    """Per-case change in median ns/op against ``baseline``; ``regressed`` past ``threshold``."""
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    rows = []
+    for result in results:
+        old = previous.get(result.name)
+        if not old or not old.get("ns_per_op"):
+            continue
+        change = (result.ns_per_op - old["ns_per_op"]) / old["ns_per_op"]
+        rows.append({
+            "name": result.name,
+            "baseline_ns_per_op": old["ns_per_op"],
+            "ns_per_op": result.ns_per_op,
+            "change": change,
+            "regressed": change > threshold,
+        })
+    return rows
+
+
+def format_table(results: List[BenchmarkResult]) -> str:
+    header = f"{'benchmark':<50} {'rounds':>6} {'ops':>6} {'median ms':>11} {'p95 ms':>10} {'ns/op':>12} {'ops/s':>12}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r.name:<50} {r.rounds:>6} {r.ops_per_call:>6} {r.median_ms:>11.3f} {r.p95_ms:>10.3f} "
+            f"{r.ns_per_op:>12.0f} {r.ops_per_sec:>12.0f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,55 @@
+"""Calibrate empirical latency/slippage tables from execution-event history.
+
+Usage (from fastapi_backend/):
+    python scripts/calibrate_execution_models.py                  # last 30 days, save a new version
+    python scripts/calibrate_execution_models.py --days 90 --min-samples 200
+    python scripts/calibrate_execution_models.py --dry-run        # print the summary only
+    python scripts/calibrate_execution_models.py --list
+
+Tables are written to EXECUTION_CALIBRATION_DIR (default database/execution_calibration)
+as calibration-vNNNN.pkl. Running simulators pick a new version up via
+POST /admin/execution-models/reload, or at the next start.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30, help="trading-day window ending today (IST)")
+    parser.add_argument("--min-samples", type=int, default=50, help="smallest sample kept as a distribution")
+    parser.add_argument("--points", type=int, default=100, help="quantile grid size")
+    parser.add_argument("--dry-run", action="store_true", help="calibrate but do not save")
+    parser.add_argument("--list", action="store_true", help="list stored versions and exit")
+    args = parser.parse_args()
+
+    from app.execution_simulator.calibration import CALIBRATION_STORE, calibrate
+
+    if args.list:
+        for version in CALIBRATION_STORE.versions():
+            table = CALIBRATION_STORE.load(version)
+            meta = table.meta if table is not None else {}
+            print(f"v{version:04d}  {meta.get('start_date')}..{meta.get('end_date')}  events={meta.get('events')}")
+        return 0
+
+    end = (datetime.utcnow() + timedelta(hours=5, minutes=30)).date()
+    start = end - timedelta(days=max(args.days, 1) - 1)
+    table = calibrate(start, end, min_samples=args.min_samples, points=args.points)
+    if not table:
+        print(f"No distribution reached {args.min_samples} samples between {start} and {end}; nothing saved.")
+        return 1
+    if not args.dry_run:
+        path = CALIBRATION_STORE.save(table)
+        print(f"Saved {path}")
+    print(json.dumps(table.summary(), indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
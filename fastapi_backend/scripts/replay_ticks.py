@@ -0,0 +1,55 @@
+"""Replay a recorded tick journal through the live tick path.
+
+Usage (from fastapi_backend/):
+    python scripts/replay_ticks.py database/tick_journal --speed 10
+    python scripts/replay_ticks.py database/tick_journal/ticks-20260105-091500-0001.tnj --speed max
+    python scripts/replay_ticks.py database/tick_journal --info
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.market.tick_journal import iter_records, list_segments, replay
+
+
+def _info(path):
+    segments = list_segments(path)
+    count = 0
+    ids = Counter()
+    first = last = None
+    for record in iter_records(path):
+        count += 1
+        ids[record.security_id] += 1
+        first = record.recv_ns if first is None else first
+        last = record.recv_ns
+    duration = ((last - first) / 1e9) if count > 1 else 0.0
+    print(json.dumps({
+        "segments": [str(s) for s in segments],
+        "ticks": count,
+        "instruments": len(ids),
+        "duration_seconds": round(duration, 3),
+        "busiest": ids.most_common(5),
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="journal directory or a single .tnj segment")
+    parser.add_argument("--speed", default="1", help="replay multiple of recorded time, or 'max'")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many ticks")
+    parser.add_argument("--info", action="store_true", help="summarise the journal instead of replaying")
+    args = parser.parse_args()
+
+    if args.info:
+        _info(args.path)
+        return
+    speed = None if args.speed.lower() == "max" else float(args.speed)
+    print(json.dumps(replay(args.path, speed=speed, limit=args.limit), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Run the hot-path benchmark suite and track results across commits.
+
+Usage (from fastapi_backend/):
+    python scripts/run_benchmarks.py                      # full size, save + compare to last run
+    python scripts/run_benchmarks.py --scale 0.05 -k feed  # quick smoke run of matching cases
+    python scripts/run_benchmarks.py --journal database/tick_journal   # recorded tick bursts
+    python scripts/run_benchmarks.py --compare-to 1a2b3c4 --threshold 0.15
+    python scripts/run_benchmarks.py --history             # print stored runs
+
+Results are appended to benchmarks/results/history.jsonl. The comparison uses
+the latest run from the same machine and scale; the exit status is 1 when any
+case's median ns/op regressed past --threshold.
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+BENCH_MODULES = ("bench_market_data", "bench_orders", "bench_margin", "bench_instruments")
+
+
+def _history(args):
+    from benchmarks.harness import load_history
+
+    for run in load_history():
+        print(f"{run.get('timestamp')}  {run.get('commit')}{'+' if run.get('dirty') else ''}  scale={run.get('scale')}  {run.get('machine')}")
+        for result in run.get("results", []):
+            print(f"    {result['name']:<50} {result['ns_per_op']:>12.0f} ns/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", action="append", default=[], help="run cases whose name contains this (repeatable)")
+    parser.add_argument("--scale", type=float, default=1.0, help="fixture size multiplier (1.0 = production sizes)")
+    parser.add_argument("--rounds", type=int, default=None, help="override rounds for every case")
+    parser.add_argument("--journal", help="tick journal directory/segment to take tick bursts from")
+    parser.add_argument("--workdir", help="where fixture files are written (default: a temp dir)")
+    parser.add_argument("--no-save", action="store_true", help="don't append this run to the history")
+    parser.add_argument("--compare-to", help="commit to compare against (default: latest comparable run)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold as a fraction")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--history", action="store_true", help="print stored runs and exit")
+    parser.add_argument("--list", action="store_true", help="list cases and exit")
+    args = parser.parse_args()
+
+    if args.history:
+        _history(args)
+        return 0
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="tn-bench-"))
+    # Keep the app's own DB, tick journal and Dhan feed out of the measurements.
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir / 'app.db'}")
+    os.environ.setdefault("TICK_JOURNAL_ENABLED", "0")
+    os.environ.setdefault("DISABLE_DHAN_WS", "1")
+
+    from benchmarks import harness
+    from benchmarks.fixtures import Fixtures
+
+    for name in BENCH_MODULES:
+        importlib.import_module(f"benchmarks.{name}")
+
+    cases = [c for c in harness.CASES.values() if not args.filter or any(f in c.name for f in args.filter)]
+    if args.list:
+        for case in cases:
+            print(f"{case.group:<12} {case.name}")
+        return 0
+    if not cases:
+        print("No benchmarks matched")
+        return 1
+
+    fixtures = Fixtures(workdir, scale=args.scale, journal=args.journal)
+    results = []
+    for case in cases:
+        print(f"[BENCH] {case.name} ...", file=sys.stderr, flush=True)
+        results.append(harness.run_case(case, fixtures, rounds=args.rounds))
+
+    meta = harness.run_metadata(args.scale)
+    baseline = harness.find_baseline(harness.load_history(), meta, ref=args.compare_to)
+    comparison = harness.compare(results, baseline, args.threshold) if baseline else []
+    if not args.no_save:
+        harness.save_run(meta, results)
+
+    if args.json:
+        print(json.dumps({
+            "meta": meta,
+            "results": [r.__dict__ for r in results],
+            "baseline_commit": baseline.get("commit") if baseline else None,
+            "comparison": comparison,
+        }, indent=2))
+    else:
+        print(harness.format_table(results))
+        if baseline:
+            print(f"\nvs {baseline.get('commit')} ({baseline.get('timestamp')}):")
+            for row in comparison:
+                flag = "  REGRESSED" if row["regressed"] else ""
+                print(f"    {row['name']:<50} {row['change'] * 100:>+7.1f}%{flag}")
+    return 1 if any(row["regressed"] for row in comparison) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Run the local Dhan market-feed simulator.
+
+Usage (from fastapi_backend/):
+    python scripts/run_feed_simulator.py --port 8765 --rate 5000
+    DHAN_FEED_URL=ws://127.0.0.1:8765 uvicorn app.main:app
+
+--prices takes a JSON file of {"security_id": price} to seed the price paths.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.dhan.feed_simulator import DhanFeedSimulator, SimulatorConfig
+
+
+async def _run(simulator, report_every):
+    await simulator.start()
+    while True:
+        await asyncio.sleep(report_every)
+        print(json.dumps(simulator.get_status()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=1000.0, help="packets/sec per connection")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--volatility", type=float, default=0.0005, help="per-packet log-return stdev")
+    parser.add_argument("--tick-size", type=float, default=0.05)
+    parser.add_argument("--prices", help="JSON file mapping security_id to starting price")
+    parser.add_argument("--require-token", action="store_true", help="reject connections without token/clientId")
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between status lines")
+    args = parser.parse_args()
+
+    base_prices = {}
+    if args.prices:
+        base_prices = {int(k): float(v) for k, v in json.loads(Path(args.prices).read_text()).items()}
+
+    logging.basicConfig(level=logging.INFO)
+    simulator = DhanFeedSimulator(SimulatorConfig(
+        host=args.host,
+        port=args.port,
+        rate=args.rate,
+        seed=args.seed,
+        volatility=args.volatility,
+        tick_size=args.tick_size,
+        base_prices=base_prices,
+        require_token=args.require_token,
+    ))
+    try:
+        asyncio.run(_run(simulator, args.report_every))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
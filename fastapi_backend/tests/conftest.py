@@ -0,0 +1,56 @@
+"""
+Test Configuration
+Points the app at a throwaway SQLite database and lock directory before any
+``app`` module is imported, and gives each test freshly created tables.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="trading-nexus-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{(_TMP_DIR / 'test.db').as_posix()}"
+os.environ["PROCESS_LOCK_DIR"] = str(_TMP_DIR / "locks")
+os.environ.setdefault("DISABLE_DHAN_WS", "1")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.storage import models  # noqa: E402
+from app.storage.db import Base, SessionLocal, engine  # noqa: E402
+
+
+@pytest.fixture()
+def db_session():
+    """Session on empty tables; dropped again after the test."""
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture()
+def make_user(db_session):
+    """Create committed ``UserAccount`` rows with a zero opening balance."""
+    counter = {"n": 0}
+
+    def _make(**fields):
+        counter["n"] += 1
+        n = counter["n"]
+        user = models.UserAccount(
+            username=fields.pop("username", f"user{n}"),
+            password_hash="x",
+            role=fields.pop("role", "USER"),
+            mobile=fields.pop("mobile", f"90000{n:05d}"),
+            **fields,
+        )
+        db_session.add(user)
+        db_session.commit()
+        return user
+
+    return _make
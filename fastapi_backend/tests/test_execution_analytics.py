@@ -0,0 +1,41 @@
+"""
+Execution Analytics Tests
+A day's cached frame is only final when it was built after that IST day ended.
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.execution_simulator import execution_analytics
+from app.execution_simulator.execution_analytics import DayFrame, ExecutionAnalytics
+
+
+@pytest.fixture(autouse=True)
+def no_rows(monkeypatch):
+    monkeypatch.setattr(execution_analytics, "_live_rows", lambda day: [])
+    monkeypatch.setattr(execution_analytics, "_archived_rows", lambda day: [])
+
+
+class TestFrameCache:
+    """DayFrame caching"""
+
+    def test_day_end_is_ist_midnight(self):
+        end = execution_analytics._ist_day_end(date(2026, 10, 18))
+        assert datetime.utcfromtimestamp(end) == datetime(2026, 10, 18, 18, 30)
+
+    def test_frame_built_during_the_day_is_rebuilt_after_it(self):
+        analytics = ExecutionAnalytics()
+        yesterday = execution_analytics._ist_today() - timedelta(days=1)
+        partial = DayFrame(yesterday)
+        partial.built_at = execution_analytics._ist_day_end(yesterday) - 5
+        analytics._frames[yesterday] = partial
+
+        rebuilt = analytics.frame(yesterday)
+        assert rebuilt is not partial
+        assert analytics.frame(yesterday) is rebuilt
+
+    def test_today_is_cached_within_the_ttl(self):
+        analytics = ExecutionAnalytics()
+        today = execution_analytics._ist_today()
+        assert analytics.frame(today) is analytics.frame(today)
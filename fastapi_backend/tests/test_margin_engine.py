@@ -0,0 +1,108 @@
+"""
+Local Margin Engine Tests
+``margin_for_scripts`` must fall back (None) rather than under-margin legs the
+parsed SPAN files don't cover, and order-path checks submitted from worker
+threads must reach the reconciler's loop.
+"""
+
+import asyncio
+
+import pytest
+
+from app.market import live_prices
+from app.rms.margin_engine import LOCAL_MARGIN_ENGINE, MarginReconciler
+from app.services.dhan_margin_service import dhan_margin_service
+from app.services.span_parameters_service import span_parameters_service
+
+
+def _leg(segment, symbol, side, quantity, price):
+    return {
+        "exchange_segment": segment,
+        "symbol": symbol,
+        "transaction_type": side,
+        "quantity": quantity,
+        "price": price,
+    }
+
+
+@pytest.fixture(autouse=True)
+def no_span_files(monkeypatch):
+    """Start every test with no SPAN data loaded and no spot prices."""
+    monkeypatch.setattr(span_parameters_service, "equity_risk_arrays", {})
+    monkeypatch.setattr(span_parameters_service, "mcx_risk_arrays", {})
+    monkeypatch.setattr(span_parameters_service, "short_option_addon_percent", {})
+    monkeypatch.setattr(live_prices, "get_price", lambda symbol: None)
+
+
+class TestMarginFallback:
+    """Legs without risk parameters"""
+
+    def test_future_without_risk_array_falls_back(self):
+        legs = [_leg("MCX_COMM", "CRUDEOIL NOV FUT", "BUY", 100, 6000)]
+        assert LOCAL_MARGIN_ENGINE.margin_for_scripts(legs) is None
+
+    def test_future_with_risk_array_is_margined(self, monkeypatch):
+        monkeypatch.setattr(
+            span_parameters_service,
+            "mcx_risk_arrays",
+            {("FUT", "CRUDEOIL", "NOV", None, None): [1000.0] * 16},
+        )
+        result = LOCAL_MARGIN_ENGINE.margin_for_scripts([_leg("MCX_COMM", "CRUDEOIL NOV FUT", "BUY", 100, 6000)])
+        assert result is not None
+        assert result["margin"] > 0
+
+    def test_short_option_without_risk_parameters_falls_back(self):
+        legs = [_leg("NSE_FNO", "NIFTY 27OCT2026 24500 CE", "SELL", 75, 100)]
+        assert LOCAL_MARGIN_ENGINE.margin_for_scripts(legs) is None
+
+    def test_short_option_addon_needs_a_spot_price(self, monkeypatch):
+        legs = [_leg("NSE_FNO", "NIFTY 27OCT2026 24500 CE", "SELL", 75, 100)]
+        monkeypatch.setattr(span_parameters_service, "short_option_addon_percent", {"NIFTY": 0.1})
+        assert LOCAL_MARGIN_ENGINE.margin_for_scripts(legs) is None
+
+        monkeypatch.setattr(live_prices, "get_price", lambda symbol: 24400.0 if symbol == "NIFTY" else None)
+        result = LOCAL_MARGIN_ENGINE.margin_for_scripts(legs)
+        assert result is not None
+        assert result["margin"] > 0
+
+    def test_long_option_pays_premium_without_span_data(self):
+        result = LOCAL_MARGIN_ENGINE.margin_for_scripts([_leg("NSE_FNO", "NIFTY 27OCT2026 24500 CE", "BUY", 75, 100)])
+        assert result is not None
+        assert result["margin"] == pytest.approx(7500.0)
+
+    def test_mixed_set_falls_back_when_any_leg_is_uncovered(self):
+        legs = [
+            _leg("NSE_EQ", "RELIANCE", "BUY", 10, 2500),
+            _leg("MCX_COMM", "CRUDEOIL NOV FUT", "SELL", 100, 6000),
+        ]
+        assert LOCAL_MARGIN_ENGINE.margin_for_scripts(legs) is None
+
+
+class TestMarginReconciler:
+    """Background Dhan reconciliation"""
+
+    def test_thread_submissions_reach_the_started_loop(self, monkeypatch):
+        async def fake_single(**kwargs):
+            return {"margin": 1000.0}
+
+        monkeypatch.setattr(dhan_margin_service, "calculate_margin_single", fake_single)
+        reconciler = MarginReconciler(tolerance=0.1)
+        reconciler.enabled = True
+
+        async def scenario():
+            reconciler.start()
+            loop = asyncio.get_running_loop()
+            submitted = await loop.run_in_executor(None, reconciler.submit, "single", {"symbol": "X"}, 1500.0)
+            for _ in range(100):
+                if reconciler.stats["checked"]:
+                    break
+                await asyncio.sleep(0.01)
+            status = reconciler.get_status()
+            reconciler.stop()
+            return submitted, status
+
+        submitted, status = asyncio.run(scenario())
+        assert submitted is True
+        assert status["running"] is True
+        assert status["dropped"] == 0
+        assert status["checked"] == status["mismatched"] == 1
@@ -0,0 +1,67 @@
+"""
+Running Ledger Balance Tests
+Concurrent writers, each with its own balance cache as separate workers
+would have, must leave a gap-free running balance.
+"""
+
+import threading
+
+from app.ledger.running_balance import LedgerConflictError, RunningBalanceCache
+from app.storage import models
+from app.storage.db import SessionLocal
+
+WRITERS = 4
+ENTRIES_PER_WRITER = 25
+
+
+def _write(user_id, writer, errors):
+    cache = RunningBalanceCache()
+    db = SessionLocal()
+    try:
+        for n in range(ENTRIES_PER_WRITER):
+            credit, debit = (100.0, 0.0) if n % 3 else (0.0, 40.0)
+            while True:
+                user = db.get(models.UserAccount, user_id)
+                try:
+                    cache.post(db, user, credit=credit, debit=debit, entry_type="ADJUST", remarks=f"w{writer}-{n}")
+                    db.commit()
+                    break
+                except LedgerConflictError:
+                    db.rollback()
+    except Exception as exc:  # surfaced by the test thread
+        db.rollback()
+        errors.append(exc)
+    finally:
+        db.close()
+
+
+class TestConcurrentAppend:
+    """append_entries under contention"""
+
+    def test_running_balance_has_no_gaps(self, db_session, make_user):
+        user = make_user(wallet_balance=0.0)
+        errors = []
+        threads = [threading.Thread(target=_write, args=(user.id, i, errors)) for i in range(WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+
+        entries = (
+            db_session.query(models.LedgerEntry)
+            .filter(models.LedgerEntry.user_id == user.id)
+            .order_by(models.LedgerEntry.id)
+            .all()
+        )
+        assert len(entries) == WRITERS * ENTRIES_PER_WRITER
+
+        balance = 0.0
+        for entry in entries:
+            assert entry.balance - entry.credit + entry.debit == balance
+            balance = entry.balance
+
+        db_session.expire_all()
+        account = db_session.get(models.UserAccount, user.id)
+        assert account.ledger_balance == balance == sum(e.credit - e.debit for e in entries)
+        assert account.ledger_version == WRITERS * ENTRIES_PER_WRITER
@@ -0,0 +1,101 @@
+"""
+MIS Square-off Tests
+One pass closes every priced MIS position exactly once, leaves unpriced and
+non-MIS positions alone, and never runs while another worker holds the lock.
+"""
+
+import pytest
+
+from app.market.market_state import state
+from app.rms.squareoff_engine import SquareOffEngine
+from app.storage import models
+from app.storage.process_lock import exclusive
+
+PRICED = ("SQA", "SQB", "SQC")
+
+
+@pytest.fixture()
+def depth():
+    for symbol in PRICED:
+        state["depth"][symbol] = {
+            "bids": [{"price": 100.0, "qty": 10}],
+            "asks": [{"price": 100.5, "qty": 10}],
+        }
+    yield
+    for symbol in PRICED:
+        state["depth"].pop(symbol, None)
+
+
+@pytest.fixture()
+def book(db_session, make_user):
+    """Two users with long and short MIS legs, plus rows the pass must skip."""
+    users = [make_user(), make_user()]
+    for user in users:
+        for symbol, quantity in zip(PRICED, (10, -25, 50)):
+            db_session.add(models.MockPosition(
+                user_id=user.id, symbol=symbol, exchange_segment="NSE_EQ",
+                product_type="MIS", quantity=quantity, avg_price=99.0,
+            ))
+        db_session.add(models.MockPosition(
+            user_id=user.id, symbol="SQNOPRICE", exchange_segment="NSE_EQ",
+            product_type="MIS", quantity=5, avg_price=1.0,
+        ))
+        db_session.add(models.MockPosition(
+            user_id=user.id, symbol="SQA", exchange_segment="NSE_EQ",
+            product_type="CNC", quantity=5, avg_price=1.0,
+        ))
+        db_session.add(models.MockOrder(
+            user_id=user.id, symbol="SQA", exchange_segment="NSE_EQ", transaction_type="BUY",
+            quantity=1, order_type="LIMIT", product_type="MIS", price=1.0, status="PENDING",
+        ))
+    db_session.commit()
+    return users
+
+
+class TestSquareOffPass:
+    """Scheduled square-off"""
+
+    def test_closes_each_position_exactly_once(self, db_session, book, depth):
+        engine = SquareOffEngine()
+        result = engine.run(["NSE"])
+
+        assert result["status"] == "ok"
+        assert result["closed"] == len(book) * len(PRICED)
+        assert result["cancelled_orders"] == len(book)
+
+        db_session.expire_all()
+        for pos in db_session.query(models.MockPosition).filter(models.MockPosition.symbol.in_(PRICED)):
+            if pos.product_type == "MIS":
+                assert pos.quantity == 0
+            else:
+                assert pos.quantity == 5
+
+        closes = db_session.query(models.MockOrder).filter(
+            models.MockOrder.remarks == "AUTO_SQUAREOFF", models.MockOrder.order_type == "MARKET",
+        ).all()
+        keys = [(order.user_id, order.symbol) for order in closes]
+        assert len(keys) == len(set(keys)) == len(book) * len(PRICED)
+        assert {order.status for order in closes} == {"EXECUTED"}
+
+        again = engine.run(["NSE"])
+        assert again["closed"] == 0
+
+    def test_leaves_unpriced_positions_open(self, db_session, book, depth):
+        result = SquareOffEngine().run(["NSE"])
+
+        assert sorted(item["user_id"] for item in result["unpriced"]) == sorted(user.id for user in book)
+        db_session.expire_all()
+        unpriced = db_session.query(models.MockPosition).filter(models.MockPosition.symbol == "SQNOPRICE").all()
+        assert [pos.quantity for pos in unpriced] == [5, 5]
+
+    def test_skips_while_another_worker_holds_the_lock(self, db_session, book, depth):
+        with exclusive("mis_squareoff") as held:
+            assert held
+            result = SquareOffEngine().run(["NSE"])
+
+        assert result["status"] == "already_running"
+        db_session.expire_all()
+        open_mis = db_session.query(models.MockPosition).filter(
+            models.MockPosition.product_type == "MIS", models.MockPosition.quantity != 0,
+        ).count()
+        assert open_mis == len(book) * (len(PRICED) + 1)